@@ -7,16 +7,32 @@ class EdgeTTSAPI:
     def __init__(self):
         pass
 
-    async def _generate_audio_async(self, text, voice, rate, pitch, output_file):
+    async def _generate_audio_async(self, text, voice, rate, pitch, output_file, word_boundaries=None):
         """
         Generate audio using edge-tts.
         rate: str, e.g. "+0%", "-10%"
         pitch: str, e.g. "+0Hz", "+10Hz"
+        word_boundaries: list to collect {'start', 'end', 'text'} of every spoken word (seconds)
         """
-        communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
-        await communicate.save(output_file)
+        try:
+            communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch, boundary="WordBoundary")
+        except TypeError:
+            # edge-tts < 7 has no boundary option and always sends WordBoundary events
+            communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
+
+        with open(output_file, "wb") as audio:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    audio.write(chunk["data"])
+                elif chunk["type"] == "WordBoundary" and word_boundaries is not None:
+                    # offset/duration come in 100 ns ticks
+                    word_boundaries.append({
+                        'start': chunk["offset"] / 10000000,
+                        'end': (chunk["offset"] + chunk["duration"]) / 10000000,
+                        'text': chunk["text"],
+                    })
 
-    def generate_audio(self, text, voice, rate, pitch, output_path):
+    def generate_audio(self, text, voice, rate, pitch, output_path, word_boundaries=None):
         try:
             # properly format rate and pitch if they are just numbers or raw strings
             # Assuming rate is passed as int (percentage) or string with %
@@ -38,7 +54,7 @@ class EdgeTTSAPI:
                 pitch_str = pitch
 
             logger.log(f"EdgeTTS generating with voice={voice}, rate={rate_str}, pitch={pitch_str}", level=LogLevel.INFO)
-            asyncio.run(self._generate_audio_async(text, voice, rate_str, pitch_str, output_path))
+            asyncio.run(self._generate_audio_async(text, voice, rate_str, pitch_str, output_path, word_boundaries))
             return True, "success"
         except Exception as e:
             logger.log(f"EdgeTTS generation failed: {e}", level=LogLevel.ERROR)
@@ -3,6 +3,7 @@ import time
 from functools import wraps
 from utils.settings import settings_manager
 from utils.logger import logger, LogLevel
+from utils.completion_cache import completion_cache
 
 
 import threading
@@ -88,20 +89,27 @@ class OpenRouterAPI:
 
 
 
-    @retry(tries=2, delay=5, backoff=2)
-    def get_chat_completion(self, model, messages, max_tokens=None, temperature=None):
-        if not self.api_key:
-            error_msg = "API key is not configured."
-            logger.log(error_msg, level=LogLevel.ERROR)
-            raise ValueError(error_msg)
+    def get_chat_completion(self, model, messages, max_tokens=None, temperature=None, cache_stage=None, refresh_cache=False):
+        """
+        cache_stage - назва етапу для кешу відповідей (None - без кешу).
+        refresh_cache - ігнорувати збережену відповідь і перезаписати її новою (регенерація).
+        """
+        data = self._build_chat_payload(model, messages, max_tokens, temperature)
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://soloveyko-ai.kherson.ua", # Required for some free models/policies
-            "X-Title": "Soloveyko.AI-Video.Maker"
-        }
-        
+        use_cache = cache_stage is not None and completion_cache.is_enabled(cache_stage)
+        if use_cache and not refresh_cache:
+            cached = completion_cache.get(data)
+            if cached:
+                logger.log(f"Chat completion for {model} served from cache ({cache_stage}).", level=LogLevel.INFO)
+                return cached
+
+        response = self._request_chat_completion(model, data)
+
+        if use_cache and self._has_content(response):
+            completion_cache.put(data, response)
+        return response
+
+    def _build_chat_payload(self, model, messages, max_tokens=None, temperature=None):
         # Prepare payload
         data = {
             "model": model,
@@ -123,6 +131,28 @@ class OpenRouterAPI:
                 {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
                 {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
             ]
+        return data
+
+    def _has_content(self, response):
+        try:
+            msg = response['choices'][0].get('message', {})
+            return bool(msg.get('content') or msg.get('reasoning'))
+        except (KeyError, IndexError, TypeError, AttributeError):
+            return False
+
+    @retry(tries=2, delay=5, backoff=2)
+    def _request_chat_completion(self, model, data):
+        if not self.api_key:
+            error_msg = "API key is not configured."
+            logger.log(error_msg, level=LogLevel.ERROR)
+            raise ValueError(error_msg)
+
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://soloveyko-ai.kherson.ua", # Required for some free models/policies
+            "X-Title": "Soloveyko.AI-Video.Maker"
+        }
 
         logger.log(f"Requesting chat completion from model: {model}", level=LogLevel.INFO)
         
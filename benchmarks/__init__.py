@@ -0,0 +1,7 @@
+"""
+Offline benchmarks. Nothing here is imported by the application itself.
+
+    python -m benchmarks.pipeline_benchmark --help
+    python -m benchmarks.motion_benchmark --help
+    python -m benchmarks.montage_benchmark --help
+"""
@@ -0,0 +1,497 @@
+"""
+Мікробенчмарк графа фільтрів монтажу: MontageEngine.create_video на синтетичних вхідних даних
+(однотонні або шумові картинки, короткі тестові відео-кліпи, синусоїда замість озвучки, зразок ASS)
+по матриці налаштувань - zoom, sway, upscale_factor, тип переходу, xfade/concat, оверлей,
+вотермарка, субтитри, портрет/пейзаж, пресет libx264.
+
+За замовчуванням матриця "по одній осі": базовий випадок (перші значення всіх осей) плюс по
+одному випадку на кожне інше значення кожної осі. --full дає повний декартів добуток вибраних осей.
+Кеш кліпів і ресурсів вимкнений - кожен прогін рендерить граф повністю.
+
+Usage:
+    python -m benchmarks.montage_benchmark --clips 6 --duration 4 --report montage.json
+    python -m benchmarks.montage_benchmark --axes zoom,upscale --full --save-baseline baseline.json
+    python -m benchmarks.montage_benchmark --baseline baseline.json --threshold 10 --fail-on-regression
+    python -m benchmarks.montage_benchmark --set preset=veryfast --set orientation=portrait --axes overlay
+
+Звіт (JSON): для кожного випадку - кадри, час (медіана з --repeat прогонів), кадри в секунду,
+процесорний час (цей процес + завершені дочірні FFmpeg; на Windows дочірні процеси не враховуються)
+і пікова RSS. З --baseline кожен випадок порівнюється із записом з тим самим id у збереженому звіті.
+"""
+import os
+import sys
+import json
+import math
+import time
+import wave
+import shutil
+import struct
+import argparse
+import itertools
+import platform
+import statistics
+import subprocess
+import tempfile
+
+from benchmarks.motion_benchmark import RssSampler
+from core.batch_runner import setup_dependency_paths
+from core.montage_engine import MontageEngine
+from core import motion_renderer
+from core.clip_cache import clip_cache
+from core.asset_cache import asset_cache
+from utils.settings import settings_manager
+
+FPS = 30
+VIDEO_CLIP_SECONDS = 3.0
+
+# Осі матриці: перше значення - базове
+AXES = {
+    'zoom': [True, False],
+    'sway': [False, True],
+    'upscale': [3.0, 2.0, 1.0],
+    'transition': ['fade', 'wipeleft', 'slideleft', 'circlecrop'],
+    'join': ['xfade', 'concat'],
+    'overlay': [False, True],
+    'watermark': [False, True],
+    'subtitles': [False, True],
+    'orientation': ['landscape', 'portrait'],
+    'preset': ['superfast', 'veryfast', 'fast', 'medium'],
+}
+# Тип переходу не має значення, коли кліпи склеюються concat
+IGNORED_WITH_CONCAT = ('transition',)
+
+SIZES = {'landscape': (1408, 768), 'portrait': (768, 1408)}
+
+
+def run_ffmpeg(args):
+    result = subprocess.run(
+        ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"] + args,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True, encoding='utf-8', errors='replace'
+    )
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg failed: {result.stderr.strip()}")
+
+
+def ffmpeg_version():
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        return result.stdout.splitlines()[0] if result.stdout else None
+    except OSError:
+        return None
+
+
+# --- Синтетичні вхідні дані ---
+
+def make_image(path, width, height, kind, seed):
+    """Однотонна картинка (найдешевше для кодера) або рівномірний шум (найдорожче)."""
+    color = f"0x{(seed * 0x3b5f27) & 0xffffff:06x}"
+    vf = ["-vf", "noise=alls=80:allf=u+t,setsar=1"] if kind == 'noise' else []
+    run_ffmpeg(["-f", "lavfi", "-i", f"color=c={color}:s={width}x{height}"] + vf + ["-frames:v", "1", path])
+
+
+def make_video_clip(path, width, height, duration):
+    run_ffmpeg([
+        "-f", "lavfi", "-i", f"testsrc2=s={width}x{height}:r={FPS}:d={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", path
+    ])
+
+
+def make_overlay(path, duration=2.0):
+    """Короткий ефект-оверлей (зерно на чорному), як типові dust/grain-кліпи."""
+    run_ffmpeg([
+        "-f", "lavfi", "-i", f"color=c=black:s=960x540:r={FPS}:d={duration}",
+        "-vf", "noise=alls=40:allf=t", "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", path
+    ])
+
+
+def make_watermark(path):
+    """Напівпрозора PNG-вотермарка з альфа-каналом."""
+    run_ffmpeg([
+        "-f", "lavfi", "-i", "color=c=white@0.6:s=400x120,format=rgba",
+        "-vf", "drawbox=x=10:y=10:w=380:h=100:color=black@0.8:t=8", "-frames:v", "1", path
+    ])
+
+
+def make_sine(path, duration, freq=440.0, sample_rate=44100):
+    """Синусоїда замість озвучки - MontageEngine ділить її тривалість між картинками."""
+    frames = int(duration * sample_rate)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        step = 2 * math.pi * freq / sample_rate
+        block = 4096
+        for start in range(0, frames, block):
+            count = min(block, frames - start)
+            wav.writeframes(struct.pack(
+                f"<{count}h", *(int(8000 * math.sin(step * (start + i))) for i in range(count))
+            ))
+
+
+def make_ass(path, duration, width, height, line_seconds=2.0):
+    """Зразок ASS: по рядку кожні line_seconds секунд, з обведенням - як у звичайних субтитрах."""
+    def ts(seconds):
+        h = int(seconds // 3600)
+        m = int((seconds % 3600) // 60)
+        return f"{h}:{m:02d}:{seconds % 60:05.2f}"
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+        "Style: Default,Arial,64,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,1,3,1,2,40,40,60,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    t = 0.0
+    i = 0
+    while t < duration:
+        end = min(duration, t + line_seconds)
+        i += 1
+        lines.append(f"Dialogue: 0,{ts(t)},{ts(end)},Default,,0,0,0,,Benchmark subtitle line number {i}")
+        t = end
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+
+
+class Inputs:
+    """Набір синтетичних файлів для однієї орієнтації; генерується один раз на весь прогін."""
+
+    def __init__(self, work_dir, args, orientation):
+        width, height = SIZES[orientation]
+        root = os.path.join(work_dir, orientation)
+        os.makedirs(root, exist_ok=True)
+
+        self.visual_files = []
+        for i in range(args.clips):
+            path = os.path.join(root, f"image_{i:03d}.png")
+            make_image(path, width, height, args.images, seed=i + 1)
+            self.visual_files.append(path)
+        for i in range(args.video_clips):
+            path = os.path.join(root, f"clip_{i:03d}.mp4")
+            make_video_clip(path, width, height, VIDEO_CLIP_SECONDS)
+            # Відео між картинками, щоб переходи були і між картинкою та відео
+            self.visual_files.insert(min(len(self.visual_files), 1 + i * 2), path)
+
+        self.duration = args.clips * args.duration + args.video_clips * VIDEO_CLIP_SECONDS
+        self.audio_path = os.path.join(root, "voice.wav")
+        make_sine(self.audio_path, self.duration)
+
+        base_w, base_h = (1080, 1920) if orientation == 'portrait' else (1920, 1080)
+        self.ass_path = os.path.join(root, "subtitles.ass")
+        make_ass(self.ass_path, self.duration, base_w, base_h)
+
+
+# --- Матриця ---
+
+def case_id(case):
+    return ",".join(f"{axis}={format_value(case[axis])}" for axis in AXES)
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return "on" if value else "off"
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+def parse_value(axis, raw):
+    sample = AXES[axis][0]
+    if isinstance(sample, bool):
+        if raw.lower() in ('1', 'on', 'true', 'yes'):
+            return True
+        if raw.lower() in ('0', 'off', 'false', 'no'):
+            return False
+        raise ValueError(f"{axis} expects on/off, got {raw}")
+    if isinstance(sample, float):
+        return float(raw)
+    return raw
+
+
+def build_matrix(axes, base, full):
+    """Список випадків (dict вісь -> значення) без дублікатів."""
+    cases = []
+    if full:
+        for values in itertools.product(*(AXES[axis] for axis in axes)):
+            cases.append(dict(base, **dict(zip(axes, values))))
+    else:
+        cases.append(dict(base))
+        for axis in axes:
+            for value in AXES[axis]:
+                if value != base[axis]:
+                    cases.append(dict(base, **{axis: value}))
+
+    unique = {}
+    for case in cases:
+        if case['join'] == 'concat':
+            for axis in IGNORED_WITH_CONCAT:
+                case[axis] = base[axis]
+        unique.setdefault(case_id(case), case)
+    return list(unique.values())
+
+
+def build_settings(case, args, assets):
+    settings = {
+        'motion_engine': args.engine,
+        'codec': 'libx264',
+        'preset': case['preset'],
+        'bitrate_mbps': 5,
+        'upscale_factor': case['upscale'],
+        'enable_transitions': case['join'] == 'xfade',
+        'transition_effect': case['transition'],
+        'transition_duration': args.transition,
+        'enable_zoom': case['zoom'],
+        'zoom_speed_factor': 1.0,
+        'zoom_intensity': 0.15,
+        'enable_sway': case['sway'],
+        'sway_speed_factor': 1.0,
+        'special_processing_mode': 'Disabled',
+        'overlay_effect_path': assets['overlay'] if case['overlay'] else None,
+        'watermark_path': assets['watermark'] if case['watermark'] else None,
+        'watermark_size': 20,
+        'watermark_position': 8,
+    }
+    if case['orientation'] == 'portrait':
+        # Підказка орієнтації, як від налаштувань генерації картинок
+        settings['pollinations'] = {'width': 1080, 'height': 1920}
+    return settings
+
+
+# --- Вимірювання ---
+
+def cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def run_case(case, args, inputs, assets, work_dir):
+    output_path = os.path.join(work_dir, "montage.mp4")
+    settings = build_settings(case, args, assets)
+    ass_path = inputs.ass_path if case['subtitles'] else None
+    frames = int(round(inputs.duration * FPS))
+
+    runs = []
+    for attempt in range(args.repeat):
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        with RssSampler() as sampler:
+            cpu_started = cpu_seconds()
+            started = time.perf_counter()
+            MontageEngine().create_video(
+                inputs.visual_files, inputs.audio_path, output_path, ass_path, settings,
+                task_id="bench-montage", progress_callback=lambda msg: None
+            )
+            wall = time.perf_counter() - started
+            cpu = cpu_seconds() - cpu_started
+        runs.append({'wall_sec': wall, 'cpu_sec': cpu, 'peak_rss_mb': sampler.peak_mb()})
+
+    wall = statistics.median(r['wall_sec'] for r in runs)
+    cpu = statistics.median(r['cpu_sec'] for r in runs)
+    rss = [r['peak_rss_mb'] for r in runs if r['peak_rss_mb'] is not None]
+    return {
+        'id': case_id(case),
+        'case': {axis: case[axis] for axis in AXES},
+        'frames': frames,
+        'wall_sec': round(wall, 2),
+        'wall_runs': [round(r['wall_sec'], 2) for r in runs],
+        'fps': round(frames / wall, 1) if wall > 0 else None,
+        'cpu_sec': round(cpu, 2),
+        # Скільки ядер у середньому було зайнято
+        'cpu_util': round(cpu / wall, 2) if wall > 0 else None,
+        'peak_rss_mb': max(rss) if rss else None,
+        'output_mb': round(os.path.getsize(output_path) / (1024 * 1024), 2),
+    }
+
+
+# --- Порівняння з базовою лінією ---
+
+def compare(report, baseline, threshold):
+    """Додає до кожного результату зміну часу відносно baseline. Повертає id випадків, що сповільнились."""
+    base_results = {r['id']: r for r in baseline.get('results', [])}
+    regressions = []
+    for r in report['results']:
+        old = base_results.get(r['id'])
+        if not old or not old.get('wall_sec'):
+            r['baseline'] = None
+            continue
+        delta = (r['wall_sec'] - old['wall_sec']) / old['wall_sec'] * 100.0
+        if delta > threshold:
+            verdict = 'slower'
+            regressions.append(r['id'])
+        elif delta < -threshold:
+            verdict = 'faster'
+        else:
+            verdict = 'same'
+        r['baseline'] = {
+            'wall_sec': old['wall_sec'],
+            'fps': old.get('fps'),
+            'cpu_sec': old.get('cpu_sec'),
+            'peak_rss_mb': old.get('peak_rss_mb'),
+            'wall_delta_pct': round(delta, 1),
+            'verdict': verdict,
+        }
+    return regressions
+
+
+def config_mismatches(config, baseline_config):
+    keys = ('clips', 'video_clips', 'duration', 'images', 'engine', 'transition', 'cpu_count', 'ffmpeg')
+    return [key for key in keys if baseline_config.get(key) != config.get(key)]
+
+
+def describe(case, base):
+    changed = [f"{axis}={format_value(case[axis])}" for axis in AXES if case[axis] != base[axis]]
+    return ", ".join(changed) if changed else "base"
+
+
+def print_report(report, base):
+    config = report['config']
+    print()
+    print(f"{config['clips']} images + {config['video_clips']} clips, {config['duration']}s per image, "
+          f"{config['images']} images, {config['engine']} engine, {config['cpu_count']} CPUs")
+    print(f"base: {describe(base, {axis: None for axis in AXES})}")
+    print()
+    compared = any(r.get('baseline') for r in report['results'])
+    header = f"{'Case':<36}{'wall s':>9}{'fps':>8}{'cpu s':>9}{'cores':>7}{'RSS MB':>9}"
+    if compared:
+        header += f"{'base s':>9}{'delta':>9}"
+    print(header)
+    for r in report['results']:
+        rss = r['peak_rss_mb'] if r['peak_rss_mb'] is not None else "n/a"
+        line = (f"{describe(r['case'], base)[:35]:<36}{r['wall_sec']:>9.2f}{r['fps']:>8.1f}"
+                f"{r['cpu_sec']:>9.2f}{r['cpu_util']:>7.2f}{rss:>9}")
+        if compared:
+            b = r.get('baseline')
+            if b:
+                mark = {'slower': ' !', 'faster': ' +'}.get(b['verdict'], '')
+                line += f"{b['wall_sec']:>9.2f}{b['wall_delta_pct']:>+8.1f}%{mark}"
+            else:
+                line += f"{'-':>9}{'new':>9}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Montage filter graph micro-benchmark over a matrix of settings.")
+    parser.add_argument('--axes', default=",".join(AXES), help=f"Comma separated axes to vary: {', '.join(AXES)}")
+    parser.add_argument('--full', action='store_true', help="Full cartesian product of the axes instead of one axis at a time")
+    parser.add_argument('--set', action='append', default=[], metavar="AXIS=VALUE", help="Change the base value of an axis")
+    parser.add_argument('--clips', type=int, default=4, help="Number of image clips")
+    parser.add_argument('--video-clips', type=int, default=1, help=f"Number of {VIDEO_CLIP_SECONDS:g}s test video clips")
+    parser.add_argument('--duration', type=float, default=3.0, help="Duration of each image clip, seconds")
+    parser.add_argument('--images', choices=['noise', 'solid'], default='noise', help="Synthetic image content")
+    parser.add_argument('--engine', choices=['zoompan', 'affine'], default='zoompan', help="Motion engine")
+    parser.add_argument('--transition', type=float, default=0.5, help="Transition duration, seconds")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per case; the median wall time is reported")
+    parser.add_argument('--report', help="Write the JSON report to this file")
+    parser.add_argument('--save-baseline', help="Write the JSON report as a baseline to this file")
+    parser.add_argument('--baseline', help="Compare against this saved report")
+    parser.add_argument('--threshold', type=float, default=10.0, help="Wall time change, %%, counted as faster/slower")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with code 1 if any case got slower")
+    parser.add_argument('--list', action='store_true', help="Print the cases and exit")
+    args = parser.parse_args(argv)
+
+    axes = [a.strip() for a in args.axes.split(',') if a.strip()]
+    unknown = [a for a in axes if a not in AXES]
+    if unknown:
+        parser.error(f"unknown axes: {', '.join(unknown)}")
+    base = {axis: values[0] for axis, values in AXES.items()}
+    for item in args.set:
+        axis, sep, raw = item.partition('=')
+        if not sep or axis not in AXES:
+            parser.error(f"--set expects AXIS=VALUE with one of: {', '.join(AXES)}")
+        try:
+            base[axis] = parse_value(axis, raw)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.engine == 'affine' and not motion_renderer.is_available():
+        parser.error("the affine engine needs opencv-python")
+    if args.repeat < 1 or args.clips < 1:
+        parser.error("--repeat and --clips must be at least 1")
+
+    cases = build_matrix(axes, base, args.full)
+    if args.list:
+        for case in cases:
+            print(describe(case, base))
+        print(f"\n{len(cases)} cases")
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    setup_dependency_paths()
+    # Лише в пам'яті - налаштування користувача на диску не змінюються. Кеш вимкнений, щоб міряти рендер
+    settings_manager.settings['clip_cache'] = {'enabled': False, 'ttl_hours': 0, 'max_size_mb': 0}
+
+    work_dir = tempfile.mkdtemp(prefix="montage_benchmark_")
+    clip_cache.cache_dir = os.path.join(work_dir, "cache", "clips")
+    asset_cache.store.cache_dir = os.path.join(work_dir, "cache", "assets")
+    results = []
+    try:
+        print("Generating inputs...", flush=True)
+        assets = {'overlay': os.path.join(work_dir, "overlay.mp4"), 'watermark': os.path.join(work_dir, "watermark.png")}
+        make_overlay(assets['overlay'])
+        make_watermark(assets['watermark'])
+        inputs = {}
+        for orientation in sorted({case['orientation'] for case in cases}):
+            inputs[orientation] = Inputs(work_dir, args, orientation)
+
+        for n, case in enumerate(cases, 1):
+            print(f"[{n}/{len(cases)}] {describe(case, base)}", flush=True)
+            results.append(run_case(case, args, inputs[case['orientation']], assets, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'config': {
+            'clips': args.clips,
+            'video_clips': args.video_clips,
+            'duration': args.duration,
+            'images': args.images,
+            'engine': args.engine,
+            'transition': args.transition,
+            'repeat': args.repeat,
+            'base': {axis: base[axis] for axis in AXES},
+            'full': args.full,
+            'cpu_count': os.cpu_count(),
+            'platform': platform.platform(),
+            'ffmpeg': ffmpeg_version(),
+            'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        'results': results,
+    }
+
+    regressions = []
+    if baseline is not None:
+        mismatches = config_mismatches(report['config'], baseline.get('config', {}))
+        if mismatches:
+            print(f"\nWarning: baseline was recorded with different {', '.join(mismatches)} - timings are not comparable.")
+        regressions = compare(report, baseline, args.threshold)
+        report['baseline'] = {'path': os.path.abspath(args.baseline), 'threshold_pct': args.threshold, 'regressions': regressions}
+
+    print_report(report, base)
+
+    for path in (args.report, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"\nReport written to {path}")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:g}%")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
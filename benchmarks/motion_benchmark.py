@@ -0,0 +1,229 @@
+"""
+Бенчмарк рушіїв руху Ken Burns: 'zoompan' (апскейл до upscale_factor + zoompan) проти
+'affine' (core/motion_renderer.py - субпіксельний warpAffine у розмірі кадру).
+
+Кожен рушій проганяє повний MontageEngine.create_video на однаковому наборі картинок
+і тихій озвучці (clips x duration секунд), з тими самими переходами та кодеком.
+Кеш кліпів (core/clip_cache.py) за замовчуванням вимкнений; з --clip-cache кожен рушій
+запускається двічі з порожнім тимчасовим кешем: холодний прогін і повторний ("+cache").
+
+Usage:
+    python -m benchmarks.motion_benchmark --clips 8 --duration 5
+    python -m benchmarks.motion_benchmark --image photo.jpg --upscale 3 --report motion.json
+    python -m benchmarks.motion_benchmark --engines zoompan --clip-cache
+
+Звіт: час, кадри в секунду, пікова RSS (цей процес + усі дочірні FFmpeg, опитування psutil кожні 20 мс)
+і розмір результату.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import wave
+
+from core.batch_runner import setup_dependency_paths
+from core.montage_engine import MontageEngine
+from core import motion_renderer
+from core.clip_cache import clip_cache
+from utils.settings import settings_manager
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SAMPLE_INTERVAL = 0.02
+
+
+class RssSampler:
+    """Пікова сумарна RSS процесу і всіх його нащадків (FFmpeg) за час вимірювання, в МБ."""
+
+    def __init__(self):
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        if psutil:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        me = psutil.Process()
+        while not self.stop_event.is_set():
+            total = 0
+            for proc in [me] + me.children(recursive=True):
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+            self.peak = max(self.peak, total)
+            self.stop_event.wait(SAMPLE_INTERVAL)
+
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1) if psutil else None
+
+
+def make_image(path, width, height, seed):
+    """Синтетична картинка з дрібними деталями (градієнт + шум + сітка), щоб рух було що інтерполювати."""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    img = np.zeros((height, width, 3), dtype=np.float32)
+    img[..., 0] = 128 + 100 * np.sin(x / 97.0 + seed)
+    img[..., 1] = 128 + 100 * np.cos(y / 71.0 - seed)
+    img[..., 2] = 128 + 60 * np.sin((x + y) / 53.0)
+    img += rng.normal(0, 3, img.shape)
+    img[::64, :] = 255
+    img[:, ::64] = 255
+    cv2.imwrite(path, np.clip(img, 0, 255).astype(np.uint8))
+
+
+def make_silence(path, duration, sample_rate=44100):
+    """Тиха озвучка потрібної тривалості - MontageEngine ділить її між картинками."""
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(duration * sample_rate))
+
+
+def build_settings(args, name):
+    return {
+        'motion_engine': name,
+        'codec': 'libx264',
+        'preset': args.preset,
+        'bitrate_mbps': 5,
+        'upscale_factor': args.upscale,
+        'enable_transitions': not args.no_transitions,
+        'transition_effect': 'fade',
+        'transition_duration': args.transition,
+        'enable_zoom': not args.no_zoom,
+        'zoom_speed_factor': 1.0,
+        'zoom_intensity': args.zoom_intensity,
+        'enable_sway': not args.no_sway,
+        'sway_speed_factor': 1.0,
+        'special_processing_mode': 'Disabled',
+    }
+
+
+def run_engine(name, args, image_paths, audio_path, work_dir, label=None):
+    label = label or name
+    output_path = os.path.join(work_dir, f"montage_{label}.mp4")
+    result = {'engine': label, 'frames': int(round(args.clips * args.duration * 30))}
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        MontageEngine().create_video(
+            image_paths, audio_path, output_path, None, build_settings(args, name),
+            task_id=f"bench-{label}", progress_callback=lambda msg: None
+        )
+        wall = time.perf_counter() - started
+    result['wall_sec'] = round(wall, 2)
+    result['fps'] = round(result['frames'] / wall, 1) if wall > 0 else None
+    result['peak_rss_mb'] = sampler.peak_mb()
+    result['output_mb'] = round(os.path.getsize(output_path) / (1024 * 1024), 1)
+    return result
+
+
+def print_report(report):
+    config = report['config']
+    print()
+    print(f"{config['clips']} clips x {config['duration']}s, preset {config['preset']}, "
+          f"zoompan upscale {config['upscale']}x, {config['cpu_count']} CPUs")
+    print()
+    print(f"{'Engine':<16}{'frames':>8}{'wall s':>9}{'fps':>9}{'peak RSS MB':>13}{'output MB':>11}")
+    for r in report['results']:
+        rss = r['peak_rss_mb'] if r['peak_rss_mb'] is not None else "n/a"
+        print(f"{r['engine']:<16}{r['frames']:>8}{r['wall_sec']:>9.2f}{r['fps']:>9.1f}{rss:>13}{r['output_mb']:>11}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ken Burns motion engine benchmark: zoompan vs affine.")
+    parser.add_argument('--engines', default="zoompan,affine", help="Comma separated engines to run")
+    parser.add_argument('--clips', type=int, default=6, help="Number of image clips")
+    parser.add_argument('--duration', type=float, default=5.0, help="Clip duration, seconds")
+    parser.add_argument('--upscale', type=float, default=3.0, help="upscale_factor for the zoompan engine")
+    parser.add_argument('--zoom-intensity', type=float, default=0.15)
+    parser.add_argument('--transition', type=float, default=1.0, help="Transition duration, seconds")
+    parser.add_argument('--no-transitions', action='store_true')
+    parser.add_argument('--preset', default="superfast", help="x264 preset of the final encode")
+    parser.add_argument('--no-zoom', action='store_true')
+    parser.add_argument('--no-sway', action='store_true')
+    parser.add_argument('--image', help="Use this image for every clip instead of synthetic ones")
+    parser.add_argument('--image-size', default="1408x768", help="Size of the synthetic images, WxH")
+    parser.add_argument('--clip-cache', action='store_true', help="Enable the clip cache and add a warm re-run per engine")
+    parser.add_argument('--report', help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()]
+    if 'affine' in engines and not motion_renderer.is_available():
+        parser.error("the affine engine needs opencv-python")
+
+    setup_dependency_paths()
+    work_dir = tempfile.mkdtemp(prefix="motion_benchmark_")
+    try:
+        if args.image:
+            image_paths = [os.path.abspath(args.image)] * args.clips
+        else:
+            width, height = (int(v) for v in args.image_size.lower().split('x'))
+            image_paths = []
+            for i in range(args.clips):
+                path = os.path.join(work_dir, f"image_{i:03d}.png")
+                make_image(path, width, height, seed=i)
+                image_paths.append(path)
+
+        audio_path = os.path.join(work_dir, "voice.wav")
+        make_silence(audio_path, args.clips * args.duration)
+
+        # Лише в пам'яті - налаштування користувача на диску не змінюються
+        settings_manager.settings['clip_cache'] = {'enabled': args.clip_cache, 'ttl_hours': 0, 'max_size_mb': 0}
+
+        results = []
+        for name in engines:
+            clip_cache.cache_dir = tempfile.mkdtemp(prefix=f"cache_{name}_", dir=work_dir)
+            print(f"Running {name}...", flush=True)
+            results.append(run_engine(name, args, image_paths, audio_path, work_dir))
+            if args.clip_cache:
+                print(f"Running {name} with a warm clip cache...", flush=True)
+                results.append(run_engine(name, args, image_paths, audio_path, work_dir, label=f"{name}+cache"))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'config': {
+            'clips': args.clips,
+            'duration': args.duration,
+            'preset': args.preset,
+            'upscale': args.upscale,
+            'transition': 0 if args.no_transitions else args.transition,
+            'clip_cache': args.clip_cache,
+            'zoom': not args.no_zoom,
+            'sway': not args.no_sway,
+            'image': args.image or f"synthetic {args.image_size}",
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    print_report(report)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport written to {args.report}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
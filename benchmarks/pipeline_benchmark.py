@@ -0,0 +1,329 @@
+"""
+Офлайн бенчмарк конвеєра: N синтетичних завдань проходять через TaskProcessor, а всі зовнішні API
+(OpenRouter, Googler, ElevenLabs, VoiceMaker, Pollinations) замінені локальними заглушками з
+benchmarks/stub_providers.py. Заглушки повертають тишу (WAV) та однокольорові PNG.
+
+Usage:
+    python -m benchmarks.pipeline_benchmark --jobs 4 --languages 2
+    python -m benchmarks.pipeline_benchmark --image-provider pollinations --tts-provider VoiceMaker \
+        --latency 0.5 --error-rate 0.05 --rate-limit 20 --report report.json --quiet
+
+Звіт: загальний час, час кожного етапу (від 'processing' до завершення), завантаженість QThreadPool,
+пікова RSS та лічильники запитів кожної заглушки. Клієнтські паузи (опитування ElevenLabs кожні 10 с,
+паузи Pollinations між зображеннями) входять у виміряний час - це частина реальної поведінки конвеєра.
+
+Налаштування змінюються лише в пам'яті, історія завдань не записується, результати пишуться
+у тимчасову папку (видаляється, якщо не вказано --keep-output).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.stub_providers import StubProviders, DEFAULT_PROFILE, PROVIDER_HOSTS
+from core.batch_runner import BatchRunner, build_queue_job, setup_dependency_paths, REVIEW_SETTINGS
+
+DEFAULT_STAGES = ['stage_translation', 'stage_img_prompts', 'stage_images', 'stage_voiceover']
+STUB_API_KEY = 'benchmark-key'
+STUB_MODEL = 'benchmark/stub-model'
+FINAL_STATUSES = ('success', 'warning', 'error')
+
+
+def peak_rss_mb():
+    """Пікова RSS процесу в МБ; None, якщо платформа не дає цих даних."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS повертає байти, Linux - кілобайти
+        return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+        except Exception:
+            return None
+
+
+def synthetic_text(chars):
+    sentences = []
+    length = 0
+    i = 0
+    while length < chars:
+        i += 1
+        sentence = f"Sentence {i} of the synthetic benchmark story describes a quiet scene in plain words."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)[:chars]
+
+
+def normalize_stage(name):
+    name = name.strip()
+    return name if name.startswith('stage_') or name.startswith('custom_') else f"stage_{name}"
+
+
+def summarize(values):
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'mean': round(statistics.mean(ordered), 3),
+        'p50': round(ordered[len(ordered) // 2], 3),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        'max': round(ordered[-1], 3),
+        'total': round(sum(ordered), 3),
+    }
+
+
+class BenchmarkRunner(BatchRunner):
+    """BatchRunner, який додатково міряє час етапів і завантаженість пулу потоків."""
+
+    SAMPLE_INTERVAL_MS = 50
+
+    def __init__(self, app, jobs, verbose=False):
+        from PySide6.QtCore import QTimer
+
+        super().__init__(app, jobs)
+        self.verbose = verbose
+        self.started = None
+        self.wall_time = None
+        self.stage_started = {}     # (task_id, stage_key) -> perf_counter
+        self.stage_durations = {}   # stage_key -> [seconds]
+        self.stage_results = {}     # stage_key -> {status: count}
+        self.thread_samples = []
+
+        self.sampler = QTimer()
+        self.sampler.timeout.connect(self._sample)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start(self.SAMPLE_INTERVAL_MS)
+        super().start()
+
+    def finish(self, exit_code):
+        if self.exit_code is None:
+            self.wall_time = time.perf_counter() - self.started
+            self.sampler.stop()
+        super().finish(exit_code)
+
+    def _sample(self):
+        self.thread_samples.append(self.task_processor.threadpool.activeThreadCount())
+
+    def _on_stage_status_changed(self, job_id, lang_id, stage_key, status):
+        key = (f"{job_id}_{lang_id}", stage_key)
+        if status == 'processing':
+            self.stage_started.setdefault(key, time.perf_counter())
+        elif status in FINAL_STATUSES and key in self.stage_started:
+            duration = time.perf_counter() - self.stage_started.pop(key)
+            self.stage_durations.setdefault(stage_key, []).append(duration)
+            results = self.stage_results.setdefault(stage_key, {})
+            results[status] = results.get(status, 0) + 1
+        super()._on_stage_status_changed(job_id, lang_id, stage_key, status)
+
+    def _print(self, message):
+        if self.verbose:
+            super()._print(message)
+
+    def report(self):
+        max_threads = self.task_processor.threadpool.maxThreadCount()
+        samples = self.thread_samples or [0]
+        task_results = {}
+        for task in self.tasks.values():
+            result = self._task_result(task)
+            task_results[result] = task_results.get(result, 0) + 1
+
+        stages = {}
+        for stage_key, durations in self.stage_durations.items():
+            stages[stage_key] = summarize(durations)
+            stages[stage_key]['results'] = self.stage_results.get(stage_key, {})
+
+        return {
+            'wall_time': round(self.wall_time or 0, 3),
+            'exit_code': self.exit_code,
+            'tasks': task_results,
+            'stages': stages,
+            'threadpool': {
+                'max_threads': max_threads,
+                'mean_active': round(statistics.mean(samples), 2),
+                'peak_active': max(samples),
+                'saturated_share': round(sum(1 for s in samples if s >= max_threads) / len(samples), 3),
+                'samples': len(self.thread_samples),
+            },
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+
+def configure_settings(settings_manager, args, lang_ids, results_dir):
+    """Перевизначення лише в пам'яті: ключі заглушок, синтетичні мови, вимкнені перевірки та кеш."""
+    s = settings_manager.settings
+    for key in ('openrouter_api_key', 'elevenlabs_api_key', 'voicemaker_api_key'):
+        s[key] = STUB_API_KEY
+    s.setdefault('googler', {}).update({'api_key': STUB_API_KEY, 'max_threads': args.image_threads})
+    s.setdefault('pollinations', {}).update({'token': STUB_API_KEY})
+    s.setdefault('image_prompt_settings', {})['model'] = STUB_MODEL
+    s['image_generation_provider'] = args.image_provider
+    s['elevenlabs_max_threads'] = args.tts_threads
+    s['prompt_count_control_enabled'] = False
+    s['completion_cache'] = {'enabled': False}
+    s['results_path'] = results_dir
+    for key in REVIEW_SETTINGS:
+        s[key] = False
+
+    s['languages_config'] = {
+        lang_id: {
+            'display_name': f"Benchmark {i + 1}",
+            'prompt': "Translate the text:",
+            'model': STUB_MODEL,
+            'tts_provider': args.tts_provider,
+            'elevenlabs_template_uuid': 'benchmark-template',
+            'voicemaker_voice_id': 'ai3-Jony',
+        }
+        for i, lang_id in enumerate(lang_ids)
+    }
+
+
+def build_profiles(args):
+    base = {
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'rate_limit': args.rate_limit,
+        'task_time': args.task_time,
+        'prompt_count': args.prompt_count,
+    }
+    profiles = {}
+    overrides = {}
+    if args.profiles:
+        with open(args.profiles, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+    for name in PROVIDER_HOSTS:
+        profile = dict(base)
+        profile.update(overrides.get(name, {}))
+        if 'image_size' in profile:
+            profile['image_size'] = tuple(profile['image_size'])
+        profiles[name] = profile
+    return profiles
+
+
+def print_report(report):
+    print()
+    print(f"Wall time: {report['wall_time']:.2f}s  |  exit code {report['exit_code']}  |  tasks: "
+          + ", ".join(f"{k} {v}" for k, v in sorted(report['tasks'].items())))
+    print()
+    print(f"{'Stage':<22}{'count':>6}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}  results")
+    for stage_key, data in report['stages'].items():
+        results = ", ".join(f"{k} {v}" for k, v in sorted(data['results'].items()))
+        print(f"{stage_key:<22}{data['count']:>6}{data['mean']:>9.2f}{data['p50']:>9.2f}{data['p95']:>9.2f}{data['max']:>9.2f}  {results}")
+    pool = report['threadpool']
+    print()
+    print(f"Thread pool: {pool['mean_active']} mean / {pool['peak_active']} peak of {pool['max_threads']} threads, "
+          f"saturated {pool['saturated_share'] * 100:.0f}% of the time")
+    print(f"Peak RSS: {report['peak_rss_mb']} MB")
+    print()
+    print(f"{'Provider':<14}{'requests':>10}{'errors':>8}{'429':>6}{'peak conc.':>12}{'MB sent':>10}")
+    for name, stats in report['providers'].items():
+        if not stats['requests']:
+            continue
+        print(f"{name:<14}{stats['requests']:>10}{stats['injected_errors']:>8}{stats['rate_limited']:>6}"
+              f"{stats['peak_in_flight']:>12}{stats['bytes_sent'] / (1024 * 1024):>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark with stub provider servers.")
+    parser.add_argument('--jobs', type=int, default=4, help="Number of synthetic jobs")
+    parser.add_argument('--languages', type=int, default=1, help="Languages per job")
+    parser.add_argument('--stages', default=",".join(DEFAULT_STAGES),
+                        help="Comma separated stages (subtitles/montage need local whisper and ffmpeg)")
+    parser.add_argument('--text-chars', type=int, default=3000, help="Length of the synthetic source text")
+    parser.add_argument('--image-provider', default='googler', choices=['googler', 'pollinations'])
+    parser.add_argument('--tts-provider', default='ElevenLabs', choices=['ElevenLabs', 'VoiceMaker'])
+    parser.add_argument('--image-threads', type=int, default=8, help="Googler max_threads")
+    parser.add_argument('--tts-threads', type=int, default=5, help="ElevenLabs max parallel tasks")
+    parser.add_argument('--prompt-count', type=int, default=DEFAULT_PROFILE['prompt_count'], help="Image prompts per completion")
+    parser.add_argument('--latency', type=float, default=DEFAULT_PROFILE['latency'], help="Stub latency per request, seconds")
+    parser.add_argument('--jitter', type=float, default=DEFAULT_PROFILE['jitter'])
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_PROFILE['error_rate'], help="Share of HTTP 500 answers")
+    parser.add_argument('--rate-limit', type=int, default=DEFAULT_PROFILE['rate_limit'], help="Requests per second per provider, 0 - unlimited")
+    parser.add_argument('--task-time', type=float, default=DEFAULT_PROFILE['task_time'], help="ElevenLabs task processing time, seconds")
+    parser.add_argument('--profiles', help="JSON file with per-provider overrides, e.g. {\"googler\": {\"latency\": 2}}")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', help="Write the JSON report to this file")
+    parser.add_argument('--keep-output', action='store_true', help="Keep the generated results folder")
+    parser.add_argument('--quiet', action='store_true', help="Hide application log output while running")
+    parser.add_argument('--verbose', action='store_true', help="Print every stage status change")
+    args = parser.parse_args(argv)
+
+    from PySide6.QtCore import QCoreApplication, QTimer
+    from utils.settings import settings_manager
+    from core.history_manager import history_manager
+
+    stages = [normalize_stage(s) for s in args.stages.split(',') if s.strip()]
+    lang_ids = [f"bench{i + 1}" for i in range(args.languages)]
+    results_dir = tempfile.mkdtemp(prefix="pipeline_benchmark_")
+
+    configure_settings(settings_manager, args, lang_ids, results_dir)
+    # Бенчмарк не повинен потрапляти в історію завдань
+    history_manager.add_entry = lambda state: None
+
+    text = synthetic_text(args.text_chars)
+    languages_config = settings_manager.get('languages_config', {})
+    jobs = [
+        build_queue_job({'name': f"Benchmark {i + 1}", 'text': text, 'languages': lang_ids, 'stages': stages}, i, languages_config)
+        for i in range(args.jobs)
+    ]
+
+    setup_dependency_paths()
+    profiles = build_profiles(args)
+    stubs = StubProviders(profiles, seed=args.seed).start()
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    runner = BenchmarkRunner(app, jobs, verbose=args.verbose)
+
+    stdout = sys.stdout
+    devnull = None
+    if args.quiet:
+        devnull = open(os.devnull, 'w', encoding='utf-8')
+        sys.stdout = devnull
+    try:
+        QTimer.singleShot(0, runner.start)
+        exit_code = app.exec()
+    finally:
+        sys.stdout = stdout
+        if devnull:
+            devnull.close()
+        stubs.stop()
+
+    report = runner.report()
+    report['providers'] = stubs.stats()
+    report['config'] = {
+        'jobs': args.jobs,
+        'languages': args.languages,
+        'stages': stages,
+        'image_provider': args.image_provider,
+        'tts_provider': args.tts_provider,
+        'profiles': profiles,
+        'seed': args.seed,
+    }
+    print_report(report)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport written to {args.report}")
+
+    if args.keep_output:
+        print(f"Output kept in {results_dir}")
+    else:
+        shutil.rmtree(results_dir, ignore_errors=True)
+    return exit_code
+
+
+if __name__ == '__main__':
+    exit_code = main()
+    sys.stdout.flush()
+    # Як і batch_runner: не чекаємо на фонові потоки провайдерів під час завершення
+    os._exit(exit_code)
@@ -0,0 +1,369 @@
+"""
+Локальні заглушки HTTP API провайдерів (OpenRouter, Googler, ElevenLabs, VoiceMaker, Pollinations)
+для офлайн-бенчмарків. Кожен провайдер - окремий ThreadingHTTPServer на 127.0.0.1 з налаштовуваною
+затримкою, часткою помилок та лімітом запитів; клієнти з api/ перенаправляються на них через
+install_url_redirect() без змін у самих клієнтах.
+"""
+import io
+import os
+import json
+import base64
+import time
+import uuid
+import wave
+import zlib
+import struct
+import random
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Хости, які використовують клієнти з api/
+PROVIDER_HOSTS = {
+    'openrouter': ['openrouter.ai'],
+    'googler': ['app.recrafter.fun'],
+    'elevenlabs': ['voiceapi.csv666.ru'],
+    'voicemaker': ['developer.voicemaker.in'],
+    'pollinations': ['gen.pollinations.ai', 'image.pollinations.ai'],
+}
+
+DEFAULT_PROFILE = {
+    'latency': 0.2,          # seconds per request
+    'jitter': 0.1,           # +- random part of the latency
+    'error_rate': 0.0,       # share of requests answered with HTTP 500
+    'rate_limit': 0,         # requests per second, 0 - unlimited (excess gets HTTP 429)
+    'task_time': 2.0,        # ElevenLabs: seconds until a task is 'ending'
+    'prompt_count': 10,      # OpenRouter: numbered lines in every completion
+    'image_size': (1280, 720),
+    'chars_per_second': 15,  # TTS: length of the generated silence
+}
+
+AUDIO_SAMPLE_RATE = 8000
+
+
+def solid_png(width, height, rgb):
+    """PNG одного кольору без сторонніх бібліотек."""
+    raw = (b'\x00' + bytes(rgb) * width) * height
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b'')
+
+
+def silent_wav(duration):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(AUDIO_SAMPLE_RATE)
+        wav.writeframes(b'\x00\x00' * int(duration * AUDIO_SAMPLE_RATE))
+    return buffer.getvalue()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.stub.dispatch(self, 'GET')
+
+    def do_POST(self):
+        self.server.stub.dispatch(self, 'POST')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubProvider:
+    """Один провайдер: HTTP-сервер, профіль навантаження та лічильники запитів."""
+
+    def __init__(self, name, profile=None, seed=0):
+        self.name = name
+        self.profile = dict(DEFAULT_PROFILE)
+        self.profile.update(profile or {})
+        self.random = random.Random(f"{seed}:{name}")
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+        self.tasks = {}          # ElevenLabs task_id -> {'created', 'text'}
+        self.files = {}          # VoiceMaker file_id -> text
+        self._media_cache = {}
+        self._window = []        # request timestamps within the last second
+        self.stats = {
+            'requests': 0,
+            'injected_errors': 0,
+            'rate_limited': 0,
+            'in_flight': 0,
+            'peak_in_flight': 0,
+            'bytes_sent': 0,
+        }
+
+    # --- Lifecycle ---
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"stub-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats.pop('in_flight', None)
+        return stats
+
+    # --- Request handling ---
+
+    def dispatch(self, handler, method):
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        path = urlsplit(handler.path).path
+
+        with self.lock:
+            now = time.monotonic()
+            self.stats['requests'] += 1
+            self.stats['in_flight'] += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+            rate_limit = self.profile['rate_limit']
+            limited = False
+            if rate_limit:
+                self._window = [t for t in self._window if now - t < 1.0]
+                limited = len(self._window) >= rate_limit
+                if not limited:
+                    self._window.append(now)
+            failed = not limited and self.random.random() < self.profile['error_rate']
+            delay = max(0.0, self.profile['latency'] + self.random.uniform(-1, 1) * self.profile['jitter'])
+            if limited:
+                self.stats['rate_limited'] += 1
+            elif failed:
+                self.stats['injected_errors'] += 1
+
+        try:
+            if limited:
+                self._send_json(handler, {'error': {'message': 'Rate limit exceeded'}}, status=429)
+                return
+            time.sleep(delay)
+            if failed:
+                self._send_json(handler, {'error': {'message': 'Injected failure'}, 'success': False}, status=500)
+                return
+
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                payload = {}
+            route = getattr(self, f"_route_{self.name}")
+            route(handler, method, path, payload)
+        finally:
+            with self.lock:
+                self.stats['in_flight'] -= 1
+
+    def _send(self, handler, data, content_type, status=200):
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+        with self.lock:
+            self.stats['bytes_sent'] += len(data)
+
+    def _send_json(self, handler, data, status=200):
+        self._send(handler, json.dumps(data).encode('utf-8'), 'application/json', status)
+
+    def _not_found(self, handler, path):
+        self._send_json(handler, {'error': {'message': f'Unknown endpoint {path}'}}, status=404)
+
+    # --- Synthetic media ---
+
+    def _image_bytes(self, prompt):
+        color = tuple(hashlib.md5(prompt.encode('utf-8')).digest()[:3])
+        key = ('png', color)
+        with self.lock:
+            data = self._media_cache.get(key)
+        if data is None:
+            width, height = self.profile['image_size']
+            data = solid_png(width, height, color)
+            with self.lock:
+                if len(self._media_cache) > 64:
+                    self._media_cache.clear()
+                self._media_cache[key] = data
+        return data
+
+    def _audio_bytes(self, text):
+        duration = min(600, max(1, round(len(text) / self.profile['chars_per_second'])))
+        key = ('wav', duration)
+        with self.lock:
+            data = self._media_cache.get(key)
+        if data is None:
+            data = silent_wav(duration)
+            with self.lock:
+                self._media_cache[key] = data
+        return data
+
+    def _completion_text(self):
+        lines = [
+            f"{i}. Photorealistic photograph, synthetic benchmark scene {i}, plain studio background, natural lighting"
+            for i in range(1, self.profile['prompt_count'] + 1)
+        ]
+        return "\n".join(lines)
+
+    # --- Provider routes ---
+
+    def _route_openrouter(self, handler, method, path, payload):
+        if path.endswith('/chat/completions'):
+            content = self._completion_text()
+            self._send_json(handler, {
+                'id': f"gen-{uuid.uuid4().hex[:12]}",
+                'model': payload.get('model', 'stub'),
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': len(json.dumps(payload)) // 4, 'completion_tokens': len(content) // 4},
+            })
+        elif path.endswith('/credits'):
+            self._send_json(handler, {'data': {'total_credits': 100.0, 'total_usage': 0.0}})
+        elif path.endswith('/auth/key'):
+            self._send_json(handler, {'data': {'label': 'benchmark'}})
+        else:
+            self._not_found(handler, path)
+
+    def _route_googler(self, handler, method, path, payload):
+        if path.endswith('/image/from-text'):
+            encoded = base64.b64encode(self._image_bytes(payload.get('prompt', ''))).decode('ascii')
+            self._send_json(handler, {'success': True, 'result': f"data:image/png;base64,{encoded}"})
+        elif path.endswith('/account/usage'):
+            self._send_json(handler, {'account': {'level': 'benchmark'}, 'usage': {}})
+        else:
+            self._not_found(handler, path)
+
+    def _route_elevenlabs(self, handler, method, path, payload):
+        parts = [p for p in path.split('/') if p]
+        if parts == ['tasks'] and method == 'POST':
+            task_id = uuid.uuid4().hex
+            with self.lock:
+                self.tasks[task_id] = {'created': time.monotonic(), 'text': payload.get('text', '')}
+            self._send_json(handler, {'task_id': task_id})
+        elif len(parts) == 3 and parts[0] == 'tasks':
+            with self.lock:
+                task = self.tasks.get(parts[1])
+            if task is None:
+                self._not_found(handler, path)
+                return
+            ready = time.monotonic() - task['created'] >= self.profile['task_time']
+            if parts[2] == 'status':
+                self._send_json(handler, {'status': 'ending' if ready else 'processing'})
+            elif parts[2] == 'result':
+                if ready:
+                    self._send(handler, self._audio_bytes(task['text']), 'audio/mpeg')
+                else:
+                    self._send_json(handler, {'status': 'processing'}, status=202)
+            else:
+                self._not_found(handler, path)
+        elif parts == ['balance']:
+            self._send_json(handler, {'balance': 1000000})
+        elif parts == ['templates']:
+            self._send_json(handler, [])
+        else:
+            self._not_found(handler, path)
+
+    def _route_voicemaker(self, handler, method, path, payload):
+        if path.endswith('/voice/convert'):
+            file_id = uuid.uuid4().hex
+            with self.lock:
+                self.files[file_id] = payload.get('Text', '')
+            self._send_json(handler, {
+                'success': True,
+                'path': f"http://{self.address}/files/{file_id}.mp3",
+                'remainChars': 1000000,
+            })
+        elif path.startswith('/files/'):
+            file_id = path.rsplit('/', 1)[-1].split('.')[0]
+            with self.lock:
+                text = self.files.pop(file_id, None)
+            if text is None:
+                self._not_found(handler, path)
+            else:
+                self._send(handler, self._audio_bytes(text), 'audio/mpeg')
+        else:
+            self._not_found(handler, path)
+
+    def _route_pollinations(self, handler, method, path, payload):
+        if path.endswith('/image/models'):
+            self._send_json(handler, [{'name': 'flux'}])
+        elif path.startswith('/prompt/') or path.startswith('/image/'):
+            prompt = unquote(path.split('/', 2)[-1])
+            self._send(handler, self._image_bytes(prompt), 'image/png')
+        else:
+            self._not_found(handler, path)
+
+
+class StubProviders:
+    """Набір заглушок для всіх провайдерів; profiles - {provider: {latency, error_rate, ...}}."""
+
+    def __init__(self, profiles=None, seed=0):
+        profiles = profiles or {}
+        self.providers = {name: StubProvider(name, profiles.get(name), seed) for name in PROVIDER_HOSTS}
+        self._restore = None
+
+    def start(self):
+        for provider in self.providers.values():
+            provider.start()
+        self._restore = install_url_redirect(self.host_map())
+        return self
+
+    def stop(self):
+        if self._restore:
+            self._restore()
+            self._restore = None
+        for provider in self.providers.values():
+            provider.stop()
+
+    def host_map(self):
+        return {host: self.providers[name].address for name, hosts in PROVIDER_HOSTS.items() for host in hosts}
+
+    def stats(self):
+        return {name: provider.snapshot() for name, provider in self.providers.items()}
+
+
+def install_url_redirect(host_map):
+    """
+    Перенаправляє всі запити requests на хости з host_map (host -> 'ip:port') на локальні заглушки.
+    Повертає функцію, яка знімає перенаправлення.
+    """
+    import requests
+
+    original_request = requests.Session.request
+    original_no_proxy = os.environ.get('NO_PROXY')
+    # Системний проксі не повинен перехоплювати запити до 127.0.0.1
+    os.environ['NO_PROXY'] = ",".join(filter(None, ['127.0.0.1', 'localhost', original_no_proxy]))
+
+    def request(session, method, url, *args, **kwargs):
+        parts = urlsplit(url)
+        target = host_map.get(parts.hostname)
+        if target:
+            url = urlunsplit(('http', target, parts.path, parts.query, parts.fragment))
+            kwargs.pop('proxies', None)
+        return original_request(session, method, url, *args, **kwargs)
+
+    requests.Session.request = request
+
+    def restore():
+        requests.Session.request = original_request
+        if original_no_proxy is None:
+            os.environ.pop('NO_PROXY', None)
+        else:
+            os.environ['NO_PROXY'] = original_no_proxy
+
+    return restore
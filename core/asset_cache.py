@@ -0,0 +1,125 @@
+import os
+import platform
+import threading
+import subprocess
+from core.clip_cache import ClipCache
+from utils.file_cache import file_digests
+from core.motion_renderer import CLIP_CODEC_ARGS
+from utils.logger import logger, LogLevel
+
+# Змінюється разом зі способом нормалізації - старі записи тоді просто перестають збігатися
+ASSET_CACHE_VERSION = 1
+# Оверлей: безвтратний FFV1 з альфою, кожен кадр ключовий - -stream_loop і -ss не декодують зайвого
+OVERLAY_CODEC_ARGS = ["-c:v", "ffv1", "-level", "3", "-g", "1", "-slices", "4", "-pix_fmt", "yuva420p"]
+
+
+class AssetCache:
+    """
+    Нормалізовані копії ресурсів, однакових для сотень монтажів: оверлей-ефект, вотермарка, інтро-відео.
+    Кожен ресурс один раз перекодовується під (вміст файлу, роздільна здатність, fps, формат пікселів)
+    і далі підставляється в монтаж замість оригіналу, тож масштабування/обрізка у графі фільтрів
+    стають холостими, а FFmpeg не декодує оригінал у повній роздільній здатності на кожному кадрі.
+    Записи лежать у cache/assets і підпорядковуються налаштуванням clip_cache (вмикання, TTL, ліміт розміру).
+    Будь-яка помилка нормалізації не зупиняє монтаж - повертається оригінальний файл.
+    """
+
+    def __init__(self):
+        self.store = ClipCache('assets')
+        self.lock = threading.Lock()
+        self.key_locks = {} # key -> Lock, щоб паралельні монтажі не нормалізували той самий ресурс двічі
+
+    def is_enabled(self):
+        return self.store.is_enabled()
+
+    def overlay(self, path, width, height, prefix=""):
+        """
+        Оверлей-ефект у розмірі кадру (scale=increase + crop по центру), з альфа-каналом.
+        Частота кадрів лишається як у джерела: overlay бере кадри ефекту за їхніми мітками часу,
+        і перерахунок fps змінив би, який кадр ефекту лягає на який кадр монтажу.
+        """
+        vf = f"format=yuva420p,scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1"
+        args = ["-an", "-vf", vf] + OVERLAY_CODEC_ARGS
+        return self._normalize('overlay', path, [width, height], args, '.mkv', prefix)
+
+    def watermark(self, path, width, prefix=""):
+        """
+        Вотермарка потрібної ширини (RGBA PNG). Альфа лишається straight: overlay FFmpeg
+        з alpha=premultiplied на YUV-кадрі зсуває яскравість під напівпрозорими пікселями.
+        """
+        args = ["-frames:v", "1", "-vf", f"scale={width}:-1,format=rgba"]
+        return self._normalize('watermark', path, [width], args, '.png', prefix)
+
+    def intro(self, path, width, height, fps, prefix=""):
+        """Інтро у розмірі кадру (scale=decrease + pad), yuv420p, fps монтажу; аудіо - PCM 44.1 кГц стерео."""
+        vf = (
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,format=yuv420p,setsar=1,fps={fps}"
+        )
+        args = ["-vf", vf] + CLIP_CODEC_ARGS + ["-c:a", "pcm_s16le", "-ar", "44100", "-ac", "2"]
+        return self._normalize('intro', path, [width, height, fps], args, '.mkv', prefix)
+
+    def _normalize(self, kind, path, params, args, ext, prefix):
+        """Повертає (шлях до нормалізованої копії або оригіналу, ключ кешу або None)."""
+        if not path or not self.is_enabled():
+            return path, None
+        try:
+            key = self.store.make_key({
+                'asset': kind,
+                'source': file_digests.file_digest(path),
+                'params': params,
+                'args': args,
+                'asset_version': ASSET_CACHE_VERSION,
+            })
+        except OSError:
+            return path, None
+
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            cached = self.store.get(key, ext)
+            if cached:
+                self.store.pin([key])
+                return cached, key
+
+            os.makedirs(self.store.cache_dir, exist_ok=True)
+            tmp_path = os.path.join(self.store.cache_dir, f"{key}.{threading.get_ident()}.tmp{ext}")
+            cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-i", path.replace("\\", "/")]
+            cmd.extend(args)
+            cmd.append(tmp_path.replace("\\", "/"))
+            try:
+                self._run(cmd)
+            except Exception as e:
+                logger.log(f"{prefix}[Assets] Could not normalize {kind} {os.path.basename(path)}, using the original: {e}", level=LogLevel.WARNING)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return path, None
+
+            logger.log(f"{prefix}[Assets] Normalized {kind}: {os.path.basename(path)}", level=LogLevel.INFO)
+            cached = self.store.put(key, tmp_path, ext)
+            self.store.pin([key])
+            return cached, key
+
+    def _run(self, cmd):
+        startupinfo = None
+        if platform.system() == "Windows":
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        result = subprocess.run(
+            cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            text=True, encoding='utf-8', errors='replace', startupinfo=startupinfo
+        )
+        if result.returncode != 0:
+            raise Exception(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "FFmpeg failed.")
+
+    def release(self, keys):
+        """Знімає закріплення записів, отриманих під час монтажу."""
+        self.store.unpin([key for key in keys if key])
+
+    def prune(self):
+        self.store.prune()
+
+    def clear(self):
+        self.store.clear()
+
+asset_cache = AssetCache()
@@ -0,0 +1,123 @@
+import os
+import re
+import platform
+import subprocess
+from utils.logger import logger, LogLevel
+
+# Пауза, що вважається тишею (рівень і мінімальна тривалість для ffmpeg silencedetect)
+SILENCE_NOISE_DB = -35
+SILENCE_MIN_SEC = 0.4
+# Шматок коротший за це втрачає контекст для Whisper (попередній текст підказує пунктуацію й імена)
+MIN_CHUNK_SEC = 60
+# Коротше аудіо не ділимо - накладні витрати (silencedetect, нарізка, завантаження моделі в інших процесах) не окупаються
+MIN_CHUNKED_AUDIO_SEC = 180
+# Наскільки далеко від ідеальної межі можна шукати паузу (частка від цільової довжини шматка)
+CUT_SEARCH_SHARE = 0.5
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def _run_ffmpeg(cmd):
+    startupinfo = None
+    if platform.system() == "Windows":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return subprocess.run(
+        cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True, encoding='utf-8', errors='replace', startupinfo=startupinfo
+    )
+
+
+def detect_silences(audio_path, noise_db=SILENCE_NOISE_DB, min_silence=SILENCE_MIN_SEC):
+    """Повертає (тривалість аудіо, [(start, end), ...] пауз) за ffmpeg silencedetect."""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats", "-i", audio_path.replace("\\", "/"),
+        "-af", f"silencedetect=noise={noise_db}dB:d={min_silence}", "-f", "null", "-"
+    ]
+    result = _run_ffmpeg(cmd)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise Exception(f"silencedetect failed: {lines[-1] if lines else 'FFmpeg failed.'}")
+
+    duration = 0.0
+    match = _DURATION_RE.search(result.stderr)
+    if match:
+        duration = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3))
+
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    if start is not None and duration > start:
+        # Тиша до самого кінця файлу - silence_end FFmpeg не пише
+        silences.append((start, duration))
+    return duration, silences
+
+
+def plan_chunks(duration, silences, chunks):
+    """
+    Ділить [0, duration] на приблизно рівні шматки, ріжучи лише посередині пауз.
+    Межа ставиться на паузу, найближчу до ідеальної, не далі CUT_SEARCH_SHARE довжини шматка;
+    якщо поблизу паузи немає, шматок подовжується до наступної. Повертає [(start, end), ...].
+    """
+    target = max(MIN_CHUNK_SEC, duration / max(1, chunks))
+    candidates = sorted((a + b) / 2 for a, b in silences if a > 0.0 and b < duration)
+    cuts = []
+    last = 0.0
+    while duration - last > target * (1 + CUT_SEARCH_SHARE):
+        ideal = last + target
+        low, high = ideal - target * CUT_SEARCH_SHARE, ideal + target * CUT_SEARCH_SHARE
+        near = [c for c in candidates if low <= c <= high]
+        if near:
+            cut = min(near, key=lambda c: abs(c - ideal))
+        else:
+            # Поблизу ідеальної межі пауз немає - ріжемо на першій наступній
+            later = [c for c in candidates if c > high]
+            if not later:
+                break
+            cut = later[0]
+        cuts.append(cut)
+        last = cut
+
+    bounds = [0.0] + cuts + [duration]
+    pieces = [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+    # Короткий хвіст приєднуємо до попереднього шматка
+    if len(pieces) > 1 and pieces[-1][1] - pieces[-1][0] < MIN_CHUNK_SEC / 2:
+        pieces[-2:] = [(pieces[-2][0], pieces[-1][1])]
+    return pieces
+
+
+def extract_chunk(audio_path, start, end, output_path):
+    """Вирізає [start, end) у WAV 16 кГц моно - формат, до якого Whisper усе одно перетворює аудіо."""
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", audio_path.replace("\\", "/"),
+        "-vn", "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", output_path.replace("\\", "/")
+    ]
+    result = _run_ffmpeg(cmd)
+    if result.returncode != 0 or not os.path.exists(output_path):
+        lines = result.stderr.strip().splitlines()
+        raise Exception(f"Could not cut audio chunk: {lines[-1] if lines else 'FFmpeg failed.'}")
+
+
+def stitch_segments(chunk_segments, pieces):
+    """Зсуває сегменти кожного шматка на його початок і обрізає ті, що вилізли за межі шматка."""
+    segments = []
+    for (start, end), items in zip(pieces, chunk_segments):
+        for seg in items:
+            seg_start = min(end, start + seg['start'])
+            seg_end = min(end, start + seg['end'])
+            if seg_end <= seg_start or not seg['text']:
+                continue
+            segments.append({'start': seg_start, 'end': seg_end, 'text': seg['text']})
+    logger.log(f"[Chunks] Stitched {len(segments)} segments from {len(pieces)} chunks", level=LogLevel.DEBUG)
+    return segments
@@ -0,0 +1,346 @@
+"""
+Headless batch runner: runs the full TaskProcessor pipeline without widgets.
+
+Usage:
+    python -m core.batch_runner jobs.json [--status-file status.json] [--results-path DIR] [--settings overrides.json]
+
+Job file - JSON (a list of jobs, or {"settings": {...}, "jobs": [...]}) or JSONL (one job per line):
+    {
+        "name": "My video",
+        "text": "Source text...",                       # or "type": "rewrite" + "input_source": "<url>"
+        "languages": ["en", "de"],                      # or {"en": {"stages": [...], "template": "..."}}
+        "stages": ["stage_translation", "stage_voiceover", "stage_subtitles", "stage_montage"],
+        "template": "My template",
+        "settings": {"montage": {"preset": "fast"}}     # per-job settings overrides
+    }
+
+Exit codes: 0 - all tasks succeeded, 2 - finished with warnings, 1 - at least one task failed,
+3 - invalid job file / nothing to run, 130 - interrupted.
+"""
+import os
+import sys
+import json
+import time
+import copy
+import signal
+import argparse
+import platform
+import multiprocessing
+from datetime import datetime
+
+EXIT_SUCCESS = 0
+EXIT_FAILED = 1
+EXIT_WARNINGS = 2
+EXIT_INVALID = 3
+EXIT_INTERRUPTED = 130
+
+DEFAULT_STAGES = ['stage_translation', 'stage_img_prompts', 'stage_images', 'stage_voiceover', 'stage_subtitles', 'stage_montage']
+# Перемикачі, що зупиняють конвеєр до втручання користувача - у пакетному режимі вимкнені
+REVIEW_SETTINGS = ('translation_review_enabled', 'rewrite_review_enabled', 'image_review_enabled')
+
+
+def load_job_file(path):
+    """Повертає (global_overrides, jobs) з JSON або JSONL файлу."""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        content = f.read()
+
+    global_overrides = {}
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        # JSONL: one job per line
+        data = []
+        for line_no, line in enumerate(content.splitlines(), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{os.path.basename(path)}:{line_no}: {e}")
+
+    if isinstance(data, dict):
+        global_overrides = data.get('settings') or {}
+        data = data.get('jobs', [data] if 'languages' in data else [])
+    if not isinstance(data, list):
+        raise ValueError("Job file must contain a list of jobs.")
+    return global_overrides, data
+
+
+def build_queue_job(raw_job, index, languages_config):
+    """Перетворює запис з файлу на job у форматі QueueManager."""
+    if not isinstance(raw_job, dict):
+        raise ValueError(f"Job #{index + 1} is not an object.")
+
+    job_type = raw_job.get('type', 'text')
+    if job_type == 'text' and not raw_job.get('text'):
+        raise ValueError(f"Job #{index + 1} has no text.")
+    if job_type == 'rewrite' and not raw_job.get('input_source'):
+        raise ValueError(f"Job #{index + 1} has no input_source.")
+
+    default_stages = raw_job.get('stages') or DEFAULT_STAGES
+    default_template = raw_job.get('template')
+
+    raw_languages = raw_job.get('languages')
+    if isinstance(raw_languages, list):
+        raw_languages = {lang_id: {} for lang_id in raw_languages}
+    if not raw_languages:
+        raise ValueError(f"Job #{index + 1} has no languages.")
+
+    languages = {}
+    for lang_id, lang_cfg in raw_languages.items():
+        lang_cfg = dict(lang_cfg or {})
+        lang_data = {
+            "display_name": lang_cfg.pop('display_name', None) or languages_config.get(lang_id, {}).get('display_name', lang_id),
+            "stages": list(lang_cfg.pop('stages', None) or default_stages),
+        }
+        template = lang_cfg.pop('template', None) or default_template
+        if template:
+            lang_data['template_name'] = template
+        lang_data.update(lang_cfg)
+        languages[lang_id] = lang_data
+
+    job = {
+        "id": None,
+        "name": raw_job.get('name') or f"Batch {index + 1}",
+        "type": job_type,
+        "text": raw_job.get('text', ''),
+        "languages": languages,
+        "created_at": datetime.now().isoformat(),
+    }
+    if raw_job.get('input_source'):
+        job['input_source'] = raw_job['input_source']
+    if raw_job.get('settings'):
+        job['settings_overrides'] = raw_job['settings']
+    return job
+
+
+def setup_dependency_paths():
+    """Додає assets (ffmpeg, ffprobe, yt-dlp) у PATH, як і GUI-версія."""
+    if getattr(sys, 'frozen', False):
+        base_dir = sys._MEIPASS
+    else:
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assets_dir = os.path.join(base_dir, "assets")
+    os.environ["PATH"] = assets_dir + os.pathsep + os.environ.get("PATH", "")
+
+
+class BatchRunner:
+    """
+    Керує TaskProcessor без віджетів: додає завдання в чергу, автоматично підтверджує перевірки,
+    відстежує статуси етапів і пише прогрес у stdout та (опційно) у JSON-файл статусу.
+    """
+
+    def __init__(self, app, jobs, status_file=None):
+        from core.queue_manager import QueueManager
+        from core.task_processor import TaskProcessor
+
+        self.app = app
+        self.jobs = jobs
+        self.status_file = status_file
+        self.started_at = datetime.now()
+        self.exit_code = None
+
+        self.queue_manager = QueueManager()
+        self.task_processor = TaskProcessor(self.queue_manager)
+
+        # task_id -> {job_name, lang_id, stages: {stage_key: status}, errors}
+        self.tasks = {}
+
+        self.task_processor.stage_status_changed.connect(self._on_stage_status_changed)
+        self.task_processor.processing_finished.connect(self._on_processing_finished)
+        self.task_processor.image_review_required.connect(self.task_processor.resume_all_montages)
+        self.task_processor.translation_review_required.connect(lambda task_id, _: self._auto_approve(task_id, 'stage_translation'))
+        self.task_processor.rewrite_review_required.connect(lambda task_id, _: self._auto_approve(task_id, 'stage_rewrite'))
+
+    def start(self):
+        for job in self.jobs:
+            # Пакетні завдання не потрапляють у список відновлення "Недавні завдання"
+            self.queue_manager.add_task(job, register_recent=False)
+            for lang_id, lang_data in job['languages'].items():
+                self.tasks[f"{job['id']}_{lang_id}"] = {
+                    'job_id': job['id'],
+                    'job_name': job['name'],
+                    'lang_id': lang_id,
+                    'stages': {stage: 'pending' for stage in lang_data['stages']},
+                    'errors': {}
+                }
+        self._write_status()
+
+        self.task_processor.start_processing()
+        if not self.task_processor.task_states:
+            self._print("Nothing to process.")
+            self.finish(EXIT_INVALID if not self.tasks else self._compute_exit_code())
+
+    def abort(self):
+        self._print("Interrupted, stopping...")
+        self.finish(EXIT_INTERRUPTED)
+
+    def finish(self, exit_code):
+        if self.exit_code is not None:
+            return
+        self.exit_code = exit_code
+        self._write_status(final=True)
+        try:
+            self.task_processor.cleanup()
+        except Exception as e:
+            self._print(f"Cleanup error: {e}")
+        self.app.exit(exit_code)
+
+    # --- Signal handlers ---
+
+    def _on_stage_status_changed(self, job_id, lang_id, stage_key, status):
+        task = self.tasks.get(f"{job_id}_{lang_id}")
+        if task is None:
+            return
+        if task['stages'].get(stage_key) == status:
+            return
+        task['stages'][stage_key] = status
+        if status == 'error':
+            state = self.task_processor.task_states.get(f"{job_id}_{lang_id}")
+            error = state.stage_errors.get(stage_key) if state else None
+            if error:
+                task['errors'][stage_key] = error
+        if status != 'pending':
+            self._print(f"{task['job_name']} [{lang_id}] {stage_key}: {status}")
+        self._write_status()
+
+    def _on_processing_finished(self, elapsed):
+        exit_code = self._compute_exit_code()
+        counts = {}
+        for task in self.tasks.values():
+            result = self._task_result(task)
+            counts[result] = counts.get(result, 0) + 1
+        summary = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
+        self._print(f"Finished in {elapsed} ({summary}). Exit code {exit_code}.")
+        self.finish(exit_code)
+
+    def _auto_approve(self, task_id, stage_key):
+        if task_id not in self.task_processor.task_states:
+            return
+        self._print(f"{task_id}: {stage_key} review auto-approved.")
+        self.task_processor._set_stage_status(task_id, stage_key, 'success')
+        self.task_processor._on_text_ready(task_id)
+
+    # --- Status ---
+
+    def _task_result(self, task):
+        statuses = list(task['stages'].values())
+        if 'error' in statuses:
+            return 'error'
+        if any(s not in ('success', 'warning') for s in statuses):
+            return 'incomplete'
+        if 'warning' in statuses:
+            return 'warning'
+        return 'success'
+
+    def _compute_exit_code(self):
+        results = [self._task_result(task) for task in self.tasks.values()]
+        if any(r in ('error', 'incomplete') for r in results):
+            return EXIT_FAILED
+        if 'warning' in results:
+            return EXIT_WARNINGS
+        return EXIT_SUCCESS
+
+    def _write_status(self, final=False):
+        if not self.status_file:
+            return
+        tasks = []
+        for task_id, task in self.tasks.items():
+            state = self.task_processor.task_states.get(task_id)
+            tasks.append({
+                'task_id': task_id,
+                'job_name': task['job_name'],
+                'lang_id': task['lang_id'],
+                'result': self._task_result(task),
+                'stages': task['stages'],
+                'errors': task['errors'],
+                'output_dir': state.dir_path if state else None,
+                'final_video_path': state.final_video_path if state else None,
+            })
+        status = {
+            'started_at': self.started_at.isoformat(),
+            'updated_at': datetime.now().isoformat(),
+            'finished': final,
+            'exit_code': self.exit_code,
+            'tasks': tasks,
+        }
+        try:
+            tmp_path = self.status_file + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(status, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.status_file)
+        except OSError as e:
+            self._print(f"Could not write status file: {e}")
+
+    def _print(self, message):
+        try:
+            print(f"[batch {time.strftime('%H:%M:%S')}] {message}", flush=True)
+        except Exception:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Soloveyko.AI-Video.Maker jobs without the GUI.")
+    parser.add_argument('job_file', help="JSON or JSONL file with jobs")
+    parser.add_argument('--status-file', help="Write task progress to this JSON file")
+    parser.add_argument('--results-path', help="Override the results folder")
+    parser.add_argument('--settings', help="JSON file with global settings overrides (not saved)")
+    args = parser.parse_args(argv)
+
+    from PySide6.QtCore import QCoreApplication, QTimer
+    from utils.settings import settings_manager
+
+    try:
+        global_overrides, raw_jobs = load_job_file(args.job_file)
+        if args.settings:
+            with open(args.settings, 'r', encoding='utf-8-sig') as f:
+                global_overrides.update(json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"Invalid job file: {e}", file=sys.stderr)
+        return EXIT_INVALID
+
+    # Глобальні перевизначення застосовуються лише в пам'яті - settings.json не змінюється
+    for key, value in global_overrides.items():
+        if isinstance(value, dict) and isinstance(settings_manager.settings.get(key), dict):
+            settings_manager.settings[key].update(copy.deepcopy(value))
+        else:
+            settings_manager.settings[key] = copy.deepcopy(value)
+    for key in REVIEW_SETTINGS:
+        settings_manager.settings[key] = False
+    if args.results_path:
+        settings_manager.settings['results_path'] = os.path.abspath(args.results_path)
+
+    languages_config = settings_manager.get('languages_config', {}) or {}
+    try:
+        jobs = [build_queue_job(raw_job, i, languages_config) for i, raw_job in enumerate(raw_jobs)]
+    except ValueError as e:
+        print(f"Invalid job file: {e}", file=sys.stderr)
+        return EXIT_INVALID
+    if not jobs:
+        print("Job file contains no jobs.", file=sys.stderr)
+        return EXIT_INVALID
+
+    setup_dependency_paths()
+
+    app = QCoreApplication(sys.argv[:1])
+    runner = BatchRunner(app, jobs, status_file=args.status_file)
+
+    # Ctrl+C / SIGTERM: Python обробляє сигнали лише між подіями Qt, тому періодично будимо інтерпретатор
+    signal.signal(signal.SIGINT, lambda *_: runner.abort())
+    if platform.system() != "Windows":
+        signal.signal(signal.SIGTERM, lambda *_: runner.abort())
+    wakeup_timer = QTimer()
+    wakeup_timer.timeout.connect(lambda: None)
+    wakeup_timer.start(500)
+
+    QTimer.singleShot(0, runner.start)
+    return app.exec()
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    exit_code = main()
+    # Як і GUI-версія: не чекаємо на фонові потоки під час завершення інтерпретатора
+    sys.stdout.flush()
+    os._exit(exit_code)
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+import shutil
+import hashlib
+import threading
+from utils.settings import settings_manager
+from utils.logger import logger, LogLevel
+from utils.file_cache import cache_root
+
+# Змінюється, коли змінюється спосіб рендеру шматків - старі записи тоді просто перестають збігатися
+CLIP_CACHE_VERSION = 2
+
+
+class ClipCache:
+    """
+    Персистентний кеш відрендерених шматків монтажу (анімовані картинки, відео-кліпи, переходи).
+    Ключ - sha256 від вмісту вихідного файлу та всіх параметрів рендеру (тривалість, zoom/sway,
+    роздільна здатність, fps, кодек шматків), тож повторний монтаж тих самих картинок
+    (інша музика, впав на водяному знаку, повторна черга) бере шматки з кешу замість рендеру.
+    Кожен запис - окремий .mp4 у cache/clips; старі записи видаляються за TTL та лімітом розміру.
+    """
+
+    def __init__(self, cache_dir_name='clips'):
+        self.lock = threading.Lock()
+        self.pinned = {} # key -> кількість монтажів, які зараз використовують запис
+        self.cache_dir = os.path.join(cache_root(), cache_dir_name)
+
+    def _config(self):
+        return settings_manager.get('clip_cache', {}) or {}
+
+    def is_enabled(self):
+        return self._config().get('enabled', False)
+
+    def make_key(self, payload):
+        payload = dict(payload, version=CLIP_CACHE_VERSION)
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key, ext='.mp4'):
+        return os.path.join(self.cache_dir, key[:2], f"{key}{ext}")
+
+    def get(self, key, ext='.mp4'):
+        """Шлях до закешованого шматка або None."""
+        path = self._path(key, ext)
+        if not os.path.exists(path):
+            return None
+
+        ttl_hours = self._config().get('ttl_hours', 168)
+        try:
+            if ttl_hours > 0 and time.time() - os.path.getmtime(path) > ttl_hours * 3600:
+                with self.lock:
+                    if key not in self.pinned:
+                        os.remove(path)
+                        return None
+            # Оновлюємо atime вручну - на багатьох ФС він вимкнений, а по ньому йде витіснення
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+            return path
+        except OSError:
+            return None
+
+    def put(self, key, src_path, ext='.mp4'):
+        """
+        Переносить відрендерений шматок у кеш і повертає його новий шлях.
+        Якщо зберегти не вдалося, повертає src_path - монтаж продовжується без кешу.
+        """
+        path = self._path(key, ext)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                # Той самий диск - просто перейменування
+                os.replace(src_path, path)
+            except OSError:
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                shutil.copyfile(src_path, tmp_path)
+                os.replace(tmp_path, path)
+                os.remove(src_path)
+            return path
+        except OSError as e:
+            logger.log(f"[ClipCache] Could not store clip: {e}", level=LogLevel.WARNING)
+            return src_path if os.path.exists(src_path) else path
+
+    def pin(self, keys):
+        """Позначає записи як використовувані - prune() їх не видалить до unpin()."""
+        with self.lock:
+            for key in keys:
+                self.pinned[key] = self.pinned.get(key, 0) + 1
+
+    def unpin(self, keys):
+        with self.lock:
+            for key in keys:
+                count = self.pinned.get(key, 0) - 1
+                if count > 0:
+                    self.pinned[key] = count
+                else:
+                    self.pinned.pop(key, None)
+
+    def prune(self):
+        """Видаляє прострочені записи та найдавніше використані, якщо кеш перевищує ліміт розміру."""
+        config = self._config()
+        ttl_hours = config.get('ttl_hours', 168)
+        max_bytes = int(config.get('max_size_mb', 10240)) * 1024 * 1024
+
+        with self.lock:
+            if not os.path.isdir(self.cache_dir):
+                return
+            now = time.time()
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    total += st.st_size
+                    if os.path.splitext(name)[0] in self.pinned:
+                        continue
+                    if ttl_hours > 0 and now - st.st_mtime > ttl_hours * 3600:
+                        try:
+                            os.remove(path)
+                            total -= st.st_size
+                        except OSError:
+                            pass
+                        continue
+                    entries.append((st.st_atime, st.st_size, path))
+
+            if max_bytes <= 0 or total <= max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def size_mb(self):
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total / (1024 * 1024)
+
+    def clear(self):
+        with self.lock:
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if os.path.splitext(name)[0] in self.pinned:
+                        continue
+                    try:
+                        os.remove(os.path.join(root, name))
+                    except OSError:
+                        pass
+
+clip_cache = ClipCache()
@@ -0,0 +1,144 @@
+import time
+import threading
+import collections
+
+# Як часто прогрес монтажу потрапляє в картку задачі (FFmpeg пише -progress приблизно раз на 0.5 с на процес)
+PROGRESS_INTERVAL = 0.5
+# Скільки останніх рядків stderr тримаємо для звіту про помилку
+STDERR_RING_LINES = 200
+
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats"]
+
+
+class FFmpegProgress:
+    """Один блок машинного виводу -progress (key=value, закінчується рядком progress=continue|end)."""
+
+    def __init__(self):
+        self.frame = 0
+        self.fps = 0.0
+        self.out_time = 0.0 # секунди
+        self.speed = None # множник реального часу, None поки FFmpeg його не знає
+        self.bitrate = None # рядок як у FFmpeg, напр. "5012.3kbits/s"
+        self.finished = False
+
+    def update(self, key, value):
+        """Застосовує одну пару key=value. Повертає True, коли блок закінчився."""
+        try:
+            if key == 'frame':
+                self.frame = int(value)
+            elif key == 'fps':
+                self.fps = float(value)
+            elif key == 'out_time_us':
+                self.out_time = max(0.0, int(value) / 1000000.0)
+            elif key == 'speed':
+                self.speed = float(value.rstrip('x'))
+            elif key == 'bitrate':
+                self.bitrate = value
+        except ValueError:
+            # На старті FFmpeg пише N/A
+            pass
+        if key == 'progress':
+            self.finished = value == 'end'
+            return True
+        return False
+
+
+def read_progress(stream, on_stats=None, interval=PROGRESS_INTERVAL):
+    """
+    Читає -progress з потоку до EOF. on_stats(FFmpegProgress) викликається не частіше за interval
+    і завжди на останньому блоці.
+    """
+    stats = FFmpegProgress()
+    last_emit = 0.0
+    for line in stream:
+        key, sep, value = line.strip().partition('=')
+        if not sep or not stats.update(key, value.strip()):
+            continue
+        now = time.monotonic()
+        if on_stats and (stats.finished or now - last_emit >= interval):
+            last_emit = now
+            on_stats(stats)
+    return stats
+
+
+class StderrRing:
+    """Фоновий читач stderr: зберігає лише останні рядки, щоб не накопичувати весь лог процесу."""
+
+    def __init__(self, stream, on_error=None, max_lines=STDERR_RING_LINES):
+        self.lines = collections.deque(maxlen=max_lines)
+        self.stream = stream
+        self.on_error = on_error
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        for line in self.stream:
+            line = line.strip()
+            if not line:
+                continue
+            self.lines.append(line)
+            if self.on_error and "Error" in line and "Error submitting packet to decoder" not in line:
+                self.on_error(line)
+
+    def tail(self, count=20):
+        self.thread.join(timeout=5)
+        return list(self.lines)[-count:]
+
+
+class ProgressEmitter:
+    """
+    Повідомлення прогресу монтажу для картки задачі: time / fps / speed / ETA / progress%.
+    Кілька паралельних FFmpeg (сегменти, шматки) звітують через один emitter,
+    тож у Qt іде не більше одного повідомлення за interval.
+    ETA рахується з загального відсотка, тому враховує всі етапи монтажу, а не лише поточний процес.
+    expected - прогноз тривалості монтажу (MontageCostModel): на старті ETA береться з нього,
+    а з ростом відсотка плавно переходить на екстраполяцію виміряного темпу.
+    """
+
+    def __init__(self, callback, interval=PROGRESS_INTERVAL, expected=None):
+        self.callback = callback
+        self.interval = interval
+        self.expected = expected
+        self.started = time.monotonic()
+        self.last_emit = 0.0
+        self.lock = threading.Lock()
+
+    def emit(self, time_sec, progress, stats=None, fps=None, force=False):
+        now = time.monotonic()
+        with self.lock:
+            # 100% не відкидаємо - інакше швидкий останній прохід (перепакування) лишає картку на 9x%
+            if not force and progress < 100.0 and now - self.last_emit < self.interval:
+                return
+            self.last_emit = now
+
+        if fps is None:
+            fps = f"{stats.fps:.0f}" if stats else "0"
+        speed = f"{stats.speed:.2f}x" if stats and stats.speed is not None else "N/A"
+        bitrate = stats.bitrate if stats and stats.bitrate else "N/A"
+        self.callback(
+            f"time={format_time(time_sec)} | "
+            f"fps={fps} | "
+            f"bit={bitrate} | "
+            f"speed={speed} | "
+            f"eta={self.eta(progress, now)} | "
+            f"progress={progress:.2f}%"
+        )
+
+    def eta(self, progress, now=None):
+        elapsed = (now or time.monotonic()) - self.started
+        predicted = max(0.0, self.expected - elapsed) if self.expected else None
+        if progress < 1.0 or elapsed < 1.0:
+            return format_time(predicted)[:8] if predicted is not None else "--:--:--"
+        measured = elapsed * (100.0 - progress) / progress
+        if predicted is not None:
+            weight = progress / 100.0
+            measured = (1.0 - weight) * predicted + weight * measured
+        return format_time(measured)[:8]
+
+
+def format_time(seconds):
+    seconds = max(0.0, seconds)
+    h = int(seconds // 3600)
+    m = int((seconds % 3600) // 60)
+    s = seconds % 60
+    return f"{h:02d}:{m:02d}:{s:05.2f}"
@@ -0,0 +1,626 @@
+import re
+import ast
+import collections
+
+# Мітки виду [0:v], [3:a:0] - потоки вхідних файлів, а не виходи інших ланцюжків
+INPUT_LABEL = re.compile(r"^\d+(:[vas])?(:\d+)?$")
+# Позиційні аргументи фільтрів, які розуміють проходи оптимізації
+POSITIONAL = {
+    'scale': ['w', 'h'],
+    'crop': ['w', 'h', 'x', 'y'],
+    'pad': ['w', 'h', 'x', 'y', 'color'],
+    'format': ['pix_fmts'],
+    'fps': ['fps'],
+    'setsar': ['r'],
+    'trim': ['start', 'end'],
+}
+# Фільтри, що не змінюють розмір кадру
+# (для xfade/concat/overlay - розмір першого входу)
+SIZE_PRESERVING = {
+    'format', 'setsar', 'fps', 'setpts', 'trim', 'tpad', 'fade', 'subtitles', 'null', 'split', 'eq', 'noise',
+    'xfade', 'concat', 'overlay',
+}
+# ... формат пікселів
+FORMAT_PRESERVING = {'scale', 'crop', 'pad', 'setsar', 'fps', 'setpts', 'trim', 'tpad', 'zoompan', 'null', 'split', 'xfade'}
+# ... пропорції пікселя
+SAR_PRESERVING = {'crop', 'format', 'fps', 'setpts', 'trim', 'tpad', 'null', 'split', 'subtitles', 'fade'}
+# ... частоту кадрів (fps відомий лише після fps/zoompan - їхній вихід гарантовано CFR)
+RATE_PRESERVING = {'scale', 'crop', 'pad', 'format', 'setsar', 'setpts', 'trim', 'null', 'split', 'subtitles', 'eq', 'noise'}
+# Опції scale, з якими проходи вміють рахувати результат
+SCALE_OPTIONS = {'w', 'h', 'flags', 'force_original_aspect_ratio'}
+# Скейлер дешевшого ядра: перед zoompan, що зменшує кадр щонайменше вдвічі, різниці з bicubic не видно
+CHEAP_SCALER = 'bilinear'
+CHEAP_SCALER_MIN_RATIO = 2.0
+
+
+class Filter:
+    """
+    Один фільтр ланцюжка: ім'я та впорядковані аргументи (key, value); key None - позиційний.
+    Значення вставляються у граф як є - екранування (лапки, \\:) робить той, хто їх формує.
+    """
+
+    def __init__(self, name, *args, **options):
+        self.name = name
+        self.args = [(None, str(value)) for value in args]
+        self.args.extend((key, str(value)) for key, value in options.items() if value is not None)
+        self._name_positional()
+
+    @classmethod
+    def parse(cls, text):
+        name, sep, rest = text.strip().partition('=')
+        f = cls(name.strip())
+        if sep:
+            for token in split_top(rest, ':'):
+                key, eq, value = token.partition('=')
+                if eq and re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", key):
+                    f.args.append((key, value))
+                else:
+                    f.args.append((None, token))
+        f._name_positional()
+        return f
+
+    def _name_positional(self):
+        names = POSITIONAL.get(self.name)
+        if not names:
+            return
+        named = []
+        for i, (key, value) in enumerate(self.args):
+            if key is None and i < len(names) and all(k is None for k, _ in self.args[:i]):
+                key = names[i]
+            named.append((key, value))
+        self.args = named
+
+    def get(self, key, default=None):
+        for k, value in self.args:
+            if k == key:
+                return value
+        return default
+
+    def set(self, key, value):
+        for i, (k, _) in enumerate(self.args):
+            if k == key:
+                self.args[i] = (key, str(value))
+                return
+        self.args.append((key, str(value)))
+
+    def keys(self):
+        return {k for k, _ in self.args}
+
+    def __str__(self):
+        if not self.args:
+            return self.name
+        return self.name + "=" + ":".join(value if key is None else f"{key}={value}" for key, value in self.args)
+
+
+class Chain:
+    """Лінійний ланцюжок фільтрів між мітками: [in]f1,f2,...[out]."""
+
+    def __init__(self, inputs, filters, outputs):
+        self.inputs = list(inputs)
+        self.filters = list(filters)
+        self.outputs = list(outputs)
+
+    def __str__(self):
+        ins = "".join(f"[{label}]" for label in self.inputs)
+        outs = "".join(f"[{label}]" for label in self.outputs)
+        return f"{ins}{','.join(str(f) for f in self.filters)}{outs}"
+
+
+class StreamState:
+    """Що відомо про кадри в точці ланцюжка: розмір, формат пікселів, SAR, частота (None - невідомо)."""
+
+    def __init__(self, width=None, height=None, pix_fmt=None, sar=None, fps=None):
+        self.width = width
+        self.height = height
+        self.pix_fmt = pix_fmt
+        self.sar = sar
+        self.fps = fps
+
+    def size(self):
+        return (self.width, self.height) if self.width and self.height else None
+
+    def copy(self):
+        return StreamState(self.width, self.height, self.pix_fmt, self.sar, self.fps)
+
+
+class FilterGraph:
+    """
+    Граф filter_complex: ланцюжки фільтрів, з'єднані мітками.
+    Ланцюжки додаються типізовано (add) або рядком у синтаксисі FFmpeg (append), перед серіалізацією
+    граф перевіряється (validate) і проходить оптимізацію (optimize): злиття ланцюжків, об'єднання
+    послідовних scale, crop до scale, прибирання холостих scale/crop/pad/format/setsar/fps
+    і дешевший скейлер там, де далі кадр однаково зменшується.
+    Розміри вхідних потоків (set_input) дають проходам знати, які масштабування вже не потрібні.
+    """
+
+    def __init__(self):
+        self.chains = []
+        self.input_states = {} # індекс вхідного файлу -> StreamState
+        self.pass_counts = collections.Counter()
+        self._states = {} # id(ланцюжка) -> стани перед фільтрами; скидається при кожній зміні графа
+
+    # --- Побудова ---
+
+    def add(self, inputs, filters, outputs):
+        """inputs/outputs - мітки без дужок; filters - Filter або рядки 'name=args'."""
+        filters = [f if isinstance(f, Filter) else Filter.parse(f) for f in filters]
+        self.chains.append(Chain(inputs, filters, outputs))
+        return self
+
+    def append(self, text):
+        """Ланцюжок (або кілька через ';') у синтаксисі FFmpeg - для частин, які зручніше писати рядком."""
+        for part in split_top(text, ';'):
+            if part.strip():
+                self.chains.append(parse_chain(part))
+
+    def extend(self, texts):
+        for text in texts:
+            self.append(text)
+
+    def set_input(self, index, width=None, height=None, pix_fmt=None):
+        if width and height:
+            self.input_states[int(index)] = StreamState(int(width), int(height), pix_fmt)
+            self._states = {}
+
+    # --- Перевірка ---
+
+    def validate(self):
+        """Кожна мітка створюється один раз і споживається не більше одного разу; вхідні потоки не створюються."""
+        produced = {}
+        for n, chain in enumerate(self.chains):
+            if not chain.filters:
+                raise Exception(f"Filter graph: empty chain {chain}")
+            for label in chain.outputs:
+                if INPUT_LABEL.match(label):
+                    raise Exception(f"Filter graph: output label [{label}] looks like an input stream")
+                if label in produced:
+                    raise Exception(f"Filter graph: label [{label}] is produced twice")
+                produced[label] = n
+
+        consumed = set()
+        for chain in self.chains:
+            for label in chain.inputs:
+                if INPUT_LABEL.match(label):
+                    continue
+                if label not in produced:
+                    raise Exception(f"Filter graph: label [{label}] is used but never produced")
+                if label in consumed:
+                    raise Exception(f"Filter graph: label [{label}] is used twice (needs split)")
+                consumed.add(label)
+
+        # Цикли: порядок залежностей має існувати
+        self._topological_order(produced)
+
+    def outputs(self):
+        """Мітки, які ніхто в графі не споживає - їх мапить -map."""
+        consumed = {label for chain in self.chains for label in chain.inputs}
+        return [label for chain in self.chains for label in chain.outputs if label not in consumed]
+
+    # --- Оптимізація ---
+
+    def optimize(self):
+        """Проганяє проходи до стабільного стану. Повертає Counter змін за проходами."""
+        self.validate()
+        self._fuse_chains()
+        for _ in range(4):
+            changed = 0
+            for chain in self._ordered_chains():
+                changed += self._merge_scales(chain)
+                changed += self._crop_before_scale(chain)
+                changed += self._drop_noops(chain)
+            if not changed:
+                break
+        for chain in self._ordered_chains():
+            self._cheap_scaler(chain)
+        return self.pass_counts
+
+    def serialize(self, optimize=True):
+        if optimize:
+            self.optimize()
+        else:
+            self.validate()
+        return ";".join(str(chain) for chain in self.chains)
+
+    def stats(self):
+        """Кількість ланцюжків і фільтрів за іменами - щоб міряти, що дала оптимізація."""
+        names = collections.Counter(f.name for chain in self.chains for f in chain.filters)
+        return {'chains': len(self.chains), 'filters': sum(names.values()), 'by_name': dict(names)}
+
+    def __len__(self):
+        return len(self.chains)
+
+    def __str__(self):
+        return ";".join(str(chain) for chain in self.chains)
+
+    # --- Проходи ---
+
+    def _fuse_chains(self):
+        """[a]f1[x];[x]f2[b] -> [a]f1,f2[b]: одна мітка між ланцюжками з одним виходом і одним входом."""
+        while True:
+            producers = {chain.outputs[0]: chain for chain in self.chains if len(chain.outputs) == 1}
+            for chain in self.chains:
+                if len(chain.inputs) != 1:
+                    continue
+                source = producers.get(chain.inputs[0])
+                if source is None or source is chain:
+                    continue
+                source.filters.extend(chain.filters)
+                source.outputs = chain.outputs
+                self.chains.remove(chain)
+                self._states = {}
+                self.pass_counts['fused_chains'] += 1
+                break
+            else:
+                return
+
+    def _merge_scales(self, chain):
+        """scale=A,scale=B -> один scale з розміром, який дав би другий (одне перевибірковування замість двох)."""
+        changed = 0
+        states = self._chain_states(chain)
+        i = 0
+        while i < len(chain.filters) - 1:
+            first, second = chain.filters[i], chain.filters[i + 1]
+            if first.name == 'scale' and second.name == 'scale' and first.keys() <= SCALE_OPTIONS and second.keys() <= SCALE_OPTIONS:
+                mid = scale_size(first, states[i])
+                out = scale_size(second, StreamState(*mid)) if mid else None
+                if out:
+                    merged = Filter('scale', w=out[0], h=out[1], flags=second.get('flags') or first.get('flags'))
+                    chain.filters[i:i + 2] = [merged]
+                    self._states = {}
+                    states = self._chain_states(chain)
+                    self.pass_counts['merged_scales'] += 1
+                    changed += 1
+                    continue
+            i += 1
+        return changed
+
+    def _crop_before_scale(self, chain):
+        """
+        scale=SW:SH,crop=w:h:x:y -> crop відповідної частки джерела, потім scale=w:h.
+        Скейлер обробляє лише потрібну частину кадру і видає одразу цільовий розмір.
+        Кроп задається через iw/ih, тож не залежить від розміру джерела (і від повороту відео,
+        якого ffprobe у розмірі не враховує) - лише від розміру після scale, відомого заздалегідь.
+        """
+        changed = 0
+        for i in range(len(chain.filters) - 1):
+            scale, crop = chain.filters[i], chain.filters[i + 1]
+            if scale.name != 'scale' or crop.name != 'crop' or not scale.keys() <= {'w', 'h', 'flags'}:
+                continue
+            scaled = scale_size(scale, StreamState())
+            region = crop_region(crop, scaled) if scaled else None
+            if not region or region[:2] == scaled:
+                continue
+            cw, ch, cx, cy = region
+            # Парні значення - кроп не зсуватиметься по сітці кольоровості 4:2:0
+            chain.filters[i:i + 2] = [
+                Filter(
+                    'crop',
+                    w=share_expr('iw', cw / scaled[0]), h=share_expr('ih', ch / scaled[1]),
+                    x=share_expr('iw', cx / scaled[0]), y=share_expr('ih', cy / scaled[1]),
+                ),
+                Filter('scale', w=cw, h=ch, flags=scale.get('flags')),
+            ]
+            self._states = {}
+            self.pass_counts['crop_before_scale'] += 1
+            changed += 1
+        return changed
+
+    def _drop_noops(self, chain):
+        """Прибирає фільтри, які нічого не змінюють у кадрі з відомими параметрами."""
+        changed = 0
+        i = 0
+        states = self._chain_states(chain)
+        while i < len(chain.filters):
+            f, state = chain.filters[i], states[i]
+            reason = noop_reason(f, state)
+            # Останній фільтр ланцюжка не прибираємо, якщо він єдиний - ланцюжок не може бути порожнім
+            if reason and len(chain.filters) > 1:
+                del chain.filters[i]
+                self._states = {}
+                states = self._chain_states(chain)
+                self.pass_counts[reason] += 1
+                changed += 1
+                continue
+            i += 1
+        return changed
+
+    def _cheap_scaler(self, chain):
+        """scale перед zoompan, що зменшує кадр щонайменше вдвічі: bicubic -> bilinear."""
+        states = self._chain_states(chain)
+        for i, f in enumerate(chain.filters):
+            if f.name != 'scale' or f.get('flags'):
+                continue
+            for j in range(i + 1, len(chain.filters)):
+                nxt = chain.filters[j]
+                if nxt.name == 'zoompan':
+                    scaled = states[j].size()
+                    target = parse_size(nxt.get('s') or nxt.get('size'))
+                    if not scaled:
+                        break
+                    if target and min(scaled[0] / target[0], scaled[1] / target[1]) >= CHEAP_SCALER_MIN_RATIO:
+                        f.set('flags', CHEAP_SCALER)
+                        self.pass_counts['cheap_scaler'] += 1
+                    break
+                if nxt.name not in ('crop', 'format', 'setsar'):
+                    break
+
+    # --- Стан потоків ---
+
+    def _chain_states(self, chain):
+        """Стан перед кожним фільтром ланцюжка (і після останнього)."""
+        states = self._states.get(id(chain))
+        if states is None:
+            state = self._input_state(chain)
+            states = [state]
+            for f in chain.filters:
+                state = apply_filter(f, state)
+                states.append(state)
+            self._states[id(chain)] = states
+        return states
+
+    def _input_state(self, chain):
+        if not chain.inputs:
+            return StreamState()
+        label = chain.inputs[0]
+        if INPUT_LABEL.match(label):
+            state = self.input_states.get(int(label.split(':')[0]))
+            return state.copy() if state else StreamState()
+        for other in self.chains:
+            if label in other.outputs:
+                # Кілька виходів - лише split дає на кожен той самий кадр
+                if len(other.outputs) == 1 or other.filters[-1].name == 'split':
+                    return self._chain_states(other)[-1].copy()
+                break
+        return StreamState()
+
+    def _ordered_chains(self):
+        produced = {label: n for n, chain in enumerate(self.chains) for label in chain.outputs}
+        return [self.chains[n] for n in self._topological_order(produced)]
+
+    def _topological_order(self, produced):
+        order, state = [], {}
+
+        def visit(n):
+            if state.get(n) == 'done':
+                return
+            if state.get(n) == 'visiting':
+                raise Exception(f"Filter graph: cycle through {self.chains[n]}")
+            state[n] = 'visiting'
+            for label in self.chains[n].inputs:
+                if label in produced:
+                    visit(produced[label])
+            state[n] = 'done'
+            order.append(n)
+
+        for n in range(len(self.chains)):
+            visit(n)
+        return order
+
+
+# --- Розбір синтаксису FFmpeg ---
+
+def split_top(text, sep):
+    """Ділить за sep поза лапками '...', квадратними дужками і \\-екрануванням."""
+    parts, buf = [], []
+    quoted = False
+    depth = 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\' and i + 1 < len(text):
+            buf.append(text[i:i + 2])
+            i += 2
+            continue
+        if ch == "'":
+            quoted = not quoted
+        elif not quoted and ch == '[':
+            depth += 1
+        elif not quoted and ch == ']':
+            depth -= 1
+        if ch == sep and not quoted and depth == 0:
+            parts.append("".join(buf))
+            buf = []
+        else:
+            buf.append(ch)
+        i += 1
+    parts.append("".join(buf))
+    return parts
+
+
+def parse_chain(text):
+    text = text.strip()
+    inputs = []
+    while text.startswith('['):
+        end = text.index(']')
+        inputs.append(text[1:end])
+        text = text[end + 1:].lstrip()
+    outputs = []
+    while text.endswith(']'):
+        start = text.rindex('[')
+        outputs.insert(0, text[start + 1:-1])
+        text = text[:start].rstrip()
+    filters = [Filter.parse(part) for part in split_top(text, ',') if part.strip()]
+    return Chain(inputs, filters, outputs)
+
+
+# --- Обчислення розмірів як у libavfilter ---
+
+def rescale(a, b, c):
+    """av_rescale з округленням до найближчого."""
+    return (a * b + c // 2) // c
+
+
+def share_expr(dim, share):
+    """Парна частка розміру входу виразом FFmpeg: round(iw*0.926/2)*2."""
+    if share == 0:
+        return "0"
+    return f"round({dim}*{share:.6f}/2)*2"
+
+
+def evaluate(expr, state):
+    """Числове значення простого виразу (числа, iw/ih, + - * /) або None."""
+    if expr is None:
+        return None
+    expr = expr.strip().strip("'")
+    names = {'iw': state.width, 'ih': state.height, 'in_w': state.width, 'in_h': state.height}
+    try:
+        tree = ast.parse(expr, mode='eval')
+    except SyntaxError:
+        return None
+
+    def walk(node):
+        if isinstance(node, ast.Expression):
+            return walk(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.Name):
+            value = names.get(node.id)
+            if value is None:
+                raise ValueError(node.id)
+            return value
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = walk(node.operand)
+            return -value if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.Div)):
+            left, right = walk(node.left), walk(node.right)
+            if isinstance(node.op, ast.Add):
+                return left + right
+            if isinstance(node.op, ast.Sub):
+                return left - right
+            if isinstance(node.op, ast.Mult):
+                return left * right
+            return left / right
+        raise ValueError(expr)
+
+    try:
+        return walk(tree)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def scale_size(f, state):
+    """Розмір виходу scale (логіка ff_scale_eval_dimensions) або None, якщо його не можна знати заздалегідь."""
+    w_val = evaluate(f.get('w', 'iw'), state)
+    h_val = evaluate(f.get('h', 'ih'), state)
+    if w_val is None or h_val is None:
+        return None
+    w, h = int(w_val), int(h_val)
+    iw, ih = state.width, state.height
+    needs_input = w <= 0 or h <= 0 or f.get('force_original_aspect_ratio', 'disable') not in ('disable', '0')
+    if needs_input and not (iw and ih):
+        return None
+    w = w or iw
+    h = h or ih
+
+    factor_w = -w if w < -1 else 1
+    factor_h = -h if h < -1 else 1
+    if w < 0 and h < 0:
+        w, h = iw, ih
+    if w < 0:
+        w = rescale(h, iw, ih * factor_w) * factor_w
+    if h < 0:
+        h = rescale(w, ih, iw * factor_h) * factor_h
+
+    mode = f.get('force_original_aspect_ratio', 'disable')
+    if mode in ('increase', 'decrease', '1', '2'):
+        tmp_w = rescale(h, iw, ih)
+        tmp_h = rescale(w, ih, iw)
+        if mode in ('decrease', '1'):
+            w, h = min(tmp_w, w), min(tmp_h, h)
+        else:
+            w, h = max(tmp_w, w), max(tmp_h, h)
+    return (w, h) if w > 0 and h > 0 else None
+
+
+def crop_region(f, size):
+    """(w, h, x, y) кропу для кадру size або None."""
+    state = StreamState(*size)
+    w = evaluate(f.get('w', 'iw'), state)
+    h = evaluate(f.get('h', 'ih'), state)
+    if w is None or h is None:
+        return None
+    w, h = int(w), int(h)
+    x = evaluate(f.get('x'), state) if f.get('x') is not None else (size[0] - w) / 2
+    y = evaluate(f.get('y'), state) if f.get('y') is not None else (size[1] - h) / 2
+    if x is None or y is None or f.keys() - {'w', 'h', 'x', 'y'}:
+        return None
+    if w <= 0 or h <= 0 or w > size[0] or h > size[1]:
+        return None
+    return w, h, int(x), int(y)
+
+
+def parse_size(value):
+    if not value:
+        return None
+    m = re.match(r"^'?(\d+)x(\d+)'?$", value.strip())
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+def apply_filter(f, state):
+    """Стан після фільтра."""
+    out = StreamState()
+    if f.name in SIZE_PRESERVING:
+        out.width, out.height = state.width, state.height
+    elif f.name == 'scale' and f.keys() <= SCALE_OPTIONS:
+        size = scale_size(f, state)
+        if size:
+            out.width, out.height = size
+    elif f.name == 'crop':
+        # Числові w/h відомі і без розміру входу
+        w, h = evaluate(f.get('w', 'iw'), state), evaluate(f.get('h', 'ih'), state)
+        if w is not None and h is not None:
+            out.width, out.height = int(w), int(h)
+    elif f.name == 'pad':
+        size = (evaluate(f.get('w'), state), evaluate(f.get('h'), state))
+        if None not in size:
+            out.width, out.height = int(size[0]), int(size[1])
+    elif f.name == 'zoompan':
+        size = parse_size(f.get('s') or f.get('size'))
+        if size:
+            out.width, out.height = size
+
+    if f.name == 'format':
+        fmts = (f.get('pix_fmts') or '').split('|')
+        out.pix_fmt = fmts[0] if len(fmts) == 1 and fmts[0] else None
+    elif f.name in FORMAT_PRESERVING and not f.get('format'):
+        out.pix_fmt = state.pix_fmt
+
+    if f.name == 'setsar':
+        value = (f.get('r') or f.get('sar') or f.get('ratio') or '').strip("'")
+        out.sar = value if value in ('1', '1/1', '1:1') else None
+    elif f.name in SAR_PRESERVING:
+        out.sar = state.sar
+
+    if f.name == 'fps':
+        out.fps = (f.get('fps') or '').strip("'") or None
+    elif f.name == 'zoompan':
+        out.fps = (f.get('fps') or '').strip("'") or None
+    elif f.name in RATE_PRESERVING:
+        out.fps = state.fps
+    return out
+
+
+def noop_reason(f, state):
+    """Ім'я проходу, якщо фільтр нічого не змінює для кадру зі станом state, інакше None."""
+    size = state.size()
+    if f.name == 'scale' and size and f.keys() <= {'w', 'h', 'force_original_aspect_ratio'}:
+        if scale_size(f, state) == size:
+            return 'dropped_scale'
+    elif f.name == 'crop' and size:
+        region = crop_region(f, size)
+        if region and region[:2] == size:
+            return 'dropped_crop'
+    elif f.name == 'pad' and size and f.keys() <= {'w', 'h', 'x', 'y', 'color'}:
+        target = (evaluate(f.get('w'), state), evaluate(f.get('h'), state))
+        if target == size:
+            return 'dropped_pad'
+    elif f.name == 'format' and state.pix_fmt and f.keys() == {'pix_fmts'}:
+        if f.get('pix_fmts') == state.pix_fmt:
+            return 'dropped_format'
+    elif f.name == 'setsar' and state.sar:
+        if apply_filter(f, state).sar:
+            return 'dropped_setsar'
+    elif f.name == 'fps' and state.fps and f.keys() == {'fps'}:
+        if f.get('fps').strip("'") == state.fps:
+            return 'dropped_fps'
+    return None
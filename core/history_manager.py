@@ -1,15 +1,29 @@
 import json
 import os
 import sys
+import shutil
+import sqlite3
 import threading
 import platform
 from datetime import datetime, timedelta
 from utils.logger import logger, LogLevel
 
 class HistoryManager:
+    """
+    Історія виконаних завдань у SQLite (history/history.db).
+    Кожна подія - це вставка/оновлення одного рядка замість перезапису денного JSON,
+    вкладка історії читає дані сторінками з фільтрами, а старі записи видаляються запитом.
+    """
+
+    RETENTION_DAYS = 30
+    RECENT_JOBS_DAYS = 2
+    RECENT_JOBS_LIMIT = 100
+    # Вікно, в межах якого мовні версії одного завдання групуються в один запис
+    GROUPING_WINDOW_SECONDS = 3600
+
     def __init__(self, history_dir='history'):
         self.lock = threading.Lock()
-        
+
         if platform.system() == "Darwin":
             base_dir = os.path.expanduser("~/Library/Application Support/Soloveyko.AI-Video.Maker")
         elif getattr(sys, 'frozen', False):
@@ -21,14 +35,52 @@ class HistoryManager:
 
         self.history_path = os.path.join(base_dir, history_dir)
         os.makedirs(self.history_path, exist_ok=True)
+        self.db_path = os.path.join(self.history_path, "history.db")
+
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._init_db()
+        self._migrate_legacy_files()
         self._cleanup()
 
+    def _init_db(self):
+        with self.lock:
+            try:
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+            except sqlite3.DatabaseError:
+                pass
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_name TEXT NOT NULL,
+                    start_time TEXT,
+                    end_time TEXT,
+                    has_error INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_end_time ON jobs(end_time);
+                CREATE INDEX IF NOT EXISTS idx_jobs_name_start ON jobs(job_name, start_time);
+
+                CREATE TABLE IF NOT EXISTS job_languages (
+                    job_id INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    lang_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (job_id, lang_id)
+                );
+
+                CREATE TABLE IF NOT EXISTS recent_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TEXT NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_recent_jobs_created ON recent_jobs(created_at);
+            """)
+            self.conn.commit()
+
     def add_entry(self, state):
         with self.lock:
             try:
-                today_str = datetime.now().strftime('%Y-%m-%d')
-                file_path = os.path.join(self.history_path, f"history_{today_str}.json")
-                
                 # Language-specific data
                 lang_entry = {
                     "lang_id": state.lang_id,
@@ -41,189 +93,247 @@ class HistoryManager:
                     "original_text": state.original_text_preview or state.original_text,
                     "translated_text": state.translated_text_preview
                 }
+                job_start = state.start_time.isoformat() if state.start_time else lang_entry['start_time']
+                self._upsert_nolock(state.job_name, job_start, lang_entry, state.start_time)
+                self.conn.commit()
 
-                data = []
-                if os.path.exists(file_path):
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                    except (json.JSONDecodeError, FileNotFoundError):
-                        data = []
-                
-                # Grouping logic: find if there's an existing entry for this job within the same "session" (e.g., started around the same time)
-                # Or simply by job_name if it's recent enough (e.g., within 1 hour)
-                existing_entry = None
-                if state.start_time:
-                    for entry in reversed(data):
-                        if entry.get('job_name') == state.job_name:
-                            # Check if the existing entry's start_time is close to current task's start_time
-                            try:
-                                entry_start = datetime.fromisoformat(entry.get('start_time', ''))
-                                if abs((state.start_time - entry_start).total_seconds()) < 3600: # 1 hour window
-                                    existing_entry = entry
-                                    break
-                            except:
-                                continue
-
-                if existing_entry:
-                    # Append language if not already there
-                    if 'languages' not in existing_entry:
-                        existing_entry['languages'] = []
-                    
-                    # Update or add lang_entry
-                    found_lang = False
-                    for i, l in enumerate(existing_entry['languages']):
-                        if l.get('lang_id') == state.lang_id:
-                            existing_entry['languages'][i] = lang_entry
-                            found_lang = True
-                            break
-                    if not found_lang:
-                        existing_entry['languages'].append(lang_entry)
-                        
-                    # Update job end_time to the latest
-                    existing_entry['end_time'] = lang_entry['end_time']
-                else:
-                    # Create new job entry
-                    new_job_entry = {
-                        "job_name": state.job_name,
-                        "start_time": state.start_time.isoformat() if state.start_time else lang_entry['start_time'],
-                        "end_time": lang_entry['end_time'],
-                        "languages": [lang_entry]
-                    }
-                    data.append(new_job_entry)
-                
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=4, ensure_ascii=False)
-                
                 logger.log(f"History entry added/updated for job {state.job_name} ({state.lang_id})", level=LogLevel.INFO)
             except Exception as e:
+                self.conn.rollback()
                 logger.log(f"Failed to add history entry: {e}", level=LogLevel.ERROR)
 
+    def _upsert_nolock(self, job_name, job_start, lang_entry, group_start=None):
+        # Grouping logic: мовні версії одного завдання, запущені в межах години, об'єднуються в один запис
+        job_id = None
+        if group_start:
+            window = timedelta(seconds=self.GROUPING_WINDOW_SECONDS)
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE job_name = ? AND start_time BETWEEN ? AND ? ORDER BY id DESC LIMIT 1",
+                (job_name, (group_start - window).isoformat(), (group_start + window).isoformat())
+            ).fetchone()
+            if row:
+                job_id = row['id']
+
+        has_error = 1 if self._lang_has_error(lang_entry) else 0
+        if job_id is None:
+            cur = self.conn.execute(
+                "INSERT INTO jobs (job_name, start_time, end_time, has_error) VALUES (?, ?, ?, ?)",
+                (job_name, job_start, lang_entry['end_time'], has_error)
+            )
+            job_id = cur.lastrowid
+        else:
+            # Update job end_time to the latest
+            self.conn.execute(
+                "UPDATE jobs SET end_time = ?, has_error = MAX(has_error, ?) WHERE id = ?",
+                (lang_entry['end_time'], has_error, job_id)
+            )
+
+        # Update or add lang_entry (позиція зберігається при оновленні мови)
+        existing = self.conn.execute(
+            "SELECT position FROM job_languages WHERE job_id = ? AND lang_id = ?", (job_id, lang_entry.get('lang_id'))
+        ).fetchone()
+        if existing:
+            position = existing['position']
+        else:
+            row = self.conn.execute("SELECT COALESCE(MAX(position), -1) + 1 AS next FROM job_languages WHERE job_id = ?", (job_id,)).fetchone()
+            position = row['next']
+        self.conn.execute(
+            "INSERT OR REPLACE INTO job_languages (job_id, position, lang_id, data) VALUES (?, ?, ?, ?)",
+            (job_id, position, lang_entry.get('lang_id'), json.dumps(lang_entry, ensure_ascii=False))
+        )
+
+    def _lang_has_error(self, lang_entry):
+        status = lang_entry.get('status')
+        if isinstance(status, dict):
+            return 'error' in status.values()
+        return status == 'error'
+
     def get_history(self, days=30):
+        """Вся історія за останні days днів (новіші спочатку)."""
+        return self.query_history(days=days)
+
+    def query_history(self, days=30, limit=None, offset=0, search=None, errors_only=False):
+        """
+        Сторінка історії, відсортована за end_time (новіші спочатку).
+        search - підрядок назви завдання, errors_only - лише завдання з помилками.
+        """
+        where, params = self._build_filter(days, search, errors_only)
+        sql = f"SELECT id, job_name, start_time, end_time FROM jobs{where} ORDER BY end_time DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [limit, offset]
+
         with self.lock:
-            history = []
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            # Ensure we check all relevant files in the directory
-            if not os.path.exists(self.history_path):
+            try:
+                jobs = self.conn.execute(sql, params).fetchall()
+                if not jobs:
+                    return []
+
+                languages = {}
+                ids = [job['id'] for job in jobs]
+                # SQLite обмежує кількість параметрів у запиті - читаємо мови порціями
+                for i in range(0, len(ids), 500):
+                    chunk = ids[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self.conn.execute(
+                        f"SELECT job_id, data FROM job_languages WHERE job_id IN ({placeholders}) ORDER BY job_id, position",
+                        chunk
+                    ).fetchall()
+                    for row in rows:
+                        try:
+                            languages.setdefault(row['job_id'], []).append(json.loads(row['data']))
+                        except json.JSONDecodeError:
+                            continue
+
+                return [{
+                    "job_name": job['job_name'],
+                    "start_time": job['start_time'],
+                    "end_time": job['end_time'],
+                    "languages": languages.get(job['id'], [])
+                } for job in jobs]
+            except sqlite3.Error as e:
+                logger.log(f"Failed to read history: {e}", level=LogLevel.ERROR)
                 return []
 
-            for filename in os.listdir(self.history_path):
-                if filename.startswith("history_") and filename.endswith(".json"):
-                    try:
-                        date_str = filename[8:-5]
-                        file_date = datetime.strptime(date_str, '%Y-%m-%d')
-                        if file_date >= start_date.replace(hour=0, minute=0, second=0, microsecond=0):
-                             file_path = os.path.join(self.history_path, filename)
-                             try:
-                                 with open(file_path, 'r', encoding='utf-8') as f:
-                                     history.extend(json.load(f))
-                             except Exception as e:
-                                 logger.log(f"Failed to read history file {file_path}: {e}", level=LogLevel.ERROR)
-                    except ValueError:
-                        continue
-            
-            # Sort by end_time descending
-            history.sort(key=lambda x: x.get('end_time', ''), reverse=True)
-            return history
+    def count_history(self, days=30, search=None, errors_only=False):
+        where, params = self._build_filter(days, search, errors_only)
+        with self.lock:
+            try:
+                return self.conn.execute(f"SELECT COUNT(*) FROM jobs{where}", params).fetchone()[0]
+            except sqlite3.Error as e:
+                logger.log(f"Failed to count history: {e}", level=LogLevel.ERROR)
+                return 0
+
+    def _build_filter(self, days, search, errors_only):
+        conditions = []
+        params = []
+        if days:
+            start_date = (datetime.now() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+            conditions.append("end_time >= ?")
+            params.append(start_date.isoformat())
+        if search:
+            conditions.append("job_name LIKE ? ESCAPE '\\'")
+            escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f"%{escaped}%")
+        if errors_only:
+            conditions.append("has_error = 1")
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        return where, params
 
     def clear_history(self):
         with self.lock:
             try:
-                for filename in os.listdir(self.history_path):
-                    if filename.startswith("history_") and filename.endswith(".json"):
-                        os.remove(os.path.join(self.history_path, filename))
+                self.conn.execute("DELETE FROM job_languages")
+                self.conn.execute("DELETE FROM jobs")
+                self.conn.commit()
                 logger.log("History cleared.", level=LogLevel.INFO)
             except Exception as e:
+                self.conn.rollback()
                 logger.log(f"Error clearing history: {e}", level=LogLevel.ERROR)
 
     def _cleanup(self):
-        try:
-            now = datetime.now()
-            retention_limit = now - timedelta(days=30)
-            
-            if not os.path.exists(self.history_path):
-                return
-
-            for filename in os.listdir(self.history_path):
-                if filename.startswith("history_") and filename.endswith(".json"):
-                    try:
-                        date_str = filename[8:-5]
-                        file_date = datetime.strptime(date_str, '%Y-%m-%d')
-                        if file_date < retention_limit.replace(hour=0, minute=0, second=0, microsecond=0):
-                            os.remove(os.path.join(self.history_path, filename))
-                            logger.log(f"Deleted old history file: {filename}", level=LogLevel.INFO)
-                    except ValueError:
-                        continue
-        except Exception as e:
-            logger.log(f"Error during history cleanup: {e}", level=LogLevel.ERROR)
+        with self.lock:
+            try:
+                retention_limit = (datetime.now() - timedelta(days=self.RETENTION_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+                cur = self.conn.execute("DELETE FROM jobs WHERE end_time < ?", (retention_limit.isoformat(),))
+                self.conn.execute("DELETE FROM job_languages WHERE job_id NOT IN (SELECT id FROM jobs)")
+                self.conn.commit()
+                if cur.rowcount:
+                    logger.log(f"Deleted {cur.rowcount} old history entries.", level=LogLevel.INFO)
+            except Exception as e:
+                self.conn.rollback()
+                logger.log(f"Error during history cleanup: {e}", level=LogLevel.ERROR)
+
+    def _migrate_legacy_files(self):
+        """Одноразово переносить старі history_YYYY-MM-DD.json та recent_jobs.json у базу."""
+        legacy_files = [f for f in os.listdir(self.history_path)
+                        if (f.startswith("history_") and f.endswith(".json")) or f == "recent_jobs.json"]
+        if not legacy_files:
+            return
+
+        legacy_dir = os.path.join(self.history_path, "legacy_json")
+        with self.lock:
+            for filename in sorted(legacy_files):
+                file_path = os.path.join(self.history_path, filename)
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except (json.JSONDecodeError, OSError) as e:
+                    logger.log(f"Failed to read history file {file_path}: {e}", level=LogLevel.ERROR)
+                    data = []
+
+                try:
+                    if filename == "recent_jobs.json":
+                        for job in data:
+                            self.conn.execute("INSERT INTO recent_jobs (created_at, data) VALUES (?, ?)",
+                                              (job.get('created_at', ''), json.dumps(job, ensure_ascii=False)))
+                    else:
+                        for entry in data:
+                            languages = entry.get('languages')
+                            # Old entry format: the entry itself is a language
+                            if not languages and 'lang_id' in entry:
+                                languages = [entry]
+                            has_error = any(self._lang_has_error(l) for l in languages or [])
+                            cur = self.conn.execute(
+                                "INSERT INTO jobs (job_name, start_time, end_time, has_error) VALUES (?, ?, ?, ?)",
+                                (entry.get('job_name', 'Unknown'), entry.get('start_time'), entry.get('end_time', ''), 1 if has_error else 0)
+                            )
+                            for position, lang in enumerate(languages or []):
+                                self.conn.execute(
+                                    "INSERT OR REPLACE INTO job_languages (job_id, position, lang_id, data) VALUES (?, ?, ?, ?)",
+                                    (cur.lastrowid, position, str(lang.get('lang_id', position)), json.dumps(lang, ensure_ascii=False))
+                                )
+                    self.conn.commit()
+                except Exception as e:
+                    self.conn.rollback()
+                    logger.log(f"Failed to migrate history file {filename}: {e}", level=LogLevel.ERROR)
+                    continue
+
+                # Файл не видаляємо, а відкладаємо - щоб повторно не імпортувати
+                try:
+                    os.makedirs(legacy_dir, exist_ok=True)
+                    shutil.move(file_path, os.path.join(legacy_dir, filename))
+                except OSError as e:
+                    logger.log(f"Could not move migrated history file {filename}: {e}", level=LogLevel.WARNING)
+        logger.log(f"Migrated {len(legacy_files)} history file(s) to {os.path.basename(self.db_path)}.", level=LogLevel.INFO)
 
     def register_recent_job(self, job):
         """Saves a job to the recent jobs list for recovery."""
         with self.lock:
             try:
-                file_path = os.path.join(self.history_path, "recent_jobs.json")
-                recent_jobs = []
-                if os.path.exists(file_path):
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            recent_jobs = json.load(f)
-                    except:
-                        recent_jobs = []
-                
                 # Add timestamp if not present
                 if 'created_at' not in job:
                     job['created_at'] = datetime.now().isoformat()
-                
-                # Prevent duplicates by name and created_at (or just name if very recent)
-                # For simplicity, just append and then clean up old ones
-                recent_jobs.append(job)
-                
+
+                self.conn.execute("INSERT INTO recent_jobs (created_at, data) VALUES (?, ?)",
+                                  (job['created_at'], json.dumps(job, ensure_ascii=False)))
+
                 # Keep only last 2 days or last 100 jobs
-                now = datetime.now()
-                two_days_ago = now - timedelta(days=2)
-                
-                filtered_jobs = []
-                for j in recent_jobs:
-                    try:
-                        created_at = datetime.fromisoformat(j.get('created_at', ''))
-                        if created_at >= two_days_ago:
-                            filtered_jobs.append(j)
-                    except:
-                        continue
-                
-                # Limit count
-                if len(filtered_jobs) > 100:
-                    filtered_jobs = filtered_jobs[-100:]
-                
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(filtered_jobs, f, indent=4, ensure_ascii=False)
-                
+                two_days_ago = datetime.now() - timedelta(days=self.RECENT_JOBS_DAYS)
+                self.conn.execute("DELETE FROM recent_jobs WHERE created_at < ?", (two_days_ago.isoformat(),))
+                self.conn.execute(
+                    "DELETE FROM recent_jobs WHERE id NOT IN (SELECT id FROM recent_jobs ORDER BY id DESC LIMIT ?)",
+                    (self.RECENT_JOBS_LIMIT,)
+                )
+                self.conn.commit()
             except Exception as e:
+                self.conn.rollback()
                 logger.log(f"Failed to register recent job: {e}", level=LogLevel.ERROR)
 
     def get_recent_jobs(self, days=2):
         """Returns recent jobs for recovery."""
         with self.lock:
-            file_path = os.path.join(self.history_path, "recent_jobs.json")
-            if not os.path.exists(file_path):
-                return []
-            
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    jobs = json.load(f)
-                
-                now = datetime.now()
-                limit = now - timedelta(days=days)
-                
-                filtered = []
-                for j in reversed(jobs): # Newest first
+                limit = datetime.now() - timedelta(days=days)
+                rows = self.conn.execute(
+                    "SELECT data FROM recent_jobs WHERE created_at >= ? ORDER BY id DESC", (limit.isoformat(),)
+                ).fetchall()
+
+                filtered = [] # Newest first
+                for row in rows:
                     try:
-                        created_at = datetime.fromisoformat(j.get('created_at', ''))
-                        if created_at >= limit:
-                            filtered.append(j)
-                    except:
+                        filtered.append(json.loads(row['data']))
+                    except json.JSONDecodeError:
                         continue
                 return filtered
             except Exception as e:
@@ -0,0 +1,206 @@
+import json
+import os
+import sys
+import time
+import atexit
+import platform
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from utils.logger import logger, LogLevel
+
+class MediaProbe:
+    """
+    Спільний сервіс ffprobe з персистентним кешем метаданих.
+    Один виклик ffprobe повертає тривалість, розмір кадру та наявність аудіо;
+    результат кешується за (шлях, розмір, mtime) і зберігається на диск.
+    """
+
+    EMPTY = {'duration': 0.0, 'width': 0, 'height': 0, 'has_audio': False}
+
+    def __init__(self, cache_name='media_probe.json', max_entries=5000, max_workers=None):
+        self.lock = threading.Lock()
+
+        if platform.system() == "Darwin":
+            base_dir = os.path.expanduser("~/Library/Application Support/Soloveyko.AI-Video.Maker")
+        elif getattr(sys, 'frozen', False):
+            # Running as a bundled exe (Windows)
+            base_dir = os.path.dirname(sys.executable)
+        else:
+            # Running as a script
+            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        self.cache_dir = os.path.join(base_dir, "cache")
+        self.cache_path = os.path.join(self.cache_dir, cache_name)
+        self.max_entries = max_entries
+        self.max_workers = max_workers or min(8, os.cpu_count() or 4)
+
+        self._entries = None
+        self._dirty = False
+        self._last_save = 0.0
+        atexit.register(self.flush)
+
+    # --- Public API ---
+
+    def probe(self, path):
+        """Повертає dict з duration, width, height, has_audio (нулі, якщо файл не читається)."""
+        info = self._probe_one(path)
+        self._maybe_save()
+        return info
+
+    def probe_many(self, paths, max_workers=None):
+        """Пробує багато файлів паралельно (обмежений пул). Повертає {path: info}."""
+        paths = list(dict.fromkeys(paths))
+        if not paths:
+            return {}
+
+        results = {}
+        missing = []
+        for path in paths:
+            cached = self._lookup(path)
+            if cached is not None:
+                results[path] = cached
+            else:
+                missing.append(path)
+
+        if missing:
+            workers = max(1, min(max_workers or self.max_workers, len(missing)))
+            if workers == 1:
+                for path in missing:
+                    results[path] = self._probe_one(path)
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    for path, info in zip(missing, pool.map(self._probe_one, missing)):
+                        results[path] = info
+            self.flush()
+        return results
+
+    def get_duration(self, path):
+        return self.probe(path)['duration']
+
+    def cached_duration(self, path):
+        """Тривалість лише з кешу, без запуску ffprobe (безпечно для GUI-потоку). 0.0, якщо запису немає."""
+        cached = self._lookup(path)
+        return cached['duration'] if cached is not None else 0.0
+
+    def get_dimensions(self, path):
+        info = self.probe(path)
+        return info['width'], info['height']
+
+    def has_audio(self, path):
+        return self.probe(path)['has_audio']
+
+    def flush(self):
+        with self.lock:
+            if not self._dirty or self._entries is None:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.log(f"[MediaProbe] Could not save cache: {e}", level=LogLevel.WARNING)
+
+    # --- Internals ---
+
+    def _load_nolock(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    self._entries = data
+            except (json.JSONDecodeError, OSError):
+                self._entries = {}
+
+    def _signature(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None, None, None
+        return os.path.normcase(os.path.abspath(path)), st.st_size, st.st_mtime_ns
+
+    def _lookup(self, path):
+        key, size, mtime = self._signature(path)
+        if key is None:
+            return dict(self.EMPTY)
+        with self.lock:
+            self._load_nolock()
+            entry = self._entries.get(key)
+            if entry and entry.get('size') == size and entry.get('mtime') == mtime:
+                entry['used'] = time.time()
+                return {k: entry[k] for k in self.EMPTY}
+        return None
+
+    def _store(self, path, info):
+        key, size, mtime = self._signature(path)
+        if key is None:
+            return
+        with self.lock:
+            self._load_nolock()
+            entry = dict(info)
+            entry.update({'size': size, 'mtime': mtime, 'used': time.time()})
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                # Викидаємо найдавніше використані записи
+                oldest = sorted(self._entries.items(), key=lambda kv: kv[1].get('used', 0))
+                for old_key, _ in oldest[:len(self._entries) - self.max_entries]:
+                    del self._entries[old_key]
+            self._dirty = True
+
+    def _maybe_save(self):
+        if self._dirty and time.time() - self._last_save > 5:
+            self.flush()
+
+    def _probe_one(self, path):
+        cached = self._lookup(path)
+        if cached is not None:
+            return cached
+
+        normalized_path = path.replace("\\", "/")
+        cmd = ["ffprobe", "-v", "error",
+               "-show_entries", "format=duration:stream=codec_type,width,height",
+               "-of", "json", normalized_path]
+        try:
+            startupinfo = None
+            if platform.system() == "Windows":
+                startupinfo = subprocess.STARTUPINFO()
+                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+            res = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='replace', startupinfo=startupinfo)
+            data = json.loads(res.stdout or "{}")
+        except Exception as e:
+            logger.log(f"[MediaProbe] ffprobe failed for {os.path.basename(path)}: {e}", level=LogLevel.DEBUG)
+            return dict(self.EMPTY)
+
+        streams = data.get('streams') or []
+        fmt = data.get('format') or {}
+        if not streams and not fmt:
+            # Не кешуємо невдалі спроби - файл може ще дописуватись
+            return dict(self.EMPTY)
+
+        info = dict(self.EMPTY)
+        try:
+            info['duration'] = float(fmt.get('duration', 0) or 0)
+        except (TypeError, ValueError):
+            info['duration'] = 0.0
+        for stream in streams:
+            codec_type = stream.get('codec_type')
+            if codec_type == 'video' and not info['width']:
+                info['width'] = int(stream.get('width') or 0)
+                info['height'] = int(stream.get('height') or 0)
+            elif codec_type == 'audio':
+                info['has_audio'] = True
+
+        self._store(path, info)
+        return info
+
+media_probe = MediaProbe()
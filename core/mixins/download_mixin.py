@@ -1,6 +1,7 @@
 from PySide6.QtCore import Slot
 from utils.logger import logger, LogLevel
 from core.workers import DownloadWorker
+from utils.file_cache import file_digests
 
 class DownloadMixin:
     """
@@ -16,7 +17,8 @@ class DownloadMixin:
             'url': state.input_source, # For rewrite tasks, input_source is the URL
             'dir_path': state.dir_path,
             'yt_dlp_path': self.yt_dlp_path,
-            'download_semaphore': self.download_semaphore
+            'download_semaphore': self.download_semaphore,
+            'transcribe': 'stage_transcription' in state.stages
         }
         self._start_worker(DownloadWorker, task_id, 'stage_download', config, self._on_download_finished, self._on_download_error)
 
@@ -24,6 +26,7 @@ class DownloadMixin:
     def _on_download_finished(self, task_id, audio_path):
         state = self.task_states[task_id]
         state.audio_path = audio_path # Temporary path for transcription
+        state.audio_digest = file_digests.known_digest(audio_path)
         self._set_stage_status(task_id, 'stage_download', 'success')
         
         # Check dependency for next stage (Transcription)
@@ -38,8 +38,10 @@ class ImageMixin:
             config = {
                 'text': state.text_for_processing,
                 'img_prompt_settings': img_settings,
-                'openrouter_api_key': state.settings.get('openrouter_api_key')
+                'openrouter_api_key': state.settings.get('openrouter_api_key'),
+                'refresh_cache': 'image_prompts' in state.completion_cache_refresh
             }
+            state.completion_cache_refresh.discard('image_prompts')
             self._start_worker(ImagePromptWorker, task_id, 'stage_img_prompts', config, self._on_img_prompts_finished, self._on_img_prompts_error)
         except Exception as e:
             self._on_img_prompts_error(task_id, f"Failed to start image prompt worker: {e}")
@@ -62,6 +64,8 @@ class ImageMixin:
         if is_check_enabled and prompts_count != desired_count:
             if state.prompt_regeneration_attempts < 3:
                 state.prompt_regeneration_attempts += 1
+                # Інакше кеш повернув би ту саму відповідь з неправильною кількістю промптів
+                state.completion_cache_refresh.add('image_prompts')
                 logger.log(
                     f"[{task_id}] Image prompt count is {prompts_count}, but {desired_count} is required. "
                     f"Regenerating, attempt {state.prompt_regeneration_attempts}/3.",
@@ -5,6 +5,11 @@ import time
 from PySide6.QtCore import Slot
 from utils.logger import logger, LogLevel
 from core.workers import VoiceoverWorker, SubtitleWorker, TranscriptionWorker
+from core.media_probe import media_probe
+from core.whisper_host import whisper_host
+from core import tts_timing
+from core.transcript_cache import transcript_cache
+from utils.file_cache import file_digests
 
 class SubtitleMixin:
     """
@@ -12,7 +17,7 @@ class SubtitleMixin:
     Requires: self.task_states, self.settings,              self.elevenlabs_queue, self.elevenlabs_active_count,
               self.elevenlabs_unlim_queue, self.elevenlabs_unlim_active_count,
               self.edgetts_queue, self.edgetts_active_count,
-              self.whisper_queue, self.subtitle_semaphore, self.subtitle_lock,
+              self.whisper_queue, self.whisper_slot_tasks, self.subtitle_lock, self.resource_governor,
               self.completed_subtitle_tasks, self.total_subtitle_tasks, self.subtitle_barrier_passed,
               self._start_worker, self._set_stage_status, self.stage_metadata_updated,
               self.check_if_all_finished, self._check_and_start_montages
@@ -45,31 +50,16 @@ class SubtitleMixin:
         return "en-US"
 
     def _get_audio_duration(self, audio_path):
-        """Get audio duration in seconds using mutagen for accuracy."""
-        from mutagen.mp3 import MP3
-        from mutagen.wave import WAVE
-        
-        try:
-            ext = os.path.splitext(audio_path)[1].lower()
-            if ext == '.mp3':
-                audio = MP3(audio_path)
-                return audio.info.length
-            elif ext == '.wav':
-                audio = WAVE(audio_path)
-                return audio.info.length
-            else:
-                logger.log(f"Unsupported audio format for duration check: {ext}. Falling back to estimation.", level=LogLevel.WARNING)
-                # Fallback for other types if any
-                file_size = os.path.getsize(audio_path)
-                duration = (file_size * 8) / (128 * 1000) # Assume 128 kbps
-                return duration
-        except Exception as e:
-            logger.log(f"Could not get audio duration for {audio_path}: {e}. Falling back to estimation.", level=LogLevel.ERROR)
-            # Fallback on any error
-            file_size = os.path.getsize(audio_path)
-            duration = (file_size * 8) / (128 * 1000) # Assume 128 kbps
+        """Get audio duration in seconds from the media probe cache (warmed by VoiceoverWorker)."""
+        duration = media_probe.cached_duration(audio_path)
+        if duration > 0:
             return duration
 
+        logger.log(f"Could not get audio duration for {audio_path}. Falling back to estimation.", level=LogLevel.WARNING)
+        file_size = os.path.getsize(audio_path)
+        duration = (file_size * 8) / (128 * 1000) # Assume 128 kbps
+        return duration
+
     def _start_voiceover(self, task_id):
         state = self.task_states[task_id]
         task_settings = state.settings
@@ -85,7 +75,8 @@ class SubtitleMixin:
             'gemini_tts_api_key': task_settings.get('gemini_tts_api_key'),
             'voicemaker_lang_code': self._get_voicemaker_language_code(lang_config.get('voicemaker_voice_id')),
             'job_name': state.job_name,
-            'lang_name': state.lang_name
+            'lang_name': state.lang_name,
+            'transcribe': 'stage_subtitles' in state.stages
         }
 
         tts_provider = lang_config.get('tts_provider', 'ElevenLabs')
@@ -139,6 +130,7 @@ class SubtitleMixin:
             self._process_edgetts_queue()
 
         state.audio_path = audio_path
+        state.audio_digest = file_digests.known_digest(audio_path)
         self._set_stage_status(task_id, 'stage_voiceover', 'success')
         
         # Get audio duration and emit metadata
@@ -191,13 +183,13 @@ class SubtitleMixin:
 
     def _process_whisper_queue(self):
         # --- Global Concurrency Check ---
-        allow_simultaneous = self.settings.get("simultaneous_montage_and_subs", False)
+        exclusive = self._montage_and_subs_exclusive()
 
         while self.whisper_queue:
             # Note: We peek/pop in loop, so we check condition inside
             
             # If not allowed simultaneous, checking if montages are running
-            if not allow_simultaneous and self._are_montages_running():
+            if exclusive and self._are_montages_running():
                 # Cannot start new subtitles yet.
                 # We stop the loop. The queue remains populated.
                 # processing will resume when _process_whisper_queue is called again (e.g. from montage finished)
@@ -208,13 +200,25 @@ class SubtitleMixin:
             sub_settings = state.settings.get('subtitles', {})
             whisper_type = sub_settings.get('whisper_type', 'standard')
 
-            if whisper_type == 'assemblyai':
+            if (whisper_type == 'assemblyai' or (worker_type == 'subtitles' and tts_timing.has_timing(state.audio_path))
+                    or self._has_cached_transcript(state, worker_type, sub_settings)):
+                # AssemblyAI рахує на сервері, а субтитри з таймінгів TTS чи з кешу розпізнавання взагалі не запускають Whisper
                 if worker_type == 'subtitles':
                     self._launch_subtitle_worker(task_id)
                 else:
                     self._launch_transcription_worker(task_id)
             else:
-                if self.subtitle_semaphore.tryAcquire():
+                if len(self.whisper_slot_tasks) < self._whisper_capacity(sub_settings):
+                    if self.resource_governor.is_enabled():
+                        # Локальний Whisper ділить CPU/RAM з монтажами - стартуємо, лише якщо вистачає ресурсів
+                        key = ('whisper', task_id)
+                        ok, reason = self.resource_governor.try_reserve(key, 'whisper', self.resource_governor.estimate_whisper(state))
+                        if not ok:
+                            self.whisper_queue.appendleft((task_id, worker_type))
+                            self._defer_by_governor(key, reason)
+                            break
+                        self._governor_deferred_reasons.pop(key, None)
+                    self.whisper_slot_tasks.add(task_id)
                     if worker_type == 'subtitles':
                         self._launch_subtitle_worker(task_id)
                     else:
@@ -223,6 +227,31 @@ class SubtitleMixin:
                     self.whisper_queue.appendleft((task_id, worker_type))
                     break
 
+    def _release_whisper_slot(self, task_id):
+        if task_id not in self.whisper_slot_tasks:
+            return # AssemblyAI і субтитри з таймінгів TTS не займали місце в пулі Whisper
+        self.whisper_slot_tasks.discard(task_id)
+        self.resource_governor.release(('whisper', task_id))
+        time.sleep(2.0)
+        self._process_whisper_queue()
+
+    def _has_cached_transcript(self, state, worker_type, sub_settings):
+        # Озвучка не змінилась з попереднього запуску - сегменти вже є в кеші, слот Whisper не потрібен.
+        # Викликається з GUI-потоку на кожному проході черги, тому лише за digest, який порахував воркер:
+        # без нього задача просто займає слот, а кеш перевіряє вже SubtitleEngine
+        if not state.audio_digest:
+            return False
+        language = state.lang_id.split('-')[0].lower() if worker_type == 'subtitles' else self._transcription_language(state)
+        return transcript_cache.lookup(
+            state.audio_path, sub_settings, sub_settings.get('whisper_model', 'base'), language, digest=state.audio_digest
+        ) is not None
+
+    def _whisper_capacity(self, sub_settings):
+        # whisper.cpp (AMD) рахує на одному GPU - по одній задачі; стандартний Whisper - скільки процесів вміщує пул
+        if sub_settings.get('whisper_type', 'standard') == 'amd':
+            return 1
+        return whisper_host.capacity(sub_settings, sub_settings.get('whisper_model', 'base'))
+
     def _launch_subtitle_worker(self, task_id):
         try:
             state = self.task_states[task_id]
@@ -250,7 +279,9 @@ class SubtitleMixin:
                 'sub_settings': sub_settings, 
                 'full_settings': state.settings, # Pass full settings for resolution detection
                 'lang_code': state.lang_id.split('-')[0].lower(),
-                'whisper_exe': whisper_exe, 'whisper_model_path': whisper_model_path
+                'whisper_exe': whisper_exe, 'whisper_model_path': whisper_model_path,
+                # Текст, який озвучив TTS цієї задачі - для вирівнювання замість розпізнавання
+                'script_text': state.text_for_processing if 'stage_voiceover' in state.stages else None
             }
             self._start_worker(SubtitleWorker, task_id, 'stage_subtitles', config,
                                          self._on_subtitles_finished, self._on_subtitles_error)
@@ -259,17 +290,10 @@ class SubtitleMixin:
         
     @Slot(str, object)
     def _on_subtitles_finished(self, task_id, subtitle_path):
-        state = self.task_states.get(task_id)
-        if state:
-            sub_settings = state.settings.get('subtitles', {})
-            whisper_type = sub_settings.get('whisper_type', 'standard')
-            if whisper_type != 'assemblyai':
-                self.subtitle_semaphore.release()
-                time.sleep(2.0)
-                self._process_whisper_queue()
+        self._release_whisper_slot(task_id)
         
         # Check if we can unblock montages now (if setting dependent)
-        if not self.settings.get("simultaneous_montage_and_subs", False):
+        if self._montage_and_subs_exclusive() or self.resource_governor.is_enabled():
             # We call this via task_processor (self)
             # Assuming task_processor has _process_montage_queue mixed in (it does from VideoMixin)
             if hasattr(self, '_process_montage_queue'):
@@ -281,17 +305,10 @@ class SubtitleMixin:
 
     @Slot(str, str)
     def _on_subtitles_error(self, task_id, error):
-        state = self.task_states.get(task_id)
-        if state:
-            sub_settings = state.settings.get('subtitles', {})
-            whisper_type = sub_settings.get('whisper_type', 'standard')
-            if whisper_type != 'assemblyai':
-                self.subtitle_semaphore.release()
-                time.sleep(2.0)
-                self._process_whisper_queue()
+        self._release_whisper_slot(task_id)
 
         # Check if we can unblock montages now
-        if not self.settings.get("simultaneous_montage_and_subs", False):
+        if self._montage_and_subs_exclusive() or self.resource_governor.is_enabled():
             if hasattr(self, '_process_montage_queue'):
                  self._process_montage_queue()
 
@@ -308,6 +325,18 @@ class SubtitleMixin:
             logger.log("All subtitle tasks completed. Barrier passed. Checking for pending montages.", level=LogLevel.SUCCESS)
             self._check_and_start_montages()
 
+    def _transcription_language(self, state):
+        # Determine language code: 
+        # 1. Forced source language (e.g. for AMD Whisper manual override)
+        # 2. 'auto' for rewrite jobs (standard behavior)
+        # 3. Target language code (default fallback)
+        forced_lang = state.lang_data.get('source_language')
+        if forced_lang:
+            return forced_lang
+        if state.job_type == 'rewrite':
+            return 'auto'
+        return state.lang_id.split('-')[0].lower()
+
     def _start_transcription(self, task_id):
         self.whisper_queue.append((task_id, 'transcription'))
         self._process_whisper_queue()
@@ -334,22 +363,10 @@ class SubtitleMixin:
                 whisper_exe = os.path.join(whisper_base_path, "main.exe")
                 whisper_model_path = os.path.join(whisper_base_path, model_name)
 
-            # Determine language code: 
-            # 1. Forced source language (e.g. for AMD Whisper manual override)
-            # 2. 'auto' for rewrite jobs (standard behavior)
-            # 3. Target language code (default fallback)
-            forced_lang = state.lang_data.get('source_language')
-            if forced_lang:
-                lang_code = forced_lang
-            elif state.job_type == 'rewrite':
-                lang_code = 'auto'
-            else:
-                lang_code = state.lang_id.split('-')[0].lower()
-
             config = {
                 'audio_path': state.audio_path,
                 'sub_settings': sub_settings,
-                'lang_code': lang_code,
+                'lang_code': self._transcription_language(state),
                 'whisper_exe': whisper_exe,
                 'whisper_model_path': whisper_model_path
             }
@@ -359,14 +376,7 @@ class SubtitleMixin:
 
     @Slot(str, str)
     def _on_transcription_error(self, task_id, error):
-        state = self.task_states.get(task_id)
-        if state:
-            sub_settings = state.settings.get('subtitles', {})
-            whisper_type = sub_settings.get('whisper_type', 'standard')
-            if whisper_type != 'assemblyai':
-                self.subtitle_semaphore.release()
-                time.sleep(2.0)
-                self._process_whisper_queue()
+        self._release_whisper_slot(task_id)
         
         self._set_stage_status(task_id, 'stage_transcription', 'error', error)
         
@@ -381,14 +391,9 @@ class SubtitleMixin:
         with open(os.path.join(state.dir_path, "transcription.txt"), 'w', encoding='utf-8') as f:
             f.write(text)
             
+        self._release_whisper_slot(task_id)
+
         if state:
-            sub_settings = state.settings.get('subtitles', {})
-            whisper_type = sub_settings.get('whisper_type', 'standard')
-            if whisper_type != 'assemblyai':
-                self.subtitle_semaphore.release()
-                time.sleep(2.0)
-                self._process_whisper_queue()
-            
             # Update stage.text_for_processing or original_text depending on logic
             # Usually transcription provides the "original text" for further processing
             state.original_text = text
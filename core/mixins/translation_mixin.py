@@ -57,8 +57,10 @@ class TranslationMixin:
                 'model': model,
                 'max_tokens': max_tokens,
                 'temperature': temperature,
-                'openrouter_api_key': state.settings.get('openrouter_api_key')
+                'openrouter_api_key': state.settings.get('openrouter_api_key'),
+                'refresh_cache': 'rewrite' in state.completion_cache_refresh
             }
+            state.completion_cache_refresh.discard('rewrite')
             self._start_worker(RewriteWorker, task_id, 'stage_rewrite', config, self._on_rewrite_finished, self._on_rewrite_error)
         except Exception as e:
             self._on_rewrite_error(task_id, f"Failed to start rewrite: {e}")
@@ -157,8 +159,10 @@ class TranslationMixin:
                     'temperature': temperature,
                     'max_tokens': max_tokens
                 },
-                'openrouter_api_key': state.settings.get('openrouter_api_key')
+                'openrouter_api_key': state.settings.get('openrouter_api_key'),
+                'refresh_cache': 'translation' in state.completion_cache_refresh
             }
+            state.completion_cache_refresh.discard('translation')
             self._start_worker(TranslationWorker, task_id, 'stage_translation', config, self._on_translation_finished, self._on_translation_error)
         except Exception as e:
             self._on_translation_error(task_id, f"Failed to start translation: {e}")
@@ -228,6 +232,7 @@ class TranslationMixin:
         logger.log(f"[{task_id}] User requested translation regeneration. Options provided: {bool(extra_options)}", level=LogLevel.INFO)
         if task_id in self.task_states:
             self.task_states[task_id].translation_review_dialog_shown = False
+            self.task_states[task_id].completion_cache_refresh.add('translation')
         self._start_translation(task_id, prompt, extra_options)
 
     def regenerate_rewrite(self, task_id, extra_options=None):
@@ -242,6 +247,7 @@ class TranslationMixin:
         if task_id in self.task_states:
             self.task_states[task_id].rewrite_review_dialog_shown = False
         state = self.task_states[task_id]
+        state.completion_cache_refresh.add('rewrite')
         self._start_rewrite(task_id, state.original_text, prompt, extra_options)
 
     def _on_text_ready(self, task_id):
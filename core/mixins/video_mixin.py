@@ -1,15 +1,16 @@
 import os
-import re
+import time
 from PySide6.QtCore import Slot
 from utils.logger import logger, LogLevel
 from core.workers import VideoGenerationWorker, MontageWorker
 from utils.translator import translator
 from core.notification_manager import notification_manager
+from core.montage_cost_model import montage_cost_model
 
 class VideoMixin:
     """
     Mixin for TaskProcessor to handle Video Generation and Montage.
-    Requires: self.task_states, self.settings, self.video_semaphore, self.montage_semaphore,
+    Requires: self.task_states, self.settings, self.video_semaphore, self.montage_semaphore, self.resource_governor,
               self.pending_montages, self.montage_tasks_ids, self.failed_montage_tasks_ids,
               self.tasks_awaiting_review, self.subtitle_barrier_passed,
               self._start_worker, self._set_stage_status, self.stage_metadata_updated,
@@ -321,27 +322,82 @@ class VideoMixin:
              logger.log(f"[{task_id}] Montage already {state.status.get('stage_montage')}. Skipping request.", level=LogLevel.DEBUG)
              return
 
-        allow_simultaneous = self.settings.get("simultaneous_montage_and_subs", False)
-        if not allow_simultaneous:
+        if self._montage_and_subs_exclusive():
             if self._are_subtitles_running():
                 logger.log(f"[{task_id}] Montage deferred. Subtitles are running and simultaneous execution is disabled.", level=LogLevel.INFO)
-                self.pending_montages.append(task_id)
+                self._enqueue_montage(task_id)
                 return 
 
-        self.pending_montages.append(task_id)
+        self._enqueue_montage(task_id)
         self._process_montage_queue()
 
+    def _enqueue_montage(self, task_id):
+        self.pending_montages.append(task_id)
+        self.montage_queued_at[task_id] = time.monotonic()
+        try:
+            predicted = montage_cost_model.predict(self._montage_cost_features(self.task_states[task_id]))
+        except Exception as e:
+            logger.log(f"[{task_id}] Could not estimate montage time: {e}", level=LogLevel.DEBUG)
+            return
+        self.montage_predictions[task_id] = predicted
+        # Поки монтаж у черзі, картка показує прогноз його тривалості
+        state = self.task_states[task_id]
+        self.stage_metadata_updated.emit(state.job_id, state.lang_id, 'stage_montage', f"~{self._format_eta(predicted)}")
+
+    def _montage_cost_features(self, state):
+        return montage_cost_model.features(
+            state.image_paths, state.audio_path, state.settings.get("montage", {}),
+            state.settings.get("clip_cache", {}).get("enabled", False)
+        )
+
+    def _format_eta(self, seconds):
+        seconds = int(seconds)
+        if seconds >= 3600:
+            return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+        return f"{seconds // 60}:{seconds % 60:02d}"
+
+    def _order_montage_queue(self):
+        """Shortest-job-first за прогнозом MontageCostModel; довге очікування поступово піднімає монтаж у черзі."""
+        if len(self.pending_montages) < 2 or self.settings.get("montage", {}).get("queue_order", "sjf") != "sjf":
+            return
+        now = time.monotonic()
+
+        def priority(task_id):
+            predicted = self.montage_predictions.get(task_id)
+            if predicted is None:
+                return float('inf')
+            return montage_cost_model.queue_priority(predicted, now - self.montage_queued_at.get(task_id, now))
+
+        ordered = sorted(self.pending_montages, key=priority)
+        if ordered != list(self.pending_montages):
+            self.pending_montages.clear()
+            self.pending_montages.extend(ordered)
+
     def _process_montage_queue(self):
         # --- Global Concurrency Check ---
         # Note: We check again here because this method is called when montages finish too.
-        allow_simultaneous = self.settings.get("simultaneous_montage_and_subs", False)
+        exclusive = self._montage_and_subs_exclusive()
+        self._order_montage_queue()
         
         while self.pending_montages:
-            if not allow_simultaneous and self._are_subtitles_running():
+            if exclusive and self._are_subtitles_running():
                  # Cannot start new montages yet
                  break
 
-            if self.montage_semaphore.tryAcquire():
+            if self.resource_governor.is_enabled():
+                # Адаптивний режим: монтаж стартує, лише якщо його оцінка вкладається в поточний бюджет
+                task_id = self.pending_montages[0]
+                key = ('montage', task_id)
+                cost = self.resource_governor.estimate_montage(self.task_states[task_id])
+                ok, reason = self.resource_governor.try_reserve(key, 'montage', cost)
+                if not ok:
+                    self._defer_by_governor(key, reason)
+                    break
+                self._governor_deferred_reasons.pop(key, None)
+                self.pending_montages.popleft()
+                logger.log(f"[{task_id}] Starting montage ({self.resource_governor.describe(cost)}).", level=LogLevel.INFO)
+                self._launch_montage_worker(task_id)
+            elif self.montage_semaphore.tryAcquire():
                 task_id = self.pending_montages.popleft()
                 self._launch_montage_worker(task_id)
             else:
@@ -414,6 +470,18 @@ class VideoMixin:
                 logger.log(f"[{task_id}] Using initial video: {os.path.basename(initial_video_path)}", level=LogLevel.INFO)
             # --- End Initial Video Config ---
 
+            # Прогноз тривалості для ETA в картці; ознаки - для калібрування моделі після рендеру
+            self.montage_queued_at.pop(task_id, None)
+            predicted = self.montage_predictions.pop(task_id, None)
+            try:
+                config['cost_features'] = self._montage_cost_features(state)
+                if predicted is None:
+                    predicted = montage_cost_model.predict(config['cost_features'])
+                config['expected_seconds'] = predicted
+                logger.log(f"[{task_id}] Estimated montage time: ~{self._format_eta(predicted)}", level=LogLevel.INFO)
+            except Exception as e:
+                logger.log(f"[{task_id}] Could not estimate montage time: {e}", level=LogLevel.DEBUG)
+
             worker = MontageWorker(task_id, config)
             worker.signals.finished.connect(self._on_montage_finished)
             worker.signals.error.connect(self._on_montage_error)
@@ -422,15 +490,19 @@ class VideoMixin:
         except Exception as e:
             self._on_montage_error(task_id, f"Failed to start montage worker: {e}")
 
+    def _release_montage_slot(self, task_id):
+        if not self.resource_governor.release(('montage', task_id)):
+            self.montage_semaphore.release()
+
     @Slot(str, object)
     def _on_montage_finished(self, task_id, video_path):
-        self.montage_semaphore.release()
+        self._release_montage_slot(task_id)
         self._process_montage_queue()
         self.task_states[task_id].final_video_path = video_path
         self._set_stage_status(task_id, 'stage_montage', 'success')
         
         # Check if we can unblock subtitles now
-        if not self.settings.get("simultaneous_montage_and_subs", False):
+        if self._montage_and_subs_exclusive() or self.resource_governor.is_enabled():
             self._process_whisper_queue()
         
         # Get file size and emit metadata
@@ -447,11 +519,11 @@ class VideoMixin:
 
     @Slot(str, str)
     def _on_montage_error(self, task_id, error):
-        self.montage_semaphore.release()
+        self._release_montage_slot(task_id)
         self._process_montage_queue()
         
         # Check if we can unblock subtitles now
-        if not self.settings.get("simultaneous_montage_and_subs", False):
+        if self._montage_and_subs_exclusive() or self.resource_governor.is_enabled():
             self._process_whisper_queue()
 
         self._set_stage_status(task_id, 'stage_montage', 'error', error)
@@ -465,8 +537,8 @@ class VideoMixin:
         # Parse percentage from message, e.g., "progress=45.20%"
         if "progress=" in message:
             try:
-                parts = dict(re.findall(r'(\w+)=([^ |]+)', message))
-                progress_str = parts.get('progress')
+                # Прогрес завжди останнє поле повідомлення ProgressEmitter
+                progress_str = message.rpartition("progress=")[2].split(' ', 1)[0]
                 if progress_str:
                     state = self.task_states[task_id]
                     self.stage_metadata_updated.emit(state.job_id, state.lang_id, 'stage_montage', progress_str)
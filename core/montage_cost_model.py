@@ -0,0 +1,181 @@
+import json
+import os
+import sys
+import time
+import atexit
+import platform
+import threading
+from utils.logger import logger, LogLevel
+from core.media_probe import media_probe
+from core.montage_engine import MontageEngine
+
+# --- Апріорна модель (до калібрування) ---
+# Секунди рендеру на секунду відео для 1080p, x264 preset 'fast', 8 ядер
+PRIOR_SEC_PER_SEC = {
+    'zoompan': 1.2, # при upscale_factor 3 - масштабується як квадрат апскейлу
+    'affine': 0.6,
+}
+PRIOR_UPSCALE = 3.0
+PRIOR_CPU_COUNT = 8
+PRESET_FACTOR = {
+    'ultrafast': 0.4, 'superfast': 0.5, 'veryfast': 0.6, 'faster': 0.8, 'fast': 1.0,
+    'medium': 1.3, 'slow': 2.0, 'slower': 3.0, 'veryslow': 5.0,
+}
+# Апаратні кодери знімають з CPU кодування, лишається граф фільтрів
+HW_CODEC_FACTOR = 0.6
+# Накладні витрати на кожен кліп (запуск FFmpeg, декодування джерела)
+PER_CLIP_SEC = 0.3
+# Тривалість, якщо аудіо ще не вдалося прочитати
+FALLBACK_DURATION_SEC = 600
+
+# --- Калібрування ---
+# Вага нового виміру в ковзному середньому поправки
+EWMA_ALPHA = 0.3
+# Поправку профілю використовуємо лише після кількох вимірів, до того - загальну поправку машини
+MIN_PROFILE_SAMPLES = 2
+# Монтажі, де більшу частину взято з кешу кліпів, не кажуть нічого про швидкість рендеру
+MAX_REUSED_SHARE = 0.2
+
+# --- Черга ---
+# Скільки секунд очікування "знімає" з оцінки при впорядкуванні (захист довгих монтажів від голодування)
+AGING_FACTOR = 1.0
+
+
+class MontageCostModel:
+    """
+    Оцінка часу монтажу за тривалістю аудіо, кількістю кліпів, рушієм руху, кодером і пресетом.
+    Апріорна формула множиться на поправку, виміряну на попередніх монтажах цієї машини
+    (окремо для профілю рушій/кодер/пресет і загальна); поправки зберігаються в cache/montage_cost.json.
+    Використовується для порядку черги монтажів (спочатку короткі) і для ETA в картці задачі.
+    """
+
+    def __init__(self, cache_name='montage_cost.json'):
+        self.lock = threading.Lock()
+        self.cpu_count = os.cpu_count() or 4
+        # Лише для вибору шляху рендеру - так само, як його вибере create_video
+        self.montage_engine = MontageEngine()
+
+        if platform.system() == "Darwin":
+            base_dir = os.path.expanduser("~/Library/Application Support/Soloveyko.AI-Video.Maker")
+        elif getattr(sys, 'frozen', False):
+            # Running as a bundled exe (Windows)
+            base_dir = os.path.dirname(sys.executable)
+        else:
+            # Running as a script
+            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+        self.cache_dir = os.path.join(base_dir, "cache")
+        self.cache_path = os.path.join(self.cache_dir, cache_name)
+        self._data = None
+        self._dirty = False
+        atexit.register(self.flush)
+
+    # --- Public API ---
+
+    def features(self, visual_files, audio_path, montage_settings, clip_cache_enabled=False):
+        """Ознаки монтажу, від яких залежить час рендеру."""
+        image_exts = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+        visual_files = visual_files or []
+        duration = media_probe.get_duration(audio_path) if audio_path and os.path.exists(audio_path) else 0
+        engine = montage_settings.get('motion_engine', 'zoompan')
+        if engine not in PRIOR_SEC_PER_SEC:
+            engine = 'zoompan'
+        render_path = self.montage_engine.render_route(montage_settings, len(visual_files), clip_cache_enabled, engine)['path']
+        return {
+            'duration': duration or FALLBACK_DURATION_SEC,
+            'clips': len(visual_files),
+            'images': sum(1 for p in visual_files if p.lower().endswith(image_exts)),
+            'engine': engine,
+            'upscale': float(montage_settings.get('upscale_factor', 3.0) or 1.0),
+            'codec': montage_settings.get('codec', 'libx264'),
+            'preset': montage_settings.get('preset', 'fast'),
+            'path': render_path,
+        }
+
+    def predict(self, features):
+        """Очікуваний час монтажу в секундах."""
+        prior = self._prior(features)
+        with self.lock:
+            self._load_nolock()
+            entry = self._data['profiles'].get(self._profile(features))
+            if entry and entry['samples'] >= MIN_PROFILE_SAMPLES:
+                correction = entry['correction']
+            else:
+                correction = self._data['machine']['correction']
+        return prior * correction
+
+    def record(self, features, wall_sec, reused_share=0.0):
+        """Калібрує модель виміряним часом завершеного монтажу."""
+        if wall_sec <= 0 or reused_share > MAX_REUSED_SHARE:
+            return
+        prior = self._prior(features)
+        if prior <= 0:
+            return
+        sample = wall_sec / prior
+        profile = self._profile(features)
+        with self.lock:
+            self._load_nolock()
+            for entry in (self._data['machine'], self._data['profiles'].setdefault(profile, {'correction': 1.0, 'samples': 0})):
+                if entry['samples'] == 0:
+                    entry['correction'] = sample
+                else:
+                    entry['correction'] += EWMA_ALPHA * (sample - entry['correction'])
+                entry['samples'] += 1
+                entry['updated'] = time.time()
+            self._dirty = True
+        self.flush()
+        logger.log(
+            f"[CostModel] {profile}: {wall_sec:.0f}s measured vs {prior:.0f}s prior, correction {sample:.2f}",
+            level=LogLevel.DEBUG
+        )
+
+    def queue_priority(self, predicted_sec, waited_sec):
+        """Менше - раніше. Shortest-job-first зі старінням, щоб довгі монтажі не чекали вічно."""
+        return predicted_sec - AGING_FACTOR * waited_sec
+
+    def flush(self):
+        with self.lock:
+            if not self._dirty or self._data is None:
+                return
+            data = json.loads(json.dumps(self._data))
+            self._dirty = False
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.log(f"[CostModel] Could not save calibration: {e}", level=LogLevel.WARNING)
+
+    # --- Internals ---
+
+    def _prior(self, features):
+        speed = PRIOR_SEC_PER_SEC[features['engine']]
+        if features['engine'] == 'zoompan':
+            speed *= (features['upscale'] / PRIOR_UPSCALE) ** 2
+        if features['codec'] in ('h264_nvenc', 'h264_amf'):
+            speed *= HW_CODEC_FACTOR
+        else:
+            speed *= PRESET_FACTOR.get(features['preset'], 1.0)
+        speed *= PRIOR_CPU_COUNT / self.cpu_count
+        return features['duration'] * speed + features['clips'] * PER_CLIP_SEC
+
+    def _profile(self, features):
+        encoder = features['codec'] if features['codec'] in ('h264_nvenc', 'h264_amf') else f"{features['codec']}/{features['preset']}"
+        return f"{features['engine']}|{features['path']}|{encoder}"
+
+    def _load_nolock(self):
+        if self._data is not None:
+            return
+        self._data = {'machine': {'correction': 1.0, 'samples': 0}, 'profiles': {}}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict) and 'machine' in data and 'profiles' in data:
+                    self._data = data
+            except (json.JSONDecodeError, OSError):
+                pass
+
+montage_cost_model = MontageCostModel()
@@ -3,12 +3,46 @@ import os
 import math
 import sys
 import tempfile
-import re
 import platform
 import random
+import shutil
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.logger import logger, LogLevel
+from core.media_probe import media_probe
+from core import motion_renderer
+from core.clip_cache import clip_cache
+from utils.file_cache import file_digests
+from core.asset_cache import asset_cache
+from core.ffmpeg_progress import ProgressEmitter, StderrRing, read_progress, PROGRESS_ARGS
+from core.filter_graph import FilterGraph, Filter
+
+VALID_TRANSITIONS = [
+    "fade", "wipeleft", "wiperight", "wipeup", "wipedown", 
+    "slideleft", "slideright", "slideup", "slidedown", "circlecrop", 
+    "rectcrop", "distance", "fadeblack", "fadewhite", "radial", 
+    "smoothleft", "smoothright", "smoothup", "smoothdown", 
+    "circleopen", "circleclose", "vertopen", "vertclose", 
+    "horzopen", "horzclose", "dissolve", "pixelize", "diagtl", 
+    "diagtr", "diagbl", "diagbr"
+]
 
 class MontageEngine:
+    VIDEO_EXTS = ['.mp4', '.mkv', '.mov', '.avi', '.webm']
+    # Коротші проекти рендеряться одним проходом - накладні витрати на сегменти не окупаються
+    MIN_SEGMENTED_DURATION = 30
+    # Тривалість фрагмента у фінальному кодеку при рендері шматками (одиниця інкрементального перерендеру)
+    CHUNK_SECONDS = 10
+    # Статична пауза між інтро-відео та початком озвучки
+    INTRO_PAUSE_SECONDS = 1.5
+    # Скільки кліпів відкрито одночасно в одному FFmpeg (montage.max_open_inputs, 0 - без обмеження).
+    # Рендер вікнами на 3-13% повільніший за один прохід, тож вмикається лише для шаблонів із сотнями картинок
+    DEFAULT_MAX_OPEN_INPUTS = 100
+    # Запас кадрів zoompan понад тривалість кліпу: xfade читає перший вхід трохи далі за кінець переходу
+    CLIP_TAIL_FRAMES = 5
+
     def create_video(self, visual_files, audio_path, output_path, ass_path, settings, task_id=None, progress_callback=None, start_time=None, background_music_path=None, background_music_volume=None, **kwargs):
         prefix = f"[{task_id}] " if task_id else ""
         
@@ -53,15 +87,6 @@ class MontageEngine:
         trans_dur = settings.get('transition_duration', 0.5) if enable_trans else 0
         transition_effect = settings.get('transition_effect', 'fade')
 
-        valid_transitions = [
-            "fade", "wipeleft", "wiperight", "wipeup", "wipedown", 
-            "slideleft", "slideright", "slideup", "slidedown", "circlecrop", 
-            "rectcrop", "distance", "fadeblack", "fadewhite", "radial", 
-            "smoothleft", "smoothright", "smoothup", "smoothdown", 
-            "circleopen", "circleclose", "vertopen", "vertclose", 
-            "horzopen", "horzclose", "dissolve", "pixelize", "diagtl", 
-            "diagtr", "diagbl", "diagbr"
-        ]
         codec = settings.get('codec', 'libx264')
         preset = settings.get('preset', 'medium')
         bitrate = settings.get('bitrate_mbps', 15)
@@ -92,9 +117,10 @@ class MontageEngine:
         if not is_portrait and visual_files:
             portrait_count = 0
             check_count = min(20, len(visual_files)) # Check up to 20 files
+            probed = media_probe.probe_many(visual_files[:check_count])
             for i in range(check_count):
-                w, h = self._get_dimensions(visual_files[i])
-                if h > w:
+                info = probed[visual_files[i]]
+                if info['height'] > info['width']:
                     portrait_count += 1
             
             # If at least 30% of checked files are portrait, we treat it as a portrait project
@@ -111,6 +137,12 @@ class MontageEngine:
             
         up_w, up_h = int(base_w * up_factor), int(base_h * up_factor)
 
+        # zoompan - класичний рух через апскейл; affine - субпіксельний рух у розмірі кадру (OpenCV)
+        motion_engine = settings.get('motion_engine', 'zoompan')
+        if motion_engine == 'affine' and not motion_renderer.is_available():
+            logger.log(f"{prefix}[Montage] OpenCV is not available, falling back to zoompan motion.", level=LogLevel.WARNING)
+            motion_engine = 'zoompan'
+
         # Effects & Watermark Settings
         overlay_effect_path = settings.get('overlay_effect_path')
         watermark_path = settings.get('watermark_path')
@@ -123,11 +155,14 @@ class MontageEngine:
         total_video_time = 0.0
         image_indices = []
         final_clip_durations = [0] * num_files
+
+        # Всі відео пробуємо одним паралельним пакетом (з кешем)
+        video_info = media_probe.probe_many([f for f in visual_files if os.path.splitext(f)[1].lower() in VIDEO_EXTS])
         
         for i, f in enumerate(visual_files):
             ext = os.path.splitext(f)[1].lower()
             if ext in VIDEO_EXTS:
-                d = self._get_duration(f)
+                d = video_info[f]['duration']
                 if d == 0: d = 5.0 # fallback
                 final_clip_durations[i] = d
                 total_video_time += d
@@ -196,145 +231,1150 @@ class MontageEngine:
         logger.log(log_msg, level=LogLevel.INFO)
         
         # 3. ГЕНЕРАЦІЯ FFmpeg КОМАНДИ
-        inputs = []
-        filter_parts = []
         fps = 30
-        
-        def fmt(val): return f"{val:.6f}".replace(",", ".")
-        
-        for i, f in enumerate(visual_files):
-            ext = os.path.splitext(f)[1].lower()
-            is_video = ext in VIDEO_EXTS
-            this_dur = final_clip_durations[i]
-            this_dur_str = fmt(this_dur)
-            
-            abs_path = os.path.abspath(f).replace("\\", "/")
-            if not os.path.exists(abs_path):
-                 logger.log(f"{prefix}[Error] Input file not found: {abs_path}", level=LogLevel.ERROR)
-                 raise Exception(f"Input file missing: {abs_path}")
-
-            inputs.append("-thread_queue_size"); inputs.append("4096")
-            inputs.append("-i"); inputs.append(abs_path)
-            v_in = f"[{i}:v]"; v_out = f"v{i}_final"
-            
-            if is_video:
-                # Нативно прибираємо водяний знак для всіх відео в монтажі (Zoom 8% + Crop top-left)
-                # Також примусово масштабуємо до розміру проекту, щоб виправити можливе розтягування (Googler/Veo).
-                vf = (
-                    f"{v_in}scale={base_w}:{base_h},"
-                    f"scale=1.08*iw:-1,crop={base_w}:{base_h}:0:0,"
-                    f"format=yuv420p,setsar=1,fps={fps},"
-                    f"setpts=PTS-STARTPTS[{v_out}]"
-                )
-                filter_parts.append(vf)
-            else:
-                v_up = f"v{i}_up"
-                scale_cmd = (
-                    f"{v_in}scale={up_w}:{up_h}:force_original_aspect_ratio=increase,"
-                    f"crop={up_w}:{up_h},"
-                    f"format=yuv420p,setsar=1[{v_up}]"
+
+        # Переходи обираємо один раз, щоб однопрохідний і сегментний рендер давали однаковий результат
+        transitions = []
+        if enable_trans and num_files > 1:
+            transitions = [self._pick_transition(transition_effect) for _ in range(num_files - 1)]
+
+        if overlay_effect_path and not os.path.exists(overlay_effect_path):
+            overlay_effect_path = None
+        if watermark_path and not os.path.exists(watermark_path):
+            watermark_path = None
+        if not (ass_path and os.path.exists(ass_path)):
+            ass_path = None
+
+        if overlay_effect_path:
+            logger.log(f"{prefix}[FFmpeg] Adding overlay effect: {os.path.basename(overlay_effect_path)}", level=LogLevel.INFO)
+        if watermark_path:
+            logger.log(f"{prefix}[FFmpeg] Adding watermark: {os.path.basename(watermark_path)}", level=LogLevel.INFO)
+            wm_width = int(base_w * (float(watermark_size) / 100.0))
+            logger.log(f"{prefix}[FFmpeg] Watermark size: {watermark_size}% = {wm_width}px", level=LogLevel.INFO)
+
+        initial_video_path = kwargs.get('initial_video_path')
+        if not (initial_video_path and os.path.exists(initial_video_path)):
+            initial_video_path = None
+
+        # Оверлей, вотермарка та інтро однакові для багатьох монтажів - беремо нормалізовані копії з cache/assets
+        asset_keys = []
+        # Розміри нормалізованих копій відомі напевно - граф фільтрів не масштабує їх повторно
+        asset_sizes = {}
+        if asset_cache.is_enabled():
+            if overlay_effect_path:
+                overlay_effect_path, key = asset_cache.overlay(overlay_effect_path, base_w, base_h, prefix)
+                asset_keys.append(key)
+                if key:
+                    asset_sizes[overlay_effect_path] = (base_w, base_h)
+            if watermark_path:
+                watermark_path, key = asset_cache.watermark(watermark_path, wm_width, prefix)
+                asset_keys.append(key)
+            if initial_video_path:
+                initial_video_path, key = asset_cache.intro(initial_video_path, base_w, base_h, fps, prefix)
+                asset_keys.append(key)
+                if key:
+                    asset_sizes[initial_video_path] = (base_w, base_h)
+
+        plan = {
+            'prefix': prefix,
+            'log_progress': log_progress,
+            # Один на монтаж: паралельні FFmpeg звітують через нього з обмеженою частотою
+            'progress': ProgressEmitter(log_progress, expected=kwargs.get('expected_seconds')),
+            'visual_files': visual_files,
+            'clip_durations': final_clip_durations,
+            'fps': fps,
+            'base_w': base_w, 'base_h': base_h,
+            'up_w': up_w, 'up_h': up_h, 'up_factor': up_factor,
+            'enable_zoom': enable_zoom, 'z_spd': z_spd, 'z_int': z_int,
+            'enable_sway': enable_sway, 's_spd': s_spd,
+            'motion_engine': motion_engine,
+            'clip_cache': clip_cache.is_enabled(),
+            'enable_trans': enable_trans, 'trans_dur': trans_dur,
+            'transition_effect': transition_effect, 'transitions': transitions,
+            'ass_path': ass_path,
+            'overlay_effect_path': overlay_effect_path,
+            'watermark_path': watermark_path,
+            'watermark_size': watermark_size,
+            'watermark_position': watermark_position,
+            'codec': codec, 'preset': preset, 'bitrate': bitrate,
+            'audio_path': audio_path, 'audio_dur': audio_dur,
+            'background_music_path': background_music_path,
+            'background_music_volume': background_music_volume,
+            'initial_video_path': initial_video_path,
+            'output_path': output_path,
+            'asset_sizes': asset_sizes,
+        }
+
+        # Яким шляхом пішов рендер і яку частку взято з кешу - для калібрування MontageCostModel
+        self.render_info = {'path': 'pieces', 'reused_share': 0.0}
+        route = self.render_route(settings, num_files, plan['clip_cache'], motion_engine)
+        windowed = route['windowed']
+        try:
+            if route['path'] == 'pieces':
+                if self._create_video_pieces(plan):
+                    return
+            self.render_info['path'] = 'segmented'
+            if route['segmented']:
+                if self._create_video_segmented(plan, settings, route['max_inputs'], windowed):
+                    return
+            if windowed:
+                logger.log(
+                    f"{prefix}[Montage] Bounded-memory render is not possible for this timeline, "
+                    f"rendering all {num_files} clips in one pass.", level=LogLevel.WARNING
                 )
-                filter_parts.append(scale_cmd)
+            self.render_info['path'] = 'single'
+            self._create_video_single(plan)
+        finally:
+            if asset_keys:
+                asset_cache.release(asset_keys)
+                asset_cache.prune()
+        # Success log is handled by MontageWorker
 
-                # --- МАТЕМАТИКА ЕФЕКТІВ ---
-                base_zoom = 1.1 if enable_sway else 1.0
-                
-                if enable_zoom:
-                    z_amp = z_int 
-                    cycle = f"((on/{fps})/{this_dur_str}) * {fmt(z_spd)}"
-                    z_expr = f"{fmt(base_zoom)}+{fmt(z_amp)}*(1-cos(6.283*{cycle}))/2"
-                else:
-                    z_expr = fmt(base_zoom)
-
-                if enable_sway:
-                    base_amp_x = 50 * up_factor
-                    base_amp_y = 25 * up_factor
-                    
-                    freq_x1 = fmt(0.02 * s_spd)
-                    freq_x2 = fmt(0.05 * s_spd)
-                    freq_y1 = fmt(0.025 * s_spd)
-                    freq_y2 = fmt(0.06 * s_spd)
-
-                    val_x = f"sin(on*{freq_x1})*{base_amp_x} + cos(on*{freq_x2})*{base_amp_x/2}"
-                    val_y = f"cos(on*{freq_y1})*{base_amp_y} + sin(on*{freq_y2})*{base_amp_y/2}"
-                    x_expr = f"iw/2-(iw/zoom/2)+{val_x}"
-                    y_expr = f"ih/2-(ih/zoom/2)+{val_y}"
-                else:
-                    x_expr = "iw/2-(iw/zoom/2)"
-                    y_expr = "ih/2-(ih/zoom/2)"
-
-                d_frames = int(this_dur * fps) + 5
-                zoom_cmd = (
-                    f"[{v_up}]zoompan=z='{z_expr}':x='{x_expr}':y='{y_expr}':"
-                    f"d={d_frames}:s={base_w}x{base_h}:fps={fps},"
-                    f"setpts=PTS-STARTPTS[{v_out}]"
+    def _create_video_single(self, plan):
+        """Класичний рендер: все відео одним процесом FFmpeg, аудіо зводиться паралельно з ним."""
+        prefix = plan['prefix']
+        log_progress = plan['log_progress']
+
+        inputs = []
+        filter_parts = FilterGraph()
+        for i, f in enumerate(plan['visual_files']):
+            inputs.extend(self._clip_input(f, prefix))
+            self._clip_filter(plan, i, i, filter_parts)
+
+        labels = [f"[v{i}_final]" for i in range(len(plan['visual_files']))]
+        final_v = self._join_clips(filter_parts, labels, plan['clip_durations'], plan['transitions'], plan['trans_dur'])
+        final_v = self._apply_post_filters(plan, inputs, filter_parts, final_v)
+        output_v_stream, intro_dur, pause_dur = self._append_intro_video(plan, inputs, filter_parts, final_v)
+
+        total_expected_duration = self._expected_duration(plan, intro_dur, pause_dur)
+
+        def on_stats(stats):
+            denom = total_expected_duration if total_expected_duration > 0.1 else 1.0
+            progress = min(max((stats.out_time / denom) * 99.0, 0.0), 99.0)
+            plan['progress'].emit(stats.out_time, progress, stats)
+
+        work_dir = self._make_work_dir(plan['output_path'], "montage_single_")
+        failed = threading.Event()
+        processes = []
+
+        def render_video():
+            filter_script_path = self._write_filter_script(self._serialize_graph(plan, filter_parts), directory=work_dir)
+            video_path = os.path.join(work_dir, "video.mp4").replace("\\", "/")
+
+            cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+            cmd.extend(inputs)
+            cmd.extend(["-filter_complex_script", filter_script_path.replace("\\", "/"), "-map", output_v_stream, "-an", "-c:v", plan['codec']])
+            cmd.extend(self._encoder_args(plan))
+            cmd.extend(["-t", self._fmt(total_expected_duration), video_path])
+
+            self._run_ffmpeg(cmd, prefix, on_stats=on_stats, log_progress=log_progress, processes=processes, cancel_event=failed)
+            return ["-i", video_path]
+
+        try:
+            self._render_with_audio_mix(plan, work_dir, render_video, processes, failed, 99.0)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _create_video_segmented(self, plan, settings, max_inputs=0, windowed=False):
+        """
+        Паралельний рендер: таймлайн ділиться на сегменти по межах кліпів,
+        кожен сегмент рендериться окремим FFmpeg без аудіо, після чого сегменти
+        склеюються concat-демуксером без перекодування; аудіо зводиться паралельно і додається склейкою без перекодування.
+        max_inputs - найбільше кліпів в одному сегменті (разом із наступним кліпом для переходу).
+        windowed - режим обмеженої пам'яті без segment_render: вікна рендеряться по черзі,
+        тож пам'ять не залежить від кількості кліпів.
+        Повертає False, якщо монтаж не підходить для сегментації (тоді використовується звичайний рендер).
+        """
+        prefix = plan['prefix']
+        log_progress = plan['log_progress']
+        fps = plan['fps']
+
+        # Працюємо в цілих кадрах однопрохідного рендеру, щоб межі сегментів збігались з ним кадр-у-кадр
+        clip_frames, trans_frames = self._timeline_frames(plan)
+        if trans_frames and any(f <= trans_frames for f in clip_frames):
+            logger.log(f"{prefix}[Montage] Segment render skipped: clips are shorter than transitions. Using single-pass render.", level=LogLevel.INFO)
+            return False
+
+        workers = 1 if windowed and not settings.get('segment_render', False) else self._segment_worker_count(settings)
+        segments, start_frames, total_frames = self._partition_windows(clip_frames, trans_frames, workers, max_inputs)
+        if len(segments) < 2 or (total_frames < fps * self.MIN_SEGMENTED_DURATION and not windowed):
+            logger.log(f"{prefix}[Montage] Segment render skipped: project too short to split. Using single-pass render.", level=LogLevel.INFO)
+            return False
+        widest = max(self._segment_inputs(segments, k, trans_frames) for k in range(len(segments)))
+        if windowed and widest > max_inputs:
+            return False
+
+        workers = min(workers, len(segments))
+        threads_per_segment = max(1, (os.cpu_count() or 4) // workers)
+        logger.log(
+            f"{prefix}[Montage] Segment render: {len(segments)} segments of up to {widest} clips, {workers} parallel workers",
+            level=LogLevel.INFO
+        )
+
+        output_path = plan['output_path']
+        seg_dir = self._make_work_dir(output_path, "montage_segments_")
+
+        # Частка прогресу, яку займає рендер сегментів (решта - відео з інтро та склейка з аудіо)
+        video_weight = 80.0 if plan['initial_video_path'] else 99.0
+        total_sec = total_frames / fps
+        seg_times = [0.0] * len(segments)
+        progress_lock = threading.Lock()
+
+        def make_segment_stats(k, seg_len):
+            def on_stats(stats):
+                with progress_lock:
+                    seg_times[k] = min(stats.out_time, seg_len)
+                    done = sum(seg_times)
+                progress = min(max(done / total_sec * video_weight, 0.0), video_weight)
+                plan['progress'].emit(done, progress, stats)
+            return on_stats
+
+        failed = threading.Event()
+        processes = []
+
+        def render_segment(k):
+            if failed.is_set():
+                return None
+            a, b = segments[k]
+            last = k == len(segments) - 1
+            local_start = start_frames[a]
+            global_start = start_frames[a] + (trans_frames if k > 0 else 0)
+            global_end = total_frames if last else start_frames[b + 1] + trans_frames
+
+            clips = list(range(a, b + 1))
+            frames = [clip_frames[j] for j in clips]
+            # Наступний кліп потрібен лише на час переходу в нього
+            if not last and trans_frames:
+                clips.append(b + 1)
+                frames.append(trans_frames)
+
+            inputs = []
+            parts = FilterGraph()
+            for local_idx, (j, nf) in enumerate(zip(clips, frames)):
+                inputs.extend(self._clip_input(plan['visual_files'][j], prefix))
+                # Для xfade - той самий запас кадрів, що й в однопрохідному рендері (зайве відрізає trim нижче);
+                # concat бере кліп цілком, тож там запасу немає
+                self._clip_filter(plan, j, local_idx, parts, frames=nf + (self.CLIP_TAIL_FRAMES if trans_frames else 0))
+
+            labels = [f"[v{j}_final]" for j in clips]
+            seg_durs = [nf / fps for nf in frames]
+            seg_trans = plan['transitions'][clips[0]:clips[-1]] if plan['transitions'] else []
+            seg_v = self._join_clips(parts, labels, seg_durs, seg_trans, trans_frames / fps)
+            parts.append(
+                f"{seg_v}trim=start_frame={global_start - local_start}:end_frame={global_end - local_start},"
+                f"setpts=PTS-STARTPTS[v_seg]"
+            )
+            seg_v = self._apply_post_filters(plan, inputs, parts, "[v_seg]", start_time=global_start / fps)
+
+            script_path = self._write_filter_script(self._serialize_graph(plan, parts), directory=seg_dir)
+            seg_path = os.path.join(seg_dir, f"segment_{k:03d}.mp4").replace("\\", "/")
+            cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+            cmd.extend(inputs)
+            cmd.extend(["-filter_complex_script", script_path.replace("\\", "/"), "-map", seg_v, "-an", "-c:v", plan['codec']])
+            cmd.extend(self._encoder_args(plan))
+            cmd.extend(["-threads", str(threads_per_segment), seg_path])
+
+            seg_len = (global_end - global_start) / fps
+            self._run_ffmpeg(cmd, prefix, on_stats=make_segment_stats(k, seg_len), log_progress=log_progress,
+                             processes=processes, cancel_event=failed)
+            return seg_path
+
+        def render_video():
+            seg_paths = [None] * len(segments)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(render_segment, k): k for k in range(len(segments))}
+                for fut in as_completed(futures):
+                    try:
+                        seg_paths[futures[fut]] = fut.result()
+                    except Exception:
+                        failed.set()
+                        for proc in list(processes):
+                            if proc.poll() is None:
+                                proc.terminate()
+                        raise
+
+            # Concat-демуксер: склеюємо сегменти без перекодування
+            list_path = os.path.join(seg_dir, "segments.txt")
+            self._write_concat_list(list_path, seg_paths)
+            video_inputs = ["-f", "concat", "-safe", "0", "-i", list_path.replace("\\", "/")]
+            if plan['initial_video_path']:
+                # Інтро потребує переходу, тому відео перекодовується (але вже без важких фільтрів)
+                master_path = self._render_video_master(plan, [], video_inputs, seg_dir, video_weight, [])
+                video_inputs = ["-i", master_path.replace("\\", "/")]
+            return video_inputs
+
+        try:
+            self._render_with_audio_mix(plan, seg_dir, render_video, processes, failed, 99.0)
+        finally:
+            shutil.rmtree(seg_dir, ignore_errors=True)
+        return True
+
+    def _create_video_pieces(self, plan):
+        """
+        Монтаж із готових шматків (рушій руху 'affine' та/або кеш кліпів).
+        Кожен кліп рендериться шматками голова/тіло/хвіст (картинки - AffineMotionRenderer або zoompan, відео - FFmpeg),
+        кожен перехід xfade - окремим коротким шматком із хвоста й голови сусідніх кліпів.
+        Шматки склеюються concat-демуксером в один відеовхід фінального проходу (субтитри, ефекти, аудіо),
+        тож пам'ять FFmpeg не росте з кількістю картинок, а рендер шматків іде паралельно.
+        З увімкненим кешем шматки беруться з ClipCache за вмістом картинки й параметрами руху.
+        Повертає False, якщо кліпи коротші за переходи (тоді використовується звичайний рендер).
+        """
+        prefix = plan['prefix']
+        log_progress = plan['log_progress']
+        fps = plan['fps']
+        visual_files = plan['visual_files']
+        num_clips = len(visual_files)
+        use_cache = plan['clip_cache']
+
+        # Межі кліпів у кадрах рахуємо від накопиченого часу, щоб сума кадрів не розходилась з аудіо
+        trans_sec = plan['trans_dur'] if plan['transitions'] else 0
+        bounds = []
+        t = 0.0
+        for d in plan['clip_durations']:
+            bounds.append((int(round(t * fps)), int(round((t + d) * fps))))
+            t += d - trans_sec
+        overlaps = [bounds[k][1] - bounds[k + 1][0] if trans_sec else 0 for k in range(num_clips - 1)]
+
+        too_short = any(b <= a for a, b in bounds) or (trans_sec and min(overlaps) <= 0)
+        for k, (a, b) in enumerate(bounds):
+            head = overlaps[k - 1] if k > 0 else 0
+            tail = overlaps[k] if k < num_clips - 1 else 0
+            too_short = too_short or head + tail > b - a
+        if too_short:
+            logger.log(f"{prefix}[Montage] Piece render skipped: clips are too short for transitions.", level=LogLevel.WARNING)
+            return False
+
+        work_dir = self._make_work_dir(plan['output_path'], "montage_pieces_")
+        # Для кожного кліпу: {'head'/'body'/'tail': шматок} у кадрах кліпу; head/tail потрібні лише переходам
+        pieces = []
+        transitions = {}
+        for k, (a, b) in enumerate(bounds):
+            clip_frames = b - a
+            head = overlaps[k - 1] if k > 0 else 0
+            tail = overlaps[k] if k < num_clips - 1 else 0
+            clip_key = self._clip_cache_key(plan, k) if use_cache else None
+            clip_pieces = {}
+            for kind, start, end in (('head', 0, head), ('body', head, clip_frames - tail), ('tail', clip_frames - tail, clip_frames)):
+                if end > start:
+                    key = clip_cache.make_key({'clip': clip_key, 'start': start, 'end': end}) if use_cache else None
+                    clip_pieces[kind] = self._new_piece(key, start, end, os.path.join(work_dir, f"clip_{k:04d}_{kind}.mp4"))
+            pieces.append(clip_pieces)
+        for k in range(num_clips - 1):
+            if trans_sec:
+                key = None
+                if use_cache:
+                    key = clip_cache.make_key({
+                        'tail': pieces[k]['tail']['key'], 'head': pieces[k + 1]['head']['key'],
+                        'transition': plan['transitions'][k], 'frames': overlaps[k],
+                    })
+                transitions[k] = self._new_piece(key, 0, overlaps[k], os.path.join(work_dir, f"trans_{k:04d}.mp4"))
+
+        # Таймлайн: тіло кліпу, перехід у наступний, тіло наступного... (шматок, індекси кліпів-джерел)
+        timeline = []
+        for k in range(num_clips):
+            if 'body' in pieces[k]:
+                timeline.append((pieces[k]['body'], [k]))
+            if k in transitions:
+                timeline.append((transitions[k], [k, k + 1]))
+        chunks = self._plan_chunks(plan, timeline, work_dir)
+
+        # Рендеримо лише шматки, потрібні фрагментам, яких немає в кеші (і хвости/голови для їхніх переходів)
+        for chunk in chunks:
+            if not chunk['cached']:
+                for piece, _ in chunk['items']:
+                    piece['needed'] = True
+        for k, piece in transitions.items():
+            if piece['needed'] and not piece['cached']:
+                pieces[k]['tail']['needed'] = True
+                pieces[k + 1]['head']['needed'] = True
+
+        all_pieces = [p for clip_pieces in pieces for p in clip_pieces.values()] + list(transitions.values())
+        cache_keys = [p['key'] for p in all_pieces + chunks if p['key']]
+        clip_cache.pin(cache_keys)
+
+        renderer = None
+        if plan['motion_engine'] == 'affine':
+            renderer = motion_renderer.AffineMotionRenderer(plan['base_w'], plan['base_h'], fps, plan)
+        workers = min(self._motion_worker_count(), num_clips)
+        threads_per_job = max(1, (os.cpu_count() or 4) // workers)
+        render_count = sum(1 for p in all_pieces if p['needed'] and not p['cached'])
+        reused_chunks = sum(1 for c in chunks if c['cached'])
+        logger.log(
+            f"{prefix}[Montage] Piece render ({plan['motion_engine']}): {num_clips} clips, {len(transitions)} transitions, "
+            f"{workers} parallel workers, {render_count}/{len(all_pieces)} pieces to render"
+            + (f", {reused_chunks}/{len(chunks)} segments reused" if use_cache else ""),
+            level=LogLevel.INFO
+        )
+        if use_cache:
+            self._log_manifest_changes(plan, chunks)
+
+        # Частки прогресу: шматки, фрагменти у фінальному кодеку, решта - зведення з аудіо
+        total_frames = sum(p['end'] - p['start'] for p in all_pieces if p['needed'] and not p['cached'])
+        chunk_frames = sum(c['end_frame'] - c['start_frame'] for c in chunks if not c['cached'])
+        self.render_info['reused_share'] = 1.0 - chunk_frames / max(chunks[-1]['end_frame'], 1)
+        pieces_weight = 45.0 if total_frames else 0.0
+        chunks_weight = 95.0 if chunk_frames else pieces_weight
+        chunk_times = {}
+        done_frames = [0]
+        progress_lock = threading.Lock()
+        started = time.monotonic()
+
+        def on_frames(count):
+            with progress_lock:
+                done_frames[0] += count
+                done = done_frames[0]
+            elapsed = max(time.monotonic() - started, 0.001)
+            progress = min(done / max(total_frames, 1) * pieces_weight, pieces_weight)
+            plan['progress'].emit(done / fps, progress, fps=f"{done / elapsed:.0f}")
+
+        failed = threading.Event()
+        processes = []
+
+        def store(piece):
+            if piece['key']:
+                piece['path'] = clip_cache.put(piece['key'], piece['path'])
+
+        def render_clip(k):
+            missing = [p for p in pieces[k].values() if p['needed'] and not p['cached']]
+            if failed.is_set() or not missing:
+                return
+            path = visual_files[k]
+            if os.path.splitext(path)[1].lower() in self.VIDEO_EXTS:
+                for piece in missing:
+                    self._render_video_piece(plan, path, piece['start'], piece['end'], piece['path'], threads_per_job, processes, failed)
+                    on_frames(piece['end'] - piece['start'])
+            elif renderer:
+                renderer.render_pieces(
+                    path, plan['clip_durations'][k], [(p['start'], p['end'], p['path']) for p in missing],
+                    threads=threads_per_job, processes=processes, cancel_event=failed, on_frames=on_frames
                 )
-                filter_parts.append(zoom_cmd)
+            else:
+                self._render_zoompan_pieces(plan, k, bounds[k][1] - bounds[k][0], missing, work_dir, threads_per_job, processes, failed)
+                on_frames(sum(p['end'] - p['start'] for p in missing))
+            for piece in missing:
+                store(piece)
 
-        # 4. TRANSITIONS
-        if enable_trans and num_files > 1:
-            curr = "[v0_final]"
-            current_offset = final_clip_durations[0] - trans_dur
-            trans_dur_str_filt = fmt(trans_dur)
-            for i in range(1, num_files):
-                next_stream = f"[v{i}_final]"; target = f"[v_m{i}]"
-                off_str = fmt(current_offset)
-                
-                current_trans = transition_effect
-                if current_trans == "random":
-                     current_trans = random.choice(valid_transitions)
-                elif current_trans not in valid_transitions:
-                     # Warn only once or simple fallback
-                     current_trans = "fade"
-                
-                # logger.log(f"{prefix}[FFmpeg] Transition {i}->{i+1}: {current_trans}", level=LogLevel.DEBUG)
+        def render_transition(k):
+            piece = transitions[k]
+            if failed.is_set() or piece['cached'] or not piece['needed']:
+                return
+            cmd = [
+                "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+                "-i", pieces[k]['tail']['path'].replace("\\", "/"), "-i", pieces[k + 1]['head']['path'].replace("\\", "/"),
+                "-filter_complex",
+                f"[0:v][1:v]xfade=transition={plan['transitions'][k]}:duration={self._fmt(overlaps[k] / fps)}:offset=0[v]",
+                "-map", "[v]", "-frames:v", str(overlaps[k]),
+            ]
+            cmd.extend(motion_renderer.CLIP_CODEC_ARGS)
+            cmd.extend(["-threads", str(threads_per_job), piece['path'].replace("\\", "/")])
+            self._run_ffmpeg(cmd, prefix, processes=processes, cancel_event=failed)
+            on_frames(overlaps[k])
+            store(piece)
+
+        def render_chunk(c):
+            chunk = chunks[c]
+            if failed.is_set():
+                return
+            list_path = os.path.join(work_dir, f"chunk_{c:04d}.txt")
+            self._write_concat_list(list_path, [piece['path'] for piece, _ in chunk['items']])
+
+            # Фінальний кодек і пост-фільтри (субтитри/оверлей/вотермарка) зі зсувом на позицію фрагмента
+            inputs = ["-f", "concat", "-safe", "0", "-i", list_path.replace("\\", "/")]
+            parts = FilterGraph()
+            chunk_v = self._apply_post_filters(plan, inputs, parts, "[0:v]", start_time=chunk['start_frame'] / fps)
+            frames = chunk['end_frame'] - chunk['start_frame']
+
+            cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+            cmd.extend(inputs)
+            if parts:
+                script_path = self._write_filter_script(self._serialize_graph(plan, parts), directory=work_dir)
+                cmd.extend(["-filter_complex_script", script_path.replace("\\", "/")])
+            cmd.extend(["-map", chunk_v if parts else "0:v", "-an", "-frames:v", str(frames), "-c:v", plan['codec']])
+            cmd.extend(self._encoder_args(plan))
+            cmd.extend(["-threads", str(threads_per_job), chunk['path'].replace("\\", "/")])
+
+            def on_stats(stats):
+                with progress_lock:
+                    chunk_times[c] = min(stats.frame, frames)
+                    done = sum(chunk_times.values())
+                progress = pieces_weight + min(done / max(chunk_frames, 1), 1.0) * (chunks_weight - pieces_weight)
+                plan['progress'].emit(done / fps, progress, stats)
+
+            self._run_ffmpeg(cmd, prefix, on_stats=on_stats, log_progress=log_progress, processes=processes, cancel_event=failed)
+            store(chunk)
+
+        def run_parallel(func, items):
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(func, item) for item in items]
+                for fut in as_completed(futures):
+                    try:
+                        fut.result()
+                    except Exception:
+                        failed.set()
+                        for proc in list(processes):
+                            if proc.poll() is None:
+                                proc.terminate()
+                        raise
+
+        def render_video():
+            run_parallel(render_clip, range(num_clips))
+            run_parallel(render_transition, sorted(transitions))
+
+            run_parallel(render_chunk, [c for c, chunk in enumerate(chunks) if not chunk['cached']])
+
+            # Фрагменти вже у фінальному кодеку - склеюємо їх без перекодування
+            list_path = os.path.join(work_dir, "chunks.txt")
+            self._write_concat_list(list_path, [chunk['path'] for chunk in chunks])
+            video_inputs = ["-f", "concat", "-safe", "0", "-i", list_path.replace("\\", "/")]
+
+            if plan['initial_video_path']:
+                master_path = self._render_video_master(plan, chunks, video_inputs, work_dir, chunks_weight, cache_keys)
+                video_inputs = ["-i", master_path.replace("\\", "/")]
+            return video_inputs
+
+        try:
+            self._render_with_audio_mix(plan, work_dir, render_video, processes, failed, 99.0)
+            self._write_manifest(plan, chunks)
+        finally:
+            clip_cache.unpin(cache_keys)
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if use_cache:
+            clip_cache.prune()
+        return True
+
+    def _render_with_audio_mix(self, plan, work_dir, render_video, processes, failed, start_weight):
+        """
+        Двофазний рендер: аудіо зводиться окремим процесом паралельно з відео, а в кінці обидва файли
+        склеюються без перекодування. render_video() рендерить відео без звуку й повертає його входи FFmpeg.
+        start_weight - прогрес (%), з якого починається склейка.
+        """
+        audio_pool = ThreadPoolExecutor(max_workers=1)
+        audio_path = os.path.join(work_dir, "audio.m4a")
+        try:
+            audio_future = audio_pool.submit(self._render_audio_mix, plan, audio_path, processes, failed)
+            video_inputs = render_video()
+            total_expected_duration = audio_future.result()
+
+            def on_final_stats(stats):
+                denom = total_expected_duration if total_expected_duration > 0.1 else 1.0
+                progress = start_weight + min(max(stats.out_time / denom, 0.0), 1.0) * (100.0 - start_weight)
+                plan['progress'].emit(stats.out_time, progress, stats)
+
+            cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+            cmd.extend(video_inputs)
+            cmd.extend(["-i", audio_path.replace("\\", "/"), "-map", "0:v", "-map", "1:a", "-c", "copy"])
+            # Тривалість відома заздалегідь: -t замість -shortest, бо -shortest у FFmpeg 7
+            # буферизує сотні кадрів, поки один потік наздоганяє інший
+            cmd.extend(["-t", self._fmt(total_expected_duration), "-max_muxing_queue_size", "9999", self._clean_output_path(plan['output_path'])])
+
+            self._run_ffmpeg(cmd, plan['prefix'], on_stats=on_final_stats, log_progress=plan['log_progress'])
+        except Exception:
+            # Зупиняємо зведення аудіо, якщо відео впало (і навпаки)
+            failed.set()
+            for proc in list(processes):
+                if proc.poll() is None:
+                    proc.terminate()
+            raise
+        finally:
+            audio_pool.shutdown(wait=True)
+
+    def _render_audio_mix(self, plan, audio_path, processes=None, cancel_event=None):
+        """
+        Аудіо-фаза двофазного рендеру: озвучка, фонова музика й звук інтро в окремий AAC-файл.
+        Займає секунди, тож зміна музики чи її гучності не вимагає перекодування відео.
+        Повертає очікувану тривалість результату.
+        """
+        inputs = []
+        parts = FilterGraph()
+        final_audio_map, _, intro_dur, pause_dur = self._mix_audio(plan, inputs, parts)
+        total_expected_duration = self._expected_duration(plan, intro_dur, pause_dur)
+
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+        cmd.extend(inputs)
+        if parts:
+            script_path = self._write_filter_script(self._serialize_graph(plan, parts), directory=os.path.dirname(audio_path))
+            cmd.extend(["-filter_complex_script", script_path.replace("\\", "/")])
+        cmd.extend(["-map", final_audio_map, "-vn", "-c:a", "aac", "-t", self._fmt(total_expected_duration), audio_path.replace("\\", "/")])
+        self._run_ffmpeg(cmd, plan['prefix'], log_progress=plan['log_progress'], processes=processes, cancel_event=cancel_event)
+        return total_expected_duration
+
+    def _render_video_master(self, plan, chunks, video_inputs, work_dir, start_weight, cache_keys):
+        """
+        Відео-фаза для монтажу з інтро: інтро + пауза + склеєні фрагменти, без аудіо.
+        Інтро потребує переходу, тож відео перекодовується (але вже без важких фільтрів);
+        з кешем результат зберігається, і наступне зведення з іншим аудіо лише перепаковує його.
+        """
+        initial_video_path = plan['initial_video_path']
+        intro_dur = self._get_duration(initial_video_path)
+        pause_dur = self.INTRO_PAUSE_SECONDS
+        duration = self._expected_duration(plan, intro_dur, pause_dur)
+
+        key = None
+        if plan['clip_cache'] and chunks and all(chunk['key'] for chunk in chunks):
+            key = clip_cache.make_key({
+                'master': [chunk['key'] for chunk in chunks],
+                'intro': file_digests.file_digest(initial_video_path),
+                'transition': [plan['enable_trans'], plan['transition_effect'], self._fmt(plan['trans_dur'])],
+                'pause': pause_dur,
+                'size': [plan['base_w'], plan['base_h']],
+                'fps': plan['fps'],
+                'codec': plan['codec'],
+                'encoder': self._encoder_args(plan),
+            })
+            cached_path = clip_cache.get(key)
+            if cached_path:
+                logger.log(f"{plan['prefix']}[Montage] Video master with intro reused from cache.", level=LogLevel.INFO)
+                return cached_path
+            clip_cache.pin([key])
+            cache_keys.append(key)
+
+        inputs = list(video_inputs)
+        parts = FilterGraph()
+        intro_index = self._intro_input(plan, inputs)
+        master_v = self._prepend_intro_video(plan, parts, "[0:v]", intro_index, intro_dur, pause_dur)
+        script_path = self._write_filter_script(self._serialize_graph(plan, parts), directory=work_dir)
+        master_path = os.path.join(work_dir, "master.mp4")
+
+        def on_stats(stats):
+            progress = start_weight + min(max(stats.out_time / max(duration, 0.1), 0.0), 1.0) * (99.0 - start_weight)
+            plan['progress'].emit(stats.out_time, progress, stats)
+
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+        cmd.extend(inputs)
+        cmd.extend(["-filter_complex_script", script_path.replace("\\", "/"), "-map", master_v, "-an", "-c:v", plan['codec']])
+        cmd.extend(self._encoder_args(plan))
+        cmd.extend(["-t", self._fmt(duration), master_path.replace("\\", "/")])
+        self._run_ffmpeg(cmd, plan['prefix'], on_stats=on_stats, log_progress=plan['log_progress'])
+        return clip_cache.put(key, master_path) if key else master_path
+
+    def _new_piece(self, key, start, end, work_path):
+        cached_path = clip_cache.get(key) if key else None
+        return {
+            'key': key, 'start': start, 'end': end,
+            'path': cached_path or work_path, 'cached': bool(cached_path), 'needed': False,
+        }
+
+    def _plan_chunks(self, plan, timeline, work_dir):
+        """
+        Ділить таймлайн шматків на фрагменти ~CHUNK_SECONDS, які кодуються у фінальний кодек окремо.
+        Межі залежать лише від таймлайну, тож при заміні однієї картинки решта фрагментів
+        отримує ті самі ключі й береться з кешу - перекодовуються лише 1-2 фрагменти навколо неї.
+        """
+        fps = plan['fps']
+        chunk_target = int(self.CHUNK_SECONDS * fps)
+        groups = []
+        current = []
+        current_frames = 0
+        for item in timeline:
+            current.append(item)
+            current_frames += item[0]['end'] - item[0]['start']
+            if current_frames >= chunk_target:
+                groups.append(current)
+                current = []
+                current_frames = 0
+        if current:
+            # Короткий залишок приєднуємо до попереднього фрагмента
+            if groups and current_frames < chunk_target / 2:
+                groups[-1].extend(current)
+            else:
+                groups.append(current)
+
+        post_signature = None
+        if plan['clip_cache']:
+            post_signature = {
+                'subs': file_digests.file_digest(plan['ass_path']) if plan['ass_path'] else None,
+                'overlay': file_digests.file_digest(plan['overlay_effect_path']) if plan['overlay_effect_path'] else None,
+                'watermark': [
+                    file_digests.file_digest(plan['watermark_path']), plan['watermark_size'], plan['watermark_position']
+                ] if plan['watermark_path'] else None,
+                'size': [plan['base_w'], plan['base_h']],
+                'codec': plan['codec'],
+                'encoder': self._encoder_args(plan),
+            }
+
+        chunks = []
+        position = 0
+        for c, items in enumerate(groups):
+            frames = sum(piece['end'] - piece['start'] for piece, _ in items)
+            sources = sorted({k for _, clip_ids in items for k in clip_ids})
+            key = None
+            if post_signature and all(piece['key'] for piece, _ in items):
+                key = clip_cache.make_key({
+                    'pieces': [piece['key'] for piece, _ in items],
+                    'start_frame': position,
+                    'post': post_signature,
+                })
+            chunk = self._new_piece(key, 0, frames, os.path.join(work_dir, f"chunk_{c:04d}.mp4"))
+            chunk.update({'items': items, 'sources': sources, 'start_frame': position, 'end_frame': position + frames})
+            chunks.append(chunk)
+            position += frames
+        return chunks
+
+    def _write_concat_list(self, list_path, paths):
+        with open(list_path, "w", encoding="utf-8") as list_file:
+            for path in paths:
+                safe_path = path.replace("\\", "/").replace("'", "'\\''")
+                list_file.write(f"file '{safe_path}'\n")
+
+    def _manifest_path(self, output_path):
+        return os.path.splitext(self._clean_output_path(output_path))[0] + ".manifest.json"
+
+    def _write_manifest(self, plan, chunks):
+        """
+        Маніфест рендеру поруч із відео: які проміжки часу з яких файлів зібрані
+        і якими ключами кешу закодовані фрагменти. Наступний монтаж порівнює з ним,
+        що змінилось, а незмінені фрагменти бере з кешу без рендеру.
+        """
+        fps = plan['fps']
+        visual_files = plan['visual_files']
+        manifest = {
+            'version': 1,
+            'created': time.time(),
+            'fps': fps,
+            'size': [plan['base_w'], plan['base_h']],
+            'motion_engine': plan['motion_engine'],
+            'segments': [
+                {
+                    'start': round(chunk['start_frame'] / fps, 3),
+                    'end': round(chunk['end_frame'] / fps, 3),
+                    'key': chunk['key'],
+                    'sources': [os.path.basename(visual_files[k]) for k in chunk['sources']],
+                }
+                for chunk in chunks
+            ],
+            'sources': [
+                {
+                    'file': os.path.basename(path),
+                    'digest': file_digests.file_digest(path) if plan['clip_cache'] else None,
+                    'segments': [c for c, chunk in enumerate(chunks) if k in chunk['sources']],
+                }
+                for k, path in enumerate(visual_files)
+            ],
+        }
+        manifest_path = self._manifest_path(plan['output_path'])
+        try:
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            logger.log(f"{plan['prefix']}[Montage] Could not write render manifest: {e}", level=LogLevel.WARNING)
+
+    def _log_manifest_changes(self, plan, chunks):
+        """Порівнює з маніфестом попереднього рендеру і пише, які файли змінились і що перерендериться."""
+        try:
+            with open(self._manifest_path(plan['output_path']), 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            return
+        old_sources = previous.get('sources', [])
+        if len(old_sources) != len(plan['visual_files']):
+            return
+        changed = [
+            os.path.basename(path) for path, old in zip(plan['visual_files'], old_sources)
+            if old.get('digest') != file_digests.file_digest(path)
+        ]
+        to_render = [c for c, chunk in enumerate(chunks) if not chunk['cached']]
+        if changed or to_render:
+            logger.log(
+                f"{plan['prefix']}[Montage] Incremental render: changed {', '.join(changed) or 'settings'}, "
+                f"re-rendering {len(to_render)} of {len(chunks)} segments",
+                level=LogLevel.INFO
+            )
+
+    def _clip_cache_key(self, plan, i):
+        """Ключ кліпу: вміст файлу + усе, від чого залежать його кадри."""
+        path = plan['visual_files'][i]
+        payload = {
+            'source': file_digests.file_digest(path),
+            'size': [plan['base_w'], plan['base_h']],
+            'fps': plan['fps'],
+            'codec': motion_renderer.CLIP_CODEC_ARGS,
+        }
+        if os.path.splitext(path)[1].lower() in self.VIDEO_EXTS:
+            payload['video'] = ",".join(str(f) for f in self._video_clip_chain(plan))
+        else:
+            payload.update({
+                'engine': plan['motion_engine'],
+                'duration': self._fmt(plan['clip_durations'][i]),
+                'zoom': [plan['enable_zoom'], self._fmt(plan['z_spd']), self._fmt(plan['z_int'])],
+                'sway': [plan['enable_sway'], self._fmt(plan['s_spd'])],
+            })
+            if plan['motion_engine'] != 'affine':
+                payload['upscale'] = [plan['up_w'], plan['up_h'], self._fmt(plan['up_factor'])]
+        return clip_cache.make_key(payload)
+
+    def _render_zoompan_pieces(self, plan, i, clip_frames, pieces, work_dir, threads, processes, cancel_event):
+        """Шматки картинки через zoompan: один прохід FFmpeg на кліп, кожен шматок - окремий вихід."""
+        parts = FilterGraph()
+        self._clip_filter(plan, i, 0, parts, frames=clip_frames)
+        parts.add([f"v{i}_final"], [Filter('split', len(pieces))], [f"s{j}" for j in range(len(pieces))])
+        for j, piece in enumerate(pieces):
+            parts.add([f"s{j}"], [
+                Filter('trim', start_frame=piece['start'], end_frame=piece['end']),
+                Filter('setpts', "PTS-STARTPTS"),
+            ], [f"p{j}"])
+        script_path = self._write_filter_script(self._serialize_graph(plan, parts), directory=work_dir)
+
+        cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+        cmd.extend(self._clip_input(plan['visual_files'][i], plan['prefix']))
+        cmd.extend(["-filter_complex_script", script_path.replace("\\", "/")])
+        for j, piece in enumerate(pieces):
+            cmd.extend(["-map", f"[p{j}]", "-frames:v", str(piece['end'] - piece['start']), "-r", str(plan['fps'])])
+            cmd.extend(motion_renderer.CLIP_CODEC_ARGS)
+            cmd.extend(["-threads", str(threads), piece['path'].replace("\\", "/")])
+        self._run_ffmpeg(cmd, plan['prefix'], processes=processes, cancel_event=cancel_event)
+
+    def _render_video_piece(self, plan, path, start, end, piece_path, threads, processes, cancel_event):
+        """Шматок відео-кліпу [start, end) у кадрах - ті самі фільтри, що й у _clip_filter."""
+        graph = FilterGraph()
+        # tpad дублює останній кадр, якщо відео коротше за очікувану тривалість
+        graph.add(["0:v"], self._video_clip_chain(plan) + [
+            Filter('tpad', stop_mode="clone", stop=-1),
+            Filter('trim', start_frame=start, end_frame=end),
+            Filter('setpts', "PTS-STARTPTS"),
+        ], ["v"])
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-i", os.path.abspath(path).replace("\\", "/"), "-filter_complex", self._serialize_graph(plan, graph),
+            "-map", "[v]", "-an", "-frames:v", str(end - start),
+            # Явна частота: шматки картинок і відео мають збігатися за timebase для xfade і concat
+            "-r", str(plan['fps']),
+        ]
+        cmd.extend(motion_renderer.CLIP_CODEC_ARGS)
+        cmd.extend(["-threads", str(threads), piece_path.replace("\\", "/")])
+        self._run_ffmpeg(cmd, plan['prefix'], processes=processes, cancel_event=cancel_event)
+
+    def _motion_worker_count(self):
+        return max(1, min(8, (os.cpu_count() or 4) // 2))
+
+    def _make_work_dir(self, output_path, prefix):
+        """Тимчасова папка поруч із результатом (той самий диск, що й фінальний файл)."""
+        out_dir = os.path.dirname(os.path.abspath(self._clean_output_path(output_path)))
+        return tempfile.mkdtemp(prefix=prefix, dir=out_dir if os.path.isdir(out_dir) else None)
+
+    def _segment_worker_count(self, settings):
+        workers = int(settings.get('segment_workers', 0) or 0)
+        if workers <= 0:
+            workers = max(2, min(8, (os.cpu_count() or 4) // 4))
+        return workers
+
+    def render_route(self, settings, clip_count, clip_cache_enabled, motion_engine=None):
+        """
+        Яким шляхом піде рендер монтажу - одне рішення для create_video, MontageCostModel і ResourceGovernor.
+        Повертає словник:
+        path - 'pieces', 'segmented' або 'single';
+        segmented / windowed - сегментний рендер (і чи це вікна обмеженої пам'яті), він же запасний шлях,
+        якщо рендер шматками не вдасться; max_inputs - найбільше кліпів в одному FFmpeg (0 - без обмеження);
+        processes і clips_per_process - скільки FFmpeg працює одночасно і скільки кліпів відкриває кожен.
+        """
+        motion_engine = motion_engine or settings.get('motion_engine', 'zoompan')
+        max_inputs = self._max_open_inputs(settings)
+        # Сотні кліпів в одному графі - сотні декодерів і черг: такий монтаж іде вікнами по max_inputs кліпів
+        windowed = bool(max_inputs) and clip_count > max_inputs
+        segment_render = settings.get('segment_render', False)
+        segmented = segment_render or windowed
+
+        if motion_engine == 'affine' or clip_cache_enabled:
+            # Рушій affine і кеш кліпів працюють через рендер шматків
+            path = 'pieces'
+        else:
+            path = 'segmented' if segmented else 'single'
+
+        processes, clips_per_process = 1, clip_count
+        if segmented:
+            # Без segment_render вікна рендеряться по черзі
+            processes = min(self._segment_worker_count(settings) if segment_render else 1, max(1, clip_count))
+            clips_per_process = math.ceil(clip_count / processes)
+            if max_inputs:
+                clips_per_process = min(clips_per_process, max_inputs)
+        return {
+            'path': path,
+            'segmented': segmented,
+            'windowed': windowed,
+            'max_inputs': max_inputs,
+            'processes': processes,
+            'clips_per_process': clips_per_process,
+        }
 
+    def _max_open_inputs(self, settings):
+        value = settings.get('max_open_inputs', self.DEFAULT_MAX_OPEN_INPUTS)
+        # Менше трьох не має сенсу: сегмент відкриває ще й наступний кліп для переходу
+        return max(3, int(value)) if value else 0
+
+    def _segment_inputs(self, segments, k, trans_frames):
+        """Скільки кліпів відкриває сегмент k: його власні плюс наступний, якщо в нього є перехід."""
+        a, b = segments[k]
+        return b - a + 1 + (1 if trans_frames and k < len(segments) - 1 else 0)
+
+    def _partition_windows(self, clip_frames, trans_frames, count, max_inputs):
+        """
+        _partition_segments, але так, щоб жоден сегмент не відкривав більше max_inputs кліпів:
+        кількість сегментів збільшується, доки найширший не влізе (або різати вже ніде).
+        """
+        if max_inputs:
+            count = max(count, math.ceil(len(clip_frames) / (max_inputs - 1)))
+        while True:
+            segments, start_frames, total_frames = self._partition_segments(clip_frames, trans_frames, count)
+            widest = max(self._segment_inputs(segments, k, trans_frames) for k in range(len(segments)))
+            if not max_inputs or widest <= max_inputs or count >= len(clip_frames):
+                return segments, start_frames, total_frames
+            count += 1
+
+    def _partition_segments(self, clip_frames, trans_frames, count):
+        """
+        Ділить кліпи на суміжні групи приблизно однакової тривалості.
+        Розріз після кліпу b можливий лише якщо кліп b+1 довший за два переходи,
+        тобто після переходу в нього є кадри, що належать тільки йому.
+        Повертає (segments, start_frames, total_frames), де segments - список (перший, останній) індексів.
+        """
+        start_frames = []
+        pos = 0
+        for f in clip_frames:
+            start_frames.append(pos)
+            pos += f - trans_frames
+        total_frames = pos + trans_frames
+
+        target = total_frames / max(1, count)
+        segments = []
+        seg_start = 0
+        prev_cut = None
+        for b in range(len(clip_frames) - 1):
+            if len(segments) == count - 1:
+                break
+            if clip_frames[b + 1] < 2 * trans_frames:
+                continue
+            cut_frame = start_frames[b + 1] + trans_frames
+            goal = target * (len(segments) + 1)
+            if cut_frame < goal:
+                prev_cut = (b, cut_frame)
+                continue
+            # Беремо ту межу (поточну чи попередню), що ближча до цільової позиції
+            if prev_cut and prev_cut[0] >= seg_start and goal - prev_cut[1] < cut_frame - goal:
+                cut_b = prev_cut[0]
+            else:
+                cut_b = b
+            segments.append((seg_start, cut_b))
+            seg_start = cut_b + 1
+            prev_cut = (b, cut_frame) if cut_b != b else None
+        segments.append((seg_start, len(clip_frames) - 1))
+        return segments, start_frames, total_frames
+
+    def _pick_transition(self, transition_effect):
+        if transition_effect == "random":
+            return random.choice(VALID_TRANSITIONS)
+        if transition_effect not in VALID_TRANSITIONS:
+            return "fade"
+        return transition_effect
+
+    def _clip_input(self, path, prefix):
+        abs_path = os.path.abspath(path).replace("\\", "/")
+        if not os.path.exists(abs_path):
+            logger.log(f"{prefix}[Error] Input file not found: {abs_path}", level=LogLevel.ERROR)
+            raise Exception(f"Input file missing: {abs_path}")
+        return ["-thread_queue_size", "4096", "-i", abs_path]
+
+    def _clip_filter(self, plan, i, input_index, graph, frames=None):
+        """
+        Фільтри для одного кліпу (відео або картинка з ефектами) - додаються в graph.
+        frames - обмеження кількості кадрів (для сегментного рендеру).
+        """
+        fps = plan['fps']
+        base_w, base_h = plan['base_w'], plan['base_h']
+        up_w, up_h = plan['up_w'], plan['up_h']
+        this_dur = plan['clip_durations'][i]
+        this_dur_str = self._fmt(this_dur)
+        ext = os.path.splitext(plan['visual_files'][i])[1].lower()
+
+        v_in = f"{input_index}:v"; v_out = f"v{i}_final"
+        trim = [Filter('trim', end_frame=frames)] if frames else []
+
+        if ext in self.VIDEO_EXTS:
+            graph.add([v_in], self._video_clip_chain(plan) + trim + [Filter('setpts', "PTS-STARTPTS")], [v_out])
+            return
+
+        v_up = f"v{i}_up"
+        graph.add([v_in], [
+            Filter('scale', w=up_w, h=up_h, force_original_aspect_ratio="increase"),
+            Filter('crop', w=up_w, h=up_h),
+            Filter('format', pix_fmts="yuv420p"),
+            Filter('setsar', r=1),
+        ], [v_up])
+
+        # --- МАТЕМАТИКА ЕФЕКТІВ ---
+        enable_sway = plan['enable_sway']
+        base_zoom = 1.1 if enable_sway else 1.0
+
+        if plan['enable_zoom']:
+            z_amp = plan['z_int']
+            cycle = f"((on/{fps})/{this_dur_str}) * {self._fmt(plan['z_spd'])}"
+            z_expr = f"{self._fmt(base_zoom)}+{self._fmt(z_amp)}*(1-cos(6.283*{cycle}))/2"
+        else:
+            z_expr = self._fmt(base_zoom)
+
+        if enable_sway:
+            s_spd = plan['s_spd']
+            base_amp_x = 50 * plan['up_factor']
+            base_amp_y = 25 * plan['up_factor']
+
+            freq_x1 = self._fmt(0.02 * s_spd)
+            freq_x2 = self._fmt(0.05 * s_spd)
+            freq_y1 = self._fmt(0.025 * s_spd)
+            freq_y2 = self._fmt(0.06 * s_spd)
+
+            val_x = f"sin(on*{freq_x1})*{base_amp_x} + cos(on*{freq_x2})*{base_amp_x/2}"
+            val_y = f"cos(on*{freq_y1})*{base_amp_y} + sin(on*{freq_y2})*{base_amp_y/2}"
+            x_expr = f"iw/2-(iw/zoom/2)+{val_x}"
+            y_expr = f"ih/2-(ih/zoom/2)+{val_y}"
+        else:
+            x_expr = "iw/2-(iw/zoom/2)"
+            y_expr = "ih/2-(ih/zoom/2)"
+
+        # zoompan генерує рівно d кадрів, тож обмеження кадрів задаємо прямо через d
+        d_frames = frames if frames else int(this_dur * fps) + self.CLIP_TAIL_FRAMES
+        graph.add([v_up], [
+            Filter('zoompan', z=f"'{z_expr}'", x=f"'{x_expr}'", y=f"'{y_expr}'", d=d_frames, s=f"{base_w}x{base_h}", fps=fps),
+            Filter('setpts', "PTS-STARTPTS"),
+        ], [v_out])
+
+    def _video_clip_chain(self, plan):
+        base_w, base_h = plan['base_w'], plan['base_h']
+        # Нативно прибираємо водяний знак для всіх відео в монтажі (Zoom 8% + Crop top-left)
+        # Також примусово масштабуємо до розміру проекту, щоб виправити можливе розтягування (Googler/Veo).
+        # Оптимізація графа зводить це до одного crop джерела + одного scale
+        return [
+            Filter('scale', w=base_w, h=base_h),
+            Filter('scale', w="1.08*iw", h=-1),
+            Filter('crop', w=base_w, h=base_h, x=0, y=0),
+            Filter('format', pix_fmts="yuv420p"),
+            Filter('setsar', r=1),
+            Filter('fps', fps=plan['fps']),
+        ]
+
+    def _set_input_size(self, plan, graph, input_index, path):
+        size = plan['asset_sizes'].get(path)
+        if size:
+            graph.set_input(input_index, *size)
+
+    def _serialize_graph(self, plan, graph):
+        """Перевіряє й оптимізує граф; що саме прибрала оптимізація - в DEBUG-лог."""
+        before = graph.stats()['filters']
+        text = graph.serialize()
+        if graph.pass_counts:
+            changes = ", ".join(f"{name}: {count}" for name, count in sorted(graph.pass_counts.items()))
+            logger.log(
+                f"{plan['prefix']}[FilterGraph] {before} -> {graph.stats()['filters']} filters ({changes})",
+                level=LogLevel.DEBUG
+            )
+        return text
+
+    def _join_clips(self, filter_parts, labels, durations, transitions, trans_dur):
+        """Склеює кліпи через xfade (якщо є переходи) або concat. Повертає мітку результату."""
+        if len(labels) == 1:
+            return labels[0]
+
+        if transitions:
+            curr = labels[0]
+            trans_dur_str_filt = self._fmt(trans_dur)
+            offsets = self._xfade_offsets(durations, trans_dur)
+            for i in range(1, len(labels)):
+                next_stream = labels[i]; target = f"[v_m{i}]"
+                off_str = self._fmt(offsets[i - 1])
                 xfade = (
-                    f"{curr}{next_stream}xfade=transition={current_trans}:"
+                    f"{curr}{next_stream}xfade=transition={transitions[i - 1]}:"
                     f"duration={trans_dur_str_filt}:offset={off_str}{target}"
                 )
                 filter_parts.append(xfade)
                 curr = target
-                current_offset += (final_clip_durations[i] - trans_dur)
-            final_v = curr
-        else:
-            ins = "".join([f"[v{i}_final]" for i in range(num_files)])
-            concat = f"{ins}concat=n={num_files}:v=1:a=0[v_concat]"
-            filter_parts.append(concat)
-            final_v = "[v_concat]"
-
-        # 5. SUBS & AUDIO
-        output_v_stream = final_v 
-        if ass_path and os.path.exists(ass_path):
+            return curr
+
+        ins = "".join(labels)
+        filter_parts.append(f"{ins}concat=n={len(labels)}:v=1:a=0[v_concat]")
+        return "[v_concat]"
+
+    def _xfade_offsets(self, durations, trans_dur):
+        """Офсети xfade (секунди від початку склейки) для кліпів 1..n-1."""
+        offsets = []
+        current_offset = durations[0] - trans_dur
+        for d in durations[1:]:
+            offsets.append(current_offset)
+            current_offset += (d - trans_dur)
+        return offsets
+
+    def _frame_at(self, seconds, fps):
+        """
+        Кадр, на який FFmpeg переводить час у секундах з фільтр-графа:
+        рядок _fmt -> мікросекунди -> кадри з округленням половини вгору (av_rescale_q).
+        """
+        us = int(round(float(self._fmt(seconds)) * 1000000))
+        return (us * fps + 500000) // 1000000
+
+    def _timeline_frames(self, plan):
+        """
+        Розмітка таймлайну в цілих кадрах - така сама, як у однопрохідного рендеру.
+        З переходами кліп k починається на кадрі, в який xfade переводить свій офсет,
+        тож кліп триває до кінця переходу в наступний. Без переходів (concat) і для останнього кліпу -
+        скільки кадрів видає фільтр кліпу: zoompan d=int(dur*fps)+CLIP_TAIL_FRAMES або тривалість відео.
+        Повертає (clip_frames, trans_frames).
+        """
+        fps = plan['fps']
+        durations = plan['clip_durations']
+        clip_frames = []
+        for i, d in enumerate(durations):
+            if os.path.splitext(plan['visual_files'][i])[1].lower() in self.VIDEO_EXTS:
+                clip_frames.append(max(1, int(round(d * fps))))
+            else:
+                clip_frames.append(int(d * fps) + self.CLIP_TAIL_FRAMES)
+        if not plan['transitions'] or len(durations) < 2:
+            return clip_frames, 0
+
+        trans_frames = self._frame_at(plan['trans_dur'], fps)
+        starts = [0] + [self._frame_at(off, fps) for off in self._xfade_offsets(durations, plan['trans_dur'])]
+        for k in range(len(durations) - 1):
+            clip_frames[k] = starts[k + 1] - starts[k] + trans_frames
+        return clip_frames, trans_frames
+
+    def _apply_post_filters(self, plan, inputs, filter_parts, final_v, start_time=None):
+        """
+        Субтитри, оверлей-ефект та вотермарка.
+        start_time - позиція фрагмента на загальному таймлайні (для сегментного рендеру).
+        """
+        base_w, base_h = plan['base_w'], plan['base_h']
+
+        # 5. SUBS
+        ass_path = plan['ass_path']
+        if ass_path:
             ass_clean = ass_path.replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
-            subs = f"{final_v}subtitles='{ass_clean}'[v_out]"
+            if start_time:
+                # Зсуваємо PTS на позицію сегмента, щоб субтитри збігались із загальним таймлайном
+                subs = (
+                    f"{final_v}setpts=PTS+{self._fmt(start_time)}/TB,"
+                    f"subtitles='{ass_clean}',setpts=PTS-STARTPTS[v_out]"
+                )
+            else:
+                subs = f"{final_v}subtitles='{ass_clean}'[v_out]"
             filter_parts.append(subs)
-            output_v_stream = "[v_out]"
-            final_v = output_v_stream # Update final_v for next steps
+            final_v = "[v_out]"
 
         # 6. OVERLAY EFFECT
-        # To avoid index confusion, let's restructure input additions.
-        # Current inputs: [img/video 0] ... [img/video N-1]
-        
-        # We need to add effect and watermark inputs *before* we finalize the command generation, 
-        # but the logic above already constructs the command heavily relying on indices.
-        
-        # Let's add extra inputs here and track their indices relative to what we have so far.
-        current_input_count = len(visual_files)
-        
-        if overlay_effect_path and os.path.exists(overlay_effect_path):
-            logger.log(f"{prefix}[FFmpeg] Adding overlay effect: {os.path.basename(overlay_effect_path)}", level=LogLevel.INFO)
-            inputs.extend(["-stream_loop", "-1", "-thread_queue_size", "4096", "-i", overlay_effect_path.replace("\\", "/")])
-            effect_index = current_input_count
-            current_input_count += 1
-            
-            
+        overlay_effect_path = plan['overlay_effect_path']
+        if overlay_effect_path:
+            effect_input = ["-stream_loop", "-1"]
+            if start_time:
+                # Продовжуємо ефект з того місця, де він був би в суцільному рендері
+                effect_dur = plan.get('overlay_effect_duration')
+                if effect_dur is None:
+                    effect_dur = self._get_duration(overlay_effect_path)
+                    plan['overlay_effect_duration'] = effect_dur
+                if effect_dur > 0:
+                    effect_input.extend(["-ss", self._fmt(start_time % effect_dur)])
+            effect_index = inputs.count("-i")
+            inputs.extend(effect_input + ["-thread_queue_size", "4096", "-i", overlay_effect_path.replace("\\", "/")])
+            self._set_input_size(plan, filter_parts, effect_index, overlay_effect_path)
+
             eff_v = f"[v_eff_scaled]"
             # Force yuva420p to ensure alpha channel is preserved/respected if present
-            # Застосовуємо effect_speed для зміни швидкості відтворення ефекту
             scale_eff = f"[{effect_index}:v]format=yuva420p,scale={base_w}:{base_h}:force_original_aspect_ratio=increase,crop={base_w}:{base_h}{eff_v}"
             filter_parts.append(scale_eff)
-            
+
             v_overlaid = f"[v_overlaid]"
             # Use 'overlay' filter. shortest=1 ensures it stops when the main video stops (though we use -shortest on output too)
             overlay_cmd = f"{final_v}{eff_v}overlay=0:0:shortest=1{v_overlaid}"
@@ -342,22 +1382,19 @@ class MontageEngine:
             final_v = v_overlaid
 
         # 7. WATERMARK
-        if watermark_path and os.path.exists(watermark_path):
-            logger.log(f"{prefix}[FFmpeg] Adding watermark: {os.path.basename(watermark_path)}", level=LogLevel.INFO)
+        watermark_path = plan['watermark_path']
+        if watermark_path:
+            wm_index = inputs.count("-i")
             inputs.extend(["-thread_queue_size", "4096", "-i", watermark_path.replace("\\", "/")])
-            wm_index = current_input_count
-            current_input_count += 1
-            
-            
+
             wm_v = f"[v_wm]"
-            # Обчислюємо розмір вотермарки: watermark_size відсотків від 1920px
-            wm_width = int(base_w * (float(watermark_size) / 100.0))
-            logger.log(f"{prefix}[FFmpeg] Watermark size: {watermark_size}% = {wm_width}px", level=LogLevel.INFO)
+            # Обчислюємо розмір вотермарки: watermark_size відсотків від ширини кадру
+            wm_width = int(base_w * (float(plan['watermark_size']) / 100.0))
             scale_wm = f"[{wm_index}:v]scale={wm_width}:-1{wm_v}"
             filter_parts.append(scale_wm)
-            
+
             v_wm_out = f"[v_wm_out]"
-            
+
             # Position mapping:
             # 0: top-left, 1: top-center, 2: top-right
             # 3: center-left, 4: center, 5: center-right
@@ -374,39 +1411,72 @@ class MontageEngine:
                 7: f"(main_w-overlay_w)/2:main_h-overlay_h-{padding}",  # bottom-center
                 8: f"main_w-overlay_w-{padding}:main_h-overlay_h-{padding}"  # bottom-right
             }
-            
-            overlay_position = position_map.get(watermark_position, position_map[8])
+
+            overlay_position = position_map.get(plan['watermark_position'], position_map[8])
             overlay_wm = f"{final_v}{wm_v}overlay={overlay_position}{v_wm_out}"
             filter_parts.append(overlay_wm)
             final_v = v_wm_out
 
-        output_v_stream = final_v
-        
-        # Audio is next input
-        audio_input_index = current_input_count
+        return final_v
 
+    def _append_intro_video(self, plan, inputs, filter_parts, final_v):
+        """
+        Додає інтро-відео перед монтажем (лише відео - аудіо зводить _render_audio_mix).
+        Повертає (output_v_stream, intro_dur, pause_dur).
+        """
+        intro_index = self._intro_input(plan, inputs)
+        if intro_index is None:
+            return final_v, 0, 0
+        intro_dur = self._get_duration(plan['initial_video_path'])
+        pause_dur = self.INTRO_PAUSE_SECONDS
+        output_v_stream = self._prepend_intro_video(plan, filter_parts, final_v, intro_index, intro_dur, pause_dur)
+        return output_v_stream, intro_dur, pause_dur
 
-        full_graph = ";".join(filter_parts)
-        
-        # --- AUDIO INPUTS AND FILTERS ---
-        inputs.append("-thread_queue_size"); inputs.append("4096")
-        inputs.append("-i"); inputs.append(audio_path.replace("\\", "/"))
-        voiceover_input_index = audio_input_index # Use the tracked index
+    def _expected_duration(self, plan, intro_dur, pause_dur):
+        """Total = (Intro Video) + (Main Audio + Pause) - (Overlap if transition used)"""
+        total_expected_duration = plan['audio_dur'] + intro_dur + pause_dur
+        if plan['enable_trans'] and intro_dur > 0:
+            total_expected_duration -= plan['trans_dur']
+        return total_expected_duration
 
+    def _intro_input(self, plan, inputs):
+        """Додає інтро-відео як вхід і повертає його індекс (None, якщо інтро немає)."""
+        initial_video_path = plan['initial_video_path']
+        if not initial_video_path:
+            return None
+        intro_index = inputs.count("-i")
+        inputs.extend(["-thread_queue_size", "4096", "-i", initial_video_path.replace("\\", "/")])
+        return intro_index
 
-        audio_filter_chains = []
-        final_audio_map = f"[{voiceover_input_index}:a]"
+    def _intro_crossfades(self, plan, intro_dur):
+        """Чи з'єднується інтро з монтажем переходом (інакше - жорсткий concat). Однаково для відео й аудіо."""
+        return plan['enable_trans'] and intro_dur > plan['trans_dur']
 
+    def _mix_audio(self, plan, inputs, filter_parts):
+        """
+        Аудіо-частина монтажу: озвучка, фонова музика (amix/afade) та звук інтро з паузою (adelay/acrossfade).
+        Не залежить від відео, тож може рендеритись окремим процесом паралельно з ним.
+        Повертає (final_audio_map, intro_index, intro_dur, pause_dur); intro_index - None без інтро.
+        """
+        prefix = plan['prefix']
+        audio_dur = plan['audio_dur']
+        trans_dur = plan['trans_dur']
+
+        # --- AUDIO INPUTS AND FILTERS ---
+        voiceover_input_index = inputs.count("-i")
+        inputs.extend(["-thread_queue_size", "4096", "-i", plan['audio_path'].replace("\\", "/")])
+
+        background_music_path = plan['background_music_path']
         if background_music_path and os.path.exists(background_music_path):
             logger.log(f"{prefix}[FFmpeg] Adding background music.", level=LogLevel.INFO)
             # Use -stream_loop on the input
             inputs.extend(["-stream_loop", "-1", "-thread_queue_size", "4096", "-i", background_music_path.replace("\\", "/")])
-            
+
             bg_music_input_index = voiceover_input_index + 1
 
-            
+            background_music_volume = plan['background_music_volume']
             vol_multiplier = (background_music_volume if background_music_volume is not None else 100) / 100.0
-            
+
             fade_duration = 5
             # Ensure fade out doesn't start before the audio begins
             fade_start_time = max(0, audio_dur - fade_duration)
@@ -417,282 +1487,188 @@ class MontageEngine:
                 f"atrim=duration={audio_dur:.3f},"
                 f"afade=t=out:st={fade_start_time:.3f}:d={fade_duration}[bg_audio]"
             )
-            audio_filter_chains.append(bg_music_filter)
-            
+            filter_parts.append(bg_music_filter)
+
             # Filter chain for mixing voiceover and background music
             mix_filter = f"[{voiceover_input_index}:a][bg_audio]amix=inputs=2:duration=first:dropout_transition=2[a_out]"
-            audio_filter_chains.append(mix_filter)
+            filter_parts.append(mix_filter)
 
             final_audio_map = "[a_out]"
         else:
-             # Direct input mapping (no brackets for raw stream map in some contexts, 
-             # but standard notation like "0:a" works reliably)
-             final_audio_map = f"{voiceover_input_index}:a"
-        
-        if audio_filter_chains:
-            full_graph += ";" + ";".join(audio_filter_chains)
-        
-        # --- END AUDIO ---
+            # Direct input mapping (no brackets for raw stream map in some contexts,
+            # but standard notation like "0:a" works reliably)
+            final_audio_map = f"{voiceover_input_index}:a"
 
         # 8. INITIAL VIDEO (PREPEND)
-        initial_video_path = kwargs.get('initial_video_path')
-        if initial_video_path and os.path.exists(initial_video_path):
-            logger.log(f"{prefix}[FFmpeg] Prepending initial video: {os.path.basename(initial_video_path)}", level=LogLevel.INFO)
-            
-            inputs.extend(["-thread_queue_size", "4096", "-i", initial_video_path.replace("\\", "/")])
-            # Correctly calculate index based on actual number of inputs added so far
-            # (Audio/Music inputs might have been added without updating current_input_count)
-            intro_index = inputs.count("-i") - 1
-            current_input_count = intro_index + 1 # Align for safety
-            
-            # --- Intro Video Processing ---
-            v_intro = "[v_intro]"
-            # Scale and Pad to match base dimensions
-            intro_scale = (
-                f"[{intro_index}:v]scale={base_w}:{base_h}:force_original_aspect_ratio=decrease,"
-                f"pad={base_w}:{base_h}:(ow-iw)/2:(oh-ih)/2,"
-                f"format=yuv420p,setsar=1,fps={fps},"
-                f"setpts=PTS-STARTPTS{v_intro}"
-            )
-            full_graph += ";" + intro_scale
-            
-            # --- Intro Audio Processing ---
-            a_intro = "[a_intro]"
-            has_intro_audio = self._has_audio(initial_video_path)
-            intro_dur = self._get_duration(initial_video_path)
-            
-            if has_intro_audio:
-                # Resample to match common settings (stereo, 44100) to avoid concat issues
-                intro_audio_filter = f"[{intro_index}:a]aformat=sample_rates=44100:channel_layouts=stereo{a_intro}"
-                full_graph += ";" + intro_audio_filter
-            else:
-                # Generate silence
-                intro_audio_filter = f"anullsrc=channel_layout=stereo:sample_rate=44100,atrim=duration={intro_dur}{a_intro}"
-                full_graph += ";" + intro_audio_filter
+        intro_index = self._intro_input(plan, inputs)
+        if intro_index is None:
+            return final_audio_map, None, 0, 0
 
-            # --- Concat/Transition Intro + Main ---
-            v_total = "[v_total]"
-            a_total = "[a_total]"
-            
-            # We assume main audio is already at final_audio_map (and might need formatting to match?)
-            # Usually main audio (voiceover/music) is robust, but let's ensure it matches format too just in case
-            a_main_fmt = "[a_main_fmt]"
-            
-            # Ensure final_audio_map is wrapped in brackets for filter syntax if it's a raw stream selector
-            safe_audio_map = final_audio_map
-            if ":" in final_audio_map and not final_audio_map.startswith("["):
-                safe_audio_map = f"[{final_audio_map}]"
-            
-            full_graph += ";" + f"{safe_audio_map}aformat=sample_rates=44100:channel_layouts=stereo{a_main_fmt}"
-            
-            # --- PAUSE LOGIC (3s delay for voiceover) ---
-            # User requested ~3s pause between Intro and Voiceover.
-            pause_dur = 1.5
-            
-            # Delay Main Audio (insert silence at start)
-            a_main_delayed = "[a_main_delayed]"
-            # adelay expects milliseconds. all=1 applies to all channels (stereo)
-            full_graph += ";" + f"{a_main_fmt}adelay={int(pause_dur*1000)}:all=1{a_main_delayed}"
-            a_main_fmt = a_main_delayed
-
-            # Delay Main Video (pad start with clone of first frame)
-            # This creates a "static pause" effect before the main video starts playing
-            v_main_padded = "[v_main_padded]"
-            full_graph += ";" + f"{final_v}tpad=start_mode=clone:start_duration={pause_dur}{v_main_padded}"
-            final_v = v_main_padded
-            
-            # Reset PTS for Main Video to ensure clean start for transitions/concat
-            final_v_reset = "[final_v_reset]"
-            full_graph += ";" + f"{final_v}setpts=PTS-STARTPTS{final_v_reset}"
-            final_v = final_v_reset
-            
-            # Apply transition if enabled
-            if enable_trans and intro_dur > trans_dur:
-                # XFADE for Video
-                offset = intro_dur - trans_dur
-                
-                # Use configured transition (or default to fade if random/invalid)
-                current_trans = transition_effect
-                if current_trans == "random": current_trans = random.choice(valid_transitions)
-                elif current_trans not in valid_transitions: current_trans = "fade"
-                
-                xfade_cmd = (
-                    f"{v_intro}{final_v}xfade=transition={current_trans}:"
-                    f"duration={trans_dur}:offset={offset}{v_total}"
-                )
-                full_graph += ";" + xfade_cmd
-                
-                # ACROSSFADE for Audio
-                # Note: acrossfade consumes the overlap, so duration math works out similar to xfade
-                acrossfade_cmd = f"{a_intro}{a_main_fmt}acrossfade=d={trans_dur}:c1=tri:c2=tri{a_total}"
-                full_graph += ";" + acrossfade_cmd
-                
-            else:
-                # Fallback to hard cut (Concat)
-                concat_v = f"{v_intro}{final_v}concat=n=2:v=1:a=0{v_total}"
-                concat_a = f"{a_intro}{a_main_fmt}concat=n=2:v=0:a=1{a_total}"
-                
-                full_graph += ";" + concat_v
-                full_graph += ";" + concat_a
-            
-            output_v_stream = v_total
-            final_audio_map = a_total
+        initial_video_path = plan['initial_video_path']
+        logger.log(f"{prefix}[FFmpeg] Prepending initial video: {os.path.basename(initial_video_path)}", level=LogLevel.INFO)
+
+        # --- Intro Audio Processing ---
+        a_intro = "[a_intro]"
+        has_intro_audio = self._has_audio(initial_video_path)
+        intro_dur = self._get_duration(initial_video_path)
+
+        if has_intro_audio:
+            # Resample to match common settings (stereo, 44100) to avoid concat issues
+            filter_parts.append(f"[{intro_index}:a]aformat=sample_rates=44100:channel_layouts=stereo{a_intro}")
         else:
-             intro_dur = 0 # No intro video
-             pause_dur = 0
+            # Generate silence
+            filter_parts.append(f"anullsrc=channel_layout=stereo:sample_rate=44100,atrim=duration={intro_dur}{a_intro}")
 
+        a_total = "[a_total]"
 
-        filter_script_path = None
-        try:
-            # Створюємо тимчасовий файл для filter_complex
-            with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix=".txt", encoding='utf-8') as filter_file:
-                filter_file.write(full_graph)
-                filter_script_path = filter_file.name
+        # Main audio might need formatting to match intro audio
+        a_main_fmt = "[a_main_fmt]"
 
-            cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-stats"]
-            cmd.extend(inputs)
-            cmd.extend(["-filter_complex_script", filter_script_path.replace("\\", "/"), "-map", output_v_stream, "-map", final_audio_map, "-c:v", codec])
-
-            bitrate_str = f"{bitrate}M"
-            if codec == "h264_amf":
-                if preset in ["ultrafast", "superfast", "veryfast", "faster", "fast"]: u="speed"
-                elif preset == "medium": u="balanced"
-                else: u="quality"
-                cmd.extend(["-quality", u, "-b:v", bitrate_str, "-pix_fmt", "yuv420p"])
-            elif codec == "h264_nvenc":
-                cmd.extend(["-preset", "p4", "-b:v", bitrate_str, "-pix_fmt", "yuv420p"])
-            else:
-                cmd.extend(["-preset", preset, "-b:v", bitrate_str, "-maxrate", bitrate_str, "-bufsize", f"{bitrate*2}M", "-pix_fmt", "yuv420p"])
-            
-            # Clean output path for FFmpeg (remove \\?\ prefix which can break when slashes are flipped)
-            clean_out_path = output_path.replace("\\\\?\\", "").replace("//?/", "")
-            cmd.extend(["-shortest", "-max_muxing_queue_size", "9999", clean_out_path.replace("\\", "/")])
-
-            startupinfo = None
-            if platform.system() == "Windows":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            process = subprocess.Popen(
-                cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, 
-                stdin=subprocess.DEVNULL,
-                text=True, encoding='utf-8', errors='replace', startupinfo=startupinfo
+        # Ensure final_audio_map is wrapped in brackets for filter syntax if it's a raw stream selector
+        safe_audio_map = final_audio_map
+        if ":" in final_audio_map and not final_audio_map.startswith("["):
+            safe_audio_map = f"[{final_audio_map}]"
+
+        filter_parts.append(f"{safe_audio_map}aformat=sample_rates=44100:channel_layouts=stereo{a_main_fmt}")
+
+        # --- PAUSE LOGIC (delay for voiceover) ---
+        pause_dur = self.INTRO_PAUSE_SECONDS
+
+        # Delay Main Audio (insert silence at start)
+        a_main_delayed = "[a_main_delayed]"
+        # adelay expects milliseconds. all=1 applies to all channels (stereo)
+        filter_parts.append(f"{a_main_fmt}adelay={int(pause_dur*1000)}:all=1{a_main_delayed}")
+        a_main_fmt = a_main_delayed
+
+        if self._intro_crossfades(plan, intro_dur):
+            # ACROSSFADE for Audio
+            # Note: acrossfade consumes the overlap, so duration math works out similar to xfade
+            filter_parts.append(f"{a_intro}{a_main_fmt}acrossfade=d={trans_dur}:c1=tri:c2=tri{a_total}")
+        else:
+            filter_parts.append(f"{a_intro}{a_main_fmt}concat=n=2:v=0:a=1{a_total}")
+
+        return a_total, intro_index, intro_dur, pause_dur
+
+    def _prepend_intro_video(self, plan, filter_parts, final_v, intro_index, intro_dur, pause_dur):
+        """Відео-частина інтро: масштабування, статична пауза перед монтажем і xfade/concat. Повертає мітку потоку."""
+        fps = plan['fps']
+        base_w, base_h = plan['base_w'], plan['base_h']
+        trans_dur = plan['trans_dur']
+
+        # --- Intro Video Processing ---
+        v_intro = "[v_intro]"
+        self._set_input_size(plan, filter_parts, intro_index, plan['initial_video_path'])
+        # Scale and Pad to match base dimensions
+        intro_scale = (
+            f"[{intro_index}:v]scale={base_w}:{base_h}:force_original_aspect_ratio=decrease,"
+            f"pad={base_w}:{base_h}:(ow-iw)/2:(oh-ih)/2,"
+            f"format=yuv420p,setsar=1,fps={fps},"
+            f"setpts=PTS-STARTPTS{v_intro}"
+        )
+        filter_parts.append(intro_scale)
+
+        v_total = "[v_total]"
+
+        # Delay Main Video (pad start with clone of first frame)
+        # This creates a "static pause" effect before the main video starts playing
+        v_main_padded = "[v_main_padded]"
+        filter_parts.append(f"{final_v}tpad=start_mode=clone:start_duration={pause_dur}{v_main_padded}")
+        final_v = v_main_padded
+
+        # Reset PTS for Main Video to ensure clean start for transitions/concat
+        final_v_reset = "[final_v_reset]"
+        filter_parts.append(f"{final_v}setpts=PTS-STARTPTS{final_v_reset}")
+        final_v = final_v_reset
+
+        # Apply transition if enabled
+        if self._intro_crossfades(plan, intro_dur):
+            # XFADE for Video
+            offset = intro_dur - trans_dur
+            current_trans = self._pick_transition(plan['transition_effect'])
+
+            xfade_cmd = (
+                f"{v_intro}{final_v}xfade=transition={current_trans}:"
+                f"duration={trans_dur}:offset={offset}{v_total}"
             )
+            filter_parts.append(xfade_cmd)
+        else:
+            # Fallback to hard cut (Concat)
+            filter_parts.append(f"{v_intro}{final_v}concat=n=2:v=1:a=0{v_total}")
 
-            full_log = []
-            
-            # Calculate total expected duration for progress bar
-            # Total = (Intro Video) + (Main Audio + Pause) - (Overlap if transition used)
-            total_expected_duration = audio_dur + intro_dur + pause_dur
-            if enable_trans and intro_dur > 0:
-                 total_expected_duration -= trans_dur
-
-            while True:
-                line = process.stderr.readline()
-                if not line and process.poll() is not None: break
-                if line:
-                    c = line.strip()
-                    full_log.append(c)
-                    
-                    if "frame=" in c or "time=" in c:
-                        parts = dict(re.findall(r'(\w+)=\s*([^ ]+)', c))
-                        time_str = parts.get('time', '00:00:00.00')
-                        
-                        try:
-                            # Конвертація часу в секунди
-                            time_parts = time_str.split(':')
-                            h = int(time_parts[0])
-                            m = int(time_parts[1])
-                            s = float(time_parts[2])
-                            time_sec = h * 3600 + m * 60 + s
-                        except (ValueError, IndexError):
-                            time_sec = 0.0
-
-                        # Calculate progress based on NEW total duration
-                        denom = total_expected_duration if total_expected_duration > 0.1 else 1.0
-                        progress = min(max((time_sec / denom) * 100, 0.0), 100.0)
-                        
-                        fps = parts.get('fps', '0')
-                        bitrate = parts.get('bitrate', 'N/A')
-                        
-                        log_line = (
-                            f"time={time_str} | "
-                            f"fps={fps} | "
-                            f"bit={bitrate} | "
-                            f"progress={progress:.2f}%"
-                        )
-                        log_progress(log_line)
-                        
-                    elif "Error" in c and "Error submitting packet to decoder" not in c:
-                        logger.log(f"{prefix}[FFmpeg] {c}", level=LogLevel.ERROR)
-                        log_progress(f"[FFmpeg] Error: {c}")
-
-            if process.returncode != 0:
-                err = "\n".join(full_log[-20:])
-                logger.log(f"{prefix}[FFmpeg] Rendering failed:\n{err}", level=LogLevel.ERROR)
-                raise Exception("FFmpeg failed.")
-        finally:
-            if filter_script_path and os.path.exists(filter_script_path):
-                os.remove(filter_script_path)
-        # Success log is handled by MontageWorker
+        return v_total
+
+    def _encoder_args(self, plan):
+        codec = plan['codec']
+        preset = plan['preset']
+        bitrate = plan['bitrate']
+        bitrate_str = f"{bitrate}M"
+        if codec == "h264_amf":
+            if preset in ["ultrafast", "superfast", "veryfast", "faster", "fast"]: u="speed"
+            elif preset == "medium": u="balanced"
+            else: u="quality"
+            return ["-quality", u, "-b:v", bitrate_str, "-pix_fmt", "yuv420p"]
+        elif codec == "h264_nvenc":
+            return ["-preset", "p4", "-b:v", bitrate_str, "-pix_fmt", "yuv420p"]
+        return ["-preset", preset, "-b:v", bitrate_str, "-maxrate", bitrate_str, "-bufsize", f"{bitrate*2}M", "-pix_fmt", "yuv420p"]
+
+    def _write_filter_script(self, graph, directory=None):
+        # Створюємо тимчасовий файл для filter_complex
+        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix=".txt", encoding='utf-8', dir=directory) as filter_file:
+            filter_file.write(graph)
+            return filter_file.name
+
+    def _clean_output_path(self, output_path):
+        # Clean output path for FFmpeg (remove \\?\ prefix which can break when slashes are flipped)
+        clean_out_path = output_path.replace("\\\\?\\", "").replace("//?/", "")
+        return clean_out_path.replace("\\", "/")
+
+    def _fmt(self, val):
+        return f"{val:.6f}".replace(",", ".")
+
+    def _run_ffmpeg(self, cmd, prefix, on_stats=None, log_progress=None, processes=None, cancel_event=None):
+        """
+        Запускає FFmpeg і кидає виняток при помилці.
+        Прогрес читається з машинного -progress у stdout (on_stats(FFmpegProgress) не частіше за PROGRESS_INTERVAL),
+        stderr іде в кільцевий буфер останніх рядків - лише для звіту про помилку.
+        """
+        cmd = cmd[:1] + PROGRESS_ARGS + cmd[1:]
+        startupinfo = None
+        if platform.system() == "Windows":
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        process = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            stdin=subprocess.DEVNULL,
+            text=True, encoding='utf-8', errors='replace', startupinfo=startupinfo
+        )
+        if processes is not None:
+            processes.append(process)
+        if cancel_event is not None and cancel_event.is_set():
+            process.terminate()
+
+        def on_error(line):
+            logger.log(f"{prefix}[FFmpeg] {line}", level=LogLevel.ERROR)
+            if log_progress:
+                log_progress(f"[FFmpeg] Error: {line}")
+
+        stderr_ring = StderrRing(process.stderr, on_error=on_error)
+        read_progress(process.stdout, on_stats)
+        process.wait()
+
+        if process.returncode != 0:
+            if cancel_event is not None and cancel_event.is_set():
+                raise Exception("FFmpeg cancelled.")
+            err = "\n".join(stderr_ring.tail(20))
+            logger.log(f"{prefix}[FFmpeg] Rendering failed:\n{err}", level=LogLevel.ERROR)
+            raise Exception("FFmpeg failed.")
 
     def _has_audio(self, path):
         """Checks if the file has an audio stream."""
-        path = path.replace("\\", "/")
-        cmd = [
-            "ffprobe", 
-            "-v", "error", 
-            "-select_streams", "a:0", 
-            "-show_entries", "stream=codec_type", 
-            "-of", "csv=p=0", 
-            path
-        ]
-        try:
-            # Use subprocess directly to avoid overhead? No, keep consistent style if possible but simple here
-            import subprocess
-            # startupinfo needed for non-blocking console on Windows
-            startupinfo = None
-            if platform.system() == 'Windows':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                
-            output = subprocess.check_output(cmd, stderr=subprocess.STDOUT, startupinfo=startupinfo).decode().strip()
-            return bool(output)
-        except Exception:
-            return False
+        return media_probe.has_audio(path)
 
     def _get_dimensions(self, path):
-        normalized_path = path.replace("\\", "/")
-        cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height", 
-               "-of", "csv=s=x:p=0", normalized_path]
-        try:
-            startupinfo = None
-            if platform.system() == "Windows":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            res = subprocess.run(cmd, capture_output=True, text=True, startupinfo=startupinfo)
-            val = res.stdout.strip().split('x')
-            if len(val) == 2:
-                return int(val[0]), int(val[1])
-            return 0, 0
-        except Exception:
-            return 0, 0
+        return media_probe.get_dimensions(path)
 
     def _get_duration(self, path):
-        normalized_path = path.replace("\\", "/")
-        cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", 
-               "-of", "default=noprint_wrappers=1:nokey=1", normalized_path]
-        try:
-            startupinfo = None
-            if platform.system() == "Windows":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            res = subprocess.run(cmd, capture_output=True, text=True, startupinfo=startupinfo)
-            val = res.stdout.strip()
-            return float(val) if val else 0
-        except Exception:
-            return 0
-        except:
-            return 0
\ No newline at end of file
+        return media_probe.get_duration(path)
@@ -0,0 +1,181 @@
+import os
+import math
+import platform
+import subprocess
+from utils.logger import logger, LogLevel
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+    np = None
+
+# Проміжні кліпи майже без втрат: вони ще раз кодуються на фінальному проході
+CLIP_CODEC_ARGS = ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "14", "-pix_fmt", "yuv420p"]
+# Амплітуда гойдання в пікселях кадру при upscale_factor=1 (zoompan множить її на upscale_factor)
+SWAY_AMP_X = 50
+SWAY_AMP_Y = 25
+
+
+def is_available():
+    return cv2 is not None
+
+
+def motion_window(n, duration, fps, base_w, base_h, motion):
+    """
+    Вікно кадру n у координатах картинки розміру base_w x base_h: (zoom, left, top).
+    Повторює вирази zoompan з MontageEngine._clip_filter, але без округлення до цілих пікселів.
+    """
+    base_zoom = 1.1 if motion['enable_sway'] else 1.0
+    zoom = base_zoom
+    if motion['enable_zoom']:
+        cycle = ((n / fps) / duration) * motion['z_spd'] if duration > 0 else 0.0
+        zoom = base_zoom + motion['z_int'] * (1 - math.cos(6.283 * cycle)) / 2
+    # zoompan обмежує zoom діапазоном [1, 10]
+    zoom = min(max(zoom, 1.0), 10.0)
+
+    left = base_w / 2 - base_w / zoom / 2
+    top = base_h / 2 - base_h / zoom / 2
+    if motion['enable_sway']:
+        s_spd = motion['s_spd']
+        left += math.sin(n * 0.02 * s_spd) * SWAY_AMP_X + math.cos(n * 0.05 * s_spd) * SWAY_AMP_X / 2
+        top += math.cos(n * 0.025 * s_spd) * SWAY_AMP_Y + math.sin(n * 0.06 * s_spd) * SWAY_AMP_Y / 2
+
+    # Як і zoompan, не даємо вікну вийти за межі картинки
+    left = min(max(left, 0.0), base_w - base_w / zoom)
+    top = min(max(top, 0.0), base_h - base_h / zoom)
+    return zoom, left, top
+
+
+def max_zoom(motion):
+    zoom = 1.1 if motion['enable_sway'] else 1.0
+    if motion['enable_zoom']:
+        zoom += max(0.0, motion['z_int'])
+    return zoom
+
+
+class AffineMotionRenderer:
+    """
+    Ken Burns без апскейлу: картинка один раз масштабується до base x max_zoom
+    (при найбільшому зумі один піксель джерела припадає на один піксель кадру),
+    а кожен кадр береться з неї через cv2.warpAffine з субпіксельною точністю.
+    Працює прямо з площинами YUV420, тож кадри йдуть у FFmpeg без перетворень кольору.
+    """
+
+    def __init__(self, base_w, base_h, fps, motion):
+        self.base_w = base_w
+        self.base_h = base_h
+        self.fps = fps
+        self.motion = motion
+        self.oversample = max_zoom(motion)
+        # YUV420 вимагає парних розмірів
+        self.src_w = int(math.ceil(base_w * self.oversample / 2)) * 2
+        self.src_h = int(math.ceil(base_h * self.oversample / 2)) * 2
+
+    def load_source(self, image_path):
+        """Читає картинку і повертає площини (Y, U, V) розміру src_w x src_h (scale=increase + crop по центру)."""
+        # imdecode замість imread - imread не відкриває не-ASCII шляхи на Windows
+        data = np.fromfile(image_path, dtype=np.uint8)
+        img = cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+        if img is None:
+            raise Exception(f"Cannot read image: {image_path}")
+
+        h, w = img.shape[:2]
+        scale = max(self.src_w / w, self.src_h / h)
+        new_w = max(self.src_w, int(math.ceil(w * scale)))
+        new_h = max(self.src_h, int(math.ceil(h * scale)))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        img = cv2.resize(img, (new_w, new_h), interpolation=interpolation)
+        x = (new_w - self.src_w) // 2
+        y = (new_h - self.src_h) // 2
+        img = img[y:y + self.src_h, x:x + self.src_w]
+
+        flat = cv2.cvtColor(img, cv2.COLOR_BGR2YUV_I420).reshape(-1)
+        luma = self.src_w * self.src_h
+        chroma = luma // 4
+        y_plane = flat[:luma].reshape(self.src_h, self.src_w)
+        u_plane = flat[luma:luma + chroma].reshape(self.src_h // 2, self.src_w // 2)
+        v_plane = flat[luma + chroma:].reshape(self.src_h // 2, self.src_w // 2)
+        return y_plane, u_plane, v_plane
+
+    def frame_matrices(self, n, duration):
+        """Матриці warpAffine (вихід -> джерело) для площини яскравості та кольорових площин."""
+        zoom, left, top = motion_window(n, duration, self.fps, self.base_w, self.base_h, self.motion)
+        k = self.oversample / zoom
+        sx = left * self.oversample
+        sy = top * self.oversample
+        # Вирівнюємо центри пікселів: src = k * (dst + 0.5) - 0.5 + зсув
+        luma = np.float32([[k, 0, sx + 0.5 * k - 0.5], [0, k, sy + 0.5 * k - 0.5]])
+        chroma = np.float32([[k, 0, sx / 2 + 0.5 * k - 0.5], [0, k, sy / 2 + 0.5 * k - 0.5]])
+        return luma, chroma
+
+    def render_frame(self, planes, n, duration):
+        """Кадр n як три площини YUV420 (Y, U, V) розміру кадру."""
+        y_plane, u_plane, v_plane = planes
+        luma_m, chroma_m = self.frame_matrices(n, duration)
+        flags = cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP
+        chroma_size = (self.base_w // 2, self.base_h // 2)
+        y_out = cv2.warpAffine(y_plane, luma_m, (self.base_w, self.base_h), flags=flags, borderMode=cv2.BORDER_REPLICATE)
+        u_out = cv2.warpAffine(u_plane, chroma_m, chroma_size, flags=flags, borderMode=cv2.BORDER_REPLICATE)
+        v_out = cv2.warpAffine(v_plane, chroma_m, chroma_size, flags=flags, borderMode=cv2.BORDER_REPLICATE)
+        return y_out, u_out, v_out
+
+    def render_pieces(self, image_path, duration, pieces, threads=None, processes=None, cancel_event=None, on_frames=None):
+        """
+        Рендерить кадри картинки шматками: pieces - список (start, end, output_path),
+        де start/end - номери кадрів кліпу. Джерело завантажується один раз на всі шматки.
+        on_frames(count) викликається після кожного шматка (для прогресу).
+        """
+        planes = self.load_source(image_path)
+        for start, end, output_path in pieces:
+            self._render_range(planes, duration, start, end, output_path, threads, processes, cancel_event)
+            if on_frames:
+                on_frames(end - start)
+
+    def _render_range(self, planes, duration, start, end, output_path, threads, processes, cancel_event):
+        cmd = [
+            "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "yuv420p", "-s", f"{self.base_w}x{self.base_h}",
+            "-r", str(self.fps), "-i", "-",
+        ]
+        cmd.extend(CLIP_CODEC_ARGS)
+        if threads:
+            cmd.extend(["-threads", str(threads)])
+        cmd.append(output_path.replace("\\", "/"))
+
+        startupinfo = None
+        if platform.system() == "Windows":
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            startupinfo=startupinfo
+        )
+        if processes is not None:
+            processes.append(process)
+
+        try:
+            for n in range(start, end):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                # Площини пишемо напряму з numpy-буферів, без склеювання в один bytes
+                for plane in self.render_frame(planes, n, duration):
+                    process.stdin.write(plane.data)
+        except OSError:
+            # FFmpeg впав - причину беремо з stderr нижче
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+        err = process.stderr.read().decode('utf-8', errors='replace').strip()
+        process.wait()
+        if cancel_event is not None and cancel_event.is_set():
+            raise Exception("FFmpeg cancelled.")
+        if process.returncode != 0:
+            logger.log(f"[Motion] Render failed for {os.path.basename(output_path)}:\n{err}", level=LogLevel.ERROR)
+            raise Exception("FFmpeg failed.")
@@ -0,0 +1,240 @@
+import os
+import math
+import time
+import threading
+from utils.logger import logger, LogLevel
+from core.media_probe import media_probe
+from core.montage_engine import MontageEngine
+from core.whisper_host import MODEL_MEMORY_MB, whisper_host
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# --- Емпірична модель вартості монтажу ---
+# FFmpeg + x264 на 1080p без урахування кадрів фільтрів
+MONTAGE_BASE_RAM_MB = 400
+# Кадри в апскейлі, які тримає граф фільтрів на кожен вхід-картинку (loop + scale/crop перед zoompan)
+FRAMES_PER_IMAGE_INPUT = 2
+# Кадри в апскейлі для активного ланцюжка zoompan/xfade
+ACTIVE_CHAIN_FRAMES = 6
+# Процес FFmpeg монтажу впирається в однопотоковий граф фільтрів (zoompan/xfade) - x264 рідко завантажує більше ~3 ядер,
+# навіть коли отримав більше потоків
+FFMPEG_PROCESS_CPU_CORES = 3.0
+DISK_MARGIN_MB = 200
+# Рендер шматками (affine / кеш кліпів): воркер тримає джерело однієї картинки + процес x264 для шматків
+PIECE_WORKER_RAM_MB = 250
+# Проміжні шматки (x264 crf 14) на секунду відео
+PIECES_MB_PER_SEC = 5
+# Тривалість, якщо аудіо ще не вдалося прочитати
+FALLBACK_DURATION_SEC = 600
+
+# --- Бюджет ---
+# Скільки RAM завжди лишаємо системі
+RAM_RESERVE_MB = 1024
+# Максимальна частка загальної RAM, яку можуть зарезервувати всі важкі задачі разом
+MAX_RAM_SHARE = 0.85
+# Допустиме перевантаження CPU (задача просто працює повільніше, а не падає)
+CPU_OVERSUBSCRIPTION = 1.5
+# Перші секунди після старту процес ще не встиг зайняти пам'ять - psutil її не бачить, тому рахуємо резерв
+WARMUP_SECONDS = 30
+
+
+class ResourceGovernor:
+    """
+    Адаптивне обмеження важких задач (монтаж FFmpeg, локальний Whisper).
+    Кожна задача оцінюється (ядра CPU, RAM, місце на диску) і стартує лише тоді, коли вкладається
+    у поточний бюджет, виміряний через psutil, з урахуванням уже запущених задач.
+    Без psutil governor вимкнений і TaskProcessor використовує статичні семафори.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.reservations = {} # key -> {'kind', 'cost', 'started'}
+        self.cpu_count = os.cpu_count() or 4
+        self.montage_engine = MontageEngine()
+        if psutil:
+            # Перший виклик cpu_percent(None) завжди повертає 0 - "запускаємо" вимірювання
+            psutil.cpu_percent(interval=None)
+
+    def is_enabled(self):
+        return psutil is not None and self.settings.get("montage", {}).get("adaptive_concurrency", True)
+
+    # --- Оцінка вартості ---
+
+    def estimate_montage(self, state):
+        montage_settings = state.settings.get("montage", {})
+        up_factor = float(montage_settings.get('upscale_factor', 3.0) or 1.0)
+        up_pixels = 1920 * 1080 * up_factor * up_factor
+        frame_mb = up_pixels * 1.5 / (1024 * 1024) # yuv420p
+
+        image_exts = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+        visual_files = state.image_paths or []
+        image_count = sum(1 for p in visual_files if p.lower().endswith(image_exts))
+        video_count = len(visual_files) - image_count
+
+        duration = media_probe.get_duration(state.audio_path) if state.audio_path else 0
+        if not duration:
+            duration = FALLBACK_DURATION_SEC
+
+        affine = montage_settings.get('motion_engine', 'zoompan') == 'affine'
+        route = self.montage_engine.render_route(
+            montage_settings, len(visual_files), state.settings.get('clip_cache', {}).get('enabled', False)
+        )
+        if route['path'] == 'pieces':
+            # Граф фільтрів не тримає кадрів картинок: пам'ять росте з кількістю воркерів, а не картинок
+            workers = min(max(1, min(8, self.cpu_count // 2)), max(1, len(visual_files)))
+            worker_ram = PIECE_WORKER_RAM_MB if affine else PIECE_WORKER_RAM_MB + ACTIVE_CHAIN_FRAMES * frame_mb
+            bitrate = float(montage_settings.get('bitrate_mbps', 15) or 15)
+            return {
+                'cpu': self._ffmpeg_cpu(workers),
+                'ram_mb': MONTAGE_BASE_RAM_MB + workers * worker_ram + video_count * 50,
+                'disk_mb': (bitrate / 8 + PIECES_MB_PER_SEC) * duration + DISK_MARGIN_MB,
+                'disk_path': state.dir_path,
+            }
+
+        # Кожен процес FFmpeg тримає кадри лише своїх картинок: сегмента чи вікна, а не всього монтажу
+        processes = route['processes']
+        if route['segmented']:
+            images_per_process = math.ceil(image_count * route['clips_per_process'] / max(1, len(visual_files)))
+            disk_factor = 2 # сегменти + фінальний файл
+        else:
+            images_per_process = image_count
+            disk_factor = 1
+        cpu = self._ffmpeg_cpu(processes)
+
+        ram = (processes * (MONTAGE_BASE_RAM_MB + (ACTIVE_CHAIN_FRAMES + images_per_process * FRAMES_PER_IMAGE_INPUT) * frame_mb)
+               + video_count * 50)
+        bitrate = float(montage_settings.get('bitrate_mbps', 15) or 15)
+        disk = bitrate * duration / 8 * disk_factor + DISK_MARGIN_MB
+
+        return {'cpu': cpu, 'ram_mb': ram, 'disk_mb': disk, 'disk_path': state.dir_path}
+
+    def _ffmpeg_cpu(self, processes):
+        # Як у MontageEngine: паралельні процеси ділять ядра порівну (-threads cpu_count // processes)
+        threads = max(1, self.cpu_count // max(1, processes))
+        return processes * min(float(threads), FFMPEG_PROCESS_CPU_CORES)
+
+    def estimate_whisper(self, state):
+        sub_settings = state.settings.get('subtitles', {})
+        whisper_type = sub_settings.get('whisper_type', 'standard')
+        if whisper_type == 'assemblyai':
+            return None
+        if whisper_type == 'amd':
+            # whisper.cpp рахує на GPU - для CPU/RAM це легка задача
+            return {'cpu': 1.0, 'ram_mb': 500, 'disk_mb': 0, 'disk_path': None}
+        model_name = sub_settings.get('whisper_model', 'base').replace('.bin', '')
+        # Процес пулу Whisper обмежений своєю часткою ядер; довге аудіо, поділене на шматки, займає весь пул
+        processes = whisper_host.capacity(sub_settings, model_name) if sub_settings.get('chunked_transcription', False) else 1
+        return {
+            'cpu': float(whisper_host.threads_per_worker(sub_settings) * processes),
+            'ram_mb': MODEL_MEMORY_MB.get(model_name, 2000) * processes,
+            'disk_mb': 0,
+            'disk_path': None,
+        }
+
+    # --- Бюджет ---
+
+    def sample(self):
+        """Поточний стан системи: вільні ядра, доступна й загальна RAM (МБ)."""
+        memory = psutil.virtual_memory()
+        busy_cores = psutil.cpu_percent(interval=None) / 100.0 * self.cpu_count
+        return {
+            'free_cores': max(0.0, self.cpu_count - busy_cores),
+            'ram_available_mb': memory.available / (1024 * 1024),
+            'ram_total_mb': memory.total / (1024 * 1024),
+        }
+
+    def _disk_free_mb(self, path):
+        while path and not os.path.isdir(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+        if not path:
+            return None
+        try:
+            return psutil.disk_usage(path).free / (1024 * 1024)
+        except Exception:
+            return None
+
+    def try_reserve(self, key, kind, cost):
+        """
+        Резервує ресурси під задачу, якщо вона вкладається в бюджет. Повертає (ok, reason).
+        Якщо жодна важка задача не виконується, задача стартує завжди - інакше черга може зависнути назавжди.
+        """
+        with self.lock:
+            if key in self.reservations:
+                return True, None
+            if cost is None:
+                return True, None
+
+            reason = None
+            if self.reservations:
+                reason = self._check_budget(cost)
+            else:
+                disk_reason = self._check_disk(cost)
+                if disk_reason:
+                    logger.log(f"[Governor] {key}: {disk_reason}. Starting anyway - nothing else is running.", level=LogLevel.WARNING)
+
+            if reason:
+                return False, reason
+
+            self.reservations[key] = {'kind': kind, 'cost': cost, 'started': time.monotonic()}
+            return True, None
+
+    def release(self, key):
+        with self.lock:
+            return self.reservations.pop(key, None) is not None
+
+    def has_reservation(self, key):
+        with self.lock:
+            return key in self.reservations
+
+    def running_count(self, kind=None):
+        with self.lock:
+            return sum(1 for r in self.reservations.values() if kind is None or r['kind'] == kind)
+
+    def describe(self, cost):
+        return f"~{cost['cpu']:.1f} cores, ~{cost['ram_mb']:.0f} MB RAM, ~{cost['disk_mb']:.0f} MB disk"
+
+    def _check_budget(self, cost):
+        snapshot = self.sample()
+        now = time.monotonic()
+        running = list(self.reservations.values())
+        warming_up = [r['cost'] for r in running if now - r['started'] < WARMUP_SECONDS]
+
+        # RAM: виміряна доступна пам'ять мінус резерв задач, які ще не встигли її зайняти
+        ram_available = snapshot['ram_available_mb'] - sum(c['ram_mb'] for c in warming_up) - RAM_RESERVE_MB
+        if cost['ram_mb'] > ram_available:
+            return f"needs ~{cost['ram_mb']:.0f} MB RAM, ~{max(0, ram_available):.0f} MB available"
+        ram_reserved = sum(r['cost']['ram_mb'] for r in running)
+        if ram_reserved + cost['ram_mb'] > snapshot['ram_total_mb'] * MAX_RAM_SHARE:
+            return f"RAM budget exhausted ({ram_reserved:.0f} MB reserved by running jobs)"
+
+        # CPU: резерв наших задач плюс стороннє навантаження - не більше CPU_OVERSUBSCRIPTION від ядер.
+        # Сторонні програми - це зайняті ядра понад резерв наших задач, що вже розігрілись (ті, що розігріваються,
+        # psutil ще не бачить). Вимога "половина потрібних ядер вільна" тут не годиться: запущений монтаж
+        # законно займає свої ядра, і другий не стартував би навіть на 32-ядерному сервері.
+        cpu_reserved = sum(r['cost']['cpu'] for r in running)
+        settled_cpu = cpu_reserved - sum(c['cpu'] for c in warming_up)
+        foreign_cpu = max(0.0, self.cpu_count - snapshot['free_cores'] - settled_cpu)
+        if cpu_reserved + foreign_cpu + cost['cpu'] > self.cpu_count * CPU_OVERSUBSCRIPTION:
+            return (f"CPU budget exhausted ({cpu_reserved:.1f} of {self.cpu_count} cores reserved, "
+                    f"~{foreign_cpu:.1f} busy with other programs)")
+
+        return self._check_disk(cost, running)
+
+    def _check_disk(self, cost, running=()):
+        if not cost.get('disk_mb') or not cost.get('disk_path'):
+            return None
+        free = self._disk_free_mb(cost['disk_path'])
+        if free is None:
+            return None
+        # Запущені монтажі ще допишуть свої файли - віднімаємо їх оцінку від вільного місця
+        pending_writes = sum(r['cost']['disk_mb'] for r in running if r['cost'].get('disk_path'))
+        if cost['disk_mb'] > free - pending_writes:
+            return f"needs ~{cost['disk_mb']:.0f} MB disk, ~{max(0, free - pending_writes):.0f} MB free"
+        return None
@@ -0,0 +1,200 @@
+import re
+import bisect
+from utils.logger import logger, LogLevel
+from core import audio_chunker
+
+# TTS робить між реченнями паузу ~0.3-0.8 с, всередині речення (коми) ~0.1-0.3 с
+PAUSE_NOISE_DB = -40
+PAUSE_MIN_SEC = 0.15
+# Допустиме відхилення тривалості речення від оцінки за кількістю символів (частка); далі штраф росте квадратично
+DURATION_TOLERANCE = 0.35
+# Речення не буває довшим чи коротшим за оцінку більше ніж у стільки разів (обмежує перебір)
+MAX_STRETCH = 3.0
+# Бонус за секунду паузи на межі речень: довгі паузи - ймовірні кінці речень
+PAUSE_WEIGHT = 2.0
+# Межа речення шукається не далі цього від оцінки за кількістю символів (частка тривалості / секунди)
+SEARCH_BAND_SHARE = 0.15
+SEARCH_BAND_MIN_SEC = 30
+# Якщо середня відносна похибка тривалостей речень більша - вирівнювання ненадійне і працює розпізнавання
+MAX_MEAN_ERROR = 0.4
+
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?…])\s+|\n+')
+
+
+def split_sentences(text):
+    """Речення сценарію, які реально озвучуються (без порожніх рядків і розділювачів на кшталт '***')."""
+    sentences = []
+    for part in _SENTENCE_SPLIT_RE.split(text or ""):
+        part = " ".join(part.split())
+        if any(ch.isalnum() for ch in part):
+            sentences.append(part)
+    return sentences
+
+
+def _weight(text):
+    # Час вимови приблизно пропорційний кількості літер і цифр
+    return max(1, sum(1 for ch in text if ch.isalnum()))
+
+
+class ScriptAligner:
+    """
+    Вирівнювання відомого тексту озвучки на аудіо без розпізнавання мови.
+    TTS вимовляє рівно текст сценарію з паузами між реченнями, тож достатньо знайти паузи (ffmpeg silencedetect)
+    і вибрати серед них межі речень: динамічне програмування мінімізує відхилення тривалості кожного речення
+    від оцінки за кількістю символів і віддає перевагу довшим паузам. Слова всередині речення отримують час
+    пропорційно довжині, пропускаючи внутрішні паузи.
+    Повертає None, якщо аудіо не схоже на цей текст - тоді субтитри робить звичайне розпізнавання.
+    """
+
+    def align(self, audio_path, text, max_words=10):
+        sentences = split_sentences(text)
+        if not sentences:
+            return None
+
+        duration, silences = audio_chunker.detect_silences(audio_path, noise_db=PAUSE_NOISE_DB, min_silence=PAUSE_MIN_SEC)
+        if duration <= 0:
+            return None
+        speech_start, speech_end, pauses = self._speech_bounds(duration, silences)
+        if speech_end <= speech_start:
+            return None
+        if len(pauses) < len(sentences) - 1:
+            logger.log(f"Script alignment: {len(sentences)} sentences but only {len(pauses)} pauses in the audio.", LogLevel.WARNING)
+            return None
+
+        # Час мовлення (без пауз) до початку кожної паузи
+        speech_before = []
+        paused = speech_start
+        for start, end in pauses:
+            speech_before.append(start - paused)
+            paused += end - start
+        total_speech = speech_end - paused
+
+        weights = [_weight(s) for s in sentences]
+        rate = total_speech / sum(weights)
+        boundaries = self._choose_boundaries(weights, rate, speech_before, total_speech, pauses)
+        if boundaries is None:
+            logger.log("Script alignment: no consistent placement of sentences on pauses.", LogLevel.WARNING)
+            return None
+
+        # Перевірка якості: тривалості речень мають відповідати тексту
+        cums = [0.0] + [speech_before[k] for k in boundaries] + [total_speech]
+        errors = [abs((cums[i + 1] - cums[i]) - w * rate) / (w * rate) for i, w in enumerate(weights)]
+        mean_error = sum(errors) / len(errors)
+        if mean_error > MAX_MEAN_ERROR:
+            logger.log(f"Script alignment rejected: mean sentence duration error {mean_error:.0%}.", LogLevel.WARNING)
+            return None
+
+        starts = [speech_start] + [pauses[k][1] for k in boundaries]
+        ends = [pauses[k][0] for k in boundaries] + [speech_end]
+        segments = []
+        for sentence, start, end in zip(sentences, starts, ends):
+            inner = [p for p in pauses if p[0] >= start and p[1] <= end]
+            words = self._time_words(sentence.split(), start, end, inner)
+            for i in range(0, len(words), max(1, max_words)):
+                group = words[i:i + max_words]
+                segments.append({'start': group[0][1], 'end': group[-1][2], 'text': " ".join(w for w, _, _ in group)})
+
+        logger.log(
+            f"Script alignment: {len(sentences)} sentences on {len(pauses)} pauses, "
+            f"mean duration error {mean_error:.0%}", LogLevel.INFO
+        )
+        return segments
+
+    def _speech_bounds(self, duration, silences):
+        speech_start, speech_end = 0.0, duration
+        pauses = []
+        for start, end in silences:
+            if start <= 0.05:
+                speech_start = end # тиша на початку файлу
+            elif end >= duration - 0.05:
+                speech_end = start # тиша в кінці файлу
+            else:
+                pauses.append((start, end))
+        pauses = [p for p in pauses if speech_start < p[0] and p[1] < speech_end]
+        return speech_start, speech_end, pauses
+
+    def _choose_boundaries(self, weights, rate, speech_before, total_speech, pauses):
+        """Індекси пауз, що відділяють речення (len(weights) - 1 штук), або None."""
+        count = len(weights)
+        if count == 1:
+            return []
+        band = max(SEARCH_BAND_MIN_SEC, total_speech * SEARCH_BAND_SHARE)
+
+        def sentence_cost(i, speech):
+            expected = weights[i] * rate
+            if speech < expected / MAX_STRETCH or speech > expected * MAX_STRETCH:
+                return None
+            return ((speech - expected) / (expected * DURATION_TOLERANCE + 0.3)) ** 2
+
+        # states: індекс паузи -> (вартість, попередній індекс паузи) для межі після речення i
+        states = {-1: (0.0, None)}
+        history = []
+        expected_cum = 0.0
+        for i in range(count - 1):
+            expected_cum += weights[i] * rate
+            low = bisect.bisect_left(speech_before, expected_cum - band)
+            high = bisect.bisect_right(speech_before, expected_cum + band)
+            prev_keys = sorted(states)
+            new_states = {}
+            for k in range(low, high):
+                best = None
+                for prev in prev_keys:
+                    if prev >= k:
+                        break
+                    speech = speech_before[k] - (speech_before[prev] if prev >= 0 else 0.0)
+                    cost = sentence_cost(i, speech)
+                    if cost is None:
+                        continue
+                    cost += states[prev][0] - PAUSE_WEIGHT * (pauses[k][1] - pauses[k][0])
+                    if best is None or cost < best[0]:
+                        best = (cost, prev)
+                if best is not None:
+                    new_states[k] = best
+            if not new_states:
+                return None
+            history.append(new_states)
+            states = new_states
+
+        best = None
+        for k, (cost, _) in states.items():
+            last = sentence_cost(count - 1, total_speech - speech_before[k])
+            if last is not None and (best is None or cost + last < best[0]):
+                best = (cost + last, k)
+        if best is None:
+            return None
+
+        boundaries = [best[1]]
+        for states in reversed(history[1:]):
+            boundaries.append(states[boundaries[-1]][1])
+        boundaries.reverse()
+        return boundaries
+
+    def _time_words(self, words, start, end, inner_pauses):
+        """[(слово, початок, кінець)] - час мовлення [start, end] без внутрішніх пауз ділиться пропорційно довжині слів."""
+        regions = []
+        cursor = start
+        for p_start, p_end in inner_pauses:
+            regions.append((cursor, p_start))
+            cursor = p_end
+        regions.append((cursor, end))
+        total = sum(r_end - r_start for r_start, r_end in regions)
+
+        def to_time(offset):
+            for r_start, r_end in regions:
+                length = r_end - r_start
+                if offset <= length:
+                    return r_start + offset
+                offset -= length
+            return end
+
+        weights = [_weight(w) for w in words]
+        scale = total / sum(weights)
+        timed = []
+        offset = 0.0
+        for word, weight in zip(words, weights):
+            word_start = to_time(offset)
+            offset += weight * scale
+            timed.append((word, word_start, to_time(offset)))
+        return timed
+
+script_aligner = ScriptAligner()
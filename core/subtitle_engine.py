@@ -4,18 +4,42 @@ import re
 import datetime
 import time
 import platform
+import shutil
+import tempfile
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from api.assemblyai import assembly_ai_api
 from utils.logger import logger, LogLevel
+from core.whisper_host import whisper_host
+from core import audio_chunker
+from core.script_aligner import script_aligner
+from core import tts_timing
+from core.transcript_cache import transcript_cache
 
 
 
 class SubtitleEngine:
-    def __init__(self, exe_path=None, model_path=None):
+    def __init__(self, exe_path=None, model_path=None, job_id=None):
         self.exe_path = exe_path
         self.model_path = model_path
-
-    def generate_ass(self, audio_path, output_path, settings, language='en'):
-        segments = self._get_segments(audio_path, settings, language)
+        self.job_id = job_id # ключ для whisper_host.cancel()
+
+    def generate_ass(self, audio_path, output_path, settings, language='en', script_text=None):
+        segments = None
+        words = tts_timing.load(audio_path)
+        if words:
+            # TTS повернув час кожного слова - розпізнавання не потрібне
+            logger.log(f"SubtitleEngine: Using {len(words)} word timings from TTS", LogLevel.INFO)
+            segments = tts_timing.to_segments(words, settings.get('max_words', 10), script_text)
+        elif script_text and settings.get('align_to_script', False):
+            # Текст озвучки відомий - вирівнюємо його на аудіо замість розпізнавання
+            try:
+                segments = script_aligner.align(audio_path, script_text, max_words=settings.get('max_words', 10))
+            except Exception as e:
+                logger.log(f"Script alignment failed, falling back to speech recognition: {e}", LogLevel.WARNING)
+        if segments is None:
+            segments = self._get_segments(audio_path, settings, language)
         
         if not segments:
             raise Exception("No subtitles generated (segments list empty).")
@@ -37,6 +61,18 @@ class SubtitleEngine:
         return " ".join([seg['text'] for seg in segments])
 
     def _get_segments(self, audio_path, settings, language='en'):
+        # Сирі сегменти (до _split_long_lines) залежать лише від аудіо, рушія, моделі та мови -
+        # зміна стилю чи довжини рядка не потребує повторного розпізнавання
+        segments = transcript_cache.lookup(audio_path, settings, self.model_path, language)
+        if segments:
+            logger.log(f"SubtitleEngine: Using {len(segments)} cached segments for {os.path.basename(audio_path)}", LogLevel.INFO)
+            return segments
+
+        segments = self._transcribe(audio_path, settings, language)
+        transcript_cache.store(audio_path, settings, self.model_path, language, segments)
+        return segments
+
+    def _transcribe(self, audio_path, settings, language='en'):
         engine_type = settings.get('whisper_type', 'standard')
         logger.log(f"SubtitleEngine: Generating segments using '{engine_type}' for {language}", LogLevel.DEBUG)
         
@@ -69,9 +105,8 @@ class SubtitleEngine:
             # --- Standard Python Whisper ---
             actual_model = self.model_path.replace(".bin", "") if self.model_path else "base"
             logger.log(f"Running Standard Whisper (Python): Model={actual_model}, Lang={language}", LogLevel.INFO)
-            try:
-                import whisper
-            except ImportError:
+            # Сам whisper (і torch) завантажується лише в процесі-хості
+            if importlib.util.find_spec("whisper") is None:
                 raise ImportError("Library 'openai-whisper' not installed. Run: pip install openai-whisper")
 
             # Check if model exists and log if it needs to be downloaded
@@ -81,18 +116,13 @@ class SubtitleEngine:
                 from utils.translator import translator
                 logger.log(translator.translate("whisper_model_download_info", "Whisper model '{model_name}' not found. Starting one-time download. This may take some time...").format(model_name=actual_model), LogLevel.INFO)
 
-            model = whisper.load_model(actual_model)
-            
             # Pass language=None for auto-detection in standard whisper
             whisper_lang = language if language != 'auto' else None
-            result = model.transcribe(audio_path, language=whisper_lang)
-            
-            for s in result['segments']:
-                segments.append({
-                    'start': s['start'],
-                    'end': s['end'],
-                    'text': s['text'].strip()
-                })
+            segments = None
+            if settings.get('chunked_transcription', False):
+                segments = self._transcribe_chunked(actual_model, audio_path, whisper_lang, settings)
+            if segments is None:
+                segments = whisper_host.transcribe(actual_model, audio_path, language=whisper_lang, settings=settings, job_id=self.job_id)
 
         else: # amd
             # --- AMD / Fork Whisper (EXE) ---
@@ -194,6 +224,58 @@ class SubtitleEngine:
 
         return segments
 
+    def _transcribe_chunked(self, model_name, audio_path, language, settings):
+        """
+        Ділить аудіо по паузах на шматки й транскрибує їх паралельно в процесах пулу Whisper.
+        Повертає сегменти з часом від початку файлу або None, якщо ділити не варто.
+        """
+        workers = whisper_host.capacity(settings, model_name)
+        if workers < 2:
+            logger.log("Chunked transcription skipped: the Whisper pool has a single process.", LogLevel.DEBUG)
+            return None
+        try:
+            duration, silences = audio_chunker.detect_silences(audio_path)
+        except Exception as e:
+            logger.log(f"Chunked transcription skipped: {e}", LogLevel.WARNING)
+            return None
+        if duration < audio_chunker.MIN_CHUNKED_AUDIO_SEC:
+            return None
+        pieces = audio_chunker.plan_chunks(duration, silences, workers)
+        if len(pieces) < 2:
+            logger.log("Chunked transcription skipped: no pauses to cut at.", LogLevel.DEBUG)
+            return None
+
+        logger.log(f"Transcribing {duration:.0f}s in {len(pieces)} chunks cut at pauses ({workers} Whisper processes)", LogLevel.INFO)
+        job_id = self.job_id if self.job_id is not None else id(self)
+        failed = threading.Event()
+        work_dir = tempfile.mkdtemp(prefix="whisper_chunks_")
+        try:
+            with ThreadPoolExecutor(max_workers=min(workers, len(pieces))) as executor:
+                futures = [
+                    executor.submit(self._transcribe_chunk, model_name, audio_path, start, end,
+                                    os.path.join(work_dir, f"chunk_{i:03d}.wav"), language, settings, (job_id, i), failed)
+                    for i, (start, end) in enumerate(pieces)
+                ]
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                errors = [future.exception() for future in done if future.exception() is not None]
+                if errors:
+                    # Один шматок упав (або задачу скасовано) - решта вже не потрібні
+                    failed.set()
+                    whisper_host.cancel(job_id)
+                    raise errors[0]
+                results = [future.result() for future in futures]
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return audio_chunker.stitch_segments(results, pieces)
+
+    def _transcribe_chunk(self, model_name, audio_path, start, end, chunk_path, language, settings, job_id, failed):
+        if failed.is_set():
+            raise Exception("Transcription cancelled.")
+        audio_chunker.extract_chunk(audio_path, start, end, chunk_path)
+        if failed.is_set():
+            raise Exception("Transcription cancelled.")
+        return whisper_host.transcribe(model_name, chunk_path, language=language, settings=settings, job_id=job_id)
+
     def _parse_srt(self, filename):
         encodings = ['utf-8', 'utf-8-sig', 'cp1252', 'cp1251', 'latin-1']
         content = None
@@ -9,7 +9,7 @@ import copy
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 
-from PySide6.QtCore import QObject, Signal, QThreadPool, QElapsedTimer, QSemaphore, Slot
+from PySide6.QtCore import QObject, Signal, QThreadPool, QElapsedTimer, QSemaphore, QTimer, Slot
 
 from utils.logger import logger, LogLevel
 from utils.settings import settings_manager, template_manager
@@ -18,6 +18,8 @@ from core.notification_manager import notification_manager
 from core.history_manager import history_manager
 
 from core.task_state import TaskState
+from core.resource_governor import ResourceGovernor
+from core.whisper_host import whisper_host
 
 # Mixins
 from core.mixins.download_mixin import DownloadMixin
@@ -74,11 +76,17 @@ class TaskProcessor(QObject, DownloadMixin, TranslationMixin, SubtitleMixin, Ima
         self.image_review_notification_emitted = False
 
         # --- Semaphores for concurrency control ---
-        self.subtitle_semaphore = QSemaphore(1)
+        # Local Whisper concurrency follows the whisper_host process pool (core/whisper_host.py)
+        self.whisper_slot_tasks = set()
         montage_settings = self.settings.get("montage", {})
         max_montage = montage_settings.get("max_concurrent_montages", 1)
         self.montage_semaphore = QSemaphore(max_montage)
 
+        # Adaptive limit for montages and local Whisper (replaces montage_semaphore when enabled)
+        self.resource_governor = ResourceGovernor(self.settings)
+        self._governor_retry_scheduled = False
+        self._governor_deferred_reasons = {}
+
         googler_settings = self.settings.get("googler", {})
         max_googler = googler_settings.get("max_threads", 1)
         self.googler_semaphore = QSemaphore(max_googler)
@@ -97,6 +105,9 @@ class TaskProcessor(QObject, DownloadMixin, TranslationMixin, SubtitleMixin, Ima
         # Queues for preventing thread starvation
         self.whisper_queue = collections.deque()
         self.pending_montages = collections.deque()
+        # Для впорядкування черги монтажів за оцінкою часу (core/montage_cost_model.py)
+        self.montage_queued_at = {}
+        self.montage_predictions = {}
         
         # Download concurrency
         max_downloads = self.settings.get("max_download_threads", 5)
@@ -137,14 +148,12 @@ class TaskProcessor(QObject, DownloadMixin, TranslationMixin, SubtitleMixin, Ima
         self.pending_subtitles = collections.deque()
         self.active_workers = set() # Track for Segfault prevention
         
-        logger.log(f"Task Processor initialized. Download concurrency: {max_downloads}, Subtitle concurrency: 1, Montage concurrency: {max_montage}, Googler concurrency: {max_googler}, Video concurrency: {max_video}", level=LogLevel.INFO)
+        sub_settings = self.settings.get("subtitles", {})
+        logger.log(f"Task Processor initialized. Download concurrency: {max_downloads}, Subtitle concurrency: {whisper_host.capacity(sub_settings, sub_settings.get('whisper_model', 'base'))}, Montage concurrency: {'adaptive' if self.resource_governor.is_enabled() else max_montage}, Googler concurrency: {max_googler}, Video concurrency: {max_video}", level=LogLevel.INFO)
 
     def _are_subtitles_running(self):
         """Checks if any subtitle or transcription workers are currently active."""
-        # Using self.subtitle_semaphore.available() < 1 is not fully reliable if we start allowing >1,
-        # but for now Subtitle concurrency is 1.
-        # Better: check active_workers list for instances of SubtitleWorker or TranscriptionWorker.
-        # Or check if semaphore is acquired.
+        # whisper_slot_tasks does not include AssemblyAI jobs, so check active_workers instead.
         from core.workers import SubtitleWorker, TranscriptionWorker
         for worker in self.active_workers:
              if isinstance(worker, (SubtitleWorker, TranscriptionWorker)):
@@ -159,6 +168,32 @@ class TaskProcessor(QObject, DownloadMixin, TranslationMixin, SubtitleMixin, Ima
                  return True
         return False
 
+    def _montage_and_subs_exclusive(self):
+        """Монтаж і субтитри не можуть виконуватись одночасно (статичний режим без simultaneous_montage_and_subs)."""
+        if self.resource_governor.is_enabled():
+            return False
+        return not self.settings.get("simultaneous_montage_and_subs", False)
+
+    def _defer_by_governor(self, key, reason):
+        # Логуємо лише зміну причини, щоб повторні перевірки не засмічували лог
+        if self._governor_deferred_reasons.get(key) != reason:
+            self._governor_deferred_reasons[key] = reason
+            logger.log(f"[{key[1]}] {key[0].capitalize()} deferred by resource governor: {reason}.", level=LogLevel.INFO)
+        self._schedule_governor_retry()
+
+    def _schedule_governor_retry(self):
+        # Ресурси звільняються не лише після завершення наших задач (прогрів процесу, інші програми),
+        # тому відкладені задачі перевіряються ще й за таймером
+        if self._governor_retry_scheduled:
+            return
+        self._governor_retry_scheduled = True
+        QTimer.singleShot(5000, self._on_governor_retry)
+
+    def _on_governor_retry(self):
+        self._governor_retry_scheduled = False
+        self._process_montage_queue()
+        self._process_whisper_queue()
+
     def start_processing(self):
         self.processing_started.emit()
         self.start_time = time.time()
@@ -226,6 +261,21 @@ class TaskProcessor(QObject, DownloadMixin, TranslationMixin, SubtitleMixin, Ima
                     else:
                         logger.log(f"[{job['name']}_{lang_id}] Template '{template_name}' not found. Using global settings.", level=LogLevel.WARNING)
 
+                # Per-job settings overrides (e.g. from a batch job file), applied on top of the template
+                settings_overrides = job.get('settings_overrides') or {}
+                for key, value in settings_overrides.items():
+                    if key == 'languages_config':
+                        # Мовні налаштування оновлюємо по кожній мові, не замінюючи весь конфіг мови
+                        for override_lang_id, override_cfg in value.items():
+                            current_settings.setdefault('languages_config', {}).setdefault(override_lang_id, {}).update(copy.deepcopy(override_cfg))
+                    elif isinstance(value, dict) and key in current_settings and isinstance(current_settings[key], dict):
+                        current_settings[key].update(copy.deepcopy(value))
+                    else:
+                        current_settings[key] = copy.deepcopy(value)
+                override_lang_cfg = settings_overrides.get('languages_config', {}).get(lang_id, {})
+                if override_lang_cfg:
+                    lang_data.update(copy.deepcopy(override_lang_cfg))
+
                 base_save_path = current_settings.get('results_path')
 
                 merged_lang_config = current_settings.get("languages_config", {}).get(lang_id, {})
@@ -558,6 +608,8 @@ class TaskProcessor(QObject, DownloadMixin, TranslationMixin, SubtitleMixin, Ima
         if not state: return
 
         state.status[stage_key] = status
+        if status == 'error' and error_message:
+            state.stage_errors[stage_key] = error_message
         self.stage_status_changed.emit(state.job_id, state.lang_id, stage_key, status)
         
         if status == 'review_required':
@@ -694,6 +746,9 @@ class TaskProcessor(QObject, DownloadMixin, TranslationMixin, SubtitleMixin, Ima
             except Exception as e:
                 logger.log(f"Error shutting down elevenlabs_executor: {e}", level=LogLevel.WARNING)
         
+        # Транскрибація в процесі пулу Whisper може тривати хвилини - завершуємо процеси, щоб потоки не чекали на них
+        whisper_host.cancel_all()
+
         if hasattr(self, 'threadpool'):
             try:
                 self.threadpool.clear()
@@ -24,14 +24,18 @@ class TaskState:
         self.text_for_processing = None
         self.image_prompts = None
         self.audio_path = None
+        self.audio_digest = None # sha256 озвучки, порахований воркером (для кешу розпізнавання)
         self.subtitle_path = None
         self.image_paths = None
         self.final_video_path = None
 
         self.status = {stage: 'pending' for stage in self.stages}
+        self.stage_errors = {} # stage_key -> last error message
         self.translation_review_dialog_shown = False
         self.rewrite_review_dialog_shown = False
         self.prompt_regeneration_attempts = 0
+        # Етапи, для яких наступний запит до LLM має оминути кеш відповідей (регенерація)
+        self.completion_cache_refresh = set()
         self.image_gen_status = 'pending'
         
         # Metadata counters
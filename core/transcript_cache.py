@@ -0,0 +1,83 @@
+import os
+import time
+from utils.settings import settings_manager
+from utils.logger import logger, LogLevel
+from utils.file_cache import JsonEntryStore, file_digests
+
+# Змінюється разом з форматом сегментів - старі записи тоді просто перестають збігатися
+TRANSCRIPT_CACHE_VERSION = 2
+
+
+class TranscriptCache(JsonEntryStore):
+    """
+    Персистентний кеш результатів розпізнавання мови - сирих сегментів (text, start, end) до розбиття на рядки.
+    Ключ - sha256 від вмісту аудіо, рушія (assemblyai / standard / amd), моделі та мови, тож зміна стилю,
+    шрифту чи кількості слів у рядку перебудовує ASS з кешу, а повторний запуск задачі з тією самою
+    озвучкою не запускає Whisper. Записи - JSON-файли у cache/transcripts з TTL та лімітом розміру.
+    """
+
+    DEFAULT_TTL_HOURS = 720
+    DEFAULT_MAX_SIZE_MB = 100
+
+    def __init__(self, cache_dir_name='transcripts'):
+        super().__init__(cache_dir_name)
+
+    def _config(self):
+        return settings_manager.get('transcript_cache', {}) or {}
+
+    def is_enabled(self):
+        return self._config().get('enabled', True)
+
+    def prepare(self, audio_path):
+        """Рахує digest аудіо в потоці воркера, щоб перевірка кешу з черги Whisper (GUI-потік) не читала файл."""
+        if not self.is_enabled() or not audio_path or not os.path.exists(audio_path):
+            return
+        try:
+            file_digests.file_digest(audio_path)
+        except OSError:
+            pass
+
+    def make_payload(self, audio_path, settings, model_path, language, digest=None):
+        engine = settings.get('whisper_type', 'standard')
+        payload = {
+            'version': TRANSCRIPT_CACHE_VERSION,
+            'audio': digest or file_digests.file_digest(audio_path),
+            'engine': engine,
+            'language': language,
+        }
+        if engine == 'assemblyai':
+            # AssemblyAI ділить текст на рядки на сервері - довжина рядка входить у результат
+            payload['model'] = engine
+            payload['chars_per_caption'] = settings.get('max_words', 10) * 5
+        else:
+            # Лише ім'я моделі: шлях до whisper-cli-amd різний на різних машинах
+            payload['model'] = os.path.basename(model_path or "base").replace(".bin", "")
+        return payload
+
+    def lookup(self, audio_path, settings, model_path, language, digest=None):
+        """Сегменти з кешу або None. digest - уже відомий sha256 аудіо (тоді файл не читається)."""
+        if not self.is_enabled() or not audio_path or not os.path.exists(audio_path):
+            return None
+        try:
+            payload = self.make_payload(audio_path, settings, model_path, language, digest)
+        except OSError:
+            return None
+        entry = self.read(self.make_key(payload))
+        return (entry.get('segments') if entry else None) or None
+
+    def store(self, audio_path, settings, model_path, language, segments):
+        if not self.is_enabled() or not segments:
+            return
+        try:
+            payload = self.make_payload(audio_path, settings, model_path, language)
+        except OSError as e:
+            logger.log(f"[TranscriptCache] Could not hash {os.path.basename(audio_path)}: {e}", level=LogLevel.WARNING)
+            return
+        segments = [{'start': s['start'], 'end': s['end'], 'text': s['text']} for s in segments]
+        self.write(self.make_key(payload), {
+            'created': time.time(),
+            'model': payload['model'],
+            'segments': segments
+        })
+
+transcript_cache = TranscriptCache()
@@ -0,0 +1,133 @@
+"""
+Таймінги слів, які TTS повертає разом з аудіо (EdgeTTS WordBoundary).
+Зберігаються поруч з озвучкою як <audio>.timing.json і дозволяють зробити субтитри без розпізнавання мови.
+Файл прив'язаний до розміру аудіо: перезаписана іншим провайдером озвучка робить його недійсним.
+"""
+import os
+import re
+import json
+from utils.logger import logger, LogLevel
+
+# Змінюється разом з форматом файлу - старі файли тоді просто ігноруються
+TIMING_VERSION = 1
+# Пауза між словами, після якої починається новий рядок субтитрів
+LINE_BREAK_GAP_SEC = 0.6
+
+_SENTENCE_END_RE = re.compile(r'[.!?…]["»”)\]]*$')
+
+
+def timing_path(audio_path):
+    return os.path.splitext(audio_path)[0] + ".timing.json"
+
+
+def save(audio_path, words, source):
+    """words: [{'start', 'end', 'text'}] у секундах від початку audio_path."""
+    path = timing_path(audio_path)
+    if not words:
+        discard(audio_path)
+        return
+    data = {
+        'version': TIMING_VERSION,
+        'source': source,
+        'audio_size': os.path.getsize(audio_path),
+        'words': words,
+    }
+    try:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.log(f"[TTS Timing] Could not save {os.path.basename(path)}: {e}", level=LogLevel.WARNING)
+
+
+def discard(audio_path):
+    path = timing_path(audio_path)
+    if os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def load(audio_path):
+    """Слова з таймінгами для audio_path або None, якщо файлу немає чи він від іншої озвучки."""
+    if not audio_path:
+        return None
+    path = timing_path(audio_path)
+    if not os.path.exists(path) or not os.path.exists(audio_path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != TIMING_VERSION:
+        return None
+    if data.get('audio_size') != os.path.getsize(audio_path) or not data.get('words'):
+        return None
+    return data['words']
+
+
+def has_timing(audio_path):
+    return load(audio_path) is not None
+
+
+def to_segments(words, max_words=10, script_text=None):
+    """
+    Рядки субтитрів із слів: новий рядок після кінця речення, довгої паузи або max_words слів.
+    Якщо відомий текст сценарію, слова беруться з нього - TTS повертає їх без розділових знаків.
+    """
+    if script_text:
+        words = _restore_punctuation(words, script_text)
+
+    segments = []
+    group = []
+    for word in words:
+        if group and (
+            len(group) >= max_words
+            or word['start'] - group[-1]['end'] > LINE_BREAK_GAP_SEC
+            or _SENTENCE_END_RE.search(group[-1]['text'])
+        ):
+            segments.append(_segment(group))
+            group = []
+        group.append(word)
+    if group:
+        segments.append(_segment(group))
+    return segments
+
+
+def _segment(group):
+    return {'start': group[0]['start'], 'end': group[-1]['end'], 'text': " ".join(w['text'] for w in group)}
+
+
+def _normalize(text):
+    return "".join(ch for ch in text.lower() if ch.isalnum())
+
+
+def _restore_punctuation(words, script_text):
+    """Замінює слова TTS відповідними словами сценарію (з розділовими знаками та регістром)."""
+    tokens = script_text.split()
+    normalized = [_normalize(t) for t in tokens]
+    restored = []
+    position = 0
+    for word in words:
+        key = _normalize(word['text'])
+        if not key:
+            continue
+        # Частина попереднього слова сценарію ("well-known" TTS вимовляє як два слова) - розширюємо його
+        if (restored and position > 0 and key in normalized[position - 1] and not normalized[position - 1].startswith(key)
+                and not (position < len(tokens) and normalized[position].startswith(key))):
+            restored[-1] = {**restored[-1], 'end': word['end']}
+            continue
+        match = None
+        for i in range(position, min(position + 5, len(tokens))):
+            if normalized[i] and normalized[i].startswith(key):
+                match = i
+                break
+        if match is None:
+            restored.append(dict(word))
+            continue
+        restored.append({'start': word['start'], 'end': word['end'], 'text': tokens[match]})
+        position = match + 1
+    return restored
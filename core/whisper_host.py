@@ -0,0 +1,442 @@
+import os
+import gc
+import atexit
+import threading
+import multiprocessing
+from collections import OrderedDict
+from utils.logger import logger, LogLevel
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Орієнтовне споживання пам'яті моделями (МБ), за даними openai-whisper
+MODEL_MEMORY_MB = {
+    'tiny': 1000, 'tiny.en': 1000,
+    'base': 1000, 'base.en': 1000,
+    'small': 2000, 'small.en': 2000,
+    'medium': 5000, 'medium.en': 5000,
+    'large': 10000, 'large-v1': 10000, 'large-v2': 10000, 'large-v3': 10000,
+    'turbo': 6000,
+}
+# Найменша модель - від неї рахується, скільки процесів може мати пул
+MIN_HOST_MEMORY_MB = min(MODEL_MEMORY_MB.values())
+# Менше ядер на процес не має сенсу: torch погано масштабується вниз, а процеси ділять кеш і пропускну здатність пам'яті
+MIN_THREADS_PER_WORKER = 4
+CPU_COUNT = os.cpu_count() or 4
+
+
+def _process_rss_mb():
+    if psutil is None:
+        return None
+    try:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def _release_memory():
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+def _load_model(models, model_name, memory_cap_mb, threads=0):
+    """Повертає модель з кешу або завантажує її, вивантажуючи найдавніші при перевищенні ліміту."""
+    if model_name in models:
+        models.move_to_end(model_name)
+        return models[model_name]
+
+    needed = MODEL_MEMORY_MB.get(model_name, 2000)
+    while models:
+        if memory_cap_mb > 0:
+            used = _process_rss_mb()
+            if used is None:
+                used = sum(MODEL_MEMORY_MB.get(name, 2000) for name in models)
+            if used + needed <= memory_cap_mb:
+                break
+        # Без відомого ліміту тримаємо лише одну модель
+        models.popitem(last=False)
+        _release_memory()
+
+    import whisper
+    if threads > 0:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    models[model_name] = whisper.load_model(model_name)
+    return models[model_name]
+
+
+def _host_main(conn, idle_timeout, memory_cap_mb, threads):
+    """Точка входу процесу-хоста. Обслуговує запити, поки не мине idle_timeout без роботи."""
+    # Кілька хостів працюють паралельно - кожен бере лише свою частку ядер, інакше потоки torch б'ються між собою
+    if threads > 0:
+        os.environ['OMP_NUM_THREADS'] = str(threads)
+        os.environ['MKL_NUM_THREADS'] = str(threads)
+    models = OrderedDict()
+    while True:
+        try:
+            if not conn.poll(idle_timeout if idle_timeout > 0 else None):
+                break  # Простій - завершуємось, звільняючи всю пам'ять моделей
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        op = request.get('op')
+        if op == 'shutdown':
+            break
+        if op != 'transcribe':
+            conn.send({'ok': False, 'error': f"Unknown op: {op}"})
+            continue
+
+        try:
+            model = _load_model(models, request['model'], memory_cap_mb, threads)
+            result = model.transcribe(request['audio_path'], language=request.get('language'))
+            segments = [
+                {'start': s['start'], 'end': s['end'], 'text': s['text'].strip()}
+                for s in result['segments']
+            ]
+            conn.send({'ok': True, 'segments': segments})
+        except Exception as e:
+            conn.send({'ok': False, 'error': f"{type(e).__name__}: {e}"})
+    models.clear()
+    _release_memory()
+
+
+def _is_job(candidate, job_id):
+    return candidate == job_id or (isinstance(candidate, tuple) and candidate[:1] == (job_id,))
+
+
+class _HostSlot:
+    """Один процес пулу: Pipe, поточна задача і остання завантажена модель."""
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.job_id = None
+        self.job_model = None
+        self.model = None
+        self.generation = 0
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class WhisperHost:
+    """
+    Пул резидентних процесів з моделями openai-whisper.
+    Моделі завантажуються один раз і обслуговують SubtitleWorker та TranscriptionWorker через Pipe.
+    Кількість процесів визначається лише бюджетом пам'яті та ядрами CPU, тож зміна моделі не перезапускає пул:
+    моделі змінюються в LRU кожного процесу, а одночасних задач запускається стільки, скільки їхніх моделей
+    вміщує бюджет. Кожна задача виконується в окремому процесі: падіння одного хоста (нестача пам'яті тощо)
+    завершує з помилкою лише його задачу, а cancel() зупиняє задачу, завершуючи її процес.
+    Процеси самі завершуються після простою.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.slots = []
+        self.cancelled = set()
+        self.waiting = set() # задачі, що чекають на вільний процес
+        self.generation = 0
+        self.config = None # (idle_timeout, memory_cap_mb на процес, threads)
+        self.size = 1
+        self.budget = 0
+        self.idle_timeout = 600
+        self.stopping = [] # зупинені процеси, яких ще треба дочекатися поза lock
+        atexit.register(self.shutdown)
+
+    # --- Розмір пулу ---
+
+    def memory_budget_mb(self, settings):
+        """Пам'ять, яку можуть зайняти всі процеси пулу разом (0 - невідомо)."""
+        budget = int(settings.get('whisper_host_memory_mb', 0) or 0)
+        if budget <= 0 and psutil is not None:
+            # Авто: не більше половини фізичної пам'яті
+            budget = int(psutil.virtual_memory().total / (1024 * 1024) * 0.5)
+        return budget
+
+    def pool_size(self, settings):
+        """Скільки процесів може мати пул - від моделі не залежить."""
+        settings = settings or {}
+        budget = self.memory_budget_mb(settings)
+        by_memory = max(1, budget // MIN_HOST_MEMORY_MB) if budget > 0 else 1
+        requested = int(settings.get('whisper_workers', 0) or 0)
+        if requested > 0:
+            return min(requested, by_memory)
+        by_cpu = max(1, CPU_COUNT // MIN_THREADS_PER_WORKER)
+        return min(by_memory, by_cpu)
+
+    def capacity(self, settings, model_name):
+        """Скільки транскрибацій моделі model_name можна виконувати одночасно."""
+        settings = settings or {}
+        needed = MODEL_MEMORY_MB.get((model_name or 'base').replace('.bin', ''), 2000)
+        budget = self.memory_budget_mb(settings)
+        by_memory = max(1, budget // needed) if budget > 0 else 1
+        return min(self.pool_size(settings), by_memory)
+
+    def threads_per_worker(self, settings):
+        return max(1, CPU_COUNT // self.pool_size(settings))
+
+    # --- Public API ---
+
+    def transcribe(self, model_name, audio_path, language=None, settings=None, job_id=None):
+        """
+        Повертає список сегментів {'start', 'end', 'text'}.
+        Якщо всі процеси пулу зайняті, чекає на вільний. job_id - ключ для cancel().
+        """
+        settings = settings or {}
+        job_id = job_id if job_id is not None else object()
+        with self.cond:
+            self._configure_nolock(settings)
+            self.cancelled.discard(job_id)
+            slot = self._acquire_slot_nolock(model_name, job_id)
+        self._join_stopped()
+
+        request = {'op': 'transcribe', 'model': model_name, 'audio_path': audio_path, 'language': language}
+        reply = None
+        try:
+            for attempt in range(2):
+                with self.lock:
+                    if job_id in self.cancelled:
+                        raise Exception("Transcription cancelled.")
+                    self._ensure_started_nolock(slot)
+                    process, conn = slot.process, slot.conn
+                self._join_stopped()
+                try:
+                    conn.send(request)
+                    reply = self._wait_reply(process, conn)
+                    break
+                except (EOFError, OSError):
+                    process.join(timeout=5)
+                    exit_code = process.exitcode
+                    with self.lock:
+                        self._stop_nolock(slot)
+                        cancelled = job_id in self.cancelled
+                    self._join_stopped()
+                    if cancelled:
+                        raise Exception("Transcription cancelled.")
+                    # Хост міг штатно завершитись через простій саме в момент запиту - тоді повторюємо один раз.
+                    # Аварійне завершення (нестача пам'яті тощо) не повторюємо.
+                    if attempt == 1 or exit_code != 0:
+                        raise Exception(f"Whisper host stopped unexpectedly (exit code {exit_code}).")
+                    logger.log(f"[WhisperHost #{slot.index}] Host exited while idle, restarting.", level=LogLevel.WARNING)
+        finally:
+            with self.cond:
+                self._release_slot_nolock(slot, model_name if reply is not None else None)
+                self.cancelled.discard(job_id)
+                self.cond.notify_all()
+            self._join_stopped()
+
+        if not reply.get('ok'):
+            raise Exception(reply.get('error', 'Whisper host error'))
+        return reply['segments']
+
+    def cancel(self, job_id):
+        """
+        Зупиняє транскрибацію job_id: процес, що її виконує, завершується, а задача отримує помилку.
+        Шматки довгого аудіо мають job_id (job_id задачі, номер) і скасовуються разом із задачею.
+        """
+        found = False
+        with self.cond:
+            for waiting in [j for j in self.waiting if _is_job(j, job_id)]:
+                self.cancelled.add(waiting)
+                found = True
+            for slot in self.slots:
+                if slot.job_id is not None and _is_job(slot.job_id, job_id):
+                    self.cancelled.add(slot.job_id)
+                    self._terminate_nolock(slot)
+                    logger.log(f"[WhisperHost #{slot.index}] Cancelled transcription {slot.job_id}.", level=LogLevel.WARNING)
+                    found = True
+            if found:
+                self.cond.notify_all()
+        return found
+
+    def cancel_all(self):
+        with self.cond:
+            self.cancelled.update(self.waiting)
+            busy = [slot for slot in self.slots if slot.job_id is not None]
+            for slot in busy:
+                self.cancelled.add(slot.job_id)
+                self._terminate_nolock(slot)
+            self.cond.notify_all()
+        if busy:
+            logger.log(f"[WhisperHost] Cancelled {len(busy)} running transcription(s).", level=LogLevel.WARNING)
+
+    def shutdown(self):
+        with self.cond:
+            for slot in self.slots:
+                self._stop_nolock(slot)
+            self.slots = []
+        self._join_stopped()
+
+    # --- Internals ---
+
+    def _configure_nolock(self, settings):
+        idle_timeout = int(settings.get('whisper_host_idle_minutes', 10) * 60)
+        self.size = self.pool_size(settings)
+        budget = self.memory_budget_mb(settings)
+        self.budget = budget
+        config = (idle_timeout, budget // self.size if budget > 0 else 0, max(1, CPU_COUNT // self.size))
+        if config != self.config:
+            self.config = config
+            self.idle_timeout = idle_timeout
+            # Нові параметри застосовуються при наступному використанні кожного процесу
+            self.generation += 1
+
+    def _acquire_slot_nolock(self, model_name, job_id):
+        while True:
+            if job_id in self.cancelled:
+                self.waiting.discard(job_id)
+                raise Exception("Transcription cancelled.")
+            idle = [slot for slot in self.slots if slot.job_id is None] if self._fits_nolock(model_name) else []
+            # Спочатку процес, у якому ця модель уже завантажена
+            slot = next((s for s in idle if s.model == model_name and s.is_alive()), None)
+            if slot is None and self._fits_nolock(model_name) and len(self.slots) < self.size and self._can_grow_nolock(model_name, idle):
+                slot = _HostSlot(self._free_index_nolock())
+                self.slots.append(slot)
+            if slot is None and idle:
+                slot = next((s for s in idle if s.is_alive()), idle[0])
+            if slot is not None:
+                self.waiting.discard(job_id)
+                slot.job_id = job_id
+                slot.job_model = model_name
+                if slot.model != model_name:
+                    self._unload_idle_nolock(slot)
+                return slot
+            self.waiting.add(job_id)
+            self.cond.wait()
+
+    def _fits_nolock(self, model_name):
+        """Чи вміщується ще одна модель model_name у бюджет пам'яті поруч із задачами, що вже виконуються."""
+        busy = [slot.job_model for slot in self.slots if slot.job_id is not None]
+        if not busy or self.budget <= 0:
+            return True
+        used = sum(MODEL_MEMORY_MB.get(name, 2000) for name in busy)
+        return used + MODEL_MEMORY_MB.get(model_name, 2000) <= self.budget
+
+    def _unload_idle_nolock(self, slot):
+        """
+        Слот завантажуватиме іншу модель: вільні процеси, чиї моделі разом із задачами
+        вже не вміщуються в бюджет пам'яті, зупиняються, а не чекають завершення через простій.
+        """
+        if self.budget <= 0:
+            return
+        def resident(s):
+            name = s.job_model if s.job_id is not None else (s.model if s.is_alive() else None)
+            return MODEL_MEMORY_MB.get(name, 2000) if name else 0
+        used = sum(resident(s) for s in self.slots)
+        for other in self.slots:
+            if used <= self.budget:
+                break
+            if other is not slot and other.job_id is None and resident(other):
+                used -= resident(other)
+                self._stop_nolock(other)
+
+    def _can_grow_nolock(self, model_name, idle):
+        if not any(slot.is_alive() for slot in self.slots):
+            return True
+        if psutil is None:
+            # Без psutil новий процес запускаємо, лише коли немає вільного
+            return not idle
+        # Новий процес завантажить ще одну модель - лише якщо для неї зараз є вільна пам'ять
+        available = psutil.virtual_memory().available / (1024 * 1024)
+        return available >= MODEL_MEMORY_MB.get(model_name, 2000)
+
+    def _free_index_nolock(self):
+        used = {slot.index for slot in self.slots}
+        index = 0
+        while index in used:
+            index += 1
+        return index
+
+    def _release_slot_nolock(self, slot, model_name):
+        slot.job_id = None
+        slot.job_model = None
+        if model_name:
+            slot.model = model_name
+        if len(self.slots) > self.size:
+            # Пул зменшився (змінились налаштування) - зайвий процес більше не потрібен
+            self._stop_nolock(slot)
+            self.slots.remove(slot)
+        elif self.idle_timeout <= 0 or not slot.is_alive():
+            self._stop_nolock(slot)
+
+    def _ensure_started_nolock(self, slot):
+        if slot.is_alive() and slot.generation == self.generation:
+            return
+        self._stop_nolock(slot)
+
+        idle_timeout, memory_cap_mb, threads = self.config
+        ctx = multiprocessing.get_context('spawn')
+        parent_conn, child_conn = ctx.Pipe()
+        slot.process = ctx.Process(
+            target=_host_main,
+            args=(child_conn, idle_timeout, memory_cap_mb, threads),
+            name=f"WhisperHost-{slot.index}",
+            daemon=True
+        )
+        slot.process.start()
+        child_conn.close()
+        slot.conn = parent_conn
+        slot.generation = self.generation
+        logger.log(
+            f"[WhisperHost #{slot.index}] Started (pid {slot.process.pid}, idle {idle_timeout}s, "
+            f"memory cap {memory_cap_mb} MB, {threads} threads, pool {len(self.slots)}/{self.size})",
+            level=LogLevel.INFO
+        )
+
+    def _wait_reply(self, process, conn):
+        while True:
+            if conn.poll(1.0):
+                return conn.recv()
+            if not process.is_alive():
+                raise EOFError("Whisper host exited")
+
+    def _terminate_nolock(self, slot):
+        # Транскрибацію посеред моделі перервати неможливо - завершуємо процес, чекаючий потік отримає EOFError
+        if slot.is_alive():
+            slot.process.terminate()
+
+    def _stop_nolock(self, slot):
+        """
+        Просить процес слота завершитись і відв'язує його від слота, не чекаючи:
+        завершення (до кількох секунд на вивантаження моделі) чекає _join_stopped уже поза lock.
+        """
+        slot.model = None
+        process = slot.process
+        slot.process = None
+        if slot.conn is not None:
+            try:
+                if process is not None and process.is_alive():
+                    slot.conn.send({'op': 'shutdown'})
+            except (EOFError, OSError):
+                pass
+            try:
+                slot.conn.close()
+            except OSError:
+                pass
+            slot.conn = None
+        if process is not None:
+            self.stopping.append(process)
+
+    def _join_stopped(self):
+        with self.lock:
+            processes, self.stopping = self.stopping, []
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=2)
+
+whisper_host = WhisperHost()
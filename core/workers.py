@@ -24,7 +24,11 @@ from api.gemini_tts import GeminiTTSAPI
 from api.edge_tts_api import EdgeTTSAPI
 from api.elevenlabs_image import ElevenLabsImageAPI
 from core.subtitle_engine import SubtitleEngine
+from core.transcript_cache import transcript_cache
+from core import tts_timing
+from core.media_probe import media_probe
 from core.montage_engine import MontageEngine
+from core.montage_cost_model import montage_cost_model
 from core.statistics_manager import statistics_manager
 
 # =================================================================================================================
@@ -42,6 +46,9 @@ class WorkerSignals(QObject):
     balance_updated = Signal(str, object) # provider, data
 
 class BaseWorker(QRunnable):
+    # do_work може повернути PENDING - тоді воркер сам надішле finished/error пізніше (з колбеків)
+    PENDING = object()
+
     def __init__(self, task_id, config):
         super().__init__()
         self.task_id = task_id
@@ -61,13 +68,11 @@ class BaseWorker(QRunnable):
         try:
             # logger.log(f"[{self.task_id}] Starting worker", level=LogLevel.INFO)
             result = self.do_work()
-            self.signals.finished.emit(self.task_id, result)
+            if result is not BaseWorker.PENDING:
+                self.signals.finished.emit(self.task_id, result)
             # logger.log(f"[{self.task_id}] Finished worker", level=LogLevel.INFO)
         except Exception as e:
-            error_msg = f"[{self.task_id}] Error: {e}"
-            logger.log(error_msg, level=LogLevel.ERROR)
-            logger.log(f"[{self.task_id}] Traceback:\n{traceback.format_exc()}", level=LogLevel.ERROR)
-            self.signals.error.emit(self.task_id, str(e))
+            self._report_error(e)
         finally:
             if com_initialized:
                 try:
@@ -75,6 +80,13 @@ class BaseWorker(QRunnable):
                 except:
                     pass
 
+    def _report_error(self, e):
+        error_msg = f"[{self.task_id}] Error: {e}"
+        logger.log(error_msg, level=LogLevel.ERROR)
+        tb = ''.join(traceback.format_exception(type(e), e, e.__traceback__))
+        logger.log(f"[{self.task_id}] Traceback:\n{tb}", level=LogLevel.ERROR)
+        self.signals.error.emit(self.task_id, str(e))
+
     def do_work(self):
         raise NotImplementedError
 
@@ -98,7 +110,9 @@ class TranslationWorker(BaseWorker):
             model=model,
             messages=[{"role": "user", "content": full_prompt}],
             max_tokens=max_tokens,
-            temperature=temp
+            temperature=temp,
+            cache_stage='translation',
+            refresh_cache=self.config.get('refresh_cache', False)
         )
         msg = response['choices'][0].get('message', {})
         result = msg.get('content') or msg.get('reasoning')
@@ -126,7 +140,9 @@ class ImagePromptWorker(BaseWorker):
             model=model,
             messages=[{"role": "user", "content": full_prompt}],
             max_tokens=max_tokens,
-            temperature=temp
+            temperature=temp,
+            cache_stage='image_prompts',
+            refresh_cache=self.config.get('refresh_cache', False)
         )
         msg = response['choices'][0].get('message', {})
         result = msg.get('content') or msg.get('reasoning')
@@ -159,7 +175,9 @@ class PreviewWorker(BaseWorker):
             model=model,
             messages=[{"role": "user", "content": full_prompt}],
             max_tokens=max_tokens,
-            temperature=temp
+            temperature=temp,
+            cache_stage='preview',
+            refresh_cache=self.config.get('refresh_cache', False)
         )
         msg = response['choices'][0].get('message', {})
         result = msg.get('content') or msg.get('reasoning')
@@ -176,6 +194,15 @@ class PreviewWorker(BaseWorker):
 
 class VoiceoverWorker(BaseWorker):
     def do_work(self):
+        audio_path = self._generate_voiceover()
+        # Пробуємо тривалість тут, щоб слот у GUI-потоці лише читав кеш
+        media_probe.get_duration(audio_path)
+        # Digest потрібен лише для кешу розпізнавання: без етапу субтитрів чи з таймінгами TTS Whisper не запускається
+        if self.config.get('transcribe') and not tts_timing.has_timing(audio_path):
+            transcript_cache.prepare(audio_path)
+        return audio_path
+
+    def _generate_voiceover(self):
         text = self.config['text']
         dir_path = self.config['dir_path']
         lang_config = self.config['lang_config']
@@ -235,9 +262,12 @@ class VoiceoverWorker(BaseWorker):
             filename = "voice.mp3"
             output_path = os.path.join(dir_path, filename)
             
-            success, msg = api.generate_audio(text, voice, rate, pitch, output_path)
+            word_boundaries = []
+            success, msg = api.generate_audio(text, voice, rate, pitch, output_path, word_boundaries=word_boundaries)
             if success:
-                logger.log(f"[{self.task_id}] [EdgeTTS] Voiceover saved", level=LogLevel.SUCCESS)
+                # Таймінги слів поруч з озвучкою - субтитри з них не потребують розпізнавання
+                tts_timing.save(output_path, word_boundaries, 'edgetts')
+                logger.log(f"[{self.task_id}] [EdgeTTS] Voiceover saved ({len(word_boundaries)} word timings)", level=LogLevel.SUCCESS)
                 return output_path
             else:
                 raise Exception(f"EdgeTTS generation failed: {msg}")
@@ -338,6 +368,7 @@ class VoiceoverWorker(BaseWorker):
     def save_audio(self, content, filename):
         path = os.path.join(self.config['dir_path'], filename)
         with open(path, 'wb') as f: f.write(content)
+        tts_timing.discard(path) # таймінги попередньої озвучки EdgeTTS більше не відповідають файлу
         tts_provider = self.config['lang_config'].get('tts_provider', 'ElevenLabs')
         logger.log(f"[{self.task_id}] [{tts_provider}] Voiceover saved", level=LogLevel.SUCCESS)
         return path
@@ -354,11 +385,12 @@ class SubtitleWorker(BaseWorker):
             whisper_label = 'assemblyai'
         
         logger.log(f"[{self.task_id}] [{whisper_label}] Starting subtitle generation", level=LogLevel.INFO)
-        engine = SubtitleEngine(self.config['whisper_exe'], self.config['whisper_model_path'])
+        engine = SubtitleEngine(self.config['whisper_exe'], self.config['whisper_model_path'], job_id=self.task_id)
         output_filename = os.path.splitext(os.path.basename(self.config['audio_path']))[0] + ".ass"
         output_path = os.path.join(self.config['dir_path'], output_filename)
         merged_settings = {**self.config.get('sub_settings', {}), **self.config.get('full_settings', {})}
-        engine.generate_ass(self.config['audio_path'], output_path, merged_settings, language=self.config['lang_code'])
+        engine.generate_ass(self.config['audio_path'], output_path, merged_settings, language=self.config['lang_code'],
+                            script_text=self.config.get('script_text'))
         logger.log(f"[{self.task_id}] [{whisper_label}] Subtitles saved", level=LogLevel.SUCCESS)
         return output_path
 
@@ -383,7 +415,9 @@ class CustomStageWorker(BaseWorker):
             model=model,
             messages=[{"role": "user", "content": full_prompt}],
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            cache_stage='custom_stage',
+            refresh_cache=self.config.get('refresh_cache', False)
         )
         
         msg = response['choices'][0].get('message', {})
@@ -407,9 +441,21 @@ class CustomStageWorker(BaseWorker):
 
 
 class ImageGenerationWorker(BaseWorker):
+    """
+    Pollinations генерується послідовно в самому воркері.
+    Для Googler/ElevenLabs воркер лише ставить запити в executor провайдера і одразу звільняє слот QThreadPool:
+    результати зберігаються в done-колбеках, які ж і подають наступні промпти, а останній колбек надсилає finished.
+    """
+
+    # Мінімальний інтервал між стартами запитів одного завдання (захист від сплесків)
+    SUBMIT_INTERVAL = 0.5
+
+    def __init__(self, task_id, config):
+        super().__init__(task_id, config)
+        # Воркер живе довше за run() - не даємо QThreadPool видалити його
+        self.setAutoDelete(False)
+
     def do_work(self):
-        from concurrent.futures import as_completed
-        
         executor = self.config.get('executor')
         if not executor:
             raise Exception("Executor not provided to ImageGenerationWorker")
@@ -499,7 +545,7 @@ class ImageGenerationWorker(BaseWorker):
         
         service_name = provider.capitalize()
         generated_paths = [None] * len(prompts)
-        
+
         def generate_single_image(index, prompt):
             """Generate a single image and return its data"""
             semaphore = self.config.get('semaphore')
@@ -521,91 +567,120 @@ class ImageGenerationWorker(BaseWorker):
             finally:
                 if semaphore:
                     semaphore.release()
-        
+
+        def save_image(result):
+            index_from_result, image_data, prompt_from_result = result
+            image_path = os.path.join(images_dir, f"{index_from_result + 1}.{file_extension}")
+            
+            try:
+                # Googler provides base64 as string, we need to decode it
+                if isinstance(image_data, str):
+                    data_to_write = base64.b64decode(image_data.split(",", 1)[1] if "," in image_data else image_data)
+                else:
+                    data_to_write = image_data
+
+                with open(image_path, 'wb') as f:
+                    f.write(data_to_write)
+                
+                logger.log(f"[{self.task_id}] [{service_name}] Image {index_from_result + 1}/{len(prompts)} saved", level=LogLevel.SUCCESS)
+                generated_paths[index_from_result] = image_path
+                
+                self.signals.status_changed.emit(self.task_id, image_path, prompt_from_result, image_path)
+                if service_name.lower() == 'googler':
+                    self.signals.balance_updated.emit('googler', None)
+            except Exception as e:
+                logger.log(f"[{self.task_id}] [{service_name}] Error processing/saving image {index_from_result + 1}: {e}", level=LogLevel.ERROR)
+
         if provider == 'pollinations':
             # Sequential processing for Pollinations to avoid rate limits and 429 errors
             for i, prompt in enumerate(prompts):
                 result = generate_single_image(i, prompt)
                 if result:
-                    index_from_result, image_data, prompt_from_result = result
-                    image_path = os.path.join(images_dir, f"{index_from_result + 1}.{file_extension}")
-                    
-                    try:
-                        with open(image_path, 'wb') as f:
-                            f.write(image_data)
-                        
-                        logger.log(f"[{self.task_id}] [{service_name}] Image {index_from_result + 1}/{len(prompts)} saved", level=LogLevel.SUCCESS)
-                        generated_paths[index_from_result] = image_path
-                        
-                        self.signals.status_changed.emit(self.task_id, image_path, prompt_from_result, image_path)
-                    except IOError as e:
-                        logger.log(f"[{self.task_id}] [{service_name}] Error saving image {index_from_result + 1}: {e}", level=LogLevel.ERROR)
+                    save_image(result)
                 
                 # Small delay between sequential requests for safety
                 time.sleep(0.5)
-        else:
-            # Parallel processing for Googler
-            max_workers = self.config.get('max_threads', 8)
-            prompts_iterator = iter(enumerate(prompts))
-            futures = {}
-            prompts_exhausted = False
 
-            while True:
-                # Check if any tasks completed
-                if futures:
-                    from concurrent.futures import wait, FIRST_COMPLETED
-                    done_set, _ = wait(futures.keys(), timeout=0, return_when=FIRST_COMPLETED)
-                    
-                    for done_future in done_set:
-                        index = futures.pop(done_future)
-                        result = done_future.result()
-
-                        if result:
-                            index_from_result, image_data, prompt_from_result = result
-                            image_path = os.path.join(images_dir, f"{index_from_result + 1}.{file_extension}")
-                            
-                            try:
-                                # Googler provides base64 as string, we need to decode it
-                                if isinstance(image_data, str):
-                                    data_to_write = base64.b64decode(image_data.split(",", 1)[1] if "," in image_data else image_data)
-                                else:
-                                    data_to_write = image_data
-
-                                with open(image_path, 'wb') as f:
-                                    f.write(data_to_write)
-                                
-                                logger.log(f"[{self.task_id}] [{service_name}] Image {index_from_result + 1}/{len(prompts)} saved", level=LogLevel.SUCCESS)
-                                generated_paths[index_from_result] = image_path
-                                
-                                self.signals.status_changed.emit(self.task_id, image_path, prompt_from_result, image_path)
-                                if service_name.lower() == 'googler':
-                                    self.signals.balance_updated.emit('googler', None)
-                            except Exception as e:
-                                logger.log(f"[{self.task_id}] [{service_name}] Error processing/saving image {index_from_result + 1}: {e}", level=LogLevel.ERROR)
-                
-                # Submit new tasks if slots available
-                if len(futures) < max_workers and not prompts_exhausted:
-                    try:
-                        i, prompt = next(prompts_iterator)
-                        future = executor.submit(generate_single_image, i, prompt)
-                        futures[future] = i
-                        time.sleep(0.5)
-                    except StopIteration:
-                        prompts_exhausted = True
-                
-                if prompts_exhausted and not futures:
-                    break
-                
-                if len(futures) >= max_workers or (prompts_exhausted and futures):
-                    time.sleep(0.1)
+            return self._build_result(generated_paths, len(prompts))
+
+        # Parallel processing for Googler / ElevenLabs
+        self._generate_async(executor, prompts, generate_single_image, save_image, generated_paths)
+        return BaseWorker.PENDING
+
+    def _generate_async(self, executor, prompts, generate_single_image, save_image, generated_paths):
+        max_workers = max(1, self.config.get('max_threads', 8))
+        lock = threading.Lock()
+        progress = {'next': 0, 'in_flight': 0, 'stopped': False, 'last_start': 0.0}
+
+        def submit_next():
+            with lock:
+                index = progress['next']
+                if progress['stopped'] or index >= len(prompts):
+                    return
+                progress['next'] += 1
+                progress['in_flight'] += 1
+                now = time.monotonic()
+                start_at = max(now, progress['last_start'] + self.SUBMIT_INTERVAL)
+                progress['last_start'] = start_at
+
+            if start_at > now:
+                # Відкладена подача - таймером, щоб очікування не займало потік executor, спільний з іншими задачами
+                timer = threading.Timer(start_at - now, submit, args=(index,))
+                timer.daemon = True
+                timer.start()
+            else:
+                submit(index)
 
+        def submit(index):
+            try:
+                future = executor.submit(generate_single_image, index, prompts[index])
+            except RuntimeError:
+                # Executor зупинено (завершення роботи) - решту промптів не подаємо
+                with lock:
+                    progress['stopped'] = True
+                job_finished()
+                return
+            future.add_done_callback(on_done)
+
+        def on_done(future):
+            result = None
+            if future.cancelled():
+                # Колбек скасованих futures викликається всередині executor.shutdown() під його локом,
+                # тому тут не можна нічого подавати в executor
+                with lock:
+                    progress['stopped'] = True
+            else:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.log(f"[{self.task_id}] Image job failed: {e}", level=LogLevel.ERROR)
+
+            if result:
+                save_image(result)
+
+            submit_next()
+            job_finished()
+
+        def job_finished():
+            with lock:
+                progress['in_flight'] -= 1
+                all_done = progress['in_flight'] == 0 and (progress['stopped'] or progress['next'] >= len(prompts))
+            if all_done:
+                try:
+                    self.signals.finished.emit(self.task_id, self._build_result(generated_paths, len(prompts)))
+                except Exception as e:
+                    self._report_error(e)
+
+        for _ in range(min(max_workers, len(prompts))):
+            submit_next()
 
+    def _build_result(self, generated_paths, total_prompts):
         final_paths = [path for path in generated_paths if path is not None]
 
-        if len(final_paths) == 0 and len(prompts) > 0:
+        if len(final_paths) == 0 and total_prompts > 0:
             raise Exception("Failed to generate any images.")
 
-        return {'paths': final_paths, 'total_prompts': len(prompts)}
+        return {'paths': final_paths, 'total_prompts': total_prompts}
 
 class VideoGenerationWorker(BaseWorker):
     # Class-level semaphore to ensure only one FFmpeg squish process runs at a time
@@ -730,6 +805,7 @@ class MontageWorker(BaseWorker):
         
         start_time = time.time()
         engine = MontageEngine()
+        cost_features = self.config.pop('cost_features', None)
         # Pass task_id and progress callback to the engine
         self.config['task_id'] = self.task_id
         self.config['progress_callback'] = lambda msg: self.signals.progress_log.emit(self.task_id, msg)
@@ -739,6 +815,12 @@ class MontageWorker(BaseWorker):
         elapsed = time.time() - start_time
         elapsed_str = time.strftime('%M:%S', time.gmtime(elapsed))
         logger.log(f"[{self.task_id}] [FFmpeg] Video montage completed (duration: {elapsed_str})", level=LogLevel.SUCCESS)
+
+        if cost_features:
+            # Калібруємо оцінку часу монтажу на цій машині
+            render_info = getattr(engine, 'render_info', {})
+            cost_features['path'] = render_info.get('path', cost_features['path'])
+            montage_cost_model.record(cost_features, elapsed, render_info.get('reused_share', 0.0))
         
         return self.config['output_path']
 
@@ -758,11 +840,15 @@ class DownloadWorker(BaseWorker):
             def report_progress(percent_str):
                  self.signals.metadata_updated.emit(self.task_id, 'stage_download', percent_str)
 
-            return YouTubeDownloader.download_audio(url, dir_path, yt_dlp_path, progress_callback=report_progress)
+            audio_path = YouTubeDownloader.download_audio(url, dir_path, yt_dlp_path, progress_callback=report_progress)
 
         finally:
             download_semaphore.release()
 
+        if self.config.get('transcribe'):
+            transcript_cache.prepare(audio_path)
+        return audio_path
+
 class TranscriptionWorker(BaseWorker):
     def do_work(self):
         audio_path = self.config['audio_path']
@@ -773,7 +859,7 @@ class TranscriptionWorker(BaseWorker):
 
         logger.log(f"[{self.task_id}] Starting transcription for rewrite...", level=LogLevel.INFO)
         
-        engine = SubtitleEngine(whisper_exe, whisper_model_path)
+        engine = SubtitleEngine(whisper_exe, whisper_model_path, job_id=self.task_id)
         text = engine.transcribe_text(audio_path, sub_settings, language=lang_code)
         
         if not text:
@@ -799,7 +885,9 @@ class RewriteWorker(BaseWorker):
             model=model,
             messages=[{"role": "user", "content": full_prompt}],
             max_tokens=max_tokens,
-            temperature=temperature
+            temperature=temperature,
+            cache_stage='rewrite',
+            refresh_cache=self.config.get('refresh_cache', False)
         )
         
         msg = response['choices'][0].get('message', {})
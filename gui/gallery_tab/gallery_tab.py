@@ -8,6 +8,7 @@ from PySide6.QtGui import QPixmap
 from utils.translator import translator
 from gui.gallery_tab.collapsible_group import CollapsibleGroup
 from gui.gallery_tab.media_thumbnail import MediaThumbnail
+from gui.gallery_tab.thumbnail_loader import ThumbnailLoader
 from gui.gallery_tab.regenerate_config_dialog import RegenerateConfigDialog
 from utils.logger import logger, LogLevel
 from api.pollinations import PollinationsAPI
@@ -98,6 +99,8 @@ class GalleryTab(QWidget):
         super().__init__()
         self.task_groups = {}
         self.threadpool = QThreadPool()
+        self.thumbnail_loader = ThumbnailLoader(parent=self)
+        self.thumbnail_loader.thumbnail_ready.connect(self._on_thumbnail_ready)
         self.init_ui()
         self.retranslate_ui()
 
@@ -224,12 +227,15 @@ class GalleryTab(QWidget):
         type_group = lang_group.type_groups[type_key]
 
         # --- Thumbnail Loading ---
-        pixmap = MediaThumbnail.get_thumbnail_for_media(media_path)
+        # Готова мініатюра береться з дискового кешу, інакше показуємо заглушку і декодуємо у фоні
+        pixmap = self.thumbnail_loader.cached_pixmap(media_path)
+        needs_loading = pixmap.isNull()
+        if needs_loading:
+            if not self.thumbnail_loader.can_load(media_path):
+                logger.log(f"Failed to load media or generate thumbnail for: {media_path}", level=LogLevel.WARNING)
+                return
+            pixmap = self.thumbnail_loader.placeholder(media_path)
         # --- End Thumbnail Loading ---
-
-        if pixmap.isNull():
-            logger.log(f"Failed to load media or generate thumbnail for: {media_path}", level=LogLevel.WARNING)
-            return
         
         thumbnail = MediaThumbnail(media_path, prompt, pixmap, type_group)
         
@@ -243,6 +249,35 @@ class GalleryTab(QWidget):
         
         self.update_total_media_count()
 
+        if needs_loading:
+            self.thumbnail_loader.request(media_path)
+
+    def _set_thumbnail_media(self, thumbnail, media_path):
+        """Перемикає віджет на новий файл: мініатюра з кешу або заглушка з фоновим завантаженням."""
+        pixmap = self.thumbnail_loader.cached_pixmap(media_path)
+        if not pixmap.isNull():
+            thumbnail.update_media(media_path, pixmap)
+            return True
+        if not self.thumbnail_loader.can_load(media_path):
+            return False
+        thumbnail.update_media(media_path, self.thumbnail_loader.placeholder(media_path))
+        self.thumbnail_loader.request(media_path)
+        return True
+
+    def _on_thumbnail_ready(self, media_path, key, pixmap):
+        if not self.thumbnail_loader.is_current(media_path, key):
+            # Файл змінився, поки рендерилась мініатюра - застарілий результат не показуємо
+            self.thumbnail_loader.request(media_path)
+            return
+        for group in self.task_groups.values():
+            thumbnail = group.find_thumbnail_by_path(media_path)
+            if thumbnail:
+                if pixmap.isNull():
+                    logger.log(f"Failed to load media or generate thumbnail for: {media_path}", level=LogLevel.WARNING)
+                else:
+                    thumbnail.set_pixmap(pixmap)
+                return
+
     def _on_media_clicked(self, media_path):
         self.media_clicked.emit(media_path)
 
@@ -273,9 +308,7 @@ class GalleryTab(QWidget):
             if thumbnail:
                 thumbnail.set_regenerating_state(False)
                 
-                new_pixmap = MediaThumbnail.get_thumbnail_for_media(new_path)
-
-                thumbnail.update_media(new_path, new_pixmap)
+                self._set_thumbnail_media(thumbnail, new_path)
                 logger.log(f"Updated thumbnail for {old_path} with new image {new_path}", level=LogLevel.INFO)
                 
                 if old_path != new_path:
@@ -386,9 +419,7 @@ class GalleryTab(QWidget):
         for task_group in self.task_groups.values():
             thumbnail = task_group.find_thumbnail_by_path(old_path)
             if thumbnail:
-                new_pixmap = MediaThumbnail.get_thumbnail_for_media(new_path)
-                if not new_pixmap.isNull():
-                    thumbnail.update_media(new_path, new_pixmap)
+                if self._set_thumbnail_media(thumbnail, new_path):
                     logger.log(f"Updated thumbnail from image to video: {os.path.basename(new_path)}", level=LogLevel.INFO)
                 else:
                     logger.log(f"Failed to create new pixmap for {new_path}", level=LogLevel.WARNING)
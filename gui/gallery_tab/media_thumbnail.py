@@ -1,13 +1,13 @@
 import os
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QToolButton, QStackedWidget
 from PySide6.QtCore import Signal, QSize, Qt, QUrl, QEvent
-from PySide6.QtGui import QIcon, QPixmap, QImage
+from PySide6.QtGui import QIcon, QPixmap
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PySide6.QtMultimediaWidgets import QVideoWidget
-import cv2
 
 from .clickable_label import ClickableLabel
 from .loading_spinner import LoadingSpinner
+from .thumbnail_loader import render_thumbnail
 from utils.translator import translator
 
 class MediaThumbnail(QWidget):
@@ -87,13 +87,13 @@ class MediaThumbnail(QWidget):
 
         
 
-        controls_container = QWidget()
+        self.controls_container = QWidget()
 
-        controls_container.setFixedWidth(pixmap.width())
+        self.controls_container.setFixedWidth(pixmap.width())
 
-        controls_container.setLayout(self.controls_layout)
+        self.controls_container.setLayout(self.controls_layout)
 
-        main_layout.addWidget(controls_container)
+        main_layout.addWidget(self.controls_container)
 
 
 
@@ -247,8 +247,7 @@ class MediaThumbnail(QWidget):
         self.media_path = new_path
         self.is_video = new_path.lower().endswith(('.mp4', '.avi', '.mov', '.webm'))
         
-        self.thumbnail_label.setPixmap(new_pixmap)
-        self.media_stack.setFixedSize(new_pixmap.size())
+        self.set_pixmap(new_pixmap)
 
         if self.is_video:
             if not self.video_widget:
@@ -278,6 +277,10 @@ class MediaThumbnail(QWidget):
 
     def set_pixmap(self, pixmap):
         self.thumbnail_label.setPixmap(pixmap)
+        # Заглушка могла мати інший розмір, ніж готова мініатюра
+        self.media_stack.setFixedSize(pixmap.size())
+        self.spinner.setFixedSize(pixmap.size())
+        self.controls_container.setFixedWidth(pixmap.width())
 
     def retranslate_ui(self):
         self.regenerate_button.setText(translator.translate("thumbnail_regen_button"))
@@ -286,39 +289,11 @@ class MediaThumbnail(QWidget):
 
     @staticmethod
     def get_thumbnail_for_media(media_path):
-        if media_path.lower().endswith(('.mp4', '.avi', '.mov', '.webm')):
-            try:
-                vid = cv2.VideoCapture(media_path)
-                if not vid.isOpened():
-                    return QPixmap()
-
-                success, frame = vid.read()
-                
-                # Check for rotation metadata (Qt and modern players handle it, cv2 doesn't always)
-                # cv2.CAP_PROP_ORIENTATION_META might return degrees (90, 180, 270)
-                rotation = vid.get(cv2.CAP_PROP_ORIENTATION_META)
-                
-                vid.release()
-                if success:
-                    if rotation == 90:
-                        frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-                    elif rotation == 180:
-                        frame = cv2.rotate(frame, cv2.ROTATE_180)
-                    elif rotation == 270:
-                        frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
-
-                    height, width, channel = frame.shape
-                    bytes_per_line = 3 * width
-                    q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format.Format_BGR888)
-                    pixmap = QPixmap.fromImage(q_img)
-                    return pixmap.scaled(290, 290, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-            except Exception:
-                pass
-
-        pixmap = QPixmap(media_path)
-        if pixmap.isNull():
-             return QPixmap()
-        return pixmap.scaled(290, 290, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        """Синхронне створення мініатюри (без кешу). Галерея використовує ThumbnailLoader."""
+        image = render_thumbnail(media_path)
+        if image.isNull():
+            return QPixmap()
+        return QPixmap.fromImage(image)
 
     def cleanup(self):
         """Releases any resources held by this thumbnail, such as file handles."""
@@ -0,0 +1,253 @@
+import os
+import sys
+import hashlib
+import platform
+import threading
+from PySide6.QtCore import QObject, Signal, QRunnable, QThreadPool, QSize, Qt
+from PySide6.QtGui import QImage, QImageReader, QPixmap, QColor
+from utils.logger import logger, LogLevel
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.webm')
+THUMBNAIL_SIZE = 290
+
+
+def _decode_video_frame(media_path):
+    import cv2
+
+    vid = cv2.VideoCapture(media_path)
+    if not vid.isOpened():
+        return QImage()
+
+    success, frame = vid.read()
+
+    # Check for rotation metadata (Qt and modern players handle it, cv2 doesn't always)
+    # cv2.CAP_PROP_ORIENTATION_META might return degrees (90, 180, 270)
+    rotation = vid.get(cv2.CAP_PROP_ORIENTATION_META)
+
+    vid.release()
+    if not success:
+        return QImage()
+
+    if rotation == 90:
+        frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
+    elif rotation == 180:
+        frame = cv2.rotate(frame, cv2.ROTATE_180)
+    elif rotation == 270:
+        frame = cv2.rotate(frame, cv2.ROTATE_90_COUNTERCLOCKWISE)
+
+    height, width, channel = frame.shape
+    bytes_per_line = 3 * width
+    # copy() - QImage не повинен посилатись на буфер numpy після виходу з функції
+    return QImage(frame.data, width, height, bytes_per_line, QImage.Format.Format_BGR888).copy()
+
+
+def _decode_image(media_path):
+    reader = QImageReader(media_path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and (size.width() > THUMBNAIL_SIZE or size.height() > THUMBNAIL_SIZE):
+        # Декодер JPEG вміє зменшувати зображення прямо під час читання - повний розмір не розпаковується
+        reader.setScaledSize(size.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio))
+    return reader.read()
+
+
+def render_thumbnail(media_path):
+    """Декодує медіафайл у QImage розміром до THUMBNAIL_SIZE. Безпечно викликати з будь-якого потоку."""
+    image = QImage()
+    if media_path.lower().endswith(VIDEO_EXTENSIONS):
+        try:
+            image = _decode_video_frame(media_path)
+        except Exception:
+            image = QImage()
+
+    if image.isNull():
+        image = _decode_image(media_path)
+    if image.isNull():
+        return QImage()
+
+    if image.width() > THUMBNAIL_SIZE or image.height() > THUMBNAIL_SIZE:
+        image = image.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    return image
+
+
+class ThumbnailJobSignals(QObject):
+    finished = Signal(str, object, QImage) # media_path, key, image (null on failure)
+
+
+class ThumbnailJob(QRunnable):
+    def __init__(self, loader, media_path, key):
+        super().__init__()
+        self.loader = loader
+        self.media_path = media_path
+        self.key = key # (шлях, розмір, mtime, розмір мініатюри) на момент запиту
+        self.signals = ThumbnailJobSignals()
+
+    def run(self):
+        image = QImage()
+        try:
+            image = self.loader.load_image(self.media_path, self.key)
+        except Exception as e:
+            logger.log(f"[Thumbnails] Failed to build thumbnail for {os.path.basename(self.media_path)}: {e}", level=LogLevel.DEBUG)
+        self.signals.finished.emit(self.media_path, self.key, image)
+
+
+class ThumbnailLoader(QObject):
+    """
+    Фонове створення мініатюр для галереї.
+    Мініатюри декодуються в окремому пулі потоків і зберігаються в cache/thumbnails
+    з ключем (шлях, розмір, mtime), тому при повторному відкритті файли не перечитуються.
+    """
+
+    thumbnail_ready = Signal(str, object, QPixmap) # media_path, key, pixmap (null on failure)
+
+    def __init__(self, cache_dir_name='thumbnails', max_size_mb=300, parent=None):
+        super().__init__(parent)
+
+        if platform.system() == "Darwin":
+            base_dir = os.path.expanduser("~/Library/Application Support/Soloveyko.AI-Video.Maker")
+        elif getattr(sys, 'frozen', False):
+            # Running as a bundled exe (Windows)
+            base_dir = os.path.dirname(sys.executable)
+        else:
+            # Running as a script (gui/gallery_tab/thumbnail_loader.py -> root)
+            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        self.cache_dir = os.path.join(base_dir, "cache", cache_dir_name)
+        self.max_size_mb = max_size_mb
+
+        self.threadpool = QThreadPool()
+        self.threadpool.setMaxThreadCount(max(2, min(4, (os.cpu_count() or 2) // 2)))
+        self.pending = set() # ключі _identity(): змінений файл - новий запит, навіть якщо старий ще рендериться
+        self._jobs = {} # key -> job
+        self._pruned = False
+        self._prune_lock = threading.Lock()
+
+    # --- Public API (GUI thread) ---
+
+    def cached_pixmap(self, media_path):
+        """Повертає мініатюру з дискового кешу або нульовий QPixmap, якщо її ще немає."""
+        cache_path = self._cache_path(media_path)
+        if cache_path and os.path.exists(cache_path):
+            pixmap = QPixmap(cache_path)
+            if not pixmap.isNull():
+                return pixmap
+        return QPixmap()
+
+    def placeholder(self, media_path):
+        """Сіра заглушка приблизного розміру мініатюри (розмір зображення читається лише з заголовка)."""
+        size = QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE * 9 // 16)
+        if not media_path.lower().endswith(VIDEO_EXTENSIONS):
+            header_size = QImageReader(media_path).size()
+            if header_size.isValid() and not header_size.isEmpty():
+                size = header_size.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio)
+        pixmap = QPixmap(size)
+        pixmap.fill(QColor("#3a3a3a"))
+        return pixmap
+
+    def can_load(self, media_path):
+        if media_path.lower().endswith(VIDEO_EXTENSIONS):
+            return os.path.exists(media_path)
+        return QImageReader(media_path).canRead()
+
+    def request(self, media_path):
+        """Ставить створення мініатюри в чергу; результат прийде через thumbnail_ready."""
+        key = self._request_key(media_path)
+        if key in self.pending:
+            return
+        self.pending.add(key)
+
+        job = ThumbnailJob(self, media_path, key)
+        job.signals.finished.connect(self._on_job_finished)
+        self._jobs[key] = job
+        job.setAutoDelete(False)
+        self.threadpool.start(job)
+
+        if not self._pruned:
+            self._pruned = True
+            threading.Thread(target=self.prune, daemon=True).start()
+
+    def is_current(self, media_path, key):
+        """True, якщо файл не змінився з моменту запиту мініатюри з цим ключем."""
+        return key == self._request_key(media_path)
+
+    def load_pixmap(self, media_path):
+        """Синхронний варіант (з кешем) для місць, де мініатюра потрібна одразу."""
+        return QPixmap.fromImage(self.load_image(media_path))
+
+    # --- Worker side ---
+
+    def load_image(self, media_path, key=None):
+        cache_path = self._cache_path(media_path, key)
+        if cache_path and os.path.exists(cache_path):
+            image = QImage(cache_path)
+            if not image.isNull():
+                return image
+
+        image = render_thumbnail(media_path)
+        if not image.isNull() and cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+                if image.save(tmp_path, "JPG", 85):
+                    os.replace(tmp_path, cache_path)
+            except OSError as e:
+                logger.log(f"[Thumbnails] Could not store thumbnail: {e}", level=LogLevel.DEBUG)
+        return image
+
+    def prune(self):
+        """Видаляє найстаріші мініатюри, якщо кеш перевищує ліміт розміру."""
+        with self._prune_lock:
+            if not os.path.isdir(self.cache_dir):
+                return
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+                    total += st.st_size
+
+            max_bytes = self.max_size_mb * 1024 * 1024
+            if total <= max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    # --- Internals ---
+
+    def _identity(self, media_path):
+        try:
+            st = os.stat(media_path)
+        except OSError:
+            return None
+        return (os.path.normcase(os.path.abspath(media_path)), st.st_size, st.st_mtime_ns, THUMBNAIL_SIZE)
+
+    def _request_key(self, media_path):
+        return self._identity(media_path) or (media_path,)
+
+    def _cache_path(self, media_path, key=None):
+        if key is None or len(key) != 4:
+            key = self._identity(media_path)
+        if key is None:
+            return None
+        raw = "|".join(str(part) for part in key)
+        digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.jpg")
+
+    def _on_job_finished(self, media_path, key, image):
+        self.pending.discard(key)
+        # Тримаємо посилання на job до завершення, інакше його signals можуть бути зібрані GC
+        self._jobs.pop(key, None)
+        pixmap = QPixmap.fromImage(image) if not image.isNull() else QPixmap()
+        self.thumbnail_ready.emit(media_path, key, pixmap)
@@ -1,6 +1,7 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QHBoxLayout, 
-                             QPushButton, QScrollArea, QFrame, QTextEdit, QDialog, QMessageBox)
-from PySide6.QtCore import Qt
+                             QPushButton, QScrollArea, QFrame, QTextEdit, QDialog, QMessageBox,
+                             QLineEdit, QCheckBox)
+from PySide6.QtCore import Qt, QTimer
 from datetime import datetime
 
 from utils.translator import translator
@@ -190,9 +191,12 @@ class HistoryCard(QFrame):
         dialog.exec()
 
 class HistoryTab(QWidget):
+    PAGE_SIZE = 50
+
     def __init__(self, main_window=None):
         super().__init__()
         self.main_window = main_window
+        self.loaded_count = 0
         self.init_ui()
 
     def init_ui(self):
@@ -212,6 +216,24 @@ class HistoryTab(QWidget):
         header_layout.addWidget(self.clear_btn)
         
         main_layout.addLayout(header_layout)
+
+        # Filters
+        filter_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText(translator.translate('history_search_placeholder', 'Пошук за назвою завдання...'))
+        self.search_input.setClearButtonEnabled(True)
+        # Не перечитуємо базу на кожну натиснуту клавішу
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.load_history)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        filter_layout.addWidget(self.search_input, 1)
+
+        self.errors_only_cb = QCheckBox(translator.translate('history_errors_only', 'Лише з помилками'))
+        self.errors_only_cb.toggled.connect(self.load_history)
+        filter_layout.addWidget(self.errors_only_cb)
+        main_layout.addLayout(filter_layout)
         
         # Scroll Area for cards
         self.scroll = QScrollArea()
@@ -225,6 +247,11 @@ class HistoryTab(QWidget):
         self.scroll.setWidget(self.scroll_content)
         
         main_layout.addWidget(self.scroll)
+
+        self.load_more_btn = QPushButton(translator.translate('history_load_more', 'Показати ще'))
+        self.load_more_btn.clicked.connect(self.load_more)
+        self.load_more_btn.hide()
+        main_layout.addWidget(self.load_more_btn)
         
         self.setLayout(main_layout)
         self.load_history()
@@ -235,18 +262,34 @@ class HistoryTab(QWidget):
             child = self.scroll_layout.takeAt(0)
             if child.widget():
                 child.widget().deleteLater()
-            
-        history = history_manager.get_history(30)
+        self.loaded_count = 0
+
+        search, errors_only = self._current_filters()
+        self.total_count = history_manager.count_history(30, search=search, errors_only=errors_only)
         
-        if not history:
+        if not self.total_count:
             no_data = QLabel(f"<div style='margin-top: 50px; color: gray;'>{translator.translate('no_history_yet', 'Історії поки немає')}</div>")
             no_data.setAlignment(Qt.AlignCenter)
             self.scroll_layout.addWidget(no_data)
+            self.load_more_btn.hide()
             return
 
+        self.load_more()
+
+    def load_more(self):
+        search, errors_only = self._current_filters()
+        history = history_manager.query_history(30, limit=self.PAGE_SIZE, offset=self.loaded_count,
+                                                search=search, errors_only=errors_only)
+
         for entry in history:
             card = HistoryCard(entry)
             self.scroll_layout.addWidget(card)
+        self.loaded_count += len(history)
+
+        self.load_more_btn.setVisible(bool(history) and self.loaded_count < self.total_count)
+
+    def _current_filters(self):
+        return self.search_input.text().strip() or None, self.errors_only_cb.isChecked()
 
     def clear_history(self):
         reply = QMessageBox.question(self, 
@@ -260,6 +303,9 @@ class HistoryTab(QWidget):
     def retranslate_ui(self):
         self.title_label.setText(f"<h1>{translator.translate('history_tab_title', 'Історія')}</h1>")
         self.clear_btn.setText(translator.translate('clear_history_button', 'Очистити історію'))
+        self.search_input.setPlaceholderText(translator.translate('history_search_placeholder', 'Пошук за назвою завдання...'))
+        self.errors_only_cb.setText(translator.translate('history_errors_only', 'Лише з помилками'))
+        self.load_more_btn.setText(translator.translate('history_load_more', 'Показати ще'))
         # Retranslate items if needed, but easier to just reload
         self.load_history()
 
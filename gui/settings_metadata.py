@@ -54,6 +54,7 @@ SETTINGS_METADATA = {
         'preset': {'type': 'choice', 'options': ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"], 'label': 'preset_label'},
         'bitrate_mbps': {'type': 'int', 'min': 1, 'max': 100, 'suffix': ' Mbps', 'label': 'bitrate_label'},
         'upscale_factor': {'type': 'float', 'min': 1.0, 'max': 5.0, 'step': 0.1, 'suffix': 'x', 'label': 'upscale_factor_label'},
+        'motion_engine': {'type': 'choice', 'options': ["zoompan", "affine"], 'label': 'motion_engine_label'},
         # Transitions
         'enable_transitions': {'type': 'bool', 'label': 'enable_transitions_label'},
         'transition_effect': {'type': 'choice', 'options': [
@@ -79,7 +80,12 @@ SETTINGS_METADATA = {
         'special_processing_duration_per_image': {'type': 'float', 'min': 0.1, 'max': 10.0, 'step': 0.1, 'suffix': ' s', 'label': 'duration_per_image_label'},
         'special_processing_video_count': {'type': 'int', 'min': 1, 'max': 100, 'label': 'special_proc_video_count_label'},
         'special_processing_check_sequence': {'type': 'bool', 'label': 'special_proc_check_sequence_label'},
-        'max_concurrent_montages': {'type': 'int', 'min': 1, 'max': 10, 'label': 'max_concurrent_montages_label'}
+        'max_concurrent_montages': {'type': 'int', 'min': 1, 'max': 10, 'label': 'max_concurrent_montages_label'},
+        'adaptive_concurrency': {'type': 'bool', 'label': 'adaptive_concurrency_label'},
+        'queue_order': {'type': 'choice', 'options': ["sjf", "fifo"], 'label': 'queue_order_label'},
+        'segment_render': {'type': 'bool', 'label': 'segment_render_label'},
+        'segment_workers': {'type': 'int', 'min': 0, 'max': 16, 'label': 'segment_workers_label'},
+        'max_open_inputs': {'type': 'int', 'min': 0, 'max': 500, 'label': 'max_open_inputs_label'}
     },
     'subtitles': {
         'whisper_type': {'type': 'choice', 'options': ['standard', 'amd', 'assemblyai'], 'label': 'whisper_engine_group'},
@@ -90,6 +96,11 @@ SETTINGS_METADATA = {
         'fade_in': {'type': 'int', 'min': 0, 'max': 5000, 'suffix': ' ms', 'label': 'fade_in_label'},
         'fade_out': {'type': 'int', 'min': 0, 'max': 5000, 'suffix': ' ms', 'label': 'fade_out_label'},
         'max_words': {'type': 'int', 'min': 1, 'max': 50, 'label': 'max_words_per_line_label'},
+        'align_to_script': {'type': 'bool', 'label': 'align_to_script_label'},
+        'whisper_host_idle_minutes': {'type': 'int', 'min': 0, 'max': 240, 'suffix': ' min', 'label': 'whisper_host_idle_label'},
+        'whisper_host_memory_mb': {'type': 'int', 'min': 0, 'max': 256000, 'suffix': ' MB', 'label': 'whisper_host_memory_label'},
+        'whisper_workers': {'type': 'int', 'min': 0, 'max': 32, 'label': 'whisper_workers_label'},
+        'chunked_transcription': {'type': 'bool', 'label': 'chunked_transcription_label'},
         'color': {'type': 'color', 'label': 'color_label'},
     },
     'googler': {
@@ -192,6 +203,7 @@ KEY_TO_TRANSLATION_MAP = {
     'preset': 'preset_label',
     'bitrate_mbps': 'bitrate_label',
     'upscale_factor': 'upscale_factor_label',
+    'motion_engine': 'motion_engine_label',
     'enable_transitions': 'enable_transitions_label',
     'transition_effect': 'transition_effect_label',
     'transition_duration': 'duration_label',
@@ -206,6 +218,11 @@ KEY_TO_TRANSLATION_MAP = {
     'special_processing_video_count': 'special_proc_video_count_label',
     'special_processing_check_sequence': 'special_proc_check_sequence_label',
     'max_concurrent_montages': 'max_concurrent_montages_label',
+    'adaptive_concurrency': 'adaptive_concurrency_label',
+    'queue_order': 'queue_order_label',
+    'segment_render': 'segment_render_label',
+    'segment_workers': 'segment_workers_label',
+    'max_open_inputs': 'max_open_inputs_label',
 
     # Subtitles Tab
     'whisper_model': 'model_label',
@@ -215,6 +232,11 @@ KEY_TO_TRANSLATION_MAP = {
     'fade_in': 'fade_in_label',
     'fade_out': 'fade_out_label',
     'max_words': 'max_words_per_line_label',
+    'align_to_script': 'align_to_script_label',
+    'whisper_host_idle_minutes': 'whisper_host_idle_label',
+    'whisper_host_memory_mb': 'whisper_host_memory_label',
+    'whisper_workers': 'whisper_workers_label',
+    'chunked_transcription': 'chunked_transcription_label',
     'color': 'color_label',
     
     # Googler
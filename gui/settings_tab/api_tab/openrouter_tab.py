@@ -1,10 +1,11 @@
 
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QListWidget, QHBoxLayout, QScrollArea, QSpinBox
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QListWidget, QHBoxLayout, QScrollArea, QSpinBox, QGroupBox, QFormLayout, QCheckBox
 from PySide6.QtCore import Signal, Qt
 from utils.translator import translator
 from utils.settings import settings_manager
 from api.openrouter import OpenRouterAPI
 from utils.logger import logger, LogLevel
+from utils.completion_cache import completion_cache
 
 from gui.widgets.help_label import HelpLabel
 from gui.widgets.setting_row import add_setting_row
@@ -75,6 +76,72 @@ class OpenRouterTab(QWidget):
         max_threads_layout.addWidget(self.max_threads_input)
         layout.addLayout(max_threads_layout)
 
+        # Response Cache
+        self.cache_group = QGroupBox()
+        cache_layout = QFormLayout(self.cache_group)
+
+        self.cache_enabled_help = HelpLabel("completion_cache_enabled_label")
+        self.cache_enabled_label = QLabel()
+        self.cache_enabled_cb = QCheckBox()
+        cache_enabled_container = QWidget()
+        cache_enabled_layout = QHBoxLayout(cache_enabled_container)
+        cache_enabled_layout.setContentsMargins(0, 0, 0, 0)
+        cache_enabled_layout.setSpacing(5)
+        cache_enabled_layout.addWidget(self.cache_enabled_help)
+        cache_enabled_layout.addWidget(self.cache_enabled_label)
+        cache_enabled_layout.addWidget(self.cache_enabled_cb)
+        cache_enabled_layout.addStretch()
+        self.cache_enabled_cb.toggled.connect(self.save_cache_settings)
+        add_setting_row(cache_layout, None, cache_enabled_container, "completion_cache.enabled", refresh_quick_panel)
+
+        self.cache_ttl_help = HelpLabel("completion_cache_ttl_label")
+        self.cache_ttl_label = QLabel()
+        cache_ttl_container = QWidget()
+        cache_ttl_layout = QHBoxLayout(cache_ttl_container)
+        cache_ttl_layout.setContentsMargins(0, 0, 0, 0)
+        cache_ttl_layout.setSpacing(5)
+        cache_ttl_layout.addWidget(self.cache_ttl_help)
+        cache_ttl_layout.addWidget(self.cache_ttl_label)
+        self.cache_ttl_spin = QSpinBox()
+        self.cache_ttl_spin.setRange(0, 8760)
+        self.cache_ttl_spin.setSuffix(" h")
+        self.cache_ttl_spin.valueChanged.connect(self.save_cache_settings)
+        add_setting_row(cache_layout, cache_ttl_container, self.cache_ttl_spin, "completion_cache.ttl_hours", refresh_quick_panel)
+
+        self.cache_size_help = HelpLabel("completion_cache_max_size_label")
+        self.cache_size_label = QLabel()
+        cache_size_container = QWidget()
+        cache_size_layout = QHBoxLayout(cache_size_container)
+        cache_size_layout.setContentsMargins(0, 0, 0, 0)
+        cache_size_layout.setSpacing(5)
+        cache_size_layout.addWidget(self.cache_size_help)
+        cache_size_layout.addWidget(self.cache_size_label)
+        self.cache_size_spin = QSpinBox()
+        self.cache_size_spin.setRange(10, 10000)
+        self.cache_size_spin.setSuffix(" MB")
+        self.cache_size_spin.valueChanged.connect(self.save_cache_settings)
+        add_setting_row(cache_layout, cache_size_container, self.cache_size_spin, "completion_cache.max_size_mb", refresh_quick_panel)
+
+        # Per-stage opt-out
+        self.cache_stages_label = QLabel()
+        cache_stages_container = QWidget()
+        cache_stages_layout = QHBoxLayout(cache_stages_container)
+        cache_stages_layout.setContentsMargins(0, 0, 0, 0)
+        self.cache_stage_cbs = {}
+        for stage in completion_cache.STAGES:
+            cb = QCheckBox()
+            cb.toggled.connect(self.save_cache_settings)
+            cache_stages_layout.addWidget(cb)
+            self.cache_stage_cbs[stage] = cb
+        cache_stages_layout.addStretch()
+        cache_layout.addRow(self.cache_stages_label, cache_stages_container)
+
+        self.clear_cache_button = QPushButton()
+        self.clear_cache_button.clicked.connect(self.clear_cache)
+        cache_layout.addRow(self.clear_cache_button)
+
+        layout.addWidget(self.cache_group)
+
         # Balance
         self.balance_label = QLabel(translator.translate("balance_loading"))
         layout.addWidget(self.balance_label)
@@ -117,6 +184,25 @@ class OpenRouterTab(QWidget):
         self.check_connection_button.setText(translator.translate("check_connection"))
         self.max_threads_label.setText(translator.translate("max_concurrent_requests"))
         self.max_threads_help.update_tooltip()
+        self.cache_group.setTitle(translator.translate("completion_cache_group"))
+        self.cache_enabled_label.setText(translator.translate("completion_cache_enabled_label"))
+        self.cache_ttl_label.setText(translator.translate("completion_cache_ttl_label"))
+        self.cache_ttl_spin.setSpecialValueText(translator.translate("completion_cache_ttl_unlimited"))
+        self.cache_size_label.setText(translator.translate("completion_cache_max_size_label"))
+        self.cache_stages_label.setText(translator.translate("completion_cache_stages_label"))
+        stage_titles = {
+            'translation': "stage_translation",
+            'rewrite': "stage_rewrite",
+            'image_prompts': "stage_img_prompts",
+            'preview': "stage_preview",
+            'custom_stage': "custom_stages_label",
+        }
+        for stage, cb in self.cache_stage_cbs.items():
+            cb.setText(translator.translate(stage_titles[stage]))
+        self.clear_cache_button.setText(translator.translate("completion_cache_clear"))
+        self.cache_enabled_help.update_tooltip()
+        self.cache_ttl_help.update_tooltip()
+        self.cache_size_help.update_tooltip()
         self.update_connection_status_label()
         self.models_label.setText(translator.translate("models"))
         self.add_model_input.setPlaceholderText(translator.translate("enter_model_name"))
@@ -136,6 +222,19 @@ class OpenRouterTab(QWidget):
         self.max_threads_input.setValue(self.settings.get("openrouter_max_threads", 5))
         self.max_threads_input.blockSignals(False)
 
+        cache_settings = self.settings.get("completion_cache", {})
+        disabled_stages = cache_settings.get("disabled_stages", [])
+        cache_widgets = [self.cache_enabled_cb, self.cache_ttl_spin, self.cache_size_spin] + list(self.cache_stage_cbs.values())
+        for widget in cache_widgets:
+            widget.blockSignals(True)
+        self.cache_enabled_cb.setChecked(cache_settings.get("enabled", True))
+        self.cache_ttl_spin.setValue(cache_settings.get("ttl_hours", 168))
+        self.cache_size_spin.setValue(cache_settings.get("max_size_mb", 200))
+        for stage, cb in self.cache_stage_cbs.items():
+            cb.setChecked(stage not in disabled_stages)
+        for widget in cache_widgets:
+            widget.blockSignals(False)
+
         self.update_models_list()
         
     def save_api_key(self, key):
@@ -145,6 +244,18 @@ class OpenRouterTab(QWidget):
     def save_max_threads(self, value):
         self.settings.set("openrouter_max_threads", value)
 
+    def save_cache_settings(self, *args):
+        self.settings.set("completion_cache", {
+            "enabled": self.cache_enabled_cb.isChecked(),
+            "ttl_hours": self.cache_ttl_spin.value(),
+            "max_size_mb": self.cache_size_spin.value(),
+            "disabled_stages": [stage for stage, cb in self.cache_stage_cbs.items() if not cb.isChecked()]
+        })
+
+    def clear_cache(self):
+        completion_cache.clear()
+        logger.log(translator.translate("completion_cache_cleared"), level=LogLevel.INFO)
+
     def check_connection(self):
         self.update_connection_status_label("checking")
         self.balance_label.setText(translator.translate("balance_loading"))
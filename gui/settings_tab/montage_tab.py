@@ -1,9 +1,12 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QScrollArea,
                                QCheckBox, QDoubleSpinBox, QComboBox, QSpinBox,
-                               QFormLayout, QGroupBox, QLabel, QHBoxLayout)
+                               QFormLayout, QGroupBox, QLabel, QHBoxLayout, QPushButton)
 from PySide6.QtCore import Qt
 from utils.translator import translator
 from utils.settings import settings_manager
+from utils.logger import logger, LogLevel
+from core.clip_cache import clip_cache
+from core.asset_cache import asset_cache
 from gui.widgets.slider_spinbox import SliderWithSpinBox
 from gui.widgets.help_label import HelpLabel
 from gui.widgets.setting_row import add_setting_row
@@ -114,6 +117,22 @@ class MontageTab(QWidget):
         self.upscale_spin.valueChanged.connect(self.save_settings)
         add_setting_row(render_layout, upscale_label_container, self.upscale_spin, "montage.upscale_factor", refresh_quick_panel)
 
+        self.motion_engine_help = HelpLabel("motion_engine_label")
+        self.motion_engine_label = QLabel()
+        motion_engine_label_container = QWidget()
+        motion_engine_label_layout = QHBoxLayout(motion_engine_label_container)
+        motion_engine_label_layout.setContentsMargins(0,0,0,0)
+        motion_engine_label_layout.setSpacing(5)
+        motion_engine_label_layout.addWidget(self.motion_engine_help)
+        motion_engine_label_layout.addWidget(self.motion_engine_label)
+
+        self.motion_engine_combo = QComboBox()
+        self.motion_engine_combo.addItem("zoompan", "zoompan")
+        self.motion_engine_combo.addItem("affine", "affine")
+        self.motion_engine_combo.currentIndexChanged.connect(self.save_settings)
+        self.motion_engine_combo.currentIndexChanged.connect(self.toggle_motion_engine_widgets)
+        add_setting_row(render_layout, motion_engine_label_container, self.motion_engine_combo, "montage.motion_engine", refresh_quick_panel)
+
         self.render_group.setLayout(render_layout)
         self.layout.addWidget(self.render_group)
 
@@ -332,6 +351,37 @@ class MontageTab(QWidget):
         self.perf_group = QGroupBox()
         perf_layout = QFormLayout()
 
+        self.adaptive_concurrency_help = HelpLabel("adaptive_concurrency_label")
+        self.adaptive_concurrency_cb = QCheckBox()
+        self.adaptive_concurrency_label = QLabel()
+        adaptive_concurrency_container = QWidget()
+        adaptive_concurrency_layout = QHBoxLayout(adaptive_concurrency_container)
+        adaptive_concurrency_layout.setContentsMargins(0,0,0,0)
+        adaptive_concurrency_layout.setSpacing(5)
+        adaptive_concurrency_layout.addWidget(self.adaptive_concurrency_help)
+        adaptive_concurrency_layout.addWidget(self.adaptive_concurrency_label)
+        adaptive_concurrency_layout.addWidget(self.adaptive_concurrency_cb)
+        adaptive_concurrency_layout.addStretch()
+
+        self.adaptive_concurrency_cb.toggled.connect(self.save_settings)
+        self.adaptive_concurrency_cb.toggled.connect(self.toggle_concurrency_widgets)
+        add_setting_row(perf_layout, None, adaptive_concurrency_container, "montage.adaptive_concurrency", refresh_quick_panel)
+
+        self.queue_order_help = HelpLabel("queue_order_label")
+        self.queue_order_label = QLabel()
+        queue_order_container = QWidget()
+        queue_order_layout = QHBoxLayout(queue_order_container)
+        queue_order_layout.setContentsMargins(0,0,0,0)
+        queue_order_layout.setSpacing(5)
+        queue_order_layout.addWidget(self.queue_order_help)
+        queue_order_layout.addWidget(self.queue_order_label)
+
+        self.queue_order_combo = QComboBox()
+        self.queue_order_combo.addItem("sjf", "sjf")
+        self.queue_order_combo.addItem("fifo", "fifo")
+        self.queue_order_combo.currentIndexChanged.connect(self.save_settings)
+        add_setting_row(perf_layout, queue_order_container, self.queue_order_combo, "montage.queue_order", refresh_quick_panel)
+
         self.max_concurrent_montages_help = HelpLabel("max_concurrent_montages_label")
         self.max_concurrent_montages_label = QLabel()
         max_montages_container = QWidget()
@@ -346,9 +396,105 @@ class MontageTab(QWidget):
         self.max_concurrent_montages_spin.valueChanged.connect(self.save_settings)
         add_setting_row(perf_layout, max_montages_container, self.max_concurrent_montages_spin, "montage.max_concurrent_montages", refresh_quick_panel)
 
+        self.segment_render_help = HelpLabel("segment_render_label")
+        self.segment_render_cb = QCheckBox()
+        self.segment_render_label = QLabel()
+        segment_render_container = QWidget()
+        segment_render_layout = QHBoxLayout(segment_render_container)
+        segment_render_layout.setContentsMargins(0,0,0,0)
+        segment_render_layout.setSpacing(5)
+        segment_render_layout.addWidget(self.segment_render_help)
+        segment_render_layout.addWidget(self.segment_render_label)
+        segment_render_layout.addWidget(self.segment_render_cb)
+        segment_render_layout.addStretch()
+
+        self.segment_render_cb.toggled.connect(self.save_settings)
+        add_setting_row(perf_layout, None, segment_render_container, "montage.segment_render", refresh_quick_panel)
+
+        self.segment_workers_help = HelpLabel("segment_workers_label")
+        self.segment_workers_label = QLabel()
+        segment_workers_container = QWidget()
+        segment_workers_layout = QHBoxLayout(segment_workers_container)
+        segment_workers_layout.setContentsMargins(0,0,0,0)
+        segment_workers_layout.setSpacing(5)
+        segment_workers_layout.addWidget(self.segment_workers_help)
+        segment_workers_layout.addWidget(self.segment_workers_label)
+
+        self.segment_workers_spin = QSpinBox()
+        self.segment_workers_spin.setRange(0, 16)
+        self.segment_workers_spin.valueChanged.connect(self.save_settings)
+        add_setting_row(perf_layout, segment_workers_container, self.segment_workers_spin, "montage.segment_workers", refresh_quick_panel)
+
+        self.max_open_inputs_help = HelpLabel("max_open_inputs_label")
+        self.max_open_inputs_label = QLabel()
+        max_open_inputs_container = QWidget()
+        max_open_inputs_layout = QHBoxLayout(max_open_inputs_container)
+        max_open_inputs_layout.setContentsMargins(0,0,0,0)
+        max_open_inputs_layout.setSpacing(5)
+        max_open_inputs_layout.addWidget(self.max_open_inputs_help)
+        max_open_inputs_layout.addWidget(self.max_open_inputs_label)
+
+        self.max_open_inputs_spin = QSpinBox()
+        self.max_open_inputs_spin.setRange(0, 500)
+        self.max_open_inputs_spin.valueChanged.connect(self.save_settings)
+        add_setting_row(perf_layout, max_open_inputs_container, self.max_open_inputs_spin, "montage.max_open_inputs", refresh_quick_panel)
+
         self.perf_group.setLayout(perf_layout)
         self.layout.addWidget(self.perf_group)
 
+        # --- Clip Cache ---
+        self.clip_cache_group = QGroupBox()
+        clip_cache_layout = QFormLayout(self.clip_cache_group)
+
+        self.clip_cache_enabled_help = HelpLabel("clip_cache_enabled_label")
+        self.clip_cache_enabled_label = QLabel()
+        self.clip_cache_enabled_cb = QCheckBox()
+        clip_cache_enabled_container = QWidget()
+        clip_cache_enabled_layout = QHBoxLayout(clip_cache_enabled_container)
+        clip_cache_enabled_layout.setContentsMargins(0,0,0,0)
+        clip_cache_enabled_layout.setSpacing(5)
+        clip_cache_enabled_layout.addWidget(self.clip_cache_enabled_help)
+        clip_cache_enabled_layout.addWidget(self.clip_cache_enabled_label)
+        clip_cache_enabled_layout.addWidget(self.clip_cache_enabled_cb)
+        clip_cache_enabled_layout.addStretch()
+        self.clip_cache_enabled_cb.toggled.connect(self.save_clip_cache_settings)
+        add_setting_row(clip_cache_layout, None, clip_cache_enabled_container, "clip_cache.enabled", refresh_quick_panel)
+
+        self.clip_cache_ttl_help = HelpLabel("clip_cache_ttl_label")
+        self.clip_cache_ttl_label = QLabel()
+        clip_cache_ttl_container = QWidget()
+        clip_cache_ttl_layout = QHBoxLayout(clip_cache_ttl_container)
+        clip_cache_ttl_layout.setContentsMargins(0,0,0,0)
+        clip_cache_ttl_layout.setSpacing(5)
+        clip_cache_ttl_layout.addWidget(self.clip_cache_ttl_help)
+        clip_cache_ttl_layout.addWidget(self.clip_cache_ttl_label)
+        self.clip_cache_ttl_spin = QSpinBox()
+        self.clip_cache_ttl_spin.setRange(0, 8760)
+        self.clip_cache_ttl_spin.setSuffix(" h")
+        self.clip_cache_ttl_spin.valueChanged.connect(self.save_clip_cache_settings)
+        add_setting_row(clip_cache_layout, clip_cache_ttl_container, self.clip_cache_ttl_spin, "clip_cache.ttl_hours", refresh_quick_panel)
+
+        self.clip_cache_size_help = HelpLabel("clip_cache_max_size_label")
+        self.clip_cache_size_label = QLabel()
+        clip_cache_size_container = QWidget()
+        clip_cache_size_layout = QHBoxLayout(clip_cache_size_container)
+        clip_cache_size_layout.setContentsMargins(0,0,0,0)
+        clip_cache_size_layout.setSpacing(5)
+        clip_cache_size_layout.addWidget(self.clip_cache_size_help)
+        clip_cache_size_layout.addWidget(self.clip_cache_size_label)
+        self.clip_cache_size_spin = QSpinBox()
+        self.clip_cache_size_spin.setRange(500, 500000)
+        self.clip_cache_size_spin.setSingleStep(500)
+        self.clip_cache_size_spin.setSuffix(" MB")
+        self.clip_cache_size_spin.valueChanged.connect(self.save_clip_cache_settings)
+        add_setting_row(clip_cache_layout, clip_cache_size_container, self.clip_cache_size_spin, "clip_cache.max_size_mb", refresh_quick_panel)
+
+        self.clear_clip_cache_button = QPushButton()
+        self.clear_clip_cache_button.clicked.connect(self.clear_clip_cache)
+        clip_cache_layout.addRow(self.clear_clip_cache_button)
+
+        self.layout.addWidget(self.clip_cache_group)
+
         self.layout.addStretch()
 
     def update_fields(self):
@@ -369,6 +515,9 @@ class MontageTab(QWidget):
         self.bitrate_spin.setValue(m_settings.get("bitrate_mbps", 15))
         self.upscale_spin.setValue(m_settings.get("upscale_factor", 3.0))
 
+        index = self.motion_engine_combo.findData(m_settings.get("motion_engine", "zoompan"))
+        self.motion_engine_combo.setCurrentIndex(index if index != -1 else 0)
+
         self.enable_trans_cb.setChecked(m_settings.get("enable_transitions", True))
         
         effect = m_settings.get("transition_effect", "random")
@@ -400,12 +549,33 @@ class MontageTab(QWidget):
         self.special_proc_check_sequence_cb.setChecked(m_settings.get("special_processing_check_sequence", False))
 
         self.max_concurrent_montages_spin.setValue(m_settings.get("max_concurrent_montages", 1))
+        self.adaptive_concurrency_cb.setChecked(m_settings.get("adaptive_concurrency", True))
+        index = self.queue_order_combo.findData(m_settings.get("queue_order", "sjf"))
+        self.queue_order_combo.setCurrentIndex(index if index != -1 else 0)
+        self.segment_render_cb.setChecked(m_settings.get("segment_render", False))
+        self.segment_workers_spin.setValue(m_settings.get("segment_workers", 0))
+        self.max_open_inputs_spin.setValue(m_settings.get("max_open_inputs", 100))
+
+        cache_settings = self.settings.get("clip_cache", {})
+        self.clip_cache_enabled_cb.setChecked(cache_settings.get("enabled", False))
+        self.clip_cache_ttl_spin.setValue(cache_settings.get("ttl_hours", 168))
+        self.clip_cache_size_spin.setValue(cache_settings.get("max_size_mb", 10240))
 
         for widget in self.findChildren(QWidget):
             if isinstance(widget, (QComboBox, QSpinBox, QDoubleSpinBox, QCheckBox, SliderWithSpinBox)):
                 widget.blockSignals(False)
 
         self.toggle_special_proc_widgets()
+        self.toggle_concurrency_widgets()
+        self.toggle_motion_engine_widgets()
+
+    def toggle_motion_engine_widgets(self, *args):
+        # Рушій affine не використовує апскейл
+        self.upscale_spin.setEnabled(self.motion_engine_combo.currentData() != "affine")
+
+    def toggle_concurrency_widgets(self, *args):
+        # В адаптивному режимі кількість монтажів визначає governor, статичний ліміт не використовується
+        self.max_concurrent_montages_spin.setEnabled(not self.adaptive_concurrency_cb.isChecked())
 
     def save_settings(self, *args):
         m_settings = {
@@ -413,6 +583,7 @@ class MontageTab(QWidget):
             "preset": self.preset_combo.currentText(),
             "bitrate_mbps": self.bitrate_spin.value(),
             "upscale_factor": self.upscale_spin.value(),
+            "motion_engine": self.motion_engine_combo.currentData(),
             "enable_transitions": self.enable_trans_cb.isChecked(),
             "transition_effect": self.trans_effect_combo.currentData(),
             "transition_duration": self.trans_dur_spin.value(),
@@ -426,16 +597,36 @@ class MontageTab(QWidget):
             "special_processing_duration_per_image": self.special_proc_dur_spin.value(),
             "special_processing_video_count": self.special_proc_video_count_spin.value(),
             "special_processing_check_sequence": self.special_proc_check_sequence_cb.isChecked(),
-            "max_concurrent_montages": self.max_concurrent_montages_spin.value()
+            "max_concurrent_montages": self.max_concurrent_montages_spin.value(),
+            "adaptive_concurrency": self.adaptive_concurrency_cb.isChecked(),
+            "queue_order": self.queue_order_combo.currentData(),
+            "segment_render": self.segment_render_cb.isChecked(),
+            "segment_workers": self.segment_workers_spin.value(),
+            "max_open_inputs": self.max_open_inputs_spin.value()
         }
         self.settings.set("montage", m_settings)
 
+    def save_clip_cache_settings(self, *args):
+        self.settings.set("clip_cache", {
+            "enabled": self.clip_cache_enabled_cb.isChecked(),
+            "ttl_hours": self.clip_cache_ttl_spin.value(),
+            "max_size_mb": self.clip_cache_size_spin.value()
+        })
+
+    def clear_clip_cache(self):
+        clip_cache.clear()
+        asset_cache.clear()
+        logger.log(translator.translate("clip_cache_cleared"), level=LogLevel.INFO)
+
     def retranslate_ui(self):
         self.render_group.setTitle(translator.translate("render_settings"))
         self.codec_label.setText(translator.translate("codec_label"))
         self.preset_label.setText(translator.translate("preset_label"))
         self.bitrate_label.setText(translator.translate("bitrate_label"))
         self.upscale_label.setText(translator.translate("upscale_factor_label"))
+        self.motion_engine_label.setText(translator.translate("motion_engine_label"))
+        self.motion_engine_combo.setItemText(0, translator.translate("motion_engine_zoompan"))
+        self.motion_engine_combo.setItemText(1, translator.translate("motion_engine_affine"))
 
         self.trans_group.setTitle(translator.translate("transitions_settings"))
         self.enable_trans_label.setText(translator.translate("enable_transitions_label"))
@@ -470,13 +661,30 @@ class MontageTab(QWidget):
         self.special_proc_check_sequence_label.setText(translator.translate("special_proc_check_sequence_label"))
 
         self.perf_group.setTitle(translator.translate("performance_group"))
+        self.adaptive_concurrency_label.setText(translator.translate("adaptive_concurrency_label"))
+        self.queue_order_label.setText(translator.translate("queue_order_label"))
+        self.queue_order_combo.setItemText(0, translator.translate("queue_order_sjf"))
+        self.queue_order_combo.setItemText(1, translator.translate("queue_order_fifo"))
         self.max_concurrent_montages_label.setText(translator.translate("max_concurrent_montages_label"))
+        self.segment_render_label.setText(translator.translate("segment_render_label"))
+        self.segment_workers_label.setText(translator.translate("segment_workers_label"))
+        self.segment_workers_spin.setSpecialValueText(translator.translate("segment_workers_auto"))
+        self.max_open_inputs_label.setText(translator.translate("max_open_inputs_label"))
+        self.max_open_inputs_spin.setSpecialValueText(translator.translate("max_open_inputs_unlimited"))
+
+        self.clip_cache_group.setTitle(translator.translate("clip_cache_group"))
+        self.clip_cache_enabled_label.setText(translator.translate("clip_cache_enabled_label"))
+        self.clip_cache_ttl_label.setText(translator.translate("clip_cache_ttl_label"))
+        self.clip_cache_ttl_spin.setSpecialValueText(translator.translate("completion_cache_ttl_unlimited"))
+        self.clip_cache_size_label.setText(translator.translate("clip_cache_max_size_label"))
+        self.clear_clip_cache_button.setText(translator.translate("completion_cache_clear"))
 
         # Update all hints
         self.codec_help.update_tooltip()
         self.preset_help.update_tooltip()
         self.bitrate_help.update_tooltip()
         self.upscale_help.update_tooltip()
+        self.motion_engine_help.update_tooltip()
         self.enable_trans_help.update_tooltip()
         self.trans_dur_help.update_tooltip()
         self.enable_zoom_help.update_tooltip()
@@ -487,7 +695,15 @@ class MontageTab(QWidget):
         self.special_proc_mode_help.update_tooltip()
         self.special_proc_check_sequence_help.update_tooltip()
         self.trans_effect_help.update_tooltip()
+        self.adaptive_concurrency_help.update_tooltip()
+        self.queue_order_help.update_tooltip()
         self.max_concurrent_montages_help.update_tooltip()
+        self.segment_render_help.update_tooltip()
+        self.segment_workers_help.update_tooltip()
+        self.max_open_inputs_help.update_tooltip()
+        self.clip_cache_enabled_help.update_tooltip()
+        self.clip_cache_ttl_help.update_tooltip()
+        self.clip_cache_size_help.update_tooltip()
 
     def update_trans_description(self):
         effect = self.trans_effect_combo.currentData()
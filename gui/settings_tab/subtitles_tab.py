@@ -5,12 +5,14 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QScrollArea, QFormLayout,
     QPushButton, QSpinBox, QFontComboBox, QColorDialog,
     QGroupBox, QComboBox, QRadioButton, QButtonGroup, QHBoxLayout, QLabel,
-    QMessageBox, QProgressDialog
+    QMessageBox, QProgressDialog, QCheckBox
 )
 from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QColor
 from utils.settings import settings_manager
 from utils.translator import translator
+from utils.logger import logger, LogLevel
+from core.transcript_cache import transcript_cache
 from gui.widgets.help_label import HelpLabel
 from gui.widgets.setting_row import add_setting_row, QuickSettingButton
 
@@ -130,6 +132,110 @@ class SubtitlesTab(QWidget):
         self.whisper_group.setLayout(whisper_layout)
         layout.addWidget(self.whisper_group)
 
+        # --- Resident Whisper Host (standard engine) ---
+        self.whisper_host_group = QGroupBox()
+        whisper_host_layout = QFormLayout()
+
+        self.whisper_host_idle_label = QLabel()
+        self.whisper_host_idle_spin = QSpinBox()
+        self.whisper_host_idle_spin.setRange(0, 240)
+        self.whisper_host_idle_spin.setSuffix(" min")
+        self.whisper_host_idle_spin.valueChanged.connect(self.save_settings)
+
+        self.whisper_host_idle_help = HelpLabel("whisper_host_idle_hint")
+        whisper_host_idle_container = QWidget()
+        whisper_host_idle_layout = QHBoxLayout(whisper_host_idle_container)
+        whisper_host_idle_layout.setContentsMargins(0, 0, 0, 0)
+        whisper_host_idle_layout.setSpacing(5)
+        whisper_host_idle_layout.addWidget(self.whisper_host_idle_help)
+        whisper_host_idle_layout.addWidget(self.whisper_host_idle_label)
+        add_setting_row(whisper_host_layout, whisper_host_idle_container, self.whisper_host_idle_spin, "subtitles.whisper_host_idle_minutes", refresh_quick_panel)
+
+        self.whisper_host_memory_label = QLabel()
+        self.whisper_host_memory_spin = QSpinBox()
+        self.whisper_host_memory_spin.setRange(0, 256000)
+        self.whisper_host_memory_spin.setSingleStep(1000)
+        self.whisper_host_memory_spin.setSuffix(" MB")
+        self.whisper_host_memory_spin.valueChanged.connect(self.save_settings)
+
+        self.whisper_host_memory_help = HelpLabel("whisper_host_memory_hint")
+        whisper_host_memory_container = QWidget()
+        whisper_host_memory_layout = QHBoxLayout(whisper_host_memory_container)
+        whisper_host_memory_layout.setContentsMargins(0, 0, 0, 0)
+        whisper_host_memory_layout.setSpacing(5)
+        whisper_host_memory_layout.addWidget(self.whisper_host_memory_help)
+        whisper_host_memory_layout.addWidget(self.whisper_host_memory_label)
+        add_setting_row(whisper_host_layout, whisper_host_memory_container, self.whisper_host_memory_spin, "subtitles.whisper_host_memory_mb", refresh_quick_panel)
+
+        self.whisper_workers_label = QLabel()
+        self.whisper_workers_spin = QSpinBox()
+        self.whisper_workers_spin.setRange(0, 32)
+        self.whisper_workers_spin.valueChanged.connect(self.save_settings)
+
+        self.whisper_workers_help = HelpLabel("whisper_workers_hint")
+        whisper_workers_container = QWidget()
+        whisper_workers_layout = QHBoxLayout(whisper_workers_container)
+        whisper_workers_layout.setContentsMargins(0, 0, 0, 0)
+        whisper_workers_layout.setSpacing(5)
+        whisper_workers_layout.addWidget(self.whisper_workers_help)
+        whisper_workers_layout.addWidget(self.whisper_workers_label)
+        add_setting_row(whisper_host_layout, whisper_workers_container, self.whisper_workers_spin, "subtitles.whisper_workers", refresh_quick_panel)
+
+        self.chunked_transcription_label = QLabel()
+        self.chunked_transcription_checkbox = QCheckBox()
+        self.chunked_transcription_checkbox.stateChanged.connect(self.save_settings)
+
+        self.chunked_transcription_help = HelpLabel("chunked_transcription_hint")
+        chunked_transcription_container = QWidget()
+        chunked_transcription_layout = QHBoxLayout(chunked_transcription_container)
+        chunked_transcription_layout.setContentsMargins(0, 0, 0, 0)
+        chunked_transcription_layout.setSpacing(5)
+        chunked_transcription_layout.addWidget(self.chunked_transcription_help)
+        chunked_transcription_layout.addWidget(self.chunked_transcription_label)
+        add_setting_row(whisper_host_layout, chunked_transcription_container, self.chunked_transcription_checkbox, "subtitles.chunked_transcription", refresh_quick_panel)
+
+        self.whisper_host_group.setLayout(whisper_host_layout)
+        layout.addWidget(self.whisper_host_group)
+
+        # --- Transcript Cache ---
+        self.transcript_cache_group = QGroupBox()
+        transcript_cache_layout = QFormLayout()
+
+        self.transcript_cache_enabled_label = QLabel()
+        self.transcript_cache_enabled_checkbox = QCheckBox()
+        self.transcript_cache_enabled_checkbox.stateChanged.connect(self.save_transcript_cache_settings)
+
+        self.transcript_cache_enabled_help = HelpLabel("transcript_cache_enabled_hint")
+        transcript_cache_enabled_container = QWidget()
+        transcript_cache_enabled_layout = QHBoxLayout(transcript_cache_enabled_container)
+        transcript_cache_enabled_layout.setContentsMargins(0, 0, 0, 0)
+        transcript_cache_enabled_layout.setSpacing(5)
+        transcript_cache_enabled_layout.addWidget(self.transcript_cache_enabled_help)
+        transcript_cache_enabled_layout.addWidget(self.transcript_cache_enabled_label)
+        add_setting_row(transcript_cache_layout, transcript_cache_enabled_container, self.transcript_cache_enabled_checkbox, "transcript_cache.enabled", refresh_quick_panel)
+
+        self.transcript_cache_ttl_label = QLabel()
+        self.transcript_cache_ttl_spin = QSpinBox()
+        self.transcript_cache_ttl_spin.setRange(0, 8760)
+        self.transcript_cache_ttl_spin.setSuffix(" h")
+        self.transcript_cache_ttl_spin.valueChanged.connect(self.save_transcript_cache_settings)
+
+        self.transcript_cache_ttl_help = HelpLabel("transcript_cache_ttl_hint")
+        transcript_cache_ttl_container = QWidget()
+        transcript_cache_ttl_layout = QHBoxLayout(transcript_cache_ttl_container)
+        transcript_cache_ttl_layout.setContentsMargins(0, 0, 0, 0)
+        transcript_cache_ttl_layout.setSpacing(5)
+        transcript_cache_ttl_layout.addWidget(self.transcript_cache_ttl_help)
+        transcript_cache_ttl_layout.addWidget(self.transcript_cache_ttl_label)
+        add_setting_row(transcript_cache_layout, transcript_cache_ttl_container, self.transcript_cache_ttl_spin, "transcript_cache.ttl_hours", refresh_quick_panel)
+
+        self.clear_transcript_cache_button = QPushButton()
+        self.clear_transcript_cache_button.clicked.connect(self.clear_transcript_cache)
+        transcript_cache_layout.addRow(self.clear_transcript_cache_button)
+
+        self.transcript_cache_group.setLayout(transcript_cache_layout)
+        layout.addWidget(self.transcript_cache_group)
+
         # --- Style Configuration ---
         self.style_group = QGroupBox()
         style_layout = QFormLayout()
@@ -216,6 +322,19 @@ class SubtitlesTab(QWidget):
         max_words_layout.addWidget(self.max_words_label)
         add_setting_row(logic_layout, max_words_container, self.max_words_spin, "subtitles.max_words", refresh_quick_panel)
 
+        self.align_to_script_label = QLabel()
+        self.align_to_script_checkbox = QCheckBox()
+        self.align_to_script_checkbox.stateChanged.connect(self.save_settings)
+
+        self.align_to_script_help = HelpLabel("align_to_script_hint")
+        align_to_script_container = QWidget()
+        align_to_script_layout = QHBoxLayout(align_to_script_container)
+        align_to_script_layout.setContentsMargins(0, 0, 0, 0)
+        align_to_script_layout.setSpacing(5)
+        align_to_script_layout.addWidget(self.align_to_script_help)
+        align_to_script_layout.addWidget(self.align_to_script_label)
+        add_setting_row(logic_layout, align_to_script_container, self.align_to_script_checkbox, "subtitles.align_to_script", refresh_quick_panel)
+
         self.logic_group.setLayout(logic_layout)
         layout.addWidget(self.logic_group)
 
@@ -274,6 +393,15 @@ class SubtitlesTab(QWidget):
         self.fade_in_spin.setValue(self.settings.get('fade_in', 0))
         self.fade_out_spin.setValue(self.settings.get('fade_out', 0))
         self.max_words_spin.setValue(self.settings.get('max_words', 10))
+        self.align_to_script_checkbox.setChecked(self.settings.get('align_to_script', False))
+        self.whisper_host_idle_spin.setValue(self.settings.get('whisper_host_idle_minutes', 10))
+        self.whisper_host_memory_spin.setValue(self.settings.get('whisper_host_memory_mb', 0))
+        self.whisper_workers_spin.setValue(self.settings.get('whisper_workers', 0))
+        self.chunked_transcription_checkbox.setChecked(self.settings.get('chunked_transcription', False))
+
+        cache_settings = settings_manager.get('transcript_cache', {})
+        self.transcript_cache_enabled_checkbox.setChecked(cache_settings.get('enabled', True))
+        self.transcript_cache_ttl_spin.setValue(cache_settings.get('ttl_hours', 720))
         
         self.is_loading = False
 
@@ -294,7 +422,20 @@ class SubtitlesTab(QWidget):
         self.fade_in_label.setText(translator.translate("fade_in_label"))
         self.fade_out_label.setText(translator.translate("fade_out_label"))
         self.max_words_label.setText(translator.translate("max_words_per_line_label"))
+        self.align_to_script_label.setText(translator.translate("align_to_script_label"))
         self.download_btn.setText(translator.translate("download_model_button"))
+        self.whisper_host_group.setTitle(translator.translate("whisper_host_group"))
+        self.whisper_host_idle_label.setText(translator.translate("whisper_host_idle_label"))
+        self.whisper_host_memory_label.setText(translator.translate("whisper_host_memory_label"))
+        self.whisper_host_memory_spin.setSpecialValueText(translator.translate("whisper_host_memory_auto"))
+        self.whisper_workers_label.setText(translator.translate("whisper_workers_label"))
+        self.whisper_workers_spin.setSpecialValueText(translator.translate("whisper_host_memory_auto"))
+        self.chunked_transcription_label.setText(translator.translate("chunked_transcription_label"))
+        self.transcript_cache_group.setTitle(translator.translate("transcript_cache_group"))
+        self.transcript_cache_enabled_label.setText(translator.translate("transcript_cache_enabled_label"))
+        self.transcript_cache_ttl_label.setText(translator.translate("transcript_cache_ttl_label"))
+        self.transcript_cache_ttl_spin.setSpecialValueText(translator.translate("completion_cache_ttl_unlimited"))
+        self.clear_transcript_cache_button.setText(translator.translate("completion_cache_clear"))
 
         self.standard_help.update_tooltip()
         self.amd_help.update_tooltip()
@@ -304,6 +445,13 @@ class SubtitlesTab(QWidget):
         self.fade_in_help.update_tooltip()
         self.fade_out_help.update_tooltip()
         self.max_words_help.update_tooltip()
+        self.align_to_script_help.update_tooltip()
+        self.whisper_host_idle_help.update_tooltip()
+        self.whisper_host_memory_help.update_tooltip()
+        self.whisper_workers_help.update_tooltip()
+        self.chunked_transcription_help.update_tooltip()
+        self.transcript_cache_enabled_help.update_tooltip()
+        self.transcript_cache_ttl_help.update_tooltip()
 
     def update_models_list(self):
         self.model_combo.blockSignals(True)
@@ -362,6 +510,13 @@ class SubtitlesTab(QWidget):
             else:
                 self.download_btn.setEnabled(True)
                 self.download_btn.setText(translator.translate("download_model_button"))
+        self.whisper_host_group.setTitle(translator.translate("whisper_host_group"))
+        self.whisper_host_idle_label.setText(translator.translate("whisper_host_idle_label"))
+        self.whisper_host_memory_label.setText(translator.translate("whisper_host_memory_label"))
+        self.whisper_host_memory_spin.setSpecialValueText(translator.translate("whisper_host_memory_auto"))
+        self.whisper_workers_label.setText(translator.translate("whisper_workers_label"))
+        self.whisper_workers_spin.setSpecialValueText(translator.translate("whisper_host_memory_auto"))
+        self.chunked_transcription_label.setText(translator.translate("chunked_transcription_label"))
         
         self.save_settings()
 
@@ -410,6 +565,7 @@ class SubtitlesTab(QWidget):
         """Updates the UI based on the selected engine, without saving."""
         is_whisper = self.rb_standard.isChecked() or self.rb_amd.isChecked()
         self.whisper_group.setVisible(is_whisper)
+        self.whisper_host_group.setVisible(self.rb_standard.isChecked())
 
         if is_whisper:
             current_text = self.model_combo.currentText()
@@ -471,5 +627,22 @@ class SubtitlesTab(QWidget):
         new_settings['fade_in'] = self.fade_in_spin.value()
         new_settings['fade_out'] = self.fade_out_spin.value()
         new_settings['max_words'] = self.max_words_spin.value()
+        new_settings['align_to_script'] = self.align_to_script_checkbox.isChecked()
+        new_settings['whisper_host_idle_minutes'] = self.whisper_host_idle_spin.value()
+        new_settings['whisper_host_memory_mb'] = self.whisper_host_memory_spin.value()
+        new_settings['whisper_workers'] = self.whisper_workers_spin.value()
+        new_settings['chunked_transcription'] = self.chunked_transcription_checkbox.isChecked()
         
-        settings_manager.set('subtitles', new_settings)
\ No newline at end of file
+        settings_manager.set('subtitles', new_settings)
+
+    def save_transcript_cache_settings(self, *args):
+        if getattr(self, 'is_loading', False):
+            return
+        cache_settings = settings_manager.get('transcript_cache', {})
+        cache_settings['enabled'] = self.transcript_cache_enabled_checkbox.isChecked()
+        cache_settings['ttl_hours'] = self.transcript_cache_ttl_spin.value()
+        settings_manager.set('transcript_cache', cache_settings)
+
+    def clear_transcript_cache(self):
+        transcript_cache.clear()
+        logger.log(translator.translate("transcript_cache_cleared"), level=LogLevel.INFO)
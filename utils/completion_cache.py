@@ -0,0 +1,39 @@
+import time
+from utils.settings import settings_manager
+from utils.file_cache import JsonEntryStore
+
+class CompletionCache(JsonEntryStore):
+    """
+    Персистентний кеш відповідей OpenRouter.
+    Ключ - sha256 від повного payload запиту (модель, повідомлення, temperature, max_tokens, safety_settings),
+    тому будь-яка зміна промпту чи параметрів дає новий запис.
+    Кожен запис - окремий JSON-файл у cache/completions; старі записи видаляються за TTL та лімітом розміру.
+    """
+
+    # Етапи, які можуть використовувати кеш (ключі для settings.completion_cache.disabled_stages)
+    STAGES = ['translation', 'rewrite', 'image_prompts', 'preview', 'custom_stage']
+
+    def __init__(self, cache_dir_name='completions'):
+        super().__init__(cache_dir_name)
+
+    def _config(self):
+        return settings_manager.get('completion_cache', {}) or {}
+
+    def is_enabled(self, stage):
+        config = self._config()
+        if not config.get('enabled', True):
+            return False
+        return stage not in config.get('disabled_stages', [])
+
+    def get(self, payload):
+        entry = self.read(self.make_key(payload))
+        return entry.get('response') if entry else None
+
+    def put(self, payload, response):
+        self.write(self.make_key(payload), {
+            'created': time.time(),
+            'model': payload.get('model'),
+            'response': response
+        })
+
+completion_cache = CompletionCache()
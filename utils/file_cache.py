@@ -0,0 +1,207 @@
+import json
+import os
+import sys
+import time
+import hashlib
+import platform
+import threading
+from collections import OrderedDict
+from utils.logger import logger, LogLevel
+
+HASH_CHUNK = 1024 * 1024
+# Скільки дайджестів файлів тримати в пам'яті (LRU) - як ліміт таблиці media_probe
+MAX_DIGESTS = 5000
+# Як часто write() перевіряє TTL обходом каталогу; ліміт розміру перевіряється за оцінкою розміру після кожного запису
+PRUNE_INTERVAL_SEC = 3600
+# Перевищивши ліміт, кеш зменшується до цієї частки ліміту - запас, щоб не обходити каталог після кожного запису
+PRUNE_TARGET_SHARE = 0.9
+
+
+def cache_root():
+    """Каталог cache/ поруч із програмою (або в Application Support на macOS)."""
+    if platform.system() == "Darwin":
+        base_dir = os.path.expanduser("~/Library/Application Support/Soloveyko.AI-Video.Maker")
+    elif getattr(sys, 'frozen', False):
+        # Running as a bundled exe (Windows)
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        # Running as a script (utils/file_cache.py -> root)
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, "cache")
+
+
+class FileDigests:
+    """
+    sha256 вмісту файлів для ключів кешів (шматки монтажу, ресурси, розпізнавання мови).
+    Дайджест запам'ятовується за (шлях, розмір, mtime), тож файл читається один раз, поки не зміниться.
+    """
+
+    def __init__(self, max_entries=MAX_DIGESTS):
+        self.lock = threading.Lock()
+        self.max_entries = max_entries
+        self.digests = OrderedDict() # (path, size, mtime) -> sha256 вмісту, LRU до max_entries
+
+    def file_digest(self, path):
+        """sha256 вмісту файлу; запам'ятовується за (шлях, розмір, mtime), щоб не читати файл повторно."""
+        st = os.stat(path)
+        ident = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self.lock:
+            digest = self.digests.get(ident)
+            if digest:
+                self.digests.move_to_end(ident)
+        if digest:
+            return digest
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self.lock:
+            self.digests[ident] = digest
+            while len(self.digests) > self.max_entries:
+                self.digests.popitem(last=False)
+        return digest
+
+    def known_digest(self, path):
+        """Вже порахований file_digest або None - файл не читається (безпечно для GUI-потоку)."""
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self.lock:
+            return self.digests.get((os.path.abspath(path), st.st_size, st.st_mtime_ns))
+
+
+class JsonEntryStore:
+    """
+    Персистентне сховище записів: кожен запис - окремий JSON-файл у cache/<cache_dir_name>,
+    ключ - sha256 від payload. Старі записи видаляються за TTL та лімітом розміру.
+    Налаштування (ttl_hours, max_size_mb) повертає _config() підкласу.
+    """
+
+    DEFAULT_TTL_HOURS = 168
+    DEFAULT_MAX_SIZE_MB = 200
+
+    def __init__(self, cache_dir_name):
+        self.lock = threading.Lock()
+        self.cache_dir = os.path.join(cache_root(), cache_dir_name)
+        # Розмір кешу з останнього prune() плюс записане після нього; None - ще не рахувався
+        self._size_estimate = None
+        self._last_prune = 0.0
+
+    def _config(self):
+        return {}
+
+    def _ttl_hours(self, config):
+        return config.get('ttl_hours', self.DEFAULT_TTL_HOURS)
+
+    def _max_bytes(self, config):
+        return int(config.get('max_size_mb', self.DEFAULT_MAX_SIZE_MB)) * 1024 * 1024
+
+    def make_key(self, payload):
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def read(self, key):
+        """Запис (dict) або None, якщо його немає, він прострочений чи пошкоджений."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+
+        ttl_hours = self._ttl_hours(self._config())
+        try:
+            if ttl_hours > 0 and time.time() - os.path.getmtime(path) > ttl_hours * 3600:
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # Оновлюємо atime вручну - на багатьох ФС він вимкнений, а по ньому йде витіснення
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+            return entry if isinstance(entry, dict) else None
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def write(self, key, entry):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            written = os.path.getsize(path)
+        except OSError as e:
+            logger.log(f"[{type(self).__name__}] Could not store entry: {e}", level=LogLevel.WARNING)
+            return
+
+        # Повний обхід каталогу - лише коли оцінка розміру перейшла ліміт або настав час перевірити TTL
+        max_bytes = self._max_bytes(self._config())
+        with self.lock:
+            if self._size_estimate is not None:
+                self._size_estimate += written
+            due = (self._size_estimate is None
+                   or (max_bytes > 0 and self._size_estimate > max_bytes)
+                   or time.time() - self._last_prune > PRUNE_INTERVAL_SEC)
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Видаляє прострочені записи та найдавніше використані, якщо кеш перевищує ліміт розміру."""
+        config = self._config()
+        ttl_hours = self._ttl_hours(config)
+        max_bytes = self._max_bytes(config)
+
+        with self.lock:
+            now = time.time()
+            self._last_prune = now
+            if not os.path.isdir(self.cache_dir):
+                self._size_estimate = 0
+                return
+            entries = []
+            total = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    if ttl_hours > 0 and now - st.st_mtime > ttl_hours * 3600:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                        continue
+                    entries.append((st.st_atime, st.st_size, path))
+                    total += st.st_size
+
+            if max_bytes > 0 and total > max_bytes:
+                target = max_bytes * PRUNE_TARGET_SHARE
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                        total -= size
+                    except OSError:
+                        pass
+            self._size_estimate = total
+
+    def clear(self):
+        with self.lock:
+            self._size_estimate = 0
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    try:
+                        os.remove(os.path.join(root, name))
+                    except OSError:
+                        pass
+
+file_digests = FileDigests()
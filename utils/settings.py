@@ -121,15 +121,43 @@ STORY TEXT:
                 'fade_in': 150,
                 'fade_out': 150,
                 'margin_v': 100,
-                'max_words': 10
+                'max_words': 10,
+                'align_to_script': False,
+                'whisper_host_idle_minutes': 10,
+                'whisper_host_memory_mb': 0,
+                'whisper_workers': 0,
+                'chunked_transcription': False
+            },
+            'completion_cache': {
+                'enabled': True,
+                'ttl_hours': 168,
+                'max_size_mb': 200,
+                'disabled_stages': []
+            },
+            'clip_cache': {
+                # Холодний монтаж через кеш кодує кожен кадр двічі (шматки + фінал) - вмикається для повторних монтажів
+                'enabled': False,
+                'ttl_hours': 168,
+                'max_size_mb': 10240
+            },
+            'transcript_cache': {
+                'enabled': True,
+                'ttl_hours': 720,
+                'max_size_mb': 100
             },
             'montage': {
                 'preset': 'superfast',
                 'bitrate_mbps': 5,
                 'upscale_factor': 2,
+                'motion_engine': 'zoompan',
                 'transition_duration': 2,
                 'enable_sway': True,
-                'max_concurrent_montages': 1
+                'max_concurrent_montages': 1,
+                'adaptive_concurrency': True,
+                'queue_order': 'sjf',
+                'segment_render': False,
+                'segment_workers': 0,
+                'max_open_inputs': 100
             },
             'languages_config': {
                 'uk': {